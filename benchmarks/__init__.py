@@ -0,0 +1 @@
+'''Throughput benchmarks over synthetic source trees, run with python -m benchmarks'''
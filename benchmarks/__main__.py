@@ -0,0 +1,122 @@
+'''
+Benchmark locstat over a synthetic source tree:
+
+    python -m benchmarks --files 5000 -o report.json
+    python -m benchmarks --baseline report.json
+    python -m benchmarks --cold -pm BUF -v BARE
+'''
+import argparse
+import json
+import sys
+import tempfile
+from typing import Any, Final, Optional
+
+from benchmarks.corpus import CorpusSpec, CorpusSummary, generate_corpus
+from benchmarks.suite import compare_reports, load_config, run_suite
+
+from locstat.data_structures.parse_modes import ParseMode
+from locstat.data_structures.verbosity import Verbosity
+from locstat.parsing.prefetch import READ_AHEAD_AVAILABLE
+
+def _parse_languages(arg: str) -> dict[str, float]:
+    '''Parse a language mix such as py=4,c=2,js'''
+    languages: dict[str, float] = {}
+    for item in arg.split(","):
+        extension, _, weight = item.strip().partition("=")
+        try:
+            languages[extension.lstrip(".")] = float(weight or 1)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Invalid weight {weight} for extension {extension}")
+    return languages
+
+def initialize_parser() -> argparse.ArgumentParser:
+    defaults: Final[CorpusSpec] = CorpusSpec()
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(prog="python -m benchmarks",
+                                                              description="Benchmark locstat over a synthetic tree")
+    corpus = parser.add_argument_group("corpus")
+    corpus.add_argument("--seed", type=int, default=defaults.seed)
+    corpus.add_argument("--files", type=int, default=defaults.files)
+    corpus.add_argument("--median-size", type=int, default=defaults.median_size,
+                        help="Median file size in bytes, sizes are log-normally distributed around it")
+    corpus.add_argument("--size-sigma", type=float, default=defaults.size_sigma)
+    corpus.add_argument("--depth", type=int, default=defaults.depth, help="Levels of subdirectories")
+    corpus.add_argument("--fan-out", type=int, default=defaults.fan_out, help="Subdirectories per directory")
+    corpus.add_argument("--languages", type=_parse_languages,
+                        default=",".join(f"{extension}={weight}" for extension, weight in defaults.languages.items()),
+                        help="Language mix as comma separated extension=weight pairs")
+    corpus.add_argument("--comment-density", type=float, default=defaults.comment_density)
+    corpus.add_argument("--blank-density", type=float, default=defaults.blank_density)
+    corpus.add_argument("--corpus-dir",
+                        help="Directory to generate the corpus in and keep it, a temporary directory by default")
+
+    parser.add_argument("-pm", "--parsing-mode", nargs="+", default=list(ParseMode),
+                        type=lambda arg: ParseMode(arg.strip().upper()),
+                        help=f"Parsing modes to benchmark, out of {', '.join(ParseMode)}")
+    parser.add_argument("-v", "--verbosity", nargs="+", default=list(Verbosity),
+                        type=lambda arg: Verbosity(arg.strip().upper()),
+                        help=f"Verbosities to benchmark, out of {', '.join(Verbosity)}")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed scans per case, the fastest is reported")
+    parser.add_argument("--cold", action="store_true",
+                        help=" ".join(("Also time scans of the corpus evicted from the page cache before each,",
+                                       "with and without read-ahead. Keep the corpus on the storage of interest",
+                                       "with --corpus-dir, such as a network file system or a throttled loop device")))
+    parser.add_argument("--drop-caches", action="store_true",
+                        help=" ".join(("Evict through /proc/sys/vm/drop_caches, which requires root and also",
+                                       "evicts directory entries and inodes, rather than file by file")))
+    parser.add_argument("-o", "--output", help="File to write the JSON report into, stdout by default")
+    parser.add_argument("--baseline", help="Report to compare against, exiting with 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="Fraction by which a case may slow down or grow before it counts as a regression")
+    return parser
+
+def _report_progress(result: dict[str, Any]) -> None:
+    cold: str = ""
+    if "read_ahead" in result:
+        cold = " cold, read-ahead" if result["read_ahead"] else " cold"
+    sys.stderr.write(f"{result['parse_mode']:>4}/{result['verbosity']:<8} "
+                     f"{result['files_per_second']:>10.0f} files/s "
+                     f"{result['megabytes_per_second']:>8.1f} MB/s{cold}\n")
+
+def main(line: Optional[list[str]] = None) -> int:
+    args: argparse.Namespace = initialize_parser().parse_args(line)
+    if args.cold and not READ_AHEAD_AVAILABLE:
+        sys.stderr.write("Cold cases evict files through posix_fadvise, which is unavailable on this platform\n")
+        return 2
+    spec: CorpusSpec = CorpusSpec(seed=args.seed, files=args.files,
+                                  median_size=args.median_size, size_sigma=args.size_sigma,
+                                  depth=args.depth, fan_out=args.fan_out, languages=args.languages,
+                                  comment_density=args.comment_density, blank_density=args.blank_density)
+
+    with tempfile.TemporaryDirectory(prefix="locstat_benchmark_") as temporary_directory:
+        directory: str = args.corpus_dir or temporary_directory
+        summary: CorpusSummary = generate_corpus(spec, directory, load_config().symbol_mapping)
+        sys.stderr.write(f"Generated {summary.files} files, {summary.bytes} bytes "
+                         f"in {summary.directories} directories\n")
+        report: dict[str, Any] = run_suite(directory, spec, summary, args.parsing_mode, args.verbosity,
+                                           args.repeat, _report_progress, args.cold, args.drop_caches)
+    sys.stderr.write(f"startup {report['startup']['seconds'] * 1000:.1f}ms, "
+                     f"{report['startup']['import_seconds'] * 1000:.1f}ms importing "
+                     f"{report['startup']['modules']} modules\n")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump(report, output_file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline, "r", encoding="utf-8") as baseline_file:
+        baseline: dict[str, Any] = json.load(baseline_file)
+    try:
+        regressions: list[str] = compare_reports(baseline, report, args.tolerance)
+    except ValueError as error:
+        sys.stderr.write(f"{error}\n")
+        return 2
+    for regression in regressions:
+        sys.stderr.write(f"Regression: {regression}\n")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
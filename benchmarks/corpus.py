@@ -0,0 +1,132 @@
+import math
+import os
+import random
+from dataclasses import dataclass, field
+from typing import Final, Mapping, NamedTuple, Optional
+
+from locstat.data_structures.typing import CommentSymbols, LanguageMetadata
+
+__all__ = ("CorpusSpec",
+           "CorpusSummary",
+           "generate_corpus")
+
+_WORDS: Final[tuple[str, ...]] = ("value", "count", "index", "buffer", "result", "node", "total", "offset",
+                                  "length", "state", "config", "handle", "item", "cursor", "limit", "entry")
+
+@dataclass(frozen=True, slots=True)
+class CorpusSpec:
+    '''Parameters of a synthetic source tree. Equal specs always generate identical trees'''
+    seed: int = 0
+    files: int = 2000
+    # File sizes follow a log-normal distribution around the median, clamped to the given bounds
+    median_size: int = 4096
+    size_sigma: float = 1.0
+    min_size: int = 64
+    max_size: int = 1 << 20
+    # Levels of subdirectories below the root, and subdirectories per directory
+    depth: int = 3
+    fan_out: int = 4
+    # Extension -> relative weight. Extensions must be known to languages.json
+    languages: Mapping[str, float] = field(default_factory=lambda: {"py" : 4, "c" : 2, "js" : 2,
+                                                                    "java" : 1, "rs" : 1})
+    # Fraction of lines that are comments, and of lines that are blank
+    comment_density: float = 0.2
+    blank_density: float = 0.1
+
+class CorpusSummary(NamedTuple):
+    files: int
+    bytes: int
+    directories: int
+
+def _first_symbol(symbols: CommentSymbols) -> Optional[bytes]:
+    if isinstance(symbols, tuple):
+        return symbols[0]
+    return symbols
+
+def _directories(root: str, depth: int, fan_out: int) -> list[str]:
+    '''Every directory of a complete tree of the given depth and fan out, root first'''
+    directories: list[str] = [root]
+    level: list[str] = [root]
+    for _ in range(depth):
+        level = [os.path.join(parent, f"dir_{index}") for parent in level for index in range(fan_out)]
+        directories.extend(level)
+    return directories
+
+def _code_line(rng: random.Random) -> bytes:
+    words: list[str] = rng.choices(_WORDS, k=rng.randint(2, 6))
+    indent: str = "    " * rng.randint(0, 3)
+    return f"{indent}{words[0]} = {' + '.join(words[1:])}\n".encode()
+
+def _file_contents(rng: random.Random,
+                   size: int,
+                   comment_data: LanguageMetadata,
+                   comment_density: float,
+                   blank_density: float) -> bytes:
+    singleline: Optional[bytes] = _first_symbol(comment_data[0])
+    multiline_start: Optional[bytes] = _first_symbol(comment_data[1])
+    multiline_end: Optional[bytes] = _first_symbol(comment_data[2])
+
+    lines: list[bytes] = []
+    written: int = 0
+    while written < size:
+        roll: float = rng.random()
+        if roll < blank_density:
+            line: bytes = b"\n"
+        elif roll < blank_density + comment_density:
+            text: bytes = " ".join(rng.choices(_WORDS, k=rng.randint(3, 8))).encode()
+            # Alternate between both kinds of comments, where the language has them
+            if multiline_start and multiline_end and (not singleline or rng.random() < 0.3):
+                line = b"".join((multiline_start, b" ", text, b"\n", text, b" ", multiline_end, b"\n"))
+            else:
+                assert singleline is not None
+                line = b"".join((singleline, b" ", text, b"\n"))
+        else:
+            line = _code_line(rng)
+        lines.append(line)
+        written += len(line)
+    return b"".join(lines)
+
+def generate_corpus(spec: CorpusSpec,
+                    root: str,
+                    symbol_mapping: Mapping[str, LanguageMetadata]) -> CorpusSummary:
+    '''
+    Write a synthetic source tree under a directory
+
+    :param spec: Parameters of the tree
+    :type spec: CorpusSpec
+
+    :param root: Directory to write into, created if it does not exist
+    :type root: str
+
+    :param symbol_mapping: Comment symbols of each language, as in ClocConfig.symbol_mapping
+    :type symbol_mapping: Mapping[str, LanguageMetadata]
+
+    :raises ValueError: If a language of the spec has no comment symbols
+
+    :return: Number of files, bytes and directories written
+    :rtype: CorpusSummary
+    '''
+    for extension in spec.languages:
+        comment_data: Optional[LanguageMetadata] = symbol_mapping.get(extension)
+        if not comment_data or not (comment_data[0] or comment_data[1]):
+            raise ValueError(f"No comment symbols are known for extension {extension}")
+
+    rng: random.Random = random.Random(spec.seed)
+    directories: list[str] = _directories(root, spec.depth, spec.fan_out)
+    for directory in directories:
+        os.makedirs(directory, exist_ok=True)
+
+    extensions: list[str] = list(spec.languages)
+    weights: list[float] = [spec.languages[extension] for extension in extensions]
+    total_bytes: int = 0
+    for index in range(spec.files):
+        extension: str = rng.choices(extensions, weights)[0]
+        size: int = round(spec.median_size * math.exp(rng.gauss(0, spec.size_sigma)))
+        size = max(spec.min_size, min(spec.max_size, size))
+        contents: bytes = _file_contents(rng, size, symbol_mapping[extension],
+                                         spec.comment_density, spec.blank_density)
+        with open(os.path.join(rng.choice(directories), f"file_{index}.{extension}"), "wb") as file:
+            file.write(contents)
+        total_bytes += len(contents)
+
+    return CorpusSummary(spec.files, total_bytes, len(directories))
@@ -0,0 +1,103 @@
+'''
+Per entry cost of path filters over synthetic paths, in memory:
+
+    python -m benchmarks.filters --paths 2000000 --patterns 1 10 100
+'''
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from typing import Any, Callable, Final, Optional, Sequence
+
+from locstat.utilities.core import construct_directory_filter, construct_file_filter
+from locstat.utilities.patterns import PathPatterns
+
+__all__ = ("generate_paths",
+           "time_filter",
+           "benchmark_filters")
+
+_ROOT: Final[str] = os.path.join(os.sep, "benchmark")
+_NAMES: Final[tuple[str, ...]] = ("src", "lib", "core", "utils", "internal", "api", "models", "views",
+                                  "generated", "vendor", "tests", "proto", "build", "docs")
+_EXTENSIONS: Final[tuple[str, ...]] = ("py", "c", "h", "js", "ts", "rs", "go", "java")
+
+def generate_paths(count: int, seed: int = 0, max_depth: int = 8) -> list[str]:
+    '''Absolute paths of files under a common root, at varying depths. Equal arguments give equal paths'''
+    rng: random.Random = random.Random(seed)
+    paths: list[str] = []
+    for index in range(count):
+        components: list[str] = rng.choices(_NAMES, k=rng.randint(0, max_depth))
+        suffix: str = "_pb2" if rng.random() < 0.05 else ""
+        paths.append(os.path.join(_ROOT, *components, f"file_{index}{suffix}.{rng.choice(_EXTENSIONS)}"))
+    return paths
+
+def _patterns(count: int) -> tuple[list[str], list[str]]:
+    '''Globs and regexes of roughly the shape found on command lines, the first few being typical ones'''
+    globs: list[str] = ["**/generated/**", "*_pb2.py", "vendor/", "**/*.min.js"]
+    regexes: list[str] = [r"/tests?/", r"_pb2\.py$", r"^build/", r"\.min\.js$"]
+    globs.extend(f"src/module_{index}/**" for index in range(count - len(globs)))
+    regexes.extend(rf"^src/module_{index}/" for index in range(count - len(regexes)))
+    return globs[:count], regexes[:count]
+
+def time_filter(paths: Sequence[str], file_filter: Callable[[str, str], bool], repeat: int = 3) -> float:
+    '''Fastest of the given number of passes over every path, in nanoseconds per path'''
+    extensions: list[str] = [path.rsplit(".", 1)[-1] for path in paths]
+    best: float = float("inf")
+    for _ in range(repeat):
+        epoch: float = time.perf_counter()
+        for path, extension in zip(paths, extensions):
+            file_filter(path, extension)
+        best = min(best, time.perf_counter() - epoch)
+    return best / len(paths) * 1e9
+
+def benchmark_filters(paths: Sequence[str], pattern_counts: Sequence[int], repeat: int = 3) -> dict[str, Any]:
+    '''
+    Time the exact match filters against glob and regex filters of increasing size
+
+    :param paths: Paths to filter, as generated by generate_paths
+    :type paths: Sequence[str]
+
+    :param pattern_counts: Numbers of patterns to time, each count timed separately for globs and regexes
+    :type pattern_counts: Sequence[int]
+
+    :return: Nanoseconds per path for each filter
+    :rtype: dict[str, Any]
+    '''
+    # Exact matches over a set of paths the size of the largest pattern count, for reference
+    excluded: frozenset[str] = frozenset(paths[:max(pattern_counts, default=1)])
+    results: dict[str, Any] = {"paths" : len(paths),
+                               "exact" : time_filter(paths, construct_file_filter(file_set=excluded,
+                                                                                  exclude_file=True), repeat),
+                               "glob" : {}, "regex" : {}}
+    for count in pattern_counts:
+        globs, regexes = _patterns(count)
+        for kind, patterns in (("glob", PathPatterns(_ROOT, exclude_globs=globs)),
+                               ("regex", PathPatterns(_ROOT, exclude_regexes=regexes))):
+            results[kind][count] = time_filter(paths, patterns.file_filter(construct_file_filter()), repeat)
+    # Directory checks, which prune subtrees, happen once per directory rather than per file
+    directories: list[str] = sorted({os.path.dirname(path) for path in paths})
+    directory_filter: Callable[[str], bool] = PathPatterns(_ROOT, exclude_globs=_patterns(10)[0]).directory_filter(
+        construct_directory_filter(frozenset()))
+    results["directories"] = len(directories)
+    results["pruned_directories"] = sum(not directory_filter(directory) for directory in directories)
+    return results
+
+def main(line: Optional[list[str]] = None) -> int:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(prog="python -m benchmarks.filters",
+                                                              description="Per path cost of path filters")
+    parser.add_argument("--paths", type=int, default=1_000_000)
+    parser.add_argument("--patterns", type=int, nargs="+", default=[1, 10, 100],
+                        help="Numbers of patterns to time")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="Passes per filter, the fastest is reported")
+    args: argparse.Namespace = parser.parse_args(line)
+
+    results: dict[str, Any] = benchmark_filters(generate_paths(args.paths, args.seed), args.patterns, args.repeat)
+    json.dump(results, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,380 @@
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Callable, Final, Iterable, Optional, Sequence
+
+from benchmarks.corpus import CorpusSpec, CorpusSummary
+
+from locstat import __version__
+from locstat.data_structures.config import ClocConfig
+from locstat.data_structures.parse_modes import ParseMode
+from locstat.data_structures.result_store import ResultStore
+from locstat.data_structures.verbosity import Verbosity
+from locstat.parsing.directory import (parse_directory,
+                                       parse_directory_columnar,
+                                       parse_directory_record,
+                                       parse_directory_verbose)
+from locstat.parsing.prefetch import ReadAhead
+from locstat.utilities.core import (construct_directory_filter,
+                                    construct_file_filter,
+                                    derive_file_parser)
+
+__all__ = ("REPORT_VERSION",
+           "load_config",
+           "imported_modules",
+           "measure_startup",
+           "run_case",
+           "evict_corpus",
+           "run_cold_case",
+           "run_suite",
+           "compare_reports")
+
+REPORT_VERSION: Final[int] = 1
+_MEGABYTE: Final[int] = 1 << 20
+_PACKAGE_ROOT: Final[Path] = Path(__file__).parent.parent
+_DROP_CACHES: Final[str] = "/proc/sys/vm/drop_caches"
+
+def load_config() -> ClocConfig:
+    '''Configuration of the installed package, for its language table'''
+    return ClocConfig.load_toml(Path(__file__).parent.parent / "locstat" / "config.toml")
+
+def imported_modules(arguments: Sequence[str], cwd: Optional[str] = None) -> dict[str, int]:
+    '''
+    Run the CLI under python -X importtime
+
+    :param arguments: Arguments to pass to locstat
+    :type arguments: Sequence[str]
+
+    :return: Modules imported by the run, mapped to their cumulative import times in microseconds.
+             Nested imports are named with their indentation, so that top level ones can be told apart
+    :rtype: dict[str, int]
+    '''
+    environment: dict[str, str] = {**os.environ, "PYTHONPATH" : str(_PACKAGE_ROOT)}
+    process: subprocess.CompletedProcess[str] = subprocess.run((sys.executable, "-X", "importtime",
+                                                                "-m", "locstat", *arguments),
+                                                               cwd=cwd, env=environment, capture_output=True,
+                                                               text=True, check=True)
+    modules: dict[str, int] = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or line.endswith("imported package"):
+            continue
+        _, cumulative, name = line.split("|")
+        # The name column is a single space, then two more per level of nesting
+        modules[name[1:].rstrip()] = int(cumulative)
+    return modules
+
+def measure_startup(repeat: int) -> dict[str, Any]:
+    '''
+    Time the startup of a single file count, the case in which startup dominates, after one untimed run
+
+    :param repeat: Number of timed runs, of which the fastest is reported
+    :type repeat: int
+
+    :return: Wall time of the run, time spent importing modules, and the number of modules imported
+    :rtype: dict[str, Any]
+    '''
+    arguments: tuple[str, ...] = ("-f", __file__)
+    imported_modules(arguments)
+    wall_time: float = float("inf")
+    import_time: float = float("inf")
+    modules: dict[str, int] = {}
+    for _ in range(repeat):
+        epoch: float = time.perf_counter()
+        modules = imported_modules(arguments)
+        wall_time = min(wall_time, time.perf_counter() - epoch)
+        import_time = min(import_time, sum(cumulative for name, cumulative in modules.items()
+                                           if not name.startswith(" ")) / 1e6)
+    return {"seconds" : wall_time, "import_seconds" : import_time, "modules" : len(modules)}
+
+def _peak_rss() -> Optional[int]:
+    '''Peak resident set size of the current process in bytes, None where it cannot be measured'''
+    try:
+        import resource
+    except ImportError:     # Windows
+        return None
+    peak: int = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in kilobytes on Linux, and in bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def _scan(directory: str, config: ClocConfig, parse_mode: ParseMode, verbosity: Verbosity) -> tuple[int, int]:
+    kwargs: dict[str, Any] = {"config" : config,
+                              "depth" : -1,
+                              "file_parsing_function" : derive_file_parser(parse_mode),
+                              "file_filter_function" : construct_file_filter(),
+                              "directory_filter_function" : construct_directory_filter(frozenset()),
+                              "minimum_characters" : config.minimum_characters}
+    with os.scandir(directory) as directory_data:
+        if verbosity == Verbosity.DETAILED:
+            tree: dict[str, Any] = parse_directory_verbose(directory_data, language_record={}, **kwargs)
+            return tree["total"], tree["loc"]
+        line_data: array = array("Q", (0, 0))
+        if verbosity == Verbosity.REPORT:
+            parse_directory_record(directory_data, line_data=line_data, language_record={}, **kwargs)
+        else:
+            parse_directory(directory_data, line_data=line_data, **kwargs)
+        return line_data[0], line_data[1]
+
+def run_case(directory: str,
+             summary: CorpusSummary,
+             parse_mode: ParseMode,
+             verbosity: Verbosity,
+             repeat: int) -> dict[str, Any]:
+    '''
+    Time scans of a corpus under a single parsing mode and verbosity, after one untimed warm up scan.
+    Meant to run in a fresh process, so that peak RSS covers this case alone
+
+    :param directory: Root of the corpus
+    :type directory: str
+
+    :param summary: Corpus summary returned by generate_corpus
+    :type summary: CorpusSummary
+
+    :param repeat: Number of timed scans, of which the fastest is reported
+    :type repeat: int
+
+    :return: Timings and throughput of the case
+    :rtype: dict[str, Any]
+    '''
+    config: ClocConfig = load_config()
+    counts: tuple[int, int] = _scan(directory, config, parse_mode, verbosity)
+    best: float = float("inf")
+    for _ in range(repeat):
+        epoch: float = time.perf_counter()
+        _scan(directory, config, parse_mode, verbosity)
+        best = min(best, time.perf_counter() - epoch)
+
+    return {"parse_mode" : str(parse_mode),
+            "verbosity" : str(verbosity),
+            "seconds" : best,
+            "files_per_second" : summary.files / best,
+            "megabytes_per_second" : summary.bytes / _MEGABYTE / best,
+            "peak_rss" : _peak_rss(),
+            "total" : counts[0],
+            "loc" : counts[1]}
+
+def evict_corpus(directory: str, drop_caches: bool = False) -> None:
+    '''
+    Evict a corpus from the page cache, so that the next scan reads it from storage.
+    Files are evicted one at a time through posix_fadvise, leaving directory entries and inodes cached
+
+    :param directory: Root of the corpus
+    :type directory: str
+
+    :param drop_caches: Drop every clean page, directory entry and inode cached system wide instead,
+                        which requires root on Linux
+    :type drop_caches: bool
+
+    :raises OSError: If caches cannot be dropped, or files cannot be evicted
+    '''
+    # Only clean pages are evicted, so a freshly generated corpus is written out first
+    os.sync()
+    if drop_caches:
+        with open(_DROP_CACHES, "w", encoding="utf-8") as drop_caches_file:
+            drop_caches_file.write("3")
+        return
+    for root, _, filenames in os.walk(directory):
+        for filename in filenames:
+            descriptor: int = os.open(os.path.join(root, filename), os.O_RDONLY)
+            try:
+                os.posix_fadvise(descriptor, 0, 0, os.POSIX_FADV_DONTNEED)
+            finally:
+                os.close(descriptor)
+
+def _cold_scan(directory: str,
+               config: ClocConfig,
+               parse_mode: ParseMode,
+               verbosity: Verbosity,
+               read_ahead: Optional[ReadAhead]) -> tuple[int, int]:
+    # The serial scans run by the CLI, which are the ones read-ahead applies to
+    kwargs: dict[str, Any] = {"config" : config,
+                              "depth" : -1,
+                              "file_parsing_function" : derive_file_parser(parse_mode),
+                              "file_filter_function" : construct_file_filter(),
+                              "directory_filter_function" : construct_directory_filter(frozenset()),
+                              "minimum_characters" : config.minimum_characters,
+                              "read_ahead" : read_ahead}
+    with os.scandir(directory) as directory_data:
+        if verbosity == Verbosity.DETAILED:
+            store: ResultStore = parse_directory_columnar(directory_data, language_record={}, root=directory, **kwargs)
+            return store.totals[0], store.locs[0]
+        line_data: array = array("Q", (0, 0))
+        if verbosity == Verbosity.REPORT:
+            parse_directory_record(directory_data, line_data=line_data, language_record={}, **kwargs)
+        else:
+            parse_directory(directory_data, line_data=line_data, **kwargs)
+        return line_data[0], line_data[1]
+
+def run_cold_case(directory: str,
+                  summary: CorpusSummary,
+                  parse_mode: ParseMode,
+                  verbosity: Verbosity,
+                  read_ahead: bool,
+                  repeat: int,
+                  drop_caches: bool = False) -> dict[str, Any]:
+    '''
+    Time scans of a corpus evicted from the page cache before each one, with or without read-ahead.
+    On storage without much latency, a throttled loop device or a network file system makes the difference plainer
+
+    :param directory: Root of the corpus
+    :type directory: str
+
+    :param summary: Corpus summary returned by generate_corpus
+    :type summary: CorpusSummary
+
+    :param read_ahead: Advise the kernel of files about to be parsed, as the CLI does under --prefetch
+    :type read_ahead: bool
+
+    :param repeat: Number of timed scans, of which the fastest is reported
+    :type repeat: int
+
+    :param drop_caches: Evict through /proc/sys/vm/drop_caches, see evict_corpus
+    :type drop_caches: bool
+
+    :return: Timings and throughput of the case
+    :rtype: dict[str, Any]
+    '''
+    config: ClocConfig = load_config()
+    best: float = float("inf")
+    counts: tuple[int, int] = (0, 0)
+    for _ in range(repeat):
+        evict_corpus(directory, drop_caches)
+        epoch: float = time.perf_counter()
+        counts = _cold_scan(directory, config, parse_mode, verbosity, ReadAhead() if read_ahead else None)
+        best = min(best, time.perf_counter() - epoch)
+
+    return {"parse_mode" : str(parse_mode),
+            "verbosity" : str(verbosity),
+            "read_ahead" : read_ahead,
+            "seconds" : best,
+            "files_per_second" : summary.files / best,
+            "megabytes_per_second" : summary.bytes / _MEGABYTE / best,
+            "total" : counts[0],
+            "loc" : counts[1]}
+
+def run_suite(directory: str,
+              spec: CorpusSpec,
+              summary: CorpusSummary,
+              parse_modes: Iterable[ParseMode] = ParseMode,
+              verbosities: Iterable[Verbosity] = Verbosity,
+              repeat: int = 3,
+              progress: Optional[Callable[[dict[str, Any]], None]] = None,
+              cold: bool = False,
+              drop_caches: bool = False) -> dict[str, Any]:
+    '''
+    Benchmark every combination of parsing mode and verbosity over a generated corpus,
+    each in its own process
+
+    :param directory: Root of the corpus
+    :type directory: str
+
+    :param spec: Parameters the corpus was generated with
+    :type spec: CorpusSpec
+
+    :param progress: Called with the result of each case as it completes
+    :type progress: Optional[Callable[[dict[str, Any]], None]]
+
+    :param cold: Also time every combination over a corpus evicted from the page cache,
+                 with and without read-ahead
+    :type cold: bool
+
+    :param drop_caches: Evict through /proc/sys/vm/drop_caches, see evict_corpus
+    :type drop_caches: bool
+
+    :return: JSON serializable report
+    :rtype: dict[str, Any]
+    '''
+    # Iterated over again for cold cases
+    parse_modes, verbosities = tuple(parse_modes), tuple(verbosities)
+    startup: dict[str, Any] = measure_startup(repeat)
+    results: list[dict[str, Any]] = []
+    # A single task per worker process keeps the peak RSS of one case from carrying over into the next
+    with ProcessPoolExecutor(max_workers=1,
+                             mp_context=multiprocessing.get_context("spawn"),
+                             max_tasks_per_child=1) as executor:
+        for parse_mode in parse_modes:
+            for verbosity in verbosities:
+                result: dict[str, Any] = executor.submit(run_case, directory, summary,
+                                                         parse_mode, verbosity, repeat).result()
+                results.append(result)
+                if progress is not None:
+                    progress(result)
+
+    cold_results: list[dict[str, Any]] = []
+    if cold:
+        for parse_mode in parse_modes:
+            for verbosity in verbosities:
+                for read_ahead in (False, True):
+                    result = run_cold_case(directory, summary, parse_mode, verbosity, read_ahead, repeat, drop_caches)
+                    cold_results.append(result)
+                    if progress is not None:
+                        progress(result)
+
+    return {"version" : REPORT_VERSION,
+            "locstat" : __version__,
+            "python" : platform.python_version(),
+            "platform" : platform.platform(),
+            "corpus" : {**asdict(spec), "languages" : dict(spec.languages), **summary._asdict()},
+            "repeat" : repeat,
+            "startup" : startup,
+            "results" : results,
+            "cold" : cold_results}
+
+def compare_reports(baseline: dict[str, Any],
+                    current: dict[str, Any],
+                    tolerance: float = 0.1) -> list[str]:
+    '''
+    Compare a report against a saved baseline
+
+    :param tolerance: Fraction by which throughput may drop, or peak RSS and startup time may grow,
+                      before it counts as a regression
+    :type tolerance: float
+
+    :raises ValueError: If the reports were made over different corpora
+
+    :return: Description of each regression found, empty if there are none
+    :rtype: list[str]
+    '''
+    if baseline["corpus"] != current["corpus"]:
+        raise ValueError("Reports were generated over different corpora, and cannot be compared")
+
+    regressions: list[str] = []
+    # Older reports were made without measuring startup
+    previous_startup: Optional[dict[str, Any]] = baseline.get("startup")
+    startup: Optional[dict[str, Any]] = current.get("startup")
+    if previous_startup and startup:
+        if startup["import_seconds"] > previous_startup["import_seconds"] * (1 + tolerance):
+            regressions.append(f"startup: {startup['import_seconds'] * 1000:.1f}ms spent importing, "
+                               f"up from {previous_startup['import_seconds'] * 1000:.1f}ms")
+        if startup["modules"] > previous_startup["modules"]:
+            regressions.append(f"startup: {startup['modules']} modules imported, "
+                               f"up from {previous_startup['modules']}")
+    # Older reports were made without cold cases
+    baseline_results: dict[tuple[str, str, Optional[bool]], dict[str, Any]] = {
+        (result["parse_mode"], result["verbosity"], result.get("read_ahead")) : result
+        for result in (*baseline["results"], *baseline.get("cold", ()))}
+    for result in (*current["results"], *current.get("cold", ())):
+        key: tuple[str, str, Optional[bool]] = (result["parse_mode"], result["verbosity"], result.get("read_ahead"))
+        previous: Optional[dict[str, Any]] = baseline_results.get(key)
+        if previous is None:
+            continue
+        case: str = f"{key[0]}/{key[1]}"
+        if key[2] is not None:
+            case += f" cold{' with read-ahead' if key[2] else ''}"
+        if (previous["total"], previous["loc"]) != (result["total"], result["loc"]):
+            regressions.append(f"{case}: counts changed from {previous['total']}/{previous['loc']} "
+                               f"to {result['total']}/{result['loc']}")
+        if result["files_per_second"] < previous["files_per_second"] * (1 - tolerance):
+            regressions.append(f"{case}: {result['files_per_second']:.0f} files/s, "
+                               f"down from {previous['files_per_second']:.0f}")
+        if (result.get("peak_rss") and previous.get("peak_rss")
+            and result["peak_rss"] > previous["peak_rss"] * (1 + tolerance)):
+            regressions.append(f"{case}: peak RSS of {result['peak_rss'] / _MEGABYTE:.1f}MB, "
+                               f"up from {previous['peak_rss'] / _MEGABYTE:.1f}MB")
+    return regressions
@@ -1,37 +1,187 @@
 import argparse
 import os
-import platform
 import sys
 import time
 from array import array
-from datetime import datetime
+from functools import partial
 from pathlib import Path
-from typing import Any, Callable, Final, Literal, NoReturn, Union
+from contextlib import nullcontext
+from typing import Any, Callable, Final, Iterator, Literal, NoReturn, Optional, Sequence, Union
 
-from locstat.argparser import initialize_parser, parse_arguments
+from locstat.argparser import (initialize_calibration_parser,
+                               initialize_parser,
+                               initialize_serve_parser,
+                               parse_arguments)
 from locstat import __version__, __tool_name__
 from locstat.data_structures.config import ClocConfig
+from locstat.data_structures.result_store import ResultStore
 from locstat.data_structures.typing import FileParsingFunction, LanguageMetadata
 from locstat.data_structures.verbosity import Verbosity
-from locstat.parsing.directory import (parse_directory,
-                                    parse_directory_record,
-                                    parse_directory_verbose)
-from locstat.utilities.core import (construct_directory_filter, construct_file_filter,
+from locstat.parsing.archive import (compression_suffix,
+                                  is_archive,
+                                  open_compressed,
+                                  parse_archive,
+                                  parse_archive_record,
+                                  parse_archive_verbose)
+from locstat.parsing.cache import MemoryCache, ResultCache, default_cache_path
+from locstat.parsing.extensions._parsing import (_set_auto_thresholds,
+                                                 _set_sniff_options,
+                                                 _set_split_options,
+                                                 _skipped_files)
+from locstat.parsing.stream import parse_stream
+from locstat.utilities.core import (SKIP_REASONS,
+                                 available_cpus,
+                                 construct_directory_filter, construct_file_filter,
                                  derive_file_parser)
+from locstat.utilities.daemon import default_socket_path, forward
 from locstat.utilities.presentation import (OUTPUT_MAPPING,
                                          OutputFunction,
+                                         dump_ndjson_stream,
                                          dump_std_output)
+from locstat.utilities.statistics import ScanStatistics
 
 __all__ = ("main",)
 
-def main() -> int:
-    config: Final[ClocConfig] = ClocConfig.load_toml(Path(__file__).parent / "config.toml")
+def _scan_metadata(epoch: float) -> dict[str, str]:
+    # os.uname() names the system just as platform.system() does, without importing platform on every run
+    if hasattr(os, "uname"):
+        system: str = os.uname().sysname
+    else:
+        import platform
+        system = platform.system()
+    return {"time" : f"{time.time()-epoch:.3f}s",
+            "scanned_at" : time.strftime("%d/%m/%y, at %H:%M:%S"),
+            "platform" : system}
+
+def _skipped_record() -> dict[str, int]:
+    return dict(zip(SKIP_REASONS, _skipped_files()))
+
+def _ndjson_records(records: Iterator[dict[str, Any]],
+                    language_record: dict[str, dict[str, int]],
+                    skip_generated: bool = False) -> Iterator[dict[str, Any]]:
+    epoch: float = time.time()
+    # The top directory's record comes last, and holds the totals of the whole scan
+    last: dict[str, Any] = {"total" : 0, "loc" : 0}
+    for last in records:
+        yield last
+    summary: dict[str, Any] = {"type" : "summary", "total" : last["total"], "loc" : last["loc"],
+                               "languages" : language_record}
+    if skip_generated:
+        summary["skipped"] = _skipped_record()
+    yield {**summary, **_scan_metadata(epoch)}
+
+def _stream_ndjson(args: argparse.Namespace,
+                   kwargs: dict[str, Any],
+                   directory: str,
+                   cache: Optional[Union[ResultCache, MemoryCache]],
+                   stats: Optional[ScanStatistics]) -> int:
+    from locstat.parsing.directory import parse_directory_stream
+    language_record: dict[str, dict[str, int]] = {}
+    records: Iterator[dict[str, Any]] = parse_directory_stream(directory, language_record=language_record,
+                                                               threads=args.threads, jobs=args.jobs, **kwargs)
+    output_file: Union[int, str] = args.output.strip() if args.output else sys.stdout.fileno()
+    try:
+        # Records are written while scanning, so output is timed as part of the scan
+        with stats.phase("scan") if stats is not None else nullcontext():
+            dump_ndjson_stream(_ndjson_records(records, language_record, args.skip_generated), output_file)
+    except BrokenPipeError:     # The reader stopped early, such as head
+        return 1
+    finally:
+        if cache is not None:
+            cache.close()
+    if stats is not None:
+        sys.stderr.write(stats.report())
+    return 0
+
+def _watch(args: argparse.Namespace, kwargs: dict[str, Any], directory: str) -> int:
+    from locstat.parsing.watch import DirectoryWatch, watch_directory
+    watch: DirectoryWatch = DirectoryWatch(directory, kwargs["config"], kwargs["depth"],
+                                           kwargs["file_parsing_function"],
+                                           kwargs["file_filter_function"],
+                                           kwargs["directory_filter_function"],
+                                           kwargs["minimum_characters"],
+                                           args.threads, args.jobs)
+    summaries: Iterator[dict[str, Any]] = watch_directory(watch, args.watch, args.poll,
+                                                          args.verbosity == Verbosity.DETAILED)
+    output_file: Union[int, str] = args.output.strip() if args.output else sys.stdout.fileno()
+    try:
+        dump_ndjson_stream(({**summary, "scanned_at" : time.strftime("%d/%m/%y, at %H:%M:%S")}
+                            for summary in summaries), output_file)
+    except BrokenPipeError:     # The reader stopped
+        return 1
+    return 0
+
+def _calibrate(config: ClocConfig, line: list[str]) -> int:
+    from locstat.utilities.calibration import calibrate
+    args: argparse.Namespace = initialize_calibration_parser().parse_args(line)
+    mmap_threshold, buffered_threshold = calibrate(args.dir, args.repeat)
+    print(f"auto_mmap_threshold : {mmap_threshold}\nauto_buffered_threshold : {buffered_threshold}")
+    if not args.dry_run:
+        config.update_configuration("auto_mmap_threshold", mmap_threshold)
+        config.update_configuration("auto_buffered_threshold", buffered_threshold)
+    return 0
+
+def _config_signature(config: ClocConfig) -> tuple[tuple[int, int], ...]:
+    signature: list[tuple[int, int]] = []
+    for filepath in (config.config_file, config.working_directory / "languages.json"):
+        stat_result: os.stat_result = os.stat(filepath)
+        signature.append((stat_result.st_mtime_ns, stat_result.st_size))
+    return tuple(signature)
+
+def _serve(config: ClocConfig, line: list[str]) -> int:
+    from locstat.utilities.daemon import request, serve
+    args: argparse.Namespace = initialize_serve_parser().parse_args(line)
+    if os.name == "nt":
+        sys.stderr.write("The daemon relies on Unix sockets, and is not supported on Windows\n")
+        return 1
+    socket_path: Path = Path(args.socket) if args.socket else default_socket_path()
+    if args.stop or args.status:
+        try:
+            response: dict[str, Any] = request({"command" : "stop" if args.stop else "status"}, socket_path)
+        except OSError:
+            sys.stderr.write(f"No daemon is listening on {socket_path}\n")
+            return 1
+        if args.status:
+            print("\n".join(f"{key} : {value}" for key, value in response.items()))
+        return 0
+
+    memory_cache: Final[MemoryCache] = MemoryCache(args.cache_limit)
+    signature: tuple[tuple[int, int], ...] = _config_signature(config)
+    def _handle(arguments: list[str]) -> int:
+        nonlocal signature
+        # Picks up configuration edited since, including through the daemon itself
+        current_signature: tuple[tuple[int, int], ...] = _config_signature(config)
+        if current_signature != signature:
+            ClocConfig.load_toml(config.config_file)
+            signature = current_signature
+        return main(arguments, config, memory_cache)
+    return serve(_handle, socket_path, lambda: {"cached_files" : len(memory_cache)})
+
+def main(line: Optional[Sequence[str]] = None,
+         config: Optional[ClocConfig] = None,
+         memory_cache: Optional[MemoryCache] = None) -> int:
+    '''
+    Run the CLI, on sys.argv unless given a command line.
+    The daemon passes its configuration, loaded once, and its cache of per-file results
+    '''
+    startup: Final[float] = time.perf_counter()
+    if line is None:
+        line = sys.argv[1:]
+    if config is None:
+        config = ClocConfig.load_toml(Path(__file__).parent / "config.toml")
+    if line[0:1] == ["calibrate"]:
+        return _calibrate(config, list(line[1:]))
+    if line[0:1] == ["serve"]:
+        return _serve(config, list(line[1:]))
     parser: Final[argparse.ArgumentParser] = initialize_parser(config)
-    args: argparse.Namespace = parse_arguments(sys.argv[1:], parser)
+    args: argparse.Namespace = parse_arguments(line, parser)
 
     if args.version:
         print(f"{__tool_name__} {__version__}")
         return 0
+    if memory_cache is not None and args.watch is not None:
+        sys.stderr.write("--watch runs until interrupted, and cannot be handed to the daemon. Pass --no-daemon\n")
+        return 1
 
     # Because of nargs="*" in argparser's config argument,
     # the only way to determine whether --config was passed
@@ -46,23 +196,47 @@ def main() -> int:
         return 0
 
     output_mapping: dict[str, Any] = {}
+    stats: Optional[ScanStatistics] = None
+    _set_auto_thresholds(config.auto_mmap_threshold, config.auto_buffered_threshold)
+    _set_split_options(config.split_threshold, config.split_threads or available_cpus())
+    # Set on every run, as the daemon serves runs with and without --skip-generated from one process
+    _set_sniff_options(config.sniff_block_size if args.skip_generated else 0, config.sniff_max_line_length)
+    _skipped_files(True)
     
     file_parser_function: Final[FileParsingFunction] = derive_file_parser(args.parsing_mode)
     # Single file, no need to check and validate other default values
-    if args.file:
-        comment_data: LanguageMetadata = config.symbol_mapping.get(args.file.rsplit(".", 1)[-1],
+    if args.file and not is_archive(args.file):
+        # Compressed files are counted by the extension they have once decompressed
+        compression: Optional[str] = compression_suffix(args.file)
+        filename: str = args.file[:-len(compression)] if compression else args.file
+        comment_data: LanguageMetadata = config.symbol_mapping.get(args.language or filename.rsplit(".", 1)[-1],
                                                                    (None, None, None))
         singleline_symbol, multiline_start_symbol, multiline_end_symbol = comment_data
         epoch: float = time.time()
-        total, loc = file_parser_function(args.file, 
-                                          singleline_symbol, 
-                                          multiline_start_symbol, 
-                                          multiline_end_symbol, 
-                                          args.min_chars)
+        if args.file == "-":
+            total, loc = parse_stream(sys.stdin.buffer, comment_data, args.min_chars)
+        elif compression:
+            with open_compressed(args.file) as stream:
+                total, loc = parse_stream(stream, comment_data, args.min_chars)
+        else:
+            total, loc = file_parser_function(args.file, 
+                                              singleline_symbol, 
+                                              multiline_start_symbol, 
+                                              multiline_end_symbol, 
+                                              args.min_chars)
         
         output_mapping["general"] = {"loc" : loc, "total" : total}
         
     else:
+        # Scanning modules are imported here rather than up front, keeping them off the single file path
+        from locstat.parsing.directory import (NATIVE_WALK_AVAILABLE,
+                                               parse_directory_native,
+                                               parse_directory,
+                                               parse_directory_record,
+                                               parse_directory_verbose,
+                                               parse_directory_threaded,
+                                               parse_directory_record_threaded,
+                                               parse_directory_columnar)
         extension_set: frozenset[str] = frozenset(extension for extension in
                                                  (args.exclude_type or args.include_type or []))
         file_set: frozenset[str] = frozenset(file for file in
@@ -74,46 +248,159 @@ def main() -> int:
                                                                         bool(args.include_type),
                                                                         bool(args.exclude_type))
         
-        directory_filter: Callable[[str], bool] = lambda directory : True
+        directory_filter: Callable[[str], bool] = construct_directory_filter(frozenset())
+        directory_set: frozenset[str] = frozenset()
         if (args.include_dir or args.exclude_dir):
-            directory_set: frozenset[str] = frozenset(directory for directory in
-                                                      (args.include_dir or args.exclude_dir))
+            directory_set = frozenset(directory for directory in
+                                      (args.include_dir or args.exclude_dir))
             directory_filter = construct_directory_filter(directory_set,
                                                           include=bool(args.include_dir),
                                                           exclude=bool(args.exclude_dir))
+        # Compiled while validating arguments, so that regexes which cannot be combined are reported there
+        patterns_given: bool = args.path_patterns is not None
+        if patterns_given:
+            file_filter = args.path_patterns.file_filter(file_filter)
+            directory_filter = args.path_patterns.directory_filter(directory_filter)
+        if args.gitignore:
+            from locstat.utilities.ignore import IgnoreRules
+            ignore_rules: IgnoreRules = IgnoreRules(args.dir)
+            file_filter = ignore_rules.file_filter(file_filter)
+            directory_filter = ignore_rules.directory_filter(directory_filter)
 
-        kwargs: dict[str, Any] = {"directory_data" : os.scandir(os.path.abspath(args.dir)),
-                                  "config" : config,
+        kwargs: dict[str, Any] = {"config" : config,
                                   "file_parsing_function" : file_parser_function,
                                   "file_filter_function" : file_filter,
                                   "directory_filter_function" : directory_filter,
                                   "minimum_characters" : args.min_chars,
                                   "depth" : args.max_depth}
+        if args.stats is not None:
+            stats = ScanStatistics(config.symbol_mapping, args.stats)
+            stats.phases["configuration"] = time.perf_counter() - startup
+            kwargs.update({"file_parsing_function" : stats.file_parser(file_parser_function),
+                           "file_filter_function" : stats.file_filter(file_filter),
+                           "directory_filter_function" : stats.directory_filter(directory_filter)})
+        directory: str = os.path.abspath(args.dir or args.file)
+        cache: Optional[Union[ResultCache, MemoryCache]] = None
+        if args.dir and (args.cache or args.git):
+            from locstat.parsing.git import git_blob_ids
+            cache = ResultCache(args.cache or default_cache_path(), args.cache_limit,
+                                git_blob_ids(directory) if args.git else None)
+            kwargs["cache"] = cache
+        elif (args.dir and memory_cache is not None
+              and not (args.rev or args.skip_generated)
+              and not (args.jobs and args.jobs > 1 and not args.threads)):
+            # Worker processes would only fill copies of the daemon's cache,
+            # and files skipped by --skip-generated would be served from it without being reported
+            cache = memory_cache
+            kwargs["cache"] = cache
+
+        if args.prefetch:
+            from locstat.parsing.prefetch import ReadAhead
+            kwargs["read_ahead"] = ReadAhead()
+
+        if args.watch is not None:
+            return _watch(args, kwargs, directory)
+        if args.ndjson:
+            return _stream_ndjson(args, kwargs, directory, cache, stats)
+        if args.file:
+            # Members are streamed from the archive in order, so parsing modes and workers do not apply
+            kwargs.pop("file_parsing_function")
+            kwargs["archive"] = directory
+            bare_parser, record_parser, verbose_parser = (parse_archive,
+                                                          parse_archive_record,
+                                                          parse_archive_verbose)
+        elif args.rev:
+            # Blobs stream from a single git process and are parsed in memory,
+            # so parsing modes and workers do not apply
+            from locstat.parsing.revision import parse_revision, parse_revision_record, parse_revision_verbose
+            kwargs.pop("file_parsing_function")
+            kwargs.update({"directory" : directory, "revision" : args.rev})
+            bare_parser, record_parser, verbose_parser = (parse_revision,
+                                                          parse_revision_record,
+                                                          parse_revision_verbose)
+        elif (NATIVE_WALK_AVAILABLE
+              and cache is None
+              and args.verbosity != Verbosity.DETAILED
+              and stats is None
+              and not (args.gitignore or patterns_given)
+              and not (args.threads or args.prefetch or (args.jobs and args.jobs > 1))):
+            # Traverse natively, passing filters as raw sets rather than callables
+            kwargs = {"directory" : directory,
+                      "config" : config,
+                      "depth" : args.max_depth,
+                      "parse_mode" : args.parsing_mode,
+                      "minimum_characters" : args.min_chars,
+                      "extension_set" : extension_set,
+                      "file_set" : file_set,
+                      "directory_set" : directory_set,
+                      "include_file" : bool(args.include_file),
+                      "exclude_file" : bool(args.exclude_file),
+                      "include_type" : bool(args.include_type),
+                      "exclude_type" : bool(args.exclude_type),
+                      "include_dir" : bool(args.include_dir),
+                      "exclude_dir" : bool(args.exclude_dir)}
+            bare_parser = record_parser = parse_directory_native
+            verbose_parser = parse_directory_verbose
+        elif args.threads:
+            kwargs.update({"directory_data" : os.scandir(directory), "jobs" : args.jobs})
+            bare_parser, record_parser, verbose_parser = (parse_directory_threaded,
+                                                          parse_directory_record_threaded,
+                                                          partial(parse_directory_columnar,
+                                                                  root=directory, threads=True))
+        elif args.jobs and args.jobs > 1:
+            from locstat.parsing.parallel import (parse_directory_parallel,
+                                                  parse_directory_record_parallel,
+                                                  parse_directory_verbose_parallel)
+            kwargs.update({"directory" : directory, "jobs" : args.jobs})
+            bare_parser, record_parser, verbose_parser = (parse_directory_parallel,
+                                                          parse_directory_record_parallel,
+                                                          parse_directory_verbose_parallel)
+        else:
+            kwargs["directory_data"] = os.scandir(directory)
+            bare_parser, record_parser, verbose_parser = (parse_directory,
+                                                          parse_directory_record,
+                                                          partial(parse_directory_columnar, root=directory))
         output_mapping = {}
         epoch: float = time.time()
-        if args.verbosity == Verbosity.BARE:
-            line_data: array = array("L", (0, 0))
-            parse_directory(**kwargs, line_data=line_data)
-            output_mapping["general"] = {"total" : line_data[0], "loc" : line_data[1]}
-        else:
-            language_record: dict[str, dict[str, int]] = {}
-            kwargs.update({"language_record" : language_record})
-
-            if args.verbosity == Verbosity.DETAILED:
-                output_mapping.update(parse_directory_verbose(**kwargs))
-                total, loc = output_mapping.pop("total"), output_mapping.pop("loc")
-                output_mapping["general"] = {"total" : total, "loc" : loc}
-            else:
-                line_data: array = array("L", (0, 0))
-                parse_directory_record(**kwargs, line_data=line_data)
+        scan_epoch: float = time.perf_counter()
+        try:
+            if args.verbosity == Verbosity.BARE:
+                line_data: array = array("Q", (0, 0))
+                bare_parser(**kwargs, line_data=line_data)
                 output_mapping["general"] = {"total" : line_data[0], "loc" : line_data[1]}
-            
-            output_mapping["languages"] = language_record
+            else:
+                language_record: dict[str, dict[str, int]] = {}
+                kwargs.update({"language_record" : language_record})
 
-    general_metadata: dict[str, str] = {"time" : f"{time.time()-epoch:.3f}s",
-                                        "scanned_at" : datetime.now().strftime("%d/%m/%y, at %H:%M:%S"),
-                                        "platform" : platform.system()}
-    output_mapping["general"].update(general_metadata)  # type: ignore
+                if args.verbosity == Verbosity.DETAILED:
+                    result: Union[dict[str, Any], ResultStore] = verbose_parser(**kwargs)
+                    if isinstance(result, ResultStore):
+                        output_mapping["store"] = result
+                        total, loc = result.totals[0], result.locs[0]
+                    else:
+                        output_mapping.update(result)
+                        total, loc = output_mapping.pop("total"), output_mapping.pop("loc")
+                    output_mapping["general"] = {"total" : total, "loc" : loc}
+                else:
+                    line_data: array = array("Q", (0, 0))
+                    record_parser(**kwargs, line_data=line_data)
+                    output_mapping["general"] = {"total" : line_data[0], "loc" : line_data[1]}
+                
+                output_mapping["languages"] = language_record
+        except ValueError as error:
+            if not args.rev:
+                raise
+            sys.stderr.write(f"{error}\n")
+            return 1
+        finally:
+            if cache is not None:
+                cache.close()
+            if stats is not None:
+                stats.phases["scan"] = time.perf_counter() - scan_epoch
+
+    output_mapping["general"].update(_scan_metadata(epoch))  # type: ignore
+    if args.skip_generated:
+        output_mapping["skipped"] = _skipped_record()
         
     # Emit results
     output_file: Union[int, str] = sys.stdout.fileno()
@@ -125,12 +412,23 @@ def main() -> int:
         # Fetch output function based on file extension, default to standard write logic
         output_handler = OUTPUT_MAPPING.get(output_extension, output_handler)
     
-    output_handler(output_mapping=output_mapping, filepath=output_file)
+    if stats is None:
+        output_handler(output_mapping=output_mapping, filepath=output_file)
+        return 0
+
+    with stats.phase("output"):
+        output_handler(output_mapping=output_mapping, filepath=output_file)
+    sys.stderr.write(stats.report())
     return 0
 
 def _run_guarded() -> NoReturn:
     try:
-        sys.exit(main())
+        # Handed to a running daemon, if any, which has the configuration and per-file results ready
+        status: Optional[int] = None
+        if (sys.argv[1:2] not in (["calibrate"], ["serve"])
+            and not any(argument == "--no-daemon" or argument.startswith("--watch") for argument in sys.argv)):
+            status = forward(sys.argv[1:])
+        sys.exit(main() if status is None else status)
     except KeyboardInterrupt:
         sys.stdout.write(f"{__tool_name__} interrupted\n")
         sys.exit()
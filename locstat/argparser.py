@@ -1,6 +1,7 @@
 import argparse
 from functools import partial
 import os
+import re
 import sys
 from typing import Final, Sequence
 
@@ -8,9 +9,16 @@ from locstat import __tool_name__
 from locstat.data_structures.config import ClocConfig
 from locstat.data_structures.parse_modes import ParseMode
 from locstat.data_structures.verbosity import Verbosity
-from locstat.utilities.presentation import OUTPUT_MAPPING, dump_std_output
+from locstat.parsing.cache import DEFAULT_CACHE_ENTRIES, default_cache_path
+from locstat.utilities.presentation import NDJSON_EXTENSIONS, OUTPUT_MAPPING, dump_std_output
+from locstat.utilities.core import available_cpus
+from locstat.utilities.daemon import default_socket_path
+from locstat.utilities.statistics import DEFAULT_SLOWEST_FILES
 
-__all__ = ("initialize_parser", "parse_arguments")
+__all__ = ("initialize_parser", "initialize_calibration_parser", "initialize_serve_parser", "parse_arguments")
+
+# Seconds between summaries of --watch when passed without a value
+DEFAULT_WATCH_INTERVAL: Final[float] = 2.0
 
 def _validate_directory(arg: str) -> str:
     arg = arg.strip()
@@ -21,6 +29,9 @@ def _validate_directory(arg: str) -> str:
 
 def _validate_filepath(arg: str) -> str:
     arg = arg.strip()
+    # Standard input
+    if arg == "-":
+        return arg
     if not os.path.isfile(arg):
         sys.stderr.write(f"File {arg} could not be found\n")
         sys.exit(1)
@@ -51,6 +62,77 @@ def _validate_max_depth(arg: str) -> int:
         sys.exit(1)
     return depth
 
+def _validate_jobs(arg: str) -> int:
+    try:
+        jobs: int = int(arg)
+    except ValueError:
+        sys.stderr.write("Number of jobs must be integer value\n")
+        sys.exit(1)
+    if jobs < 1:
+        sys.stderr.write("Number of jobs must be at least 1\n")
+        sys.exit(1)
+    return jobs
+
+def _validate_cache_limit(arg: str) -> int:
+    try:
+        limit: int = int(arg)
+    except ValueError:
+        sys.stderr.write("Cache limit must be integer value\n")
+        sys.exit(1)
+    if limit < 1:
+        sys.stderr.write("Cache limit must be at least 1\n")
+        sys.exit(1)
+    return limit
+
+def _validate_repeat(arg: str) -> int:
+    try:
+        repeat: int = int(arg)
+    except ValueError:
+        sys.stderr.write("Number of repetitions must be integer value\n")
+        sys.exit(1)
+    if repeat < 1:
+        sys.stderr.write("Number of repetitions must be at least 1\n")
+        sys.exit(1)
+    return repeat
+
+def _validate_slowest_files(arg: str) -> int:
+    try:
+        count: int = int(arg)
+    except ValueError:
+        sys.stderr.write("Number of slowest files must be integer value\n")
+        sys.exit(1)
+    if count < 0:
+        sys.stderr.write("Number of slowest files cannot be negative\n")
+        sys.exit(1)
+    return count
+
+def _validate_interval(arg: str) -> float:
+    try:
+        interval: float = float(arg)
+    except ValueError:
+        sys.stderr.write("Watch interval must be a number of seconds\n")
+        sys.exit(1)
+    if not interval > 0:
+        sys.stderr.write("Watch interval must be positive\n")
+        sys.exit(1)
+    return interval
+
+def _validate_revision(arg: str) -> str:
+    arg = arg.strip()
+    # Would otherwise be read as an option by git
+    if not arg or arg.startswith("-"):
+        sys.stderr.write(f"Invalid revision {arg}\n")
+        sys.exit(1)
+    return arg
+
+def _validate_regex(arg: str) -> str:
+    try:
+        re.compile(arg)
+    except re.error as error:
+        sys.stderr.write(f"Invalid regular expression {arg}: {error}\n")
+        sys.exit(1)
+    return arg
+
 def _validate_verbosity(arg: str) -> Verbosity:
     arg = arg.strip().upper()
     try:
@@ -106,7 +188,15 @@ def initialize_parser(config: ClocConfig) -> argparse.ArgumentParser:
 
     required_group.add_argument("-f", "--file",
                         type=_validate_filepath,
-                        help="Specify the file to scan. Either this or '-d' must be used")
+                        help=" ".join(("Specify the file to scan, or '-' to read standard input.",
+                                       "Tar and zip archives are scanned like directories, and .gz, .bz2 and .xz",
+                                       "files are decompressed while counting. Either this or '-d' must be used")))
+
+    parser.add_argument("--language",
+                        help=" ".join(("File extension whose comment symbols are used for the file passed to '-f',",
+                                       "instead of its own. Needed to recognise comments in standard input")),
+                        type=lambda arg: arg.strip().lstrip("."),
+                        default=None)
     
     # Parsing logic manipulation
     parser.add_argument("-mc", "--min-chars",
@@ -122,6 +212,96 @@ def initialize_parser(config: ClocConfig) -> argparse.ArgumentParser:
                         type=_validate_max_depth,
                         default=config.max_depth)
 
+    parser.add_argument("-j", "--jobs",
+                        help=" ".join(("Number of workers used to scan directories.",
+                                       "If passed without a value, all CPUs available to the process are used")),
+                        nargs="?",
+                        type=_validate_jobs,
+                        const=available_cpus(),
+                        default=None)
+
+    parser.add_argument("-t", "--threads",
+                        help=" ".join(("Parse files on a pool of threads instead of processes.",
+                                       "Useful for I/O bound scans, such as on network filesystems.",
+                                       "--jobs sets the number of threads if passed")),
+                        action="store_true")
+
+    parser.add_argument("--prefetch",
+                        help=" ".join(("Advise the kernel to read upcoming files into the page cache while",
+                                       "earlier ones are parsed, for cold caches and network file systems.",
+                                       "The number of files read ahead adapts to the measured throughput.",
+                                       "Has no effect where posix_fadvise is unavailable")),
+                        action="store_true")
+
+    parser.add_argument("--cache",
+                        help=" ".join(("Cache per-file results in the given SQLite database,",
+                                       "only parsing files that changed since the previous scan.",
+                                       f"If passed without a value, {default_cache_path()} is used")),
+                        nargs="?",
+                        const=str(default_cache_path()),
+                        default=None)
+
+    parser.add_argument("--cache-limit",
+                        help=" ".join(("Maximum number of entries kept in the cache,",
+                                       "least recently used entries are evicted beyond it")),
+                        type=_validate_cache_limit,
+                        default=DEFAULT_CACHE_ENTRIES)
+
+    parser.add_argument("--git",
+                        help=" ".join(("Key cached results of files tracked by git on their blob IDs,",
+                                       "sharing them across clones and checkouts of the same contents.",
+                                       "Implies --cache")),
+                        action="store_true")
+
+    parser.add_argument("--gitignore",
+                        help=" ".join(("Skip files and directories ignored by .gitignore, .ignore and",
+                                       ".git/info/exclude files, including those of parent directories within the",
+                                       "same repository. Ignored directories are never scanned")),
+                        action="store_true")
+
+    parser.add_argument("--skip-generated",
+                        help=" ".join(("Skip binary, minified and generated files, judged by their first",
+                                       "sniff_block_size bytes: files holding NUL bytes, lines longer than",
+                                       "sniff_max_line_length bytes or markers such as '@generated' and",
+                                       "'DO NOT EDIT' are not counted, and the files skipped are reported",
+                                       "per reason. Archive members and standard input are not sniffed")),
+                        action="store_true")
+
+    parser.add_argument("--stats",
+                        help=" ".join(("Profile the scan, writing time spent per phase, files and directories",
+                                       "visited and skipped, bytes read, throughput per extension and the",
+                                       "given number of slowest files to stderr.",
+                                       f"If passed without a value, {DEFAULT_SLOWEST_FILES} files are listed.",
+                                       "Files are parsed one at a time on a single thread while profiling")),
+                        nargs="?",
+                        type=_validate_slowest_files,
+                        const=DEFAULT_SLOWEST_FILES,
+                        default=None)
+
+    parser.add_argument("--rev",
+                        help=" ".join(("Scan the given git revision of the directory instead of its work tree,",
+                                       "reading files straight from the repository without checking them out")),
+                        type=_validate_revision,
+                        default=None)
+
+    parser.add_argument("--watch",
+                        help=" ".join(("Scan the directory, then follow changes to it, counting only the files",
+                                       "created, modified or removed. A summary of totals per language, and per",
+                                       "directory under DETAILED verbosity, is written as a JSON line once",
+                                       "scanned, then every given number of seconds in which counts changed.",
+                                       f"If passed without a value, every {DEFAULT_WATCH_INTERVAL:g} seconds.",
+                                       "Changes are subscribed to through inotify where available,",
+                                       "and polled for otherwise")),
+                        nargs="?",
+                        type=_validate_interval,
+                        const=DEFAULT_WATCH_INTERVAL,
+                        default=None)
+
+    parser.add_argument("--poll",
+                        help=" ".join(("Poll for changes under --watch rather than subscribing to them,",
+                                       "needed on network file systems where changes made elsewhere are not reported")),
+                        action="store_true")
+
     file_filter_group: argparse._MutuallyExclusiveGroup = parser.add_mutually_exclusive_group()
 
     file_filter_group.add_argument("-xf", "--exclude-file",
@@ -152,6 +332,30 @@ def initialize_parser(config: ClocConfig) -> argparse.ArgumentParser:
                         help=" ".join(("Include files by extension, useful for specificity",
                                        "when working with directories with files for different languages")))
 
+    parser.add_argument("-xg", "--exclude-glob",
+                        nargs="+",
+                        help=" ".join(("Exclude files and directories matching globs, relative to the scanned",
+                                       "directory. Globs without a separator match names at any depth, ** matches",
+                                       "any number of directories, and excluded directories are not scanned,",
+                                       "e.g. '**/generated/**'")))
+
+    parser.add_argument("-ig", "--include-glob",
+                        nargs="+",
+                        help="Only count files matching globs, relative to the scanned directory, e.g. 'src/**/*.py'")
+
+    parser.add_argument("-xr", "--exclude-regex",
+                        nargs="+",
+                        type=_validate_regex,
+                        help=" ".join(("Exclude files and directories whose paths, relative to the scanned directory,",
+                                       "contain a match of a regular expression. Directories are matched with a",
+                                       "trailing separator")))
+
+    parser.add_argument("-ir", "--include-regex",
+                        nargs="+",
+                        type=_validate_regex,
+                        help=" ".join(("Only count files whose paths, relative to the scanned directory,",
+                                       "contain a match of a regular expression")))
+
     # Output control
     parser.add_argument("-vb", "--verbosity",
                         type=_validate_verbosity,
@@ -167,6 +371,18 @@ def initialize_parser(config: ClocConfig) -> argparse.ArgumentParser:
                                     f"{', '.join(k for k,v in OUTPUT_MAPPING.items() if v != dump_std_output)}",
                                     "then output is formatted differently.")))
     
+    parser.add_argument("--ndjson",
+                        help=" ".join(("Stream one JSON record per line for each file as soon as it is parsed,",
+                                       "then for each directory once complete, and a final summary.",
+                                       "Memory use does not grow with the number of files.",
+                                       f"Implied by output files ending in {', '.join(sorted(NDJSON_EXTENSIONS))}")),
+                        action="store_true")
+
+    parser.add_argument("--no-daemon",
+                        help=" ".join(("Scan in this process, even if a daemon started by",
+                                       f"'{__tool_name__} serve' is listening")),
+                        action="store_true")
+
     parser.add_argument("-pm", "--parsing-mode",
                         type=_validate_parsing_mode,
                         default=ParseMode.BUFFERED,
@@ -176,6 +392,60 @@ def initialize_parser(config: ClocConfig) -> argparse.ArgumentParser:
 
     return parser
 
+def initialize_calibration_parser() -> argparse.ArgumentParser:
+    '''Instantiate and return an argument parser for the calibrate subcommand
+
+    :return: argparse.ArgumentParser'''
+
+    parser: Final[argparse.ArgumentParser] = argparse.ArgumentParser(prog=f"{__tool_name__} calibrate",
+                                                                     description=" ".join((
+                                                                         "Time each parsing mode on this machine",
+                                                                         "and save the file sizes at which AUTO",
+                                                                         "parsing switches between them")))
+    parser.add_argument("-d", "--dir",
+                        type=_validate_directory,
+                        help=" ".join(("Directory to write temporary files into,",
+                                       "preferably on the file system usually scanned.",
+                                       "Defaults to the system's temporary directory")))
+    parser.add_argument("--repeat",
+                        type=_validate_repeat,
+                        default=3,
+                        help="Times each measurement is repeated, keeping the fastest")
+    parser.add_argument("--dry-run",
+                        action="store_true",
+                        help="Print the chosen thresholds without saving them")
+    return parser
+
+def initialize_serve_parser() -> argparse.ArgumentParser:
+    '''Instantiate and return an argument parser for the serve subcommand
+
+    :return: argparse.ArgumentParser'''
+
+    parser: Final[argparse.ArgumentParser] = argparse.ArgumentParser(prog=f"{__tool_name__} serve",
+                                                                     description=" ".join((
+                                                                         "Keep the configuration, language table",
+                                                                         "and per-file results in memory, answering",
+                                                                         "scans over a Unix socket. Later runs of",
+                                                                         f"{__tool_name__} hand their scans to it")))
+    parser.add_argument("--socket",
+                        type=lambda arg: arg.strip(),
+                        help=" ".join(("Socket to listen on, where clients look for it too.",
+                                       "Defaults to $LOCSTAT_SOCKET if set,",
+                                       f"{default_socket_path() if os.name != 'nt' else 'unsupported'} otherwise")))
+    parser.add_argument("--cache-limit",
+                        type=_validate_cache_limit,
+                        default=DEFAULT_CACHE_ENTRIES,
+                        help=" ".join(("Maximum number of per-file results kept,",
+                                       "least recently used results are evicted beyond it")))
+    control_group: argparse._MutuallyExclusiveGroup = parser.add_mutually_exclusive_group()
+    control_group.add_argument("--stop",
+                               action="store_true",
+                               help="Stop the daemon listening on the socket")
+    control_group.add_argument("--status",
+                               action="store_true",
+                               help="Show the process ID, uptime and requests served by the daemon")
+    return parser
+
 def parse_arguments(line: Sequence[str],
                     parser: argparse.ArgumentParser) -> argparse.Namespace:
     parsed_arguments: argparse.Namespace = parser.parse_args(line)
@@ -188,6 +458,82 @@ def parse_arguments(line: Sequence[str],
     # Format parsed_arguments.config into list of key, value pairs
     parsed_arguments.config = [(parsed_arguments.config[i], parsed_arguments.config[i+1])
                                for i in range(0, configurations_args_length-1, 2)]
+    if parsed_arguments.rev and not parsed_arguments.dir:
+        sys.stderr.write("--rev can only be used when scanning a directory\n")
+        sys.exit(1)
+    if parsed_arguments.rev and (parsed_arguments.cache or parsed_arguments.git):
+        sys.stderr.write("--rev cannot be combined with --cache or --git\n")
+        sys.exit(1)
+    if parsed_arguments.gitignore and not parsed_arguments.dir:
+        sys.stderr.write("--gitignore can only be used when scanning a directory\n")
+        sys.exit(1)
+    if parsed_arguments.gitignore and parsed_arguments.rev:
+        sys.stderr.write("--gitignore cannot be combined with --rev, which only scans tracked files\n")
+        sys.exit(1)
+    if ((parsed_arguments.exclude_glob or parsed_arguments.include_glob
+         or parsed_arguments.exclude_regex or parsed_arguments.include_regex)
+        and not parsed_arguments.dir):
+        sys.stderr.write("Glob and regex filters can only be used when scanning a directory\n")
+        sys.exit(1)
+    parsed_arguments.path_patterns = None
+    if (parsed_arguments.exclude_glob or parsed_arguments.include_glob
+        or parsed_arguments.exclude_regex or parsed_arguments.include_regex):
+        # Regexes that compile alone can still fail once combined, e.g. when reusing a group name
+        from locstat.utilities.patterns import PathPatterns
+        try:
+            parsed_arguments.path_patterns = PathPatterns(parsed_arguments.dir,
+                                                          parsed_arguments.include_glob or (),
+                                                          parsed_arguments.exclude_glob or (),
+                                                          parsed_arguments.include_regex or (),
+                                                          parsed_arguments.exclude_regex or ())
+        except re.error as error:
+            regexes: list[str] = [*(parsed_arguments.include_regex or ()), *(parsed_arguments.exclude_regex or ())]
+            sys.stderr.write(f"Invalid regular expressions {', '.join(regexes)}: {error}\n")
+            sys.exit(1)
+    if parsed_arguments.skip_generated and (parsed_arguments.cache or parsed_arguments.git):
+        sys.stderr.write("--skip-generated cannot be combined with --cache or --git\n")
+        sys.exit(1)
+    if parsed_arguments.stats is not None and not parsed_arguments.dir:
+        sys.stderr.write("--stats can only be used when scanning a directory\n")
+        sys.exit(1)
+    if parsed_arguments.stats is not None and (parsed_arguments.rev
+                                               or parsed_arguments.threads
+                                               or (parsed_arguments.jobs and parsed_arguments.jobs > 1)):
+        sys.stderr.write("--stats cannot be combined with --rev, --threads or --jobs\n")
+        sys.exit(1)
+    if parsed_arguments.output and parsed_arguments.output.strip().rsplit(".", 1)[-1] in NDJSON_EXTENSIONS:
+        parsed_arguments.ndjson = True
+    if parsed_arguments.ndjson and not parsed_arguments.dir:
+        sys.stderr.write("NDJSON output can only be used when scanning a directory\n")
+        sys.exit(1)
+    if parsed_arguments.ndjson and (parsed_arguments.rev
+                                    or (parsed_arguments.jobs and parsed_arguments.jobs > 1
+                                        and not parsed_arguments.threads)):
+        sys.stderr.write("NDJSON output cannot be combined with --rev, or --jobs without --threads\n")
+        sys.exit(1)
+    if parsed_arguments.watch is not None and not parsed_arguments.dir:
+        sys.stderr.write("--watch can only be used when scanning a directory\n")
+        sys.exit(1)
+    if parsed_arguments.watch is not None and (parsed_arguments.rev
+                                               or parsed_arguments.cache or parsed_arguments.git
+                                               or parsed_arguments.stats is not None
+                                               or (parsed_arguments.jobs and parsed_arguments.jobs > 1
+                                                   and not parsed_arguments.threads)):
+        sys.stderr.write(" ".join(("--watch cannot be combined with --rev, --cache, --git, --stats,",
+                                   "or --jobs without --threads\n")))
+        sys.exit(1)
+    if parsed_arguments.prefetch and not parsed_arguments.dir:
+        sys.stderr.write("--prefetch can only be used when scanning a directory\n")
+        sys.exit(1)
+    if parsed_arguments.prefetch and (parsed_arguments.rev
+                                      or parsed_arguments.watch is not None
+                                      or (parsed_arguments.jobs and parsed_arguments.jobs > 1
+                                          and not parsed_arguments.threads)):
+        sys.stderr.write("--prefetch cannot be combined with --rev, --watch, or --jobs without --threads\n")
+        sys.exit(1)
+    if parsed_arguments.poll and parsed_arguments.watch is None:
+        sys.stderr.write("--poll can only be used with --watch\n")
+        sys.exit(1)
     # TODO: Add additional mutual exclusion logic
 
     return parsed_arguments
\ No newline at end of file
@@ -5,6 +5,7 @@ from locstat.data_structures.exceptions import (ExitException,
 from locstat.data_structures.singleton import SingletonMeta
 from locstat.data_structures.parse_modes import ParseMode
 from locstat.data_structures.config import ClocConfig
+from locstat.data_structures.result_store import ResultStore
 import locstat.data_structures.typing as cloc_typing
 from locstat.data_structures.verbosity import Verbosity
 
@@ -13,5 +14,6 @@ __all__ = ("ExitException",
            "SingletonMeta",
            "ParseMode",
            "ClocConfig",
+           "ResultStore",
            "cloc_typing",
            "Verbosity")
\ No newline at end of file
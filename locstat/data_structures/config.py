@@ -1,19 +1,24 @@
 from enum import StrEnum
-import json
+import marshal
+import os
+import sys
 import tomllib
 from dataclasses import dataclass, field
 from pathlib import Path
 from types import MappingProxyType
-from typing import Any, Final, Mapping
+from typing import Any, Final, Mapping, Optional, Union
 
 from locstat.data_structures.exceptions import InvalidConfigurationException
 from locstat.data_structures.singleton import SingletonMeta
-from locstat.data_structures.typing import LanguageMetadata
+from locstat.data_structures.typing import CommentSymbols, LanguageMetadata
 from locstat.data_structures.verbosity import Verbosity
 from locstat.data_structures.parse_modes import ParseMode
 
 __all__ = ("ClocConfig",)
 
+# Bump whenever the layout of the compiled language table changes
+_LANGUAGE_TABLE_VERSION: Final[int] = 1
+
 @dataclass(init=False, slots=True, weakref_slot=True)
 class ClocConfig(metaclass=SingletonMeta):
     working_directory: Path
@@ -23,6 +28,16 @@ class ClocConfig(metaclass=SingletonMeta):
     minimum_characters: int = 0
     max_depth: int = -1
     parsing_mode: ParseMode = ParseMode.BUFFERED
+    # File sizes from which AUTO parsing switches to MMAP, then to BUF. Set by `locstat calibrate`
+    auto_mmap_threshold: int = 64 * 1024
+    auto_buffered_threshold: int = 1 << 30
+    # Files of at least split_threshold bytes are counted in parallel ranges, on split_threads threads
+    # (0 for every CPU available). A threshold of 0 disables splitting
+    split_threshold: int = 64 * 1024 * 1024
+    split_threads: int = 0
+    # Leading bytes inspected, and the line length from which files are taken as minified, by --skip-generated
+    sniff_block_size: int = 4096
+    sniff_max_line_length: int = 1000
 
     # Language metadata
     symbol_mapping: MappingProxyType[str, LanguageMetadata]
@@ -35,7 +50,10 @@ class ClocConfig(metaclass=SingletonMeta):
     @property
     def configurable(self) -> frozenset[str]:
         return frozenset(["verbosity", "minimum_characters",
-                          "max_depth", "parsing_mode"])
+                          "max_depth", "parsing_mode",
+                          "auto_mmap_threshold", "auto_buffered_threshold",
+                          "split_threshold", "split_threads",
+                          "sniff_block_size", "sniff_max_line_length"])
 
     @staticmethod
     def flatten_mapping(mapping: Mapping[Any, Any]) -> dict[Any, Any]:
@@ -50,6 +68,76 @@ class ClocConfig(metaclass=SingletonMeta):
                 flattened[k] = v
         return flattened
 
+    @staticmethod
+    def _encode_symbols(symbols: Optional[Union[str, list[str]]]) -> CommentSymbols:
+        '''Encode a comment symbol, or a list of alternative symbols, from languages.json'''
+        if not symbols:
+            return None
+        if isinstance(symbols, str):
+            return symbols.encode()
+        return tuple(symbol.encode() for symbol in symbols)
+
+    @classmethod
+    def _compile_languages(cls, languages_data: dict[str, Any]) -> tuple[set[str], dict[str, LanguageMetadata]]:
+        '''Validate the contents of languages.json, and encode their comment symbols'''
+        comments_data: dict[str, list[Optional[Union[str, list[str]]]]] = languages_data.pop("comments")
+        symbol_mapping: dict[str, LanguageMetadata] = {}
+        for language, comment_data in comments_data.items():
+            if len(comment_data) != 3:
+                raise InvalidConfigurationException(" ".join((f"Comment data for file extension {language} malformed",
+                                                              "Should be of format:",
+                                                              "(singleline, multiline-start, multiline-end)",
+                                                              f"got {comment_data} instead")))
+            singleline, multistart, multiend = comment_data
+            if (isinstance(multistart, list) or isinstance(multiend, list)) and \
+                len(multistart or ()) != len(multiend or ()):
+                raise InvalidConfigurationException(" ".join((f"Comment data for file extension {language} malformed,",
+                                                              "multiline start and end symbols must pair up,",
+                                                              f"got {multistart} and {multiend} instead")))
+            symbol_mapping[language] = (cls._encode_symbols(singleline),
+                                        cls._encode_symbols(multistart),
+                                        cls._encode_symbols(multiend))
+        return set(languages_data.pop("ignore")), symbol_mapping
+
+    @classmethod
+    def _load_languages(cls, languages_file: Path) -> tuple[set[str], dict[str, LanguageMetadata]]:
+        '''
+        Load the language table, from its compiled form where it is up to date with languages.json.
+        Much like bytecode, the compiled table lives in __pycache__, keyed by the source's modification
+        time and size, and is skipped if it cannot be written
+        '''
+        source_stat: os.stat_result = os.stat(languages_file)
+        key: tuple[int, int, int] = (_LANGUAGE_TABLE_VERSION, source_stat.st_mtime_ns, source_stat.st_size)
+        # marshal's format is only stable within a single interpreter version
+        cache_tag: Optional[str] = sys.implementation.cache_tag
+        compiled_file: Optional[Path] = (languages_file.parent / "__pycache__" / f"languages.{cache_tag}.marshal"
+                                         if cache_tag else None)
+        if compiled_file is not None:
+            try:
+                with open(compiled_file, "rb") as compiled:
+                    compiled_key, ignored_languages, symbol_mapping = marshal.load(compiled)
+                if compiled_key == key:
+                    return ignored_languages, symbol_mapping
+            except (OSError, EOFError, ValueError, TypeError):
+                pass
+
+        # JSON is only needed when the table is (re)compiled
+        import json
+        with open(languages_file, "rb") as languages_source:
+            ignored_languages, symbol_mapping = cls._compile_languages(json.loads(languages_source.read()))
+
+        if compiled_file is not None:
+            # Written to a temporary file first, so that concurrent runs never read a partial table
+            temporary_file: Path = compiled_file.with_name(f"{compiled_file.name}.{os.getpid()}")
+            try:
+                compiled_file.parent.mkdir(exist_ok=True)
+                with open(temporary_file, "wb") as compiled:
+                    marshal.dump((key, ignored_languages, symbol_mapping), compiled)
+                os.replace(temporary_file, compiled_file)
+            except OSError:
+                temporary_file.unlink(missing_ok=True)
+        return ignored_languages, symbol_mapping
+
     @classmethod
     def load_toml(cls, config_file: Path) -> 'ClocConfig':
         with open(config_file, 'r', encoding="utf-8") as configurations:
@@ -79,24 +167,8 @@ class ClocConfig(metaclass=SingletonMeta):
         working_directory: Path = Path(__file__).parent.parent
         object.__setattr__(instance, "working_directory", working_directory)
 
-        # Load data about comment symbols
-        with open(working_directory / "languages.json", "rb") as langauges_source:
-            languages_data = json.loads(langauges_source.read())
-
-        object.__setattr__(instance, "ignored_languages", set(languages_data.pop("ignore")))
-        
-        comments_data: dict[str, list[str]] = languages_data.pop("comments")
-        symbol_mapping: dict[str, LanguageMetadata] = {}
-        for language, comment_data in comments_data.items():
-            if len(comment_data) != 3:
-                raise InvalidConfigurationException(" ".join((f"Comment data for file extension {language} malformed",
-                                                              "Should be of format:",
-                                                              "(singleline, multiline-start, multiline-end)",
-                                                              f"got {comment_data} instead")))
-            singleline, multistart, multiend = comment_data
-            symbol_mapping[language] = (singleline.encode() if singleline else None,
-                                        multistart.encode() if multistart else None,
-                                        multiend.encode() if multiend else None)
+        ignored_languages, symbol_mapping = cls._load_languages(working_directory / "languages.json")
+        object.__setattr__(instance, "ignored_languages", ignored_languages)
         object.__setattr__(instance, "symbol_mapping", symbol_mapping)
         return instance
     
@@ -5,4 +5,6 @@ __all__ = ("ParseMode",)
 class ParseMode(StrEnum):
     MMAP = "MMAP"
     BUFFERED = "BUF"
-    COMPLETE = "COMP"
\ No newline at end of file
+    COMPLETE = "COMP"
+    # Picks one of the above per file, by its size
+    AUTO = "AUTO"
@@ -0,0 +1,141 @@
+import os
+from array import array
+from typing import Any, Final, Iterator, Optional
+
+__all__ = ("ResultStore",)
+
+class ResultStore:
+    '''
+    Columnar results of a DETAILED scan. Files and directories are nodes, numbered in the order they are
+    walked (depth first, the top directory being node 0), so that every directory's contents are the nodes
+    between it and the end of its subtree. Node attributes are held in typed arrays, which export their
+    contents through the buffer protocol, rather than as a mapping per file and a full path per file.
+
+    Names are stored once as encoded bytes. Repeated names, such as those of directories and common files,
+    are interned up to a bounded number of distinct names, beyond which new names are stored as they come
+    '''
+    # Extension ID of directories
+    DIRECTORY: Final[int] = 0xFFFF
+    # Upper bound on distinct names looked up for reuse
+    INTERN_LIMIT: Final[int] = 1 << 16
+
+    __slots__ = ("root",
+                 "parents", "ends", "name_ids", "extension_ids", "totals", "locs",
+                 "_name_data", "_name_offsets", "_name_index",
+                 "_extensions", "_extension_index", "_open")
+
+    def __init__(self, root: str) -> None:
+        self.root: str = root
+        # Per node columns
+        self.parents: array = array("i", (-1,))
+        # End (exclusive) of each directory's subtree, unused for files
+        self.ends: array = array("I", (0,))
+        self.name_ids: array = array("I", (0,))
+        self.extension_ids: array = array("H", (self.DIRECTORY,))
+        self.totals: array = array("Q", (0,))
+        self.locs: array = array("Q", (0,))
+
+        # Encoded names back to back, name i spanning [offsets[i], offsets[i+1])
+        self._name_data: bytearray = bytearray()
+        self._name_offsets: array = array("Q", (0, 0))
+        self._name_index: dict[str, int] = {"" : 0}
+        self._extensions: list[str] = []
+        self._extension_index: dict[str, int] = {}
+        # Directories currently open, innermost last
+        self._open: list[int] = [0]
+
+    def __len__(self) -> int:
+        return len(self.parents)
+
+    def _intern(self, name: str) -> int:
+        name_id: Optional[int] = self._name_index.get(name)
+        if name_id is not None:
+            return name_id
+        name_id = len(self._name_offsets) - 1
+        self._name_data += os.fsencode(name)
+        self._name_offsets.append(len(self._name_data))
+        if len(self._name_index) < self.INTERN_LIMIT:
+            self._name_index[name] = name_id
+        return name_id
+
+    def _append(self, name: str, extension_id: int, total: int, loc: int) -> int:
+        index: int = len(self.parents)
+        self.parents.append(self._open[-1])
+        self.ends.append(0)
+        self.name_ids.append(self._intern(name))
+        self.extension_ids.append(extension_id)
+        self.totals.append(total)
+        self.locs.append(loc)
+        return index
+
+    def enter_directory(self, name: str) -> int:
+        '''Add a directory within the innermost open one, and open it. Returns its node index'''
+        index: int = self._append(name, self.DIRECTORY, 0, 0)
+        self._open.append(index)
+        return index
+
+    def exit_directory(self) -> None:
+        '''Close the innermost open directory, adding its counts to its parent's'''
+        index: int = self._open.pop()
+        self.ends[index] = len(self.parents)
+        parent: int = self._open[-1]
+        self.totals[parent] += self.totals[index]
+        self.locs[parent] += self.locs[index]
+
+    def add_file(self, name: str, extension: str, total: int, loc: int) -> int:
+        '''Add a file within the innermost open directory. Returns its node index'''
+        extension_id: Optional[int] = self._extension_index.get(extension)
+        if extension_id is None:
+            extension_id = self._extension_index[extension] = len(self._extensions)
+            self._extensions.append(extension)
+        index: int = self._append(name, extension_id, total, loc)
+        directory: int = self._open[-1]
+        self.totals[directory] += total
+        self.locs[directory] += loc
+        return index
+
+    def is_directory(self, index: int) -> bool:
+        return self.extension_ids[index] == self.DIRECTORY
+
+    def name(self, index: int) -> str:
+        name_id: int = self.name_ids[index]
+        return os.fsdecode(bytes(self._name_data[self._name_offsets[name_id]:self._name_offsets[name_id + 1]]))
+
+    def extension(self, index: int) -> str:
+        return self._extensions[self.extension_ids[index]]
+
+    def path(self, index: int) -> str:
+        '''Full path of a node, as it would have been reported by os.scandir'''
+        components: list[str] = []
+        while index > 0:
+            components.append(self.name(index))
+            index = self.parents[index]
+        return os.path.join(self.root, *reversed(components))
+
+    def children(self, index: int) -> Iterator[int]:
+        '''Nodes directly within a directory, in the order they were walked'''
+        end: int = len(self.parents) if index == 0 else self.ends[index]
+        child: int = index + 1
+        while child < end:
+            yield child
+            child = self.ends[child] if self.is_directory(child) else child + 1
+
+    @property
+    def columns(self) -> dict[str, memoryview]:
+        '''
+        Read-only, zero-copy views over the per node columns. The store cannot grow while views are held
+        '''
+        return {column : memoryview(getattr(self, column)).toreadonly()
+                for column in ("parents", "ends", "name_ids", "extension_ids", "totals", "locs")}
+
+    def to_mapping(self, index: int = 0) -> dict[str, Any]:
+        '''Nested mapping of a directory, in the format returned by parse_directory_verbose'''
+        files: dict[str, dict[str, int]] = {}
+        subdirectories: dict[str, Any] = {}
+        for child in self.children(index):
+            if self.is_directory(child):
+                subdirectories[self.name(child)] = self.to_mapping(child)
+            else:
+                files[self.path(child)] = {"loc" : self.locs[child], "total_lines" : self.totals[child]}
+        return {"files" : files, "subdirectories" : subdirectories,
+                "total" : self.totals[index], "loc" : self.locs[index]}
@@ -1,13 +1,16 @@
 import os
 from typing import Any, Literal, Optional, Protocol, TypeAlias, TypeVar, Union
 
-__all__ = ("LanguageMetadata",
+__all__ = ("CommentSymbols",
+           "LanguageMetadata",
            "OutputFunction",
            "SupportsBuffer",
            "FileParsingFunction",
            "SupportsMembershipChecks")
 
-LanguageMetadata: TypeAlias = tuple[Optional[bytes], Optional[bytes], Optional[bytes]]
+# A single comment symbol, or several alternatives of the same kind
+CommentSymbols: TypeAlias = Optional[Union[bytes, tuple[bytes, ...]]]
+LanguageMetadata: TypeAlias = tuple[CommentSymbols, CommentSymbols, CommentSymbols]
 
 class OutputFunction(Protocol):
     def __call__(self,
@@ -23,9 +26,9 @@ class SupportsBuffer(Protocol):
 class FileParsingFunction(Protocol):
     def __call__(self,
                  filepath: str,
-                 singleline_symbol: Optional[bytes] = None,
-                 multiline_start_symbol: Optional[bytes] = None,
-                 multiline_end_symbol: Optional[bytes] = None,
+                 singleline_symbol: CommentSymbols = None,
+                 multiline_start_symbol: CommentSymbols = None,
+                 multiline_end_symbol: CommentSymbols = None,
                  minimum_characters: int = 0,
                  /) -> tuple[int, int]: ...
 
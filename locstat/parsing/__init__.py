@@ -1,13 +1,62 @@
 '''Subpackage to encapsulate parsing logic'''
 
-from .directory import (parse_directory,
-                        parse_directory_verbose)
-from .extensions._parsing import (_parse_file,
-                                  _parse_file_no_chunk,
-                                  _parse_file_vm_map)
+from importlib import import_module
+from typing import Any, Final, Optional
 
-__all__ = ("_parse_file",
+__all__ = ("DirectoryWatch",
+           "Parser",
+           "MemoryCache",
+           "ResultCache",
+           "_parse_file",
            "_parse_file_no_chunk",
            "_parse_file_vm_map",
+           "parse_archive",
+           "parse_archive_record",
+           "parse_archive_verbose",
            "parse_directory",
-           "parse_directory_verbose")
\ No newline at end of file
+           "parse_directory_native",
+           "parse_directory_verbose",
+           "parse_directory_threaded",
+           "parse_directory_record_threaded",
+           "parse_directory_verbose_threaded",
+           "parse_directory_stream",
+           "parse_directory_columnar",
+           "parse_directory_parallel",
+           "parse_directory_record_parallel",
+           "parse_directory_verbose_parallel",
+           "parse_revision",
+           "parse_revision_record",
+           "parse_revision_verbose",
+           "parse_stream",
+           "ReadAhead",
+           "watch_directory")
+
+# Exports are only imported from their submodules on first access, so that importing any one submodule
+# does not pull in the others, nor their dependencies such as sqlite3, tarfile and multiprocessing
+_EXPORTS: Final[dict[str, str]] = {
+    **dict.fromkeys(("parse_archive", "parse_archive_record", "parse_archive_verbose"), ".archive"),
+    **dict.fromkeys(("MemoryCache", "ResultCache"), ".cache"),
+    **dict.fromkeys(("parse_directory", "parse_directory_native", "parse_directory_verbose",
+                     "parse_directory_threaded", "parse_directory_record_threaded",
+                     "parse_directory_verbose_threaded", "parse_directory_stream",
+                     "parse_directory_columnar"), ".directory"),
+    **dict.fromkeys(("parse_directory_parallel", "parse_directory_record_parallel",
+                     "parse_directory_verbose_parallel"), ".parallel"),
+    **dict.fromkeys(("parse_revision", "parse_revision_record", "parse_revision_verbose"), ".revision"),
+    "parse_stream" : ".stream",
+    "ReadAhead" : ".prefetch",
+    **dict.fromkeys(("DirectoryWatch", "watch_directory"), ".watch"),
+    **dict.fromkeys(("Parser", "_parse_file", "_parse_file_no_chunk", "_parse_file_vm_map"),
+                    ".extensions._parsing"),
+}
+
+def __getattr__(name: str) -> Any:
+    submodule: Optional[str] = _EXPORTS.get(name)
+    if submodule is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value: Any = getattr(import_module(submodule, __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__() -> list[str]:
+    return sorted((*globals(), *__all__))
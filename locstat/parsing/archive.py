@@ -0,0 +1,204 @@
+import io
+import os
+import stat
+from array import array
+from functools import partial
+from importlib import import_module
+from typing import Any, Callable, Final, Iterator, Optional
+
+from locstat.data_structures.config import ClocConfig
+from locstat.data_structures.typing import LanguageMetadata
+from locstat.parsing.stream import parse_stream
+
+__all__ = ("ARCHIVE_SUFFIXES",
+           "COMPRESSION_SUFFIXES",
+           "is_archive",
+           "compression_suffix",
+           "open_compressed",
+           "parse_archive",
+           "parse_archive_record",
+           "parse_archive_verbose")
+
+ARCHIVE_SUFFIXES: Final[tuple[str, ...]] = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2",
+                                            ".tar.xz", ".txz", ".zip")
+# Suffixes mapped to the modules opening them. These, along with tarfile and zipfile, are imported on first use,
+# as is_archive and compression_suffix are on the CLI's startup path
+COMPRESSION_SUFFIXES: Final[dict[str, str]] = {".gz" : "gzip",
+                                               ".bz2" : "bz2",
+                                               ".xz" : "lzma"}
+
+_MemberOpener = Callable[[], io.BufferedIOBase]
+
+def is_archive(path: str) -> bool:
+    '''Whether a file is a tar or zip archive, judging by its name'''
+    return path.lower().endswith(ARCHIVE_SUFFIXES)
+
+def compression_suffix(path: str) -> Optional[str]:
+    '''Compression suffix of a single compressed file, None if it is not compressed or is an archive'''
+    if is_archive(path):
+        return None
+    suffix: str = os.path.splitext(path)[1].lower()
+    return suffix if suffix in COMPRESSION_SUFFIXES else None
+
+def open_compressed(path: str) -> io.BufferedIOBase:
+    '''
+    Open a single compressed file for reading its decompressed contents as a stream
+
+    :param path: Path of a file ending in one of COMPRESSION_SUFFIXES
+    :type path: str
+
+    :return: Binary stream over the decompressed contents
+    :rtype: io.BufferedIOBase
+    '''
+    module: Any = import_module(COMPRESSION_SUFFIXES[os.path.splitext(path)[1].lower()])
+    return module.open(path)
+
+def _tar_members(path: str) -> Iterator[tuple[str, _MemberOpener]]:
+    import tarfile
+    # Stream mode reads the archive strictly sequentially, without holding more than a block of it
+    with tarfile.open(path, "r|*") as archive:
+        for member in archive:
+            if member.isfile():
+                yield member.name, partial(archive.extractfile, member)  # type: ignore[misc]
+
+def _zip_members(path: str) -> Iterator[tuple[str, _MemberOpener]]:
+    import zipfile
+    with zipfile.ZipFile(path) as archive:
+        for info in archive.infolist():
+            if info.is_dir() or stat.S_ISLNK(info.external_attr >> 16):
+                continue
+            yield info.filename, partial(archive.open, info)  # type: ignore[misc]
+
+def _scan_archive(
+        path: str,
+        config: ClocConfig,
+        depth: int,
+        file_filter_function: Callable[[str, str], bool],
+        directory_filter_function: Callable[[str], bool],
+        minimum_characters: int,
+        language_record: Optional[dict[str, dict[str, int]]],
+        detailed: bool) -> dict[str, Any]:
+    '''
+    Parse every member of an archive in archive order, under the same traversal rules as parse_directory_verbose.
+    Members are placed into a tree of directories by their names, and reported under paths within the archive
+    '''
+    tree: dict[str, Any] = {"files" : {}, "subdirectories" : {}, "total" : 0, "loc" : 0}
+    # Verdicts of the directory filter, keyed by directory path within the archive
+    directory_verdicts: dict[str, bool] = {}
+    members: Iterator[tuple[str, _MemberOpener]] = (_zip_members(path) if path.lower().endswith(".zip")
+                                                    else _tar_members(path))
+    for name, opener in members:
+        parts: list[str] = [component for component in name.split("/") if component not in ("", ".")]
+        if not parts or ".." in parts or (depth >= 0 and len(parts) > depth + 1):
+            continue
+        *components, filename = parts
+
+        prefix: str = path
+        for component in components:
+            prefix = os.path.join(prefix, component)
+            verdict: Optional[bool] = directory_verdicts.get(prefix)
+            if verdict is None:
+                verdict = directory_verdicts[prefix] = directory_filter_function(prefix)
+            if not verdict:
+                break
+        else:
+            filepath: str = os.path.join(prefix, filename)
+            extension: str = filename.rsplit(".", 1)[-1]
+            if not file_filter_function(filepath, extension):
+                continue
+            comment_data: LanguageMetadata = config.symbol_mapping.get(extension, (None, None, None))
+            if not (comment_data[0] or comment_data[1]):
+                continue
+
+            with opener() as stream:
+                file_total, file_loc = parse_stream(stream, comment_data, minimum_characters)
+
+            if language_record is not None:
+                record: dict[str, int] = language_record.setdefault(extension,
+                                                                    {"total" : 0, "loc" : 0, "files" : 0})
+                record["total"] += file_total
+                record["loc"] += file_loc
+                record["files"] += 1
+
+            # Credit the file to the archive's root and, if detailed, every directory leading to it
+            node: dict[str, Any] = tree
+            node["total"] += file_total
+            node["loc"] += file_loc
+            if not detailed:
+                continue
+            for component in components:
+                node = node["subdirectories"].setdefault(component,
+                                                         {"files" : {}, "subdirectories" : {}, "total" : 0, "loc" : 0})
+                node["total"] += file_total
+                node["loc"] += file_loc
+            node["files"][filepath] = {"loc" : file_loc, "total_lines" : file_total}
+
+    return tree
+
+def parse_archive(
+        archive: str,
+        config: ClocConfig,
+        line_data: array,
+        depth: int,
+        file_filter_function: Callable[[str, str], bool],
+        directory_filter_function: Callable[[str], bool],
+        minimum_characters: int = 0) -> None:
+    '''
+    Counterpart of parse_directory for a tar or zip archive, streaming each member through the parser
+    without extracting it. Memory use does not depend on the size of the archive or its members
+
+    :param archive: Path of the archive, see ARCHIVE_SUFFIXES
+    :type archive: str
+
+    :return: Passed line_data array is updated
+    :rtype: NoneType
+    '''
+    tree: dict[str, Any] = _scan_archive(archive, config, depth, file_filter_function, directory_filter_function,
+                                         minimum_characters, None, False)
+    line_data[0] += tree["total"]
+    line_data[1] += tree["loc"]
+
+def parse_archive_record(
+        archive: str,
+        config: ClocConfig,
+        line_data: array,
+        language_record: dict[str, dict[str, int]],
+        depth: int,
+        file_filter_function: Callable[[str, str], bool],
+        directory_filter_function: Callable[[str], bool],
+        minimum_characters: int = 0) -> None:
+    '''
+    Counterpart of parse_directory_record for a tar or zip archive, streaming each member through the parser
+    without extracting it. Memory use does not depend on the size of the archive or its members
+
+    :param archive: Path of the archive, see ARCHIVE_SUFFIXES
+    :type archive: str
+
+    :return: Passed line_data array and language_record mapping are updated
+    :rtype: NoneType
+    '''
+    tree: dict[str, Any] = _scan_archive(archive, config, depth, file_filter_function, directory_filter_function,
+                                         minimum_characters, language_record, False)
+    line_data[0] += tree["total"]
+    line_data[1] += tree["loc"]
+
+def parse_archive_verbose(
+        archive: str,
+        config: ClocConfig,
+        language_record: dict[str, dict[str, int]],
+        depth: int,
+        file_filter_function: Callable[[str, str], bool],
+        directory_filter_function: Callable[[str], bool],
+        minimum_characters: int = 0) -> dict[str, Any]:
+    '''
+    Counterpart of parse_directory_verbose for a tar or zip archive, streaming each member through the parser
+    without extracting it. Members are shown as a tree of directories, under paths within the archive
+
+    :param archive: Path of the archive, see ARCHIVE_SUFFIXES
+    :type archive: str
+
+    :return: Mapping of LOC and line information
+    :rtype: dict[str, Any]
+    '''
+    return _scan_archive(archive, config, depth, file_filter_function, directory_filter_function,
+                         minimum_characters, language_record, True)
@@ -0,0 +1,374 @@
+import os
+from pathlib import Path
+from typing import Final, Iterable, Mapping, Optional, Sequence, Union
+
+from locstat.data_structures.typing import LanguageMetadata
+
+__all__ = ("DEFAULT_CACHE_ENTRIES",
+           "default_cache_path",
+           "MemoryCache",
+           "ResultCache")
+
+DEFAULT_CACHE_ENTRIES: Final[int] = 1_000_000
+
+# Bump whenever stored results become invalid, such as on changes to counting rules
+_SCHEMA_VERSION: Final[int] = 2
+# SQLite's default limit on host parameters is 999 for older builds
+_LOOKUP_CHUNK: Final[int] = 500
+# Pending results are written out once this many accumulate
+_FLUSH_THRESHOLD: Final[int] = 4096
+# Eviction trims the cache down to this fraction of its bound, so that it does not run on every scan
+_EVICTION_TARGET: Final[float] = 0.9
+
+_SCHEMA: Final[str] = '''
+CREATE TABLE IF NOT EXISTS results (
+    path TEXT NOT NULL,
+    parameters INTEGER NOT NULL,
+    device INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    total INTEGER NOT NULL,
+    loc INTEGER NOT NULL,
+    generation INTEGER NOT NULL,
+    PRIMARY KEY (path, parameters)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS results_generation ON results (generation);
+CREATE TABLE IF NOT EXISTS blobs (
+    blob_id BLOB NOT NULL,
+    parameters INTEGER NOT NULL,
+    total INTEGER NOT NULL,
+    loc INTEGER NOT NULL,
+    generation INTEGER NOT NULL,
+    PRIMARY KEY (blob_id, parameters)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS blobs_generation ON blobs (generation);
+CREATE TABLE IF NOT EXISTS metadata (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+) WITHOUT ROWID;
+'''
+
+# (path, parameters, device, inode, size, mtime_ns) for files, (blob_id, parameters) for git blobs
+_CacheKey = Union[tuple[str, int, int, int, int, int], tuple[bytes, int]]
+# (path, comment symbols, minimum characters, device, inode, size, mtime_ns) for MemoryCache
+_MemoryKey = tuple[str, LanguageMetadata, int, int, int, int, int]
+
+def default_cache_path() -> Path:
+    '''Platform specific location for the result cache'''
+    if os.name == "nt":
+        base: str = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return Path(base) / "locstat" / "results.sqlite"
+
+class ResultCache:
+    '''
+    On-disk cache of per-file total lines and LOC, stored in SQLite.
+
+    Entries are keyed by file path and a digest of the comment symbols and minimum characters used to count it,
+    and are only valid while the file's device, inode, size and modification time match.
+    The database runs in WAL mode, allowing concurrent readers alongside a writer, including other scans.
+    Each scan is a new generation, when the cache outgrows its bound, the least recently used entries are evicted.
+
+    Files with a known git blob ID are keyed by it instead of their path and stat data,
+    so that results carry over between clones, worktrees and checkouts of the same content.
+
+    Instances can be pickled for process pools, unpickled copies share the owner's generation
+    and only write results back, leaving eviction to the owner. Their hits are handed back through
+    take_hits and add_hits, so that the owner's eviction counts files looked up by workers as recent
+    '''
+
+    __slots__ = ("path", "max_entries", "blob_ids", "_connection", "_generation", "_owner",
+                 "_parameters", "_pending", "_pending_blobs", "_hits", "_blob_hits")
+
+    def __init__(self,
+                 path: Union[str, os.PathLike[str]],
+                 max_entries: int = DEFAULT_CACHE_ENTRIES,
+                 blob_ids: Optional[Mapping[str, bytes]] = None) -> None:
+        self.path: Path = Path(path)
+        self.max_entries: int = max_entries
+        self.blob_ids: Mapping[str, bytes] = blob_ids or {}
+        self._owner: bool = True
+        self._open()
+        self._generation: int = self._read_generation() + 1
+
+    def _open(self) -> None:
+        # Deferred, as the CLI imports this module for its defaults on every run, cache or not
+        import sqlite3
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection: sqlite3.Connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+
+        version: int = self._connection.execute("PRAGMA user_version").fetchone()[0]
+        if version != _SCHEMA_VERSION:
+            with self._connection:
+                self._connection.execute("BEGIN IMMEDIATE")
+                self._connection.execute("DROP TABLE IF EXISTS results")
+                self._connection.execute("DROP TABLE IF EXISTS blobs")
+                self._connection.execute("DROP TABLE IF EXISTS metadata")
+                self._connection.execute(f"PRAGMA user_version={_SCHEMA_VERSION}")
+        self._connection.executescript(_SCHEMA)
+
+        self._parameters: dict[tuple[LanguageMetadata, int], int] = {}
+        self._pending: list[tuple[str, int, int, int, int, int, int, int, int]] = []
+        self._pending_blobs: list[tuple[bytes, int, int, int, int]] = []
+        self._hits: list[tuple[str, int]] = []
+        self._blob_hits: list[tuple[bytes, int]] = []
+
+    def _read_generation(self) -> int:
+        row = self._connection.execute("SELECT value FROM metadata WHERE key = 'generation'").fetchone()
+        return row[0] if row else 0
+
+    def __getstate__(self) -> tuple[Path, int, Mapping[str, bytes], int]:
+        return self.path, self.max_entries, self.blob_ids, self._generation
+
+    def __setstate__(self, state: tuple[Path, int, Mapping[str, bytes], int]) -> None:
+        self.path, self.max_entries, self.blob_ids, self._generation = state
+        self._owner = False
+        self._open()
+
+    def __enter__(self) -> 'ResultCache':
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def _digest(self, comment_data: LanguageMetadata, minimum_characters: int) -> int:
+        key: tuple[LanguageMetadata, int] = (comment_data, minimum_characters)
+        parameters: Optional[int] = self._parameters.get(key)
+        if parameters is None:
+            import hashlib
+            digest: bytes = hashlib.blake2b(repr(key).encode(), digest_size=8).digest()
+            parameters = self._parameters[key] = int.from_bytes(digest, "little", signed=True)
+        return parameters
+
+    def lookup(self,
+               files: Sequence[tuple[str, LanguageMetadata]],
+               minimum_characters: int) -> tuple[list[Optional[tuple[int, int]]], list[Optional[_CacheKey]]]:
+        '''
+        Look up cached counts for a batch of files
+
+        :param files: Pairs of file paths and their comment symbols
+        :type files: Sequence[tuple[str, LanguageMetadata]]
+
+        :param minimum_characters: Minimum characters per line for it to be counted as a line of code
+        :type minimum_characters: int
+
+        :return: Cached (total, loc) pairs, None for misses, along with keys for each miss in order,
+        to be passed back to store once they are counted. Keys of files that could not be stat'd are None
+        :rtype: tuple[list[Optional[tuple[int, int]]], list[Optional[_CacheKey]]]
+        '''
+        keys: list[Optional[_CacheKey]] = []
+        for filepath, comment_data in files:
+            blob_id: Optional[bytes] = self.blob_ids.get(filepath)
+            if blob_id is not None:
+                keys.append((blob_id, self._digest(comment_data, minimum_characters)))
+                continue
+            try:
+                stat_result: os.stat_result = os.stat(filepath)
+            except OSError:
+                keys.append(None)
+                continue
+            keys.append((filepath, self._digest(comment_data, minimum_characters),
+                         stat_result.st_dev, stat_result.st_ino, stat_result.st_size, stat_result.st_mtime_ns))
+
+        rows: dict[tuple[str, int], tuple[int, int, int, int, int, int]] = {}
+        paths: list[str] = [key[0] for key in keys if key and len(key) > 2]
+        for start in range(0, len(paths), _LOOKUP_CHUNK):
+            chunk: list[str] = paths[start:start+_LOOKUP_CHUNK]
+            query: str = " ".join(("SELECT path, parameters, device, inode, size, mtime_ns, total, loc",
+                                   f"FROM results WHERE path IN ({', '.join('?' * len(chunk))})"))
+            for path, parameters, *signature in self._connection.execute(query, chunk):
+                rows[(path, parameters)] = tuple(signature)
+
+        blob_rows: dict[tuple[bytes, int], tuple[int, int]] = {}
+        blobs: list[bytes] = [key[0] for key in keys if key and len(key) == 2]
+        for start in range(0, len(blobs), _LOOKUP_CHUNK):
+            blob_chunk: list[bytes] = blobs[start:start+_LOOKUP_CHUNK]
+            query = " ".join(("SELECT blob_id, parameters, total, loc",
+                              f"FROM blobs WHERE blob_id IN ({', '.join('?' * len(blob_chunk))})"))
+            for blob_id, parameters, total, loc in self._connection.execute(query, blob_chunk):
+                blob_rows[(blob_id, parameters)] = (total, loc)
+
+        results: list[Optional[tuple[int, int]]] = []
+        misses: list[Optional[_CacheKey]] = []
+        for key in keys:
+            if key and len(key) == 2:
+                counts: Optional[tuple[int, int]] = blob_rows.get(key)
+                if counts is None:
+                    results.append(None)
+                    misses.append(key)
+                    continue
+                results.append(counts)
+                self._blob_hits.append(key)
+                continue
+            row = rows.get(key[:2]) if key else None
+            if row is None or row[:4] != key[2:]:
+                results.append(None)
+                misses.append(key)
+                continue
+            results.append((row[4], row[5]))
+            self._hits.append(key[:2])
+        return results, misses
+
+    def store(self, keys: Iterable[Optional[_CacheKey]], counts: Sequence[int]) -> None:
+        '''
+        Record counts for files missed by lookup
+
+        :param keys: Keys returned by lookup for the missed files
+        :type keys: Iterable[Optional[_CacheKey]]
+
+        :param counts: Counts of the missed files, in the form [total_0, loc_0, total_1, loc_1, ...]
+        :type counts: Sequence[int]
+        '''
+        for key, total, loc in zip(keys, counts[0::2], counts[1::2]):
+            if key is None:
+                continue
+            if len(key) == 2:
+                self._pending_blobs.append((*key, total, loc, self._generation))
+            else:
+                self._pending.append((*key, total, loc, self._generation))
+        if len(self._pending) + len(self._pending_blobs) >= _FLUSH_THRESHOLD:
+            self.flush()
+
+    def flush(self) -> None:
+        '''Write pending results to disk'''
+        if not (self._pending or self._pending_blobs):
+            return
+        with self._connection:
+            self._connection.execute("BEGIN IMMEDIATE")
+            self._connection.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                         self._pending)
+            self._connection.executemany("INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?)",
+                                         self._pending_blobs)
+        self._pending.clear()
+        self._pending_blobs.clear()
+
+    def take_hits(self) -> tuple[list[tuple[str, int]], list[tuple[bytes, int]]]:
+        '''
+        Remove and return the keys of entries hit by lookup so far, for unpickled copies to hand to their owner
+
+        :return: (path, parameters) keys of file results and (blob_id, parameters) keys of blob results
+        :rtype: tuple[list[tuple[str, int]], list[tuple[bytes, int]]]
+        '''
+        hits, blob_hits = self._hits, self._blob_hits
+        self._hits, self._blob_hits = [], []
+        return hits, blob_hits
+
+    def add_hits(self, hits: Iterable[tuple[str, int]], blob_hits: Iterable[tuple[bytes, int]]) -> None:
+        '''Count entries hit by another copy of this cache as hit in this scan, see take_hits'''
+        self._hits.extend(hits)
+        self._blob_hits.extend(blob_hits)
+
+    def _evict(self) -> None:
+        count: int = self._connection.execute(" ".join(("SELECT (SELECT count(*) FROM results)",
+                                                        "+ (SELECT count(*) FROM blobs)"))).fetchone()[0]
+        if count <= self.max_entries:
+            return
+        excess: int = count - int(self.max_entries * _EVICTION_TARGET)
+        with self._connection:
+            self._connection.execute("BEGIN IMMEDIATE")
+            # Entries hit in this scan are recent despite not being rewritten
+            self._connection.executemany("UPDATE results SET generation = ? WHERE path = ? AND parameters = ?",
+                                         ((self._generation, path, parameters) for path, parameters in self._hits))
+            self._connection.executemany("UPDATE blobs SET generation = ? WHERE blob_id = ? AND parameters = ?",
+                                         ((self._generation, blob_id, parameters)
+                                          for blob_id, parameters in self._blob_hits))
+            # Both tables share one bound, drop generations older than the cutoff, then trim the cutoff itself
+            cutoff: int = self._connection.execute(" ".join(("SELECT generation FROM (SELECT generation FROM results",
+                                                             "UNION ALL SELECT generation FROM blobs)",
+                                                             "ORDER BY generation LIMIT 1 OFFSET ?")),
+                                                   (excess - 1,)).fetchone()[0]
+            for table in ("results", "blobs"):
+                excess -= self._connection.execute(f"DELETE FROM {table} WHERE generation < ?",
+                                                   (cutoff,)).rowcount
+            for table, key in (("results", "path, parameters"), ("blobs", "blob_id, parameters")):
+                if excess <= 0:
+                    break
+                excess -= self._connection.execute(" ".join((f"DELETE FROM {table} WHERE ({key}) IN",
+                                                             f"(SELECT {key} FROM {table}",
+                                                             "WHERE generation = ? LIMIT ?)")),
+                                                   (cutoff, excess)).rowcount
+
+    def close(self) -> None:
+        '''Write pending results, evict entries beyond the cache's bound, and close the database'''
+        try:
+            self.flush()
+            if self._owner:
+                self._evict()
+                with self._connection:
+                    self._connection.execute("BEGIN IMMEDIATE")
+                    self._connection.execute("INSERT OR REPLACE INTO metadata VALUES ('generation', ?)",
+                                             (self._generation,))
+        finally:
+            self._hits.clear()
+            self._blob_hits.clear()
+            self._connection.close()
+
+
+class MemoryCache:
+    '''
+    In-memory counterpart of ResultCache, kept by `locstat serve` across the scans it answers.
+
+    Entries are keyed by file path, comment symbols and minimum characters, and are only valid while the file's
+    device, inode, size and modification time match. Beyond max_entries, the least recently used are evicted.
+    Results stored by worker processes are not seen by the owner, so the cache is only used within one process
+    '''
+
+    __slots__ = ("max_entries", "_entries")
+
+    def __init__(self, max_entries: int = DEFAULT_CACHE_ENTRIES) -> None:
+        self.max_entries: int = max_entries
+        # (path, comment symbols, minimum characters) -> (device, inode, size, mtime_ns, total, loc)
+        self._entries: dict[tuple[str, LanguageMetadata, int], tuple[int, int, int, int, int, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(self,
+               files: Sequence[tuple[str, LanguageMetadata]],
+               minimum_characters: int) -> tuple[list[Optional[tuple[int, int]]], list[Optional[_MemoryKey]]]:
+        '''
+        Look up cached counts for a batch of files, see ResultCache.lookup
+        '''
+        results: list[Optional[tuple[int, int]]] = []
+        misses: list[Optional[_MemoryKey]] = []
+        for filepath, comment_data in files:
+            try:
+                stat_result: os.stat_result = os.stat(filepath)
+            except OSError:
+                results.append(None)
+                misses.append(None)
+                continue
+            key: tuple[str, LanguageMetadata, int] = (filepath, comment_data, minimum_characters)
+            signature: tuple[int, int, int, int] = (stat_result.st_dev, stat_result.st_ino,
+                                                    stat_result.st_size, stat_result.st_mtime_ns)
+            entry: Optional[tuple[int, int, int, int, int, int]] = self._entries.pop(key, None)
+            if entry is None or entry[:4] != signature:
+                results.append(None)
+                misses.append((*key, *signature))
+                continue
+            # Reinserted, keeping the entries in order of use
+            self._entries[key] = entry
+            results.append(entry[4:])
+        return results, misses
+
+    def store(self, keys: Iterable[Optional[_MemoryKey]], counts: Sequence[int]) -> None:
+        '''
+        Record counts for files missed by lookup, see ResultCache.store
+        '''
+        for key, total, loc in zip(keys, counts[0::2], counts[1::2]):
+            if key is None:
+                continue
+            self._entries.pop(key[:3], None)
+            self._entries[key[:3]] = (*key[3:], total, loc)
+        while len(self._entries) > self.max_entries:
+            del self._entries[next(iter(self._entries))]
+
+    def flush(self) -> None:
+        '''Results are held in memory, nothing to write'''
+
+    def close(self) -> None:
+        '''Entries outlive each scan, closing leaves them in place'''
@@ -1,13 +1,170 @@
 import os
 from array import array
-from typing import Any, Callable, Iterator, Optional
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Final, Iterable, Iterator, Optional, Sequence
 
 from locstat.data_structures.config import ClocConfig
-from locstat.data_structures.typing import FileParsingFunction
-
-__all__ = ("parse_directory",
+from locstat.data_structures.parse_modes import ParseMode
+from locstat.data_structures.result_store import ResultStore
+from locstat.data_structures.typing import FileParsingFunction, LanguageMetadata
+from locstat.parsing.cache import ResultCache
+from locstat.parsing.extensions._parsing import (_parse_file,
+                                              _parse_file_no_chunk,
+                                              _parse_file_vm_map,
+                                              _parse_file_auto,
+                                              _parse_files)
+from locstat.parsing.prefetch import ReadAhead
+try:
+    from locstat.parsing.extensions._parsing import _walk_directory
+except ImportError:     # Native traversal relies on POSIX directory APIs
+    _walk_directory = None
+
+__all__ = ("NATIVE_WALK_AVAILABLE",
+           "parse_file_batch",
+           "parse_directory_native",
+           "parse_directory",
            "parse_directory_record",
-           "parse_directory_verbose")
+           "parse_directory_verbose",
+           "parse_directory_threaded",
+           "parse_directory_record_threaded",
+           "parse_directory_verbose_threaded",
+           "parse_directory_stream",
+           "parse_directory_columnar")
+
+_BATCH_PARSE_MODES: Final[dict[Any, ParseMode]] = {_parse_file : ParseMode.BUFFERED,
+                                                   _parse_file_no_chunk : ParseMode.COMPLETE,
+                                                   _parse_file_vm_map : ParseMode.MMAP,
+                                                   _parse_file_auto : ParseMode.AUTO}
+
+def _parse_uncached(files: Sequence[tuple[str, LanguageMetadata]],
+                    file_parsing_function: FileParsingFunction,
+                    minimum_characters: int) -> Sequence[int]:
+    parse_mode: Optional[ParseMode] = _BATCH_PARSE_MODES.get(file_parsing_function)
+    if parse_mode is not None:
+        return _parse_files(files, minimum_characters, parse_mode)
+
+    counts: array = array("Q")
+    for filepath, comment_data in files:
+        counts.extend(file_parsing_function(filepath, *comment_data, minimum_characters))
+    return counts
+
+def parse_file_batch(files: Sequence[tuple[str, LanguageMetadata]],
+                     file_parsing_function: FileParsingFunction,
+                     minimum_characters: int = 0,
+                     cache: Optional[ResultCache] = None) -> Sequence[int]:
+    '''
+    Parse a batch of files, returning their total lines and LOC interleaved.
+    Batches for the extension's parsers are handed over in a single call,
+    other parsing functions are called once per file
+
+    :param files: Pairs of file paths and their comment symbols
+    :type files: Sequence[tuple[str, LanguageMetadata]]
+
+    :param file_parsing_function: Parsing function to apply to each file
+    :type file_parsing_function: FileParsingFunction
+
+    :param minimum_characters: Minimum characters per line for it to be counted as a line of code
+    :type minimum_characters: int
+
+    :param cache: Result cache to consult, only files missing from it or changed since are parsed
+    :type cache: Optional[ResultCache]
+
+    :return: Sequence of the form [total_0, loc_0, total_1, loc_1, ...]
+    :rtype: Sequence[int]
+    '''
+    if not files:
+        return ()
+    if cache is None:
+        return _parse_uncached(files, file_parsing_function, minimum_characters)
+
+    cached, misses = cache.lookup(files, minimum_characters)
+    counts: array = array("Q", bytes(16 * len(files)))
+    missed_files: list[tuple[str, LanguageMetadata]] = []
+    for index, (file, result) in enumerate(zip(files, cached)):
+        if result is None:
+            missed_files.append(file)
+            continue
+        counts[2*index], counts[2*index + 1] = result
+    if not missed_files:
+        return counts
+
+    fresh: Sequence[int] = _parse_uncached(missed_files, file_parsing_function, minimum_characters)
+    cache.store(misses, fresh)
+    fresh_index: int = 0
+    for index, result in enumerate(cached):
+        if result is None:
+            counts[2*index], counts[2*index + 1] = fresh[fresh_index], fresh[fresh_index + 1]
+            fresh_index += 2
+    return counts
+
+NATIVE_WALK_AVAILABLE: Final[bool] = _walk_directory is not None
+
+def _filter_mode(include: bool, exclude: bool) -> int:
+    # Must match enum FilterMode in _directory_walker.c
+    return 1 if include else 2 if exclude else 0
+
+def parse_directory_native(
+        directory: str,
+        config: ClocConfig,
+        line_data: array,
+        depth: int,
+        parse_mode: ParseMode,
+        minimum_characters: int = 0,
+        language_record: Optional[dict[str, dict[str, int]]] = None,
+        *,
+        extension_set: Iterable[str] = frozenset(),
+        file_set: Iterable[str] = frozenset(),
+        directory_set: Iterable[str] = frozenset(),
+        include_file: bool = False,
+        exclude_file: bool = False,
+        include_type: bool = False,
+        exclude_type: bool = False,
+        include_dir: bool = False,
+        exclude_dir: bool = False) -> None:
+    '''
+    Parse directory using the extension's native traversal, following the same rules as
+    parse_directory, and parse_directory_record if a language record is given.
+    Filters are given as the sets and flags accepted by construct_file_filter and construct_directory_filter.
+    Only available if NATIVE_WALK_AVAILABLE is set
+
+    :param directory: Path of the top directory
+    :type directory: str
+
+    :param parse_mode: File parsing mode applied to each file
+    :type parse_mode: ParseMode
+
+    :param language_record: Mapping to store total lines and LOC per file extension
+    :type language_record: Optional[dict[str, dict[str, int]]]
+
+    :return: Passed line_data array, and language_record mapping if given, are updated
+    :rtype: NoneType
+    '''
+    if _walk_directory is None:
+        raise NotImplementedError("Native directory traversal is not supported on this platform")
+
+    symbol_table: dict[bytes, LanguageMetadata] = {os.fsencode(extension) : comment_data
+                                                   for extension, comment_data in config.symbol_mapping.items()}
+    total, loc, languages = _walk_directory(os.fsencode(directory),
+                                            symbol_table,
+                                            depth, minimum_characters, parse_mode,
+                                            [os.fsencode(file) for file in file_set],
+                                            _filter_mode(include_file, exclude_file),
+                                            [os.fsencode(extension) for extension in extension_set],
+                                            _filter_mode(include_type, exclude_type),
+                                            [os.fsencode(directory) for directory in directory_set],
+                                            _filter_mode(include_dir, exclude_dir))
+    line_data[0] += total
+    line_data[1] += loc
+    if language_record is None:
+        return
+
+    for extension, language_total, language_loc, files in languages:
+        record: dict[str, int] = language_record.setdefault(os.fsdecode(extension),
+                                                            {"total" : 0, "loc" : 0, "files" : 0})
+        record["total"] += language_total
+        record["loc"] += language_loc
+        record["files"] += files
 
 def parse_directory(
         directory_data: Iterator[os.DirEntry[str]],
@@ -17,7 +174,9 @@ def parse_directory(
         file_parsing_function: FileParsingFunction,
         file_filter_function: Callable[[str, str], bool] = lambda filename, extension: True,
         directory_filter_function: Callable = lambda _ : False,
-        minimum_characters: int = 0) -> None:
+        minimum_characters: int = 0,
+        cache: Optional[ResultCache] = None,
+        read_ahead: Optional[ReadAhead] = None) -> None:
     '''
     Parse directory and calculate LOC and total lines
     
@@ -45,9 +204,26 @@ def parse_directory(
     :param depth: Sub-directory traversal depth
     :type depth: int
 
+    :param cache: Result cache to consult, only files missing from it or changed since are parsed
+    :type cache: Optional[ResultCache]
+
+    :param read_ahead: Advises the kernel of files about to be parsed, for cold caches and network file systems.
+    Files are then parsed in the order of a single walk, rather than a batch per directory
+    :type read_ahead: Optional[ReadAhead]
+
     :return: Passed line_data array is updated
     :rtype: NoneType
     '''
+    if read_ahead is not None:
+        walk = read_ahead.pipeline(_walk_events(directory_data, config, depth,
+                                                file_filter_function, directory_filter_function, False),
+                                   _walk_filepath)
+        for _, _, _, (file_total, file_loc) in _parse_walk(walk, file_parsing_function, minimum_characters, cache):
+            line_data[0] += file_total
+            line_data[1] += file_loc
+        return
+
+    batch: list[tuple[str, LanguageMetadata]] = []
     for dir_entry in directory_data:
         if dir_entry.is_symlink(): continue
         if dir_entry.is_file(follow_symlinks=False):
@@ -55,26 +231,25 @@ def parse_directory(
             if not file_filter_function(dir_entry.path, extension):
                 continue
 
-            singleLine, multi_start, multi_end = config.symbol_mapping.get(extension, (None, None, None))
-            if not (singleLine or multi_start):
+            comment_data: LanguageMetadata = config.symbol_mapping.get(extension, (None, None, None))
+            if not (comment_data[0] or comment_data[1]):
                 continue
-            
-            tl, l = file_parsing_function(dir_entry.path,
-                                          singleLine, multi_start, multi_end,
-                                          minimum_characters)
-            line_data[0] += tl
-            line_data[1] += l
+            batch.append((dir_entry.path, comment_data))
             continue
 
         if not depth:
-            return
+            break
         if not directory_filter_function(dir_entry.path):
             continue
         parse_directory(os.scandir(dir_entry.path), config,
                         line_data,
                         depth-1,
                         file_parsing_function, file_filter_function, directory_filter_function,
-                        minimum_characters)
+                        minimum_characters, cache)
+
+    counts: Sequence[int] = parse_file_batch(batch, file_parsing_function, minimum_characters, cache)
+    line_data[0] += sum(counts[0::2])
+    line_data[1] += sum(counts[1::2])
 
 def parse_directory_record(
         directory_data: Iterator[os.DirEntry[str]],
@@ -85,7 +260,9 @@ def parse_directory_record(
         file_parsing_function: FileParsingFunction,
         file_filter_function: Callable[[str, str], bool] = lambda filename, extension: True,
         directory_filter_function: Callable = lambda _ : False,
-        minimum_characters: int = 0) -> None:
+        minimum_characters: int = 0,
+        cache: Optional[ResultCache] = None,
+        read_ahead: Optional[ReadAhead] = None) -> None:
     '''
     Parse directory and calculate LOC and total lines, aggregating by file extensions as well
     
@@ -116,9 +293,35 @@ def parse_directory_record(
     :param depth: Sub-directory traversal depth
     :type depth: int
 
+    :param cache: Result cache to consult, only files missing from it or changed since are parsed
+    :type cache: Optional[ResultCache]
+
+    :param read_ahead: Advises the kernel of files about to be parsed, for cold caches and network file systems.
+    Files are then parsed in the order of a single walk, rather than a batch per directory
+    :type read_ahead: Optional[ReadAhead]
+
     :return: Passed line_data array is updated
     :rtype: NoneType
     '''
+    if read_ahead is not None:
+        walk = read_ahead.pipeline(_walk_events(directory_data, config, depth,
+                                                file_filter_function, directory_filter_function, False),
+                                   _walk_filepath)
+        for kind, _, extension, (file_total, file_loc) in _parse_walk(walk, file_parsing_function,
+                                                                      minimum_characters, cache):
+            if kind != _FILE:
+                continue
+            assert extension is not None
+            line_data[0] += file_total
+            line_data[1] += file_loc
+            record: dict[str, int] = language_record.setdefault(extension, {"total" : 0, "loc" : 0, "files" : 0})
+            record["total"] += file_total
+            record["loc"] += file_loc
+            record["files"] += 1
+        return
+
+    batch: list[tuple[str, LanguageMetadata]] = []
+    extensions: list[str] = []
     for dir_entry in directory_data:
         if dir_entry.is_symlink(): continue
         if dir_entry.is_file(follow_symlinks=False):
@@ -126,23 +329,17 @@ def parse_directory_record(
             if not file_filter_function(dir_entry.path, extension):
                 continue
 
-            singleLine, multi_start, multi_end = config.symbol_mapping.get(extension, (None, None, None))
-            if not (singleLine or multi_start):
+            comment_data: LanguageMetadata = config.symbol_mapping.get(extension, (None, None, None))
+            if not (comment_data[0] or comment_data[1]):
                 continue
 
             language_record.setdefault(extension, {"total" : 0, "loc" : 0, "files" : 0})
-            tl, l = file_parsing_function(dir_entry.path,
-                                          singleLine, multi_start, multi_end,
-                                          minimum_characters)
-            line_data[0] += tl
-            line_data[1] += l
-            language_record[extension]["total"] += tl
-            language_record[extension]["loc"] += l
-            language_record[extension]["files"] += 1
+            batch.append((dir_entry.path, comment_data))
+            extensions.append(extension)
             continue
 
         if not depth:
-            return
+            break
         
         if not directory_filter_function(dir_entry.path):
             continue
@@ -150,7 +347,15 @@ def parse_directory_record(
                                line_data, language_record,
                                depth-1,
                                file_parsing_function, file_filter_function, directory_filter_function,
-                               minimum_characters)
+                               minimum_characters, cache)
+
+    counts: Sequence[int] = parse_file_batch(batch, file_parsing_function, minimum_characters, cache)
+    for extension, tl, l in zip(extensions, counts[0::2], counts[1::2]):
+        line_data[0] += tl
+        line_data[1] += l
+        language_record[extension]["total"] += tl
+        language_record[extension]["loc"] += l
+        language_record[extension]["files"] += 1
 
 def parse_directory_verbose(
     directory_data: Iterator[os.DirEntry[str]],
@@ -163,6 +368,7 @@ def parse_directory_verbose(
     minimum_characters: int = 0,
     *,
     output_mapping: Optional[dict[str, Any]] = None,
+    cache: Optional[ResultCache] = None,
 ) -> dict[str, Any]:
     '''
     Parse directory and include aggregate data for all children files and subdirectories
@@ -195,6 +401,9 @@ def parse_directory_verbose(
     There is no need to pass arguments for this paraneter
     :type output_mapping: Optional[dict[str, Any]]
 
+    :param cache: Result cache to consult, only files missing from it or changed since are parsed
+    :type cache: Optional[ResultCache]
+
     :return: Mapping of LOC and line information
     :rtype: dict[str, Any]
     '''
@@ -206,6 +415,8 @@ def parse_directory_verbose(
     files: dict[str, Any] = {}
     subdirectories: dict[str, Any] = {}
 
+    batch: list[tuple[str, LanguageMetadata]] = []
+    extensions: list[str] = []
     for dir_entry in directory_data:
         if dir_entry.is_symlink(): continue
         if dir_entry.is_file(follow_symlinks=False):
@@ -213,33 +424,12 @@ def parse_directory_verbose(
             if not file_filter_function(dir_entry.path, extension):
                 continue
 
-            single, multi_start, multi_end = config.symbol_mapping.get(
-                extension, (None, None, None)
-            )
-
-            if not (single or multi_end):
+            comment_data: LanguageMetadata = config.symbol_mapping.get(extension, (None, None, None))
+            if not (comment_data[0] or comment_data[2]):
                 continue
             language_record.setdefault(extension, {"total" : 0, "loc" : 0, "files" : 0})
-
-            file_total, file_loc = file_parsing_function(
-                dir_entry.path,
-                single,
-                multi_start,
-                multi_end,
-                minimum_characters,
-            )
-
-            language_record[extension]["total"] += file_total
-            language_record[extension]["loc"] += file_loc
-            language_record[extension]["files"] += 1
-
-            directory_total += file_total
-            directory_loc += file_loc
-
-            files[dir_entry.path] = {
-                "loc": file_loc,
-                "total_lines": file_total,
-            }
+            batch.append((dir_entry.path, comment_data))
+            extensions.append(extension)
 
         elif (depth
               and dir_entry.is_dir()
@@ -253,12 +443,27 @@ def parse_directory_verbose(
                     file_parsing_function,
                     file_filter_function,
                     directory_filter_function,
-                    minimum_characters)
+                    minimum_characters,
+                    cache=cache)
 
             subdirectories[dir_entry.name] = child
             directory_total += child["total"]
             directory_loc += child["loc"]
 
+    counts: Sequence[int] = parse_file_batch(batch, file_parsing_function, minimum_characters, cache)
+    for (filepath, _), extension, file_total, file_loc in zip(batch, extensions, counts[0::2], counts[1::2]):
+        language_record[extension]["total"] += file_total
+        language_record[extension]["loc"] += file_loc
+        language_record[extension]["files"] += 1
+
+        directory_total += file_total
+        directory_loc += file_loc
+
+        files[filepath] = {
+            "loc": file_loc,
+            "total_lines": file_total,
+        }
+
     output_mapping.update({
         "files": files,
         "subdirectories": subdirectories,
@@ -267,3 +472,407 @@ def parse_directory_verbose(
     })
 
     return output_mapping
+
+
+_FILE, _ENTER, _EXIT = range(3)
+_WALK_BATCH_SIZE: Final[int] = 64
+
+def _walk_events(
+        directory_data: Iterator[os.DirEntry[str]],
+        config: ClocConfig,
+        depth: int,
+        file_filter_function: Callable[[str, str], bool],
+        directory_filter_function: Callable[[str], bool],
+        detailed: bool) -> Iterator[tuple[int, str, Optional[str], Optional[LanguageMetadata]]]:
+    '''
+    Yield files to parse, and entries into/exits out of subdirectories, in the same
+    order and under the same traversal rules as the serial parsing functions
+    '''
+    for dir_entry in directory_data:
+        if dir_entry.is_symlink(): continue
+        if dir_entry.is_file(follow_symlinks=False):
+            extension = dir_entry.name.rsplit(".", 1)[-1]
+            if not file_filter_function(dir_entry.path, extension):
+                continue
+
+            comment_data: LanguageMetadata = config.symbol_mapping.get(extension, (None, None, None))
+            if not (comment_data[0] or comment_data[1]):
+                continue
+            yield (_FILE, dir_entry.path, extension, comment_data)
+            continue
+
+        if detailed:
+            if not (depth
+                    and dir_entry.is_dir()
+                    and directory_filter_function(dir_entry.path)):
+                continue
+        else:
+            if not depth:
+                return
+            if not directory_filter_function(dir_entry.path):
+                continue
+
+        yield (_ENTER, dir_entry.name, None, None)
+        with os.scandir(dir_entry.path) as directory_iterator:
+            yield from _walk_events(directory_iterator, config, depth-1,
+                                    file_filter_function, directory_filter_function,
+                                    detailed)
+        yield (_EXIT, dir_entry.name, None, None)
+
+def _walk_filepath(event: tuple[int, str, Optional[str], Optional[LanguageMetadata]]) -> Optional[str]:
+    return event[1] if event[0] == _FILE else None
+
+def _read_ahead_walk(
+        walk: Iterator[tuple[int, str, Optional[str], Optional[LanguageMetadata]]],
+        read_ahead: Optional[ReadAhead]) -> Iterator[tuple[int, str, Optional[str], Optional[LanguageMetadata]]]:
+    '''Advise the files of upcoming walk events to the kernel, if read-ahead is enabled'''
+    return walk if read_ahead is None else read_ahead.pipeline(walk, _walk_filepath)
+
+def _resolve_threaded(item: tuple[int, str, Optional[str], Any, Any],
+                      cache: Optional[ResultCache]) -> tuple[int, str, Optional[str], tuple[int, int]]:
+    kind, name, extension, result, key = item
+    if isinstance(result, Future):
+        result = result.result()
+        if cache is not None:
+            cache.store((key,), result)
+    return (kind, name, extension, result)
+
+def _parse_walk_threaded(
+        walk: Iterator[tuple[int, str, Optional[str], Optional[LanguageMetadata]]],
+        file_parsing_function: FileParsingFunction,
+        minimum_characters: int,
+        jobs: Optional[int],
+        cache: Optional[ResultCache] = None) -> Iterator[tuple[int, str, Optional[str], tuple[int, int]]]:
+    '''
+    Parse files yielded by a walk on a thread pool, yielding walk events along with file counts in walk order.
+    At most a few files per worker are in flight, keeping memory bounded regardless of tree size.
+    Cache lookups and writes happen on the calling thread
+    '''
+    workers: int = jobs or min(32, (os.cpu_count() or 1) + 4)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        window: int = workers * 4
+        in_flight: deque[tuple[int, str, Optional[str], Any, Any]] = deque()
+        for kind, name, extension, comment_data in walk:
+            # Either a cached result, or a future along with the cache key to store its result under
+            result: Any = (0, 0)
+            key: Any = None
+            if kind == _FILE:
+                assert comment_data is not None
+                if cache is not None:
+                    (result,), misses = cache.lookup(((name, comment_data),), minimum_characters)
+                    key = misses[0] if misses else None
+                if result is None or cache is None:
+                    result = executor.submit(file_parsing_function, name, *comment_data, minimum_characters)
+            in_flight.append((kind, name, extension, result, key))
+
+            while len(in_flight) > window:
+                yield _resolve_threaded(in_flight.popleft(), cache)
+
+        while in_flight:
+            yield _resolve_threaded(in_flight.popleft(), cache)
+
+def parse_directory_threaded(
+        directory_data: Iterator[os.DirEntry[str]],
+        config: ClocConfig,
+        line_data: array,
+        depth: int,
+        file_parsing_function: FileParsingFunction,
+        file_filter_function: Callable[[str, str], bool] = lambda filename, extension: True,
+        directory_filter_function: Callable = lambda _ : False,
+        minimum_characters: int = 0,
+        jobs: Optional[int] = None,
+        cache: Optional[ResultCache] = None,
+        read_ahead: Optional[ReadAhead] = None) -> None:
+    '''
+    Threaded counterpart of parse_directory. Directories are traversed on the calling thread,
+    while files are parsed on a thread pool to overlap I/O latency across files
+
+    :param jobs: Number of worker threads, defaults to min(32, CPU count + 4)
+    :type jobs: Optional[int]
+
+    :param cache: Result cache to consult, only files missing from it or changed since are parsed
+    :type cache: Optional[ResultCache]
+
+    :param read_ahead: Advises the kernel of files about to be parsed, for cold caches and network file systems
+    :type read_ahead: Optional[ReadAhead]
+
+    :return: Passed line_data array is updated
+    :rtype: NoneType
+    '''
+    walk = _read_ahead_walk(_walk_events(directory_data, config, depth,
+                                         file_filter_function, directory_filter_function, False),
+                            read_ahead)
+    for _, _, _, (file_total, file_loc) in _parse_walk_threaded(walk, file_parsing_function,
+                                                                minimum_characters, jobs, cache):
+        line_data[0] += file_total
+        line_data[1] += file_loc
+
+def parse_directory_record_threaded(
+        directory_data: Iterator[os.DirEntry[str]],
+        config: ClocConfig,
+        line_data: array,
+        language_record: dict[str, dict[str, int]],
+        depth: int,
+        file_parsing_function: FileParsingFunction,
+        file_filter_function: Callable[[str, str], bool] = lambda filename, extension: True,
+        directory_filter_function: Callable = lambda _ : False,
+        minimum_characters: int = 0,
+        jobs: Optional[int] = None,
+        cache: Optional[ResultCache] = None,
+        read_ahead: Optional[ReadAhead] = None) -> None:
+    '''
+    Threaded counterpart of parse_directory_record. Directories are traversed on the calling thread,
+    while files are parsed on a thread pool to overlap I/O latency across files
+
+    :param jobs: Number of worker threads, defaults to min(32, CPU count + 4)
+    :type jobs: Optional[int]
+
+    :param cache: Result cache to consult, only files missing from it or changed since are parsed
+    :type cache: Optional[ResultCache]
+
+    :param read_ahead: Advises the kernel of files about to be parsed, for cold caches and network file systems
+    :type read_ahead: Optional[ReadAhead]
+
+    :return: Passed line_data array and language_record mapping are updated
+    :rtype: NoneType
+    '''
+    walk = _read_ahead_walk(_walk_events(directory_data, config, depth,
+                                         file_filter_function, directory_filter_function, False),
+                            read_ahead)
+    for kind, _, extension, (file_total, file_loc) in _parse_walk_threaded(walk, file_parsing_function,
+                                                                           minimum_characters, jobs, cache):
+        if kind != _FILE:
+            continue
+        assert extension is not None
+        line_data[0] += file_total
+        line_data[1] += file_loc
+        record: dict[str, int] = language_record.setdefault(extension, {"total" : 0, "loc" : 0, "files" : 0})
+        record["total"] += file_total
+        record["loc"] += file_loc
+        record["files"] += 1
+
+def parse_directory_verbose_threaded(
+        directory_data: Iterator[os.DirEntry[str]],
+        config: ClocConfig,
+        language_record: dict[str, dict[str, int]],
+        depth: int,
+        file_parsing_function: FileParsingFunction,
+        file_filter_function: Callable[[str, str], bool] = lambda filename, extension : True,
+        directory_filter_function: Callable = lambda _: False,
+        minimum_characters: int = 0,
+        jobs: Optional[int] = None,
+        cache: Optional[ResultCache] = None,
+        read_ahead: Optional[ReadAhead] = None) -> dict[str, Any]:
+    '''
+    Threaded counterpart of parse_directory_verbose. Directories are traversed on the calling thread,
+    while files are parsed on a thread pool to overlap I/O latency across files
+
+    :param jobs: Number of worker threads, defaults to min(32, CPU count + 4)
+    :type jobs: Optional[int]
+
+    :param cache: Result cache to consult, only files missing from it or changed since are parsed
+    :type cache: Optional[ResultCache]
+
+    :param read_ahead: Advises the kernel of files about to be parsed, for cold caches and network file systems
+    :type read_ahead: Optional[ReadAhead]
+
+    :return: Mapping of LOC and line information
+    :rtype: dict[str, Any]
+    '''
+    walk = _read_ahead_walk(_walk_events(directory_data, config, depth,
+                                         file_filter_function, directory_filter_function, True),
+                            read_ahead)
+
+    # Stack of (name, mapping) pairs for directories currently being populated
+    stack: list[tuple[str, dict[str, Any]]] = [("", {"files" : {}, "subdirectories" : {}, "total" : 0, "loc" : 0})]
+    for kind, name, extension, (file_total, file_loc) in _parse_walk_threaded(walk, file_parsing_function,
+                                                                              minimum_characters, jobs, cache):
+        if kind == _ENTER:
+            stack.append((name, {"files" : {}, "subdirectories" : {}, "total" : 0, "loc" : 0}))
+            continue
+        if kind == _EXIT:
+            child_name, child = stack.pop()
+            parent: dict[str, Any] = stack[-1][1]
+            parent["subdirectories"][child_name] = child
+            parent["total"] += child["total"]
+            parent["loc"] += child["loc"]
+            continue
+
+        assert extension is not None
+        record: dict[str, int] = language_record.setdefault(extension, {"total" : 0, "loc" : 0, "files" : 0})
+        record["total"] += file_total
+        record["loc"] += file_loc
+        record["files"] += 1
+
+        current: dict[str, Any] = stack[-1][1]
+        current["files"][name] = {"loc" : file_loc, "total_lines" : file_total}
+        current["total"] += file_total
+        current["loc"] += file_loc
+
+    return stack[0][1]
+
+def _flush_walk_batch(
+        batch: list[tuple[str, LanguageMetadata]],
+        extensions: list[str],
+        file_parsing_function: FileParsingFunction,
+        minimum_characters: int,
+        cache: Optional[ResultCache]) -> Iterator[tuple[int, str, Optional[str], tuple[int, int]]]:
+    counts: Sequence[int] = parse_file_batch(batch, file_parsing_function, minimum_characters, cache)
+    for index, ((filepath, _), extension) in enumerate(zip(batch, extensions)):
+        yield (_FILE, filepath, extension, (counts[2*index], counts[2*index + 1]))
+    batch.clear()
+    extensions.clear()
+
+def _parse_walk(
+        walk: Iterator[tuple[int, str, Optional[str], Optional[LanguageMetadata]]],
+        file_parsing_function: FileParsingFunction,
+        minimum_characters: int,
+        cache: Optional[ResultCache] = None) -> Iterator[tuple[int, str, Optional[str], tuple[int, int]]]:
+    '''
+    Serial counterpart of _parse_walk_threaded. Consecutive files are parsed in batches of at most
+    _WALK_BATCH_SIZE, so that files are still yielded shortly after the walk reaches them
+    '''
+    batch: list[tuple[str, LanguageMetadata]] = []
+    extensions: list[str] = []
+    for kind, name, extension, comment_data in walk:
+        if kind == _FILE:
+            assert comment_data is not None and extension is not None
+            batch.append((name, comment_data))
+            extensions.append(extension)
+            if len(batch) >= _WALK_BATCH_SIZE:
+                yield from _flush_walk_batch(batch, extensions, file_parsing_function, minimum_characters, cache)
+            continue
+        if batch:
+            yield from _flush_walk_batch(batch, extensions, file_parsing_function, minimum_characters, cache)
+        yield (kind, name, extension, (0, 0))
+    if batch:
+        yield from _flush_walk_batch(batch, extensions, file_parsing_function, minimum_characters, cache)
+
+def parse_directory_stream(
+        directory: str,
+        config: ClocConfig,
+        language_record: dict[str, dict[str, int]],
+        depth: int,
+        file_parsing_function: FileParsingFunction,
+        file_filter_function: Callable[[str, str], bool] = lambda filename, extension : True,
+        directory_filter_function: Callable = lambda _: False,
+        minimum_characters: int = 0,
+        threads: bool = False,
+        jobs: Optional[int] = None,
+        cache: Optional[ResultCache] = None,
+        read_ahead: Optional[ReadAhead] = None) -> Iterator[dict[str, Any]]:
+    '''
+    Streaming counterpart of parse_directory_verbose. Instead of building a tree, a record is yielded
+    for every file as soon as it is parsed, and for every directory once all of its contents have been.
+    Only the directories currently being walked are held in memory, regardless of the size of the tree
+
+    :param directory: Path of the top directory
+    :type directory: str
+
+    :param threads: Parse files on a thread pool, yielding records in the same order
+    :type threads: bool
+
+    :param jobs: Number of worker threads if threaded, defaults to min(32, CPU count + 4)
+    :type jobs: Optional[int]
+
+    :param read_ahead: Advises the kernel of files about to be parsed, for cold caches and network file systems
+    :type read_ahead: Optional[ReadAhead]
+
+    :return: Records of the forms {"type" : "file", "path", "extension", "total", "loc"}
+    and {"type" : "directory", "path", "files", "total", "loc"}, the top directory's coming last
+    :rtype: Iterator[dict[str, Any]]
+    '''
+    with os.scandir(directory) as directory_data:
+        walk = _read_ahead_walk(_walk_events(directory_data, config, depth,
+                                             file_filter_function, directory_filter_function, True),
+                                read_ahead)
+        events: Iterator[tuple[int, str, Optional[str], tuple[int, int]]] = (
+            _parse_walk_threaded(walk, file_parsing_function, minimum_characters, jobs, cache) if threads
+            else _parse_walk(walk, file_parsing_function, minimum_characters, cache))
+
+        # Stack of [path, files, total, loc] for directories currently being walked
+        stack: list[list[Any]] = [[directory, 0, 0, 0]]
+        for kind, name, extension, (file_total, file_loc) in events:
+            if kind == _ENTER:
+                stack.append([os.path.join(stack[-1][0], name), 0, 0, 0])
+                continue
+            if kind == _EXIT:
+                path, files, total, loc = stack.pop()
+                stack[-1][2] += total
+                stack[-1][3] += loc
+                yield {"type" : "directory", "path" : path, "files" : files, "total" : total, "loc" : loc}
+                continue
+
+            assert extension is not None
+            record: dict[str, int] = language_record.setdefault(extension, {"total" : 0, "loc" : 0, "files" : 0})
+            record["total"] += file_total
+            record["loc"] += file_loc
+            record["files"] += 1
+
+            current: list[Any] = stack[-1]
+            current[1] += 1
+            current[2] += file_total
+            current[3] += file_loc
+            yield {"type" : "file", "path" : name, "extension" : extension, "total" : file_total, "loc" : file_loc}
+
+    path, files, total, loc = stack.pop()
+    yield {"type" : "directory", "path" : path, "files" : files, "total" : total, "loc" : loc}
+
+def parse_directory_columnar(
+        directory_data: Iterator[os.DirEntry[str]],
+        config: ClocConfig,
+        language_record: dict[str, dict[str, int]],
+        depth: int,
+        file_parsing_function: FileParsingFunction,
+        file_filter_function: Callable[[str, str], bool] = lambda filename, extension : True,
+        directory_filter_function: Callable = lambda _: False,
+        minimum_characters: int = 0,
+        *,
+        root: str,
+        threads: bool = False,
+        jobs: Optional[int] = None,
+        cache: Optional[ResultCache] = None,
+        read_ahead: Optional[ReadAhead] = None) -> ResultStore:
+    '''
+    Counterpart of parse_directory_verbose collecting results into a columnar ResultStore,
+    rather than a mapping per file and directory. ResultStore.to_mapping gives the same tree
+
+    :param root: Path of the top directory, that directory_data iterates over
+    :type root: str
+
+    :param threads: Parse files on a thread pool rather than the calling thread
+    :type threads: bool
+
+    :param jobs: Number of worker threads if threaded, defaults to min(32, CPU count + 4)
+    :type jobs: Optional[int]
+
+    :param read_ahead: Advises the kernel of files about to be parsed, for cold caches and network file systems
+    :type read_ahead: Optional[ReadAhead]
+
+    :return: Results of every file and directory walked
+    :rtype: ResultStore
+    '''
+    walk = _read_ahead_walk(_walk_events(directory_data, config, depth,
+                                         file_filter_function, directory_filter_function, True),
+                            read_ahead)
+    events: Iterator[tuple[int, str, Optional[str], tuple[int, int]]] = (
+        _parse_walk_threaded(walk, file_parsing_function, minimum_characters, jobs, cache) if threads
+        else _parse_walk(walk, file_parsing_function, minimum_characters, cache))
+
+    store: ResultStore = ResultStore(root)
+    for kind, name, extension, (file_total, file_loc) in events:
+        if kind == _ENTER:
+            store.enter_directory(name)
+            continue
+        if kind == _EXIT:
+            store.exit_directory()
+            continue
+
+        assert extension is not None
+        record: dict[str, int] = language_record.setdefault(extension, {"total" : 0, "loc" : 0, "files" : 0})
+        record["total"] += file_total
+        record["loc"] += file_loc
+        record["files"] += 1
+        store.add_file(os.path.basename(name), extension, file_total, file_loc)
+
+    return store
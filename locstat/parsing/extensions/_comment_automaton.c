@@ -0,0 +1,364 @@
+#include <string.h>
+#include "_comment_automaton.h"
+
+#define AUTOMATON_CAPSULE_NAME "locstat._comment_automaton"
+
+struct Symbol {
+    const char *buffer;
+    Py_ssize_t length;
+};
+
+// Metadata tuple -> capsule of its automaton
+static PyObject *_automaton_cache = NULL;
+
+static bool
+_is_countable(unsigned char c){
+    const bool ignorable = ((c == 0x20) || (c == 0x09) || (c == 0x0B) || (c == 0x0C) || (c == 0x0D));
+    return !(ignorable || (c & 0b11000000) == 0b10000000);
+}
+
+static void
+_free_automaton(struct CommentAutomaton *automaton){
+    if (!automaton){
+        return;
+    }
+    PyMem_Free(automaton->transitions);
+    PyMem_Free(automaton->kinds);
+    PyMem_Free(automaton->adjustments);
+    PyMem_Free(automaton->stops);
+    PyMem_Free(automaton->stop_counts);
+    PyMem_Free(automaton);
+}
+
+static void
+_capsule_destructor(PyObject *capsule){
+    _free_automaton(PyCapsule_GetPointer(capsule, AUTOMATON_CAPSULE_NAME));
+}
+
+static bool
+_extract_symbol(PyObject *symbol, struct Symbol *destination){
+    char *contents;
+    if (PyBytes_AsStringAndSize(symbol, &contents, &destination->length) == -1){
+        return false;
+    }
+    if (!destination->length || memchr(contents, '\n', destination->length)){
+        PyErr_SetString(PyExc_ValueError, "Comment symbols must be non-empty and cannot contain newlines");
+        return false;
+    }
+    destination->buffer = contents;
+    return true;
+}
+
+/* Collect symbols from None, bytes, or a tuple of bytes into a newly allocated array */
+static bool
+_collect_symbols(PyObject *item, struct Symbol **symbols, Py_ssize_t *count){
+    *symbols = NULL;
+    *count = 0;
+    if (item == Py_None){
+        return true;
+    }
+
+    const bool is_tuple = PyTuple_Check(item);
+    const Py_ssize_t item_count = is_tuple ? PyTuple_Size(item) : 1;
+    if (!item_count){
+        return true;
+    }
+    if (!(*symbols = PyMem_Malloc(sizeof(struct Symbol) * item_count))){
+        PyErr_NoMemory();
+        return false;
+    }
+    for (Py_ssize_t i = 0; i < item_count; i++){
+        if (!_extract_symbol(is_tuple ? PyTuple_GetItem(item, i) : item, &(*symbols)[i])){
+            PyMem_Free(*symbols);
+            *symbols = NULL;
+            return false;
+        }
+    }
+    *count = item_count;
+    return true;
+}
+
+static Py_ssize_t
+_countable_prefix(const struct Symbol *symbol){
+    Py_ssize_t count = 0;
+    for (Py_ssize_t i = 0; i < symbol->length - 1; i++){
+        count += _is_countable((unsigned char) symbol->buffer[i]);
+    }
+    return count;
+}
+
+static bool
+_allocate_automaton(struct CommentAutomaton *automaton, Py_ssize_t state_count){
+    automaton->state_count = state_count;
+    automaton->transitions = PyMem_Calloc(state_count, sizeof(*automaton->transitions));
+    automaton->kinds = PyMem_Calloc(state_count, sizeof(*automaton->kinds));
+    automaton->adjustments = PyMem_Calloc(state_count, sizeof(*automaton->adjustments));
+    automaton->stops = PyMem_Calloc(state_count, sizeof(*automaton->stops));
+    automaton->stop_counts = PyMem_Calloc(state_count, sizeof(*automaton->stop_counts));
+    return (automaton->transitions && automaton->kinds && automaton->adjustments
+            && automaton->stops && automaton->stop_counts);
+}
+
+/* Record the bytes that leave a state. States left by too many distinct bytes are not skipped over */
+static void
+_compute_stops(struct CommentAutomaton *automaton, uint16_t state){
+    unsigned char count = 0;
+    for (int c = 0; c < 256; c++){
+        if (automaton->transitions[state][c] == state && c != '\n'){
+            continue;
+        }
+        if (count == AUTOMATON_MAX_STOPS){
+            automaton->stop_counts[state] = 0;
+            return;
+        }
+        automaton->stops[state][count++] = (unsigned char) c;
+    }
+    for (unsigned char i = count; i < AUTOMATON_MAX_STOPS; i++){
+        automaton->stops[state][i] = automaton->stops[state][0];
+    }
+    automaton->stop_counts[state] = count;
+}
+
+/* KMP automaton for a block terminator, occupying states first + 1 onwards. State first is the entry state */
+static void
+_build_terminator(struct CommentAutomaton *automaton, const struct Symbol *terminator, uint16_t first){
+    const uint16_t base = first + 1;
+    const unsigned char *symbol = (const unsigned char *) terminator->buffer;
+    const Py_ssize_t length = terminator->length;
+
+    for (int c = 0; c < 256; c++){
+        automaton->transitions[base][c] = base;
+    }
+    automaton->transitions[base][symbol[0]] = (length == 1) ? AUTOMATON_ROOT : base + 1;
+
+    Py_ssize_t fallback = 0;
+    for (Py_ssize_t j = 1; j < length; j++){
+        memcpy(automaton->transitions[base + j], automaton->transitions[base + fallback], sizeof(automaton->transitions[0]));
+        automaton->transitions[base + j][symbol[j]] = (j + 1 == length) ? AUTOMATON_ROOT : (uint16_t) (base + j + 1);
+        fallback = automaton->transitions[base + fallback][symbol[j]] - base;
+    }
+
+    memcpy(automaton->transitions[first], automaton->transitions[base], sizeof(automaton->transitions[0]));
+    for (Py_ssize_t j = 0; j <= length; j++){
+        automaton->kinds[first + j] = STATE_BLOCK_COMMENT;
+    }
+}
+
+static struct CommentAutomaton *
+_build_automaton(const struct Symbol *singleline, Py_ssize_t singleline_count,
+                 const struct Symbol *block_start, const struct Symbol *block_end, Py_ssize_t block_count){
+
+    struct CommentAutomaton *automaton = PyMem_Calloc(1, sizeof(struct CommentAutomaton));
+    Py_ssize_t node_count = 1, node_capacity = 1, terminator_states = 0;
+    for (Py_ssize_t i = 0; i < singleline_count; i++){
+        node_capacity += singleline[i].length;
+    }
+    for (Py_ssize_t i = 0; i < block_count; i++){
+        node_capacity += block_start[i].length;
+        terminator_states += block_end[i].length + 1;
+    }
+
+    // Trie of opening symbols, completed into an Aho-Corasick automaton in place
+    int (*trie)[256] = PyMem_Malloc(sizeof(*trie) * node_capacity);
+    // Symbol matched upon reaching a node, singleline symbols are numbered first
+    Py_ssize_t *accepts = PyMem_Malloc(sizeof(Py_ssize_t) * node_capacity);
+    Py_ssize_t *failures = PyMem_Malloc(sizeof(Py_ssize_t) * node_capacity);
+    Py_ssize_t *queue = PyMem_Malloc(sizeof(Py_ssize_t) * node_capacity);
+    Py_ssize_t *state_ids = PyMem_Malloc(sizeof(Py_ssize_t) * node_capacity);
+    Py_ssize_t *entry_states = PyMem_Malloc(sizeof(Py_ssize_t) * (singleline_count + block_count + 1));
+    if (!(automaton && trie && accepts && failures && queue && state_ids && entry_states)){
+        PyErr_NoMemory();
+        goto error;
+    }
+
+    memset(trie[0], -1, sizeof(trie[0]));
+    accepts[0] = -1;
+    for (Py_ssize_t symbol_index = 0; symbol_index < singleline_count + block_count; symbol_index++){
+        const struct Symbol *symbol = (symbol_index < singleline_count)
+            ? &singleline[symbol_index]
+            : &block_start[symbol_index - singleline_count];
+        Py_ssize_t node = 0;
+        for (Py_ssize_t j = 0; j < symbol->length; j++){
+            const unsigned char c = (unsigned char) symbol->buffer[j];
+            if (trie[node][c] == -1){
+                memset(trie[node_count], -1, sizeof(trie[0]));
+                accepts[node_count] = -1;
+                trie[node][c] = (int) node_count++;
+            }
+            node = trie[node][c];
+        }
+        // On duplicates the earlier symbol wins, giving singleline symbols priority
+        if (accepts[node] == -1){
+            accepts[node] = symbol_index;
+        }
+    }
+
+    Py_ssize_t head = 0, tail = 0;
+    for (int c = 0; c < 256; c++){
+        if (trie[0][c] == -1){
+            trie[0][c] = 0;
+        } else {
+            failures[trie[0][c]] = 0;
+            queue[tail++] = trie[0][c];
+        }
+    }
+    while (head < tail){
+        const Py_ssize_t node = queue[head++];
+        for (int c = 0; c < 256; c++){
+            const int child = trie[node][c];
+            if (child == -1){
+                trie[node][c] = trie[failures[node]][c];
+                continue;
+            }
+            failures[child] = trie[failures[node]][c];
+            if (accepts[child] == -1){
+                accepts[child] = accepts[failures[child]];
+            }
+            queue[tail++] = child;
+        }
+    }
+
+    // Only non-accepting nodes reachable from the root become code states,
+    // transitions into accepting nodes lead directly into the matched comment
+    for (Py_ssize_t i = 0; i < node_count; i++){
+        state_ids[i] = -1;
+    }
+    Py_ssize_t code_count = 1;
+    state_ids[0] = AUTOMATON_ROOT;
+    head = 0, tail = 0;
+    queue[tail++] = 0;
+    while (head < tail){
+        const Py_ssize_t node = queue[head++];
+        for (int c = 0; c < 256; c++){
+            const int child = trie[node][c];
+            if (accepts[child] == -1 && state_ids[child] == -1){
+                state_ids[child] = code_count++;
+                queue[tail++] = child;
+            }
+        }
+    }
+
+    Py_ssize_t state_count = code_count + singleline_count;
+    for (Py_ssize_t i = 0; i < singleline_count; i++){
+        entry_states[i] = code_count + i;
+    }
+    for (Py_ssize_t i = 0; i < block_count; i++){
+        entry_states[singleline_count + i] = state_count;
+        state_count += block_end[i].length + 1;
+    }
+    if (state_count > UINT16_MAX){
+        PyErr_SetString(PyExc_ValueError, "Comment symbols are too long to compile");
+        goto error;
+    }
+    if (!_allocate_automaton(automaton, state_count)){
+        PyErr_NoMemory();
+        goto error;
+    }
+    automaton->symbol_count = singleline_count + block_count;
+
+    for (Py_ssize_t node = 0; node < node_count; node++){
+        if (state_ids[node] == -1){
+            continue;
+        }
+        for (int c = 0; c < 256; c++){
+            const int child = trie[node][c];
+            automaton->transitions[state_ids[node]][c] = (uint16_t) ((accepts[child] == -1)
+                ? state_ids[child]
+                : entry_states[accepts[child]]);
+        }
+        automaton->kinds[state_ids[node]] = STATE_CODE;
+    }
+    for (Py_ssize_t i = 0; i < singleline_count; i++){
+        automaton->kinds[entry_states[i]] = STATE_LINE_COMMENT;
+        automaton->adjustments[entry_states[i]] = _countable_prefix(&singleline[i]);
+    }
+    for (Py_ssize_t i = 0; i < block_count; i++){
+        const uint16_t entry = (uint16_t) entry_states[singleline_count + i];
+        _build_terminator(automaton, &block_end[i], entry);
+        automaton->adjustments[entry] = _countable_prefix(&block_start[i]);
+    }
+    for (Py_ssize_t state = 0; state < state_count; state++){
+        if (automaton->kinds[state] != STATE_LINE_COMMENT){
+            _compute_stops(automaton, (uint16_t) state);
+        }
+    }
+
+    PyMem_Free(trie);
+    PyMem_Free(accepts);
+    PyMem_Free(failures);
+    PyMem_Free(queue);
+    PyMem_Free(state_ids);
+    PyMem_Free(entry_states);
+    return automaton;
+
+error:
+    PyMem_Free(trie);
+    PyMem_Free(accepts);
+    PyMem_Free(failures);
+    PyMem_Free(queue);
+    PyMem_Free(state_ids);
+    PyMem_Free(entry_states);
+    _free_automaton(automaton);
+    return NULL;
+}
+
+static struct CommentAutomaton *
+_compile_metadata(PyObject *metadata){
+    if (!PyTuple_Check(metadata) || PyTuple_Size(metadata) != 3){
+        PyErr_SetString(PyExc_TypeError, "Comment metadata must be a 3-tuple of bytes, tuples of bytes, or None");
+        return NULL;
+    }
+
+    struct Symbol *singleline = NULL, *block_start = NULL, *block_end = NULL;
+    Py_ssize_t singleline_count, block_start_count, block_end_count;
+    struct CommentAutomaton *automaton = NULL;
+    if (!(_collect_symbols(PyTuple_GetItem(metadata, 0), &singleline, &singleline_count)
+          && _collect_symbols(PyTuple_GetItem(metadata, 1), &block_start, &block_start_count)
+          && _collect_symbols(PyTuple_GetItem(metadata, 2), &block_end, &block_end_count))){
+        goto cleanup;
+    }
+
+    Py_ssize_t block_count = block_start_count;
+    if (block_start_count != block_end_count){
+        // A lone start or end symbol can never form a block, as with languages terminating single line comments
+        if (block_start_count > 1 || block_end_count > 1){
+            PyErr_SetString(PyExc_ValueError, "Block comment start and end symbols must pair up");
+            goto cleanup;
+        }
+        block_count = 0;
+    }
+    automaton = _build_automaton(singleline, singleline_count, block_start, block_end, block_count);
+
+cleanup:
+    PyMem_Free(singleline);
+    PyMem_Free(block_start);
+    PyMem_Free(block_end);
+    return automaton;
+}
+
+const struct CommentAutomaton *
+get_comment_automaton(PyObject *metadata){
+    if (!_automaton_cache && !(_automaton_cache = PyDict_New())){
+        return NULL;
+    }
+
+    PyObject *capsule = PyDict_GetItemWithError(_automaton_cache, metadata);
+    if (capsule){
+        return PyCapsule_GetPointer(capsule, AUTOMATON_CAPSULE_NAME);
+    }
+    if (PyErr_Occurred()){
+        return NULL;
+    }
+
+    struct CommentAutomaton *automaton = _compile_metadata(metadata);
+    if (!automaton){
+        return NULL;
+    }
+    if (!(capsule = PyCapsule_New(automaton, AUTOMATON_CAPSULE_NAME, _capsule_destructor))){
+        _free_automaton(automaton);
+        return NULL;
+    }
+    const int status = PyDict_SetItem(_automaton_cache, metadata, capsule);
+    Py_DECREF(capsule);
+    return (status == -1) ? NULL : automaton;
+}
@@ -0,0 +1,42 @@
+#ifndef _COMMENT_AUTOMATON_H
+#define _COMMENT_AUTOMATON_H
+#include "_locstat.h"
+#include <stdbool.h>
+#include <stdint.h>
+
+#define AUTOMATON_ROOT 0
+#define AUTOMATON_MAX_STOPS 4
+
+enum StateKind {STATE_CODE, STATE_LINE_COMMENT, STATE_BLOCK_COMMENT};
+
+/*
+ * Table-driven DFA matching all comment symbols of a language at once.
+ * Code states form an Aho-Corasick automaton over every single-line and block-start symbol,
+ * completing a symbol transitions into a comment state. Each block comment has its own
+ * KMP automaton for its terminator, which transitions back to the root on completion.
+ *
+ * Immutable once built, and therefore safe to share across threads without the GIL
+ */
+struct CommentAutomaton {
+    Py_ssize_t state_count;
+    // Number of comment symbols, an automaton without any never leaves the root
+    Py_ssize_t symbol_count;
+
+    // state_count rows of 256 transitions
+    uint16_t (*transitions)[256];
+    unsigned char *kinds;
+    // Characters of a completed symbol counted as valid before the match was known,
+    // subtracted when entering a comment state from code
+    Py_ssize_t *adjustments;
+    // Bytes leaving a state, scanned for in bulk. A count of 0 disables skipping for the state
+    unsigned char (*stops)[AUTOMATON_MAX_STOPS];
+    unsigned char *stop_counts;
+};
+
+/* Fetch the automaton for a (singleline, multiline_start, multiline_end) tuple, building it on first use.
+ * Each element may be bytes, None, or a tuple of bytes. Block start and end symbols are paired by position.
+ * The returned automaton is owned by a module-level cache and lives until interpreter shutdown */
+extern const struct CommentAutomaton *
+get_comment_automaton(PyObject *metadata);
+
+#endif
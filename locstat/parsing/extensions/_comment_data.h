@@ -2,24 +2,22 @@
 #define _COMMENT_DATA_H
 #include "_locstat.h"
 #include <stdbool.h>
+#include <stdint.h>
+#include "_comment_automaton.h"
+
 struct CommentData {
-    const char *singleline_symbol;
-    const char *multiline_start_symbol;
-    const char *multiline_end_symbol;
+    const struct CommentAutomaton *automaton;
+    // Current automaton state, carried over between chunks of the same file
+    uint16_t state;
+};
 
-    Py_ssize_t singleline_length;
-    Py_ssize_t multiline_start_length;
-    Py_ssize_t multiline_end_length;
+extern void initialize_comment_data(struct CommentData *comment_data, const struct CommentAutomaton *automaton);
 
-    Py_ssize_t singleline_pointer;
-    Py_ssize_t multiline_start_pointer;
-    Py_ssize_t multiline_end_pointer;
-    
-    bool in_singleline, in_multiline;
-};
+/* Initialize comment data from a (singleline, multiline_start, multiline_end) tuple.
+ * The language's automaton is compiled on first use and cached for the lifetime of the module */
+extern bool extract_comment_data(PyObject *metadata, struct CommentData *comment_data);
 
-extern void initialize_comment_data(struct CommentData *comment_data,
-    const char *singleline_symbol, const char *multiline_start_symbol, const char *multiline_end_symbol,
-    Py_ssize_t singleline_length, Py_ssize_t multiline_start_length, Py_ssize_t multiline_end_length);
+/* Whether any comment symbols are known for the language */
+extern bool has_comment_symbols(const struct CommentData *comment_data);
 
-#endif
\ No newline at end of file
+#endif
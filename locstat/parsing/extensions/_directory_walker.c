@@ -0,0 +1,424 @@
+#ifndef _WIN32
+
+#include <stdbool.h>
+#include <stdint.h>
+#include <stdlib.h>
+#include <errno.h>
+#include <string.h>
+#include <dirent.h>
+#include <fcntl.h>
+#include <unistd.h>
+#include <sys/stat.h>
+#include "_directory_walker.h"
+#include "_file_counting.h"
+#include "_comment_data.h"
+
+enum FilterMode {FILTER_NONE, FILTER_INCLUDE, FILTER_EXCLUDE};
+
+struct StringTableEntry {
+    const char *key;
+    Py_ssize_t length;
+    Py_ssize_t value;
+};
+
+/* Open addressing hash table of byte strings, with keys borrowed from Python bytes objects */
+struct StringTable {
+    struct StringTableEntry *entries;
+    size_t mask;
+};
+
+struct LanguageCount {
+    unsigned long long total, loc, files;
+    bool seen;
+};
+
+struct WalkContext {
+    struct StringTable languages, files, extensions, directories;
+    enum FilterMode file_mode, extension_mode, directory_mode;
+    struct CommentData *comment_data;
+    enum CountingMode counting_mode;
+    Py_ssize_t minimum_characters;
+
+    unsigned long long total, loc;
+    struct LanguageCount *language_counts;
+    // Indices of languages in order of first occurrence
+    Py_ssize_t *language_order;
+    Py_ssize_t language_order_length;
+
+    // Path of the entry currently being processed
+    char *path;
+    size_t path_length, path_capacity;
+
+    int error;
+    char *error_path;
+};
+
+static uint64_t
+_hash_string(const char *key, Py_ssize_t length){
+    // FNV-1a
+    uint64_t hash = 14695981039346656037ULL;
+    for (Py_ssize_t i = 0; i < length; i++){
+        hash ^= (unsigned char) key[i];
+        hash *= 1099511628211ULL;
+    }
+    return hash;
+}
+
+static bool
+_table_initialize(struct StringTable *table, Py_ssize_t size){
+    size_t capacity = 8;
+    while (capacity < (size_t) size * 2){
+        capacity <<= 1;
+    }
+    table->entries = PyMem_Calloc(capacity, sizeof(struct StringTableEntry));
+    table->mask = capacity - 1;
+    return table->entries != NULL;
+}
+
+static void
+_table_insert(struct StringTable *table, const char *key, Py_ssize_t length, Py_ssize_t value){
+    size_t index = _hash_string(key, length) & table->mask;
+    while (table->entries[index].key){
+        if (table->entries[index].length == length
+            && memcmp(table->entries[index].key, key, length) == 0){
+            break;
+        }
+        index = (index + 1) & table->mask;
+    }
+    table->entries[index].key = key;
+    table->entries[index].length = length;
+    table->entries[index].value = value;
+}
+
+static Py_ssize_t
+_table_lookup(const struct StringTable *table, const char *key, Py_ssize_t length){
+    size_t index = _hash_string(key, length) & table->mask;
+    while (table->entries[index].key){
+        if (table->entries[index].length == length
+            && memcmp(table->entries[index].key, key, length) == 0){
+            return table->entries[index].value;
+        }
+        index = (index + 1) & table->mask;
+    }
+    return -1;
+}
+
+static bool
+_filter_passes(const struct StringTable *table, enum FilterMode mode, const char *key, Py_ssize_t length){
+    switch (mode){
+        case FILTER_INCLUDE:
+            return _table_lookup(table, key, length) != -1;
+        case FILTER_EXCLUDE:
+            return _table_lookup(table, key, length) == -1;
+        default:
+            return true;
+    }
+}
+
+/* Build a table out of an iterable of bytes. The returned tuple keeps the keys alive */
+static PyObject *
+_build_set_table(PyObject *iterable, struct StringTable *table){
+    PyObject *items = PySequence_Tuple(iterable);
+    if (!items){
+        return NULL;
+    }
+    Py_ssize_t size = PyTuple_Size(items);
+    if (!_table_initialize(table, size)){
+        Py_DECREF(items);
+        PyErr_NoMemory();
+        return NULL;
+    }
+    for (Py_ssize_t i = 0; i < size; i++){
+        char *key;
+        Py_ssize_t length;
+        if (PyBytes_AsStringAndSize(PyTuple_GetItem(items, i), &key, &length) == -1){
+            Py_DECREF(items);
+            return NULL;
+        }
+        _table_insert(table, key, length, i);
+    }
+    return items;
+}
+
+static bool
+_set_walk_error(struct WalkContext *context, int error){
+    context->error = error;
+    context->error_path = strdup(context->path);
+    return false;
+}
+
+static bool
+_push_path(struct WalkContext *context, const char *name, size_t name_length){
+    size_t required = context->path_length + name_length + 2;
+    if (required > context->path_capacity){
+        size_t capacity = context->path_capacity * 2 > required ? context->path_capacity * 2 : required;
+        char *path = realloc(context->path, capacity);
+        if (!path){
+            context->error = ENOMEM;
+            return false;
+        }
+        context->path = path;
+        context->path_capacity = capacity;
+    }
+    // Same joining rule as os.path.join for an absolute root
+    if (context->path[context->path_length - 1] != '/'){
+        context->path[context->path_length++] = '/';
+    }
+    memcpy(context->path + context->path_length, name, name_length + 1);
+    context->path_length += name_length;
+    return true;
+}
+
+static bool
+_count_walked_file(struct WalkContext *context, int directory_fd, const char *name, Py_ssize_t language){
+    int fd = openat(directory_fd, name, O_RDONLY | O_CLOEXEC);
+    if (fd == -1){
+        return _set_walk_error(context, errno);
+    }
+    FILE *file = fdopen(fd, "rb");
+    if (!file){
+        int error = errno;
+        close(fd);
+        return _set_walk_error(context, error);
+    }
+
+    struct CommentData comment_data = context->comment_data[language];
+    unsigned long long total_lines = 0, loc = 0;
+    int error = 0;
+    switch (context->counting_mode){
+        case COUNT_BUFFERED:
+            error = _count_stream(file, &comment_data, context->minimum_characters, &total_lines, &loc);
+            break;
+        case COUNT_COMPLETE:
+            error = _count_stream_no_chunk(file, &comment_data, context->minimum_characters, &total_lines, &loc);
+            break;
+        case COUNT_VM_MAP:
+            error = _count_stream_vm_map(file, &comment_data, context->minimum_characters, &total_lines, &loc);
+            break;
+        case COUNT_AUTO:
+            error = _count_stream_auto(file, &comment_data, context->minimum_characters, &total_lines, &loc);
+            break;
+    }
+    fclose(file);
+    if (error){
+        return _set_walk_error(context, error);
+    }
+
+    struct LanguageCount *count = &context->language_counts[language];
+    if (!count->seen){
+        count->seen = true;
+        context->language_order[context->language_order_length++] = language;
+    }
+    count->total += total_lines;
+    count->loc += loc;
+    count->files++;
+    context->total += total_lines;
+    context->loc += loc;
+    return true;
+}
+
+/* Mirrors the traversal rules of locstat.parsing.directory.parse_directory.
+ * Takes ownership of directory_fd. Called without the GIL */
+static bool
+_walk(struct WalkContext *context, int directory_fd, long long depth){
+    DIR *directory = fdopendir(directory_fd);
+    if (!directory){
+        int error = errno;
+        close(directory_fd);
+        return _set_walk_error(context, error);
+    }
+
+    const size_t parent_length = context->path_length;
+    bool success = true;
+    struct dirent *entry;
+    while (success){
+        errno = 0;
+        if (!(entry = readdir(directory))){
+            if (errno){
+                success = _set_walk_error(context, errno);
+            }
+            break;
+        }
+
+        const char *name = entry->d_name;
+        if (name[0] == '.' && (name[1] == '\0' || (name[1] == '.' && name[2] == '\0'))){
+            continue;
+        }
+
+        unsigned char type = entry->d_type;
+        if (type == DT_UNKNOWN){
+            struct stat st;
+            if (fstatat(directory_fd, name, &st, AT_SYMLINK_NOFOLLOW) == 0){
+                type = S_ISLNK(st.st_mode) ? DT_LNK : S_ISREG(st.st_mode) ? DT_REG : S_ISDIR(st.st_mode) ? DT_DIR : DT_UNKNOWN;
+            }
+        }
+        if (type == DT_LNK){
+            continue;
+        }
+
+        const size_t name_length = strlen(name);
+        if (type == DT_REG){
+            const char *extension = strrchr(name, '.');
+            extension = extension ? extension + 1 : name;
+            const Py_ssize_t extension_length = name_length - (extension - name);
+
+            if (!_filter_passes(&context->extensions, context->extension_mode, extension, extension_length)){
+                continue;
+            }
+            if (!(success = _push_path(context, name, name_length))){
+                break;
+            }
+            if (_filter_passes(&context->files, context->file_mode, context->path, context->path_length)){
+                Py_ssize_t language = _table_lookup(&context->languages, extension, extension_length);
+                if (language != -1
+                    && has_comment_symbols(&context->comment_data[language])){
+                    success = _count_walked_file(context, directory_fd, name, language);
+                }
+            }
+            context->path_length = parent_length;
+            context->path[parent_length] = '\0';
+            continue;
+        }
+
+        if (!depth){
+            break;
+        }
+        if (!(success = _push_path(context, name, name_length))){
+            break;
+        }
+        if (_filter_passes(&context->directories, context->directory_mode, context->path, context->path_length)){
+            int child_fd = openat(directory_fd, name, O_RDONLY | O_DIRECTORY | O_NONBLOCK | O_CLOEXEC);
+            success = (child_fd == -1
+                       ? _set_walk_error(context, errno)
+                       : _walk(context, child_fd, depth - 1));
+        }
+        context->path_length = parent_length;
+        context->path[parent_length] = '\0';
+    }
+
+    closedir(directory);
+    return success;
+}
+
+static PyObject *
+_build_walk_result(struct WalkContext *context, PyObject *language_items){
+    PyObject *languages = PyList_New(context->language_order_length);
+    if (!languages){
+        return NULL;
+    }
+    for (Py_ssize_t i = 0; i < context->language_order_length; i++){
+        Py_ssize_t index = context->language_order[i];
+        struct LanguageCount *count = &context->language_counts[index];
+        PyObject *extension = PyTuple_GetItem(PyList_GetItem(language_items, index), 0);
+        PyObject *record = Py_BuildValue("OKKK", extension, count->total, count->loc, count->files);
+        if (!record){
+            Py_DECREF(languages);
+            return NULL;
+        }
+        PyList_SetItem(languages, i, record);
+    }
+    return Py_BuildValue("KKN", context->total, context->loc, languages);
+}
+
+PyObject *
+_walk_directory(PyObject *self, PyObject *args){
+    const char *root, *parse_mode;
+    PyObject *languages, *files, *extensions, *directories;
+    long long depth;
+    Py_ssize_t minimum_characters;
+    int file_mode, extension_mode, directory_mode;
+
+    if (!PyArg_ParseTuple(args, "yO!LnsOiOiOi",
+        &root,
+        &PyDict_Type, &languages,
+        &depth, &minimum_characters, &parse_mode,
+        &files, &file_mode,
+        &extensions, &extension_mode,
+        &directories, &directory_mode)){
+        return NULL;
+    }
+
+    struct WalkContext context;
+    memset(&context, 0, sizeof(context));
+    context.file_mode = file_mode;
+    context.extension_mode = extension_mode;
+    context.directory_mode = directory_mode;
+    context.minimum_characters = minimum_characters;
+    if (!_parse_counting_mode(parse_mode, &context.counting_mode)){
+        return NULL;
+    }
+
+    PyObject *result = NULL;
+    PyObject *file_keys = NULL, *extension_keys = NULL, *directory_keys = NULL;
+    // List of (extension, metadata) pairs, keeping symbol buffers alive while the GIL is released
+    PyObject *language_items = PyDict_Items(languages);
+    if (!language_items){
+        return NULL;
+    }
+
+    const Py_ssize_t language_count = PyList_Size(language_items);
+    context.comment_data = PyMem_Calloc(language_count ? language_count : 1, sizeof(struct CommentData));
+    context.language_counts = PyMem_Calloc(language_count ? language_count : 1, sizeof(struct LanguageCount));
+    context.language_order = PyMem_Calloc(language_count ? language_count : 1, sizeof(Py_ssize_t));
+    context.path_capacity = strlen(root) + 256;
+    context.path = malloc(context.path_capacity);
+    if (!(context.comment_data && context.language_counts && context.language_order && context.path
+          && _table_initialize(&context.languages, language_count))){
+        PyErr_NoMemory();
+        goto cleanup;
+    }
+
+    for (Py_ssize_t i = 0; i < language_count; i++){
+        PyObject *item = PyList_GetItem(language_items, i);
+        char *extension;
+        Py_ssize_t extension_length;
+        if (PyBytes_AsStringAndSize(PyTuple_GetItem(item, 0), &extension, &extension_length) == -1
+            || !extract_comment_data(PyTuple_GetItem(item, 1), &context.comment_data[i])){
+            goto cleanup;
+        }
+        _table_insert(&context.languages, extension, extension_length, i);
+    }
+
+    if (!((file_keys = _build_set_table(files, &context.files))
+          && (extension_keys = _build_set_table(extensions, &context.extensions))
+          && (directory_keys = _build_set_table(directories, &context.directories)))){
+        goto cleanup;
+    }
+
+    strcpy(context.path, root);
+    context.path_length = strlen(root);
+
+    bool success;
+    Py_BEGIN_ALLOW_THREADS
+    int root_fd = open(root, O_RDONLY | O_DIRECTORY | O_CLOEXEC);
+    success = (root_fd == -1
+               ? _set_walk_error(&context, errno)
+               : _walk(&context, root_fd, depth));
+    Py_END_ALLOW_THREADS
+
+    if (success){
+        result = _build_walk_result(&context, language_items);
+    } else if (context.error_path){
+        _set_file_error(context.error, context.error_path);
+    } else {
+        PyErr_NoMemory();
+    }
+
+cleanup:
+    free(context.path);
+    free(context.error_path);
+    PyMem_Free(context.comment_data);
+    PyMem_Free(context.language_counts);
+    PyMem_Free(context.language_order);
+    PyMem_Free(context.languages.entries);
+    PyMem_Free(context.files.entries);
+    PyMem_Free(context.extensions.entries);
+    PyMem_Free(context.directories.entries);
+    Py_XDECREF(file_keys);
+    Py_XDECREF(extension_keys);
+    Py_XDECREF(directory_keys);
+    Py_DECREF(language_items);
+    return result;
+}
+
+#endif
@@ -0,0 +1,12 @@
+#ifndef _DIRECTORY_WALKER_H
+#define _DIRECTORY_WALKER_H
+#include "_locstat.h"
+
+#ifndef _WIN32
+/* Walk a directory tree natively, counting lines of every recognised file.
+ * See _parsing.pyi for the Python signature */
+extern PyObject *
+_walk_directory(PyObject *self, PyObject *args);
+#endif
+
+#endif
@@ -0,0 +1,389 @@
+#include <stdbool.h>
+#include <errno.h>
+#include <string.h>
+#include <sys/stat.h>
+#include "_file_counting.h"
+#include "_parsing_prinitives.h"
+#include "_comment_data.h"
+#include "_file_sniffing.h"
+#include "_split_counting.h"
+
+bool
+_parse_counting_mode(const char *parse_mode, enum CountingMode *mode){
+    if (strcmp(parse_mode, "BUF") == 0){
+        *mode = COUNT_BUFFERED;
+    } else if (strcmp(parse_mode, "COMP") == 0){
+        *mode = COUNT_COMPLETE;
+    } else if (strcmp(parse_mode, "MMAP") == 0){
+        *mode = COUNT_VM_MAP;
+    } else if (strcmp(parse_mode, "AUTO") == 0){
+        *mode = COUNT_AUTO;
+    } else {
+        PyErr_Format(PyExc_ValueError, "Invalid parsing mode %s", parse_mode);
+        return false;
+    }
+    return true;
+}
+
+// Defaults for uncalibrated machines: small reads avoid mapping costs, and huge files are never held whole
+static Py_ssize_t auto_mmap_threshold = 64 * 1024;
+static Py_ssize_t auto_buffered_threshold = (Py_ssize_t) 1 << 30;
+
+void
+set_auto_thresholds(Py_ssize_t mmap_threshold, Py_ssize_t buffered_threshold){
+    auto_mmap_threshold = mmap_threshold;
+    auto_buffered_threshold = buffered_threshold;
+}
+
+void
+_count_buffer(const unsigned char *buffer, size_t buffer_size, struct CommentData *comment_data,
+    Py_ssize_t minimum_characters, unsigned long long *total_lines, unsigned long long *loc){
+
+    if (buffer_size == 0 || sniff_buffer(buffer, buffer_size)){
+        return;
+    }
+    Py_ssize_t valid_symbols = 0;
+    _parse_buffer((unsigned char *) buffer, buffer_size, minimum_characters, &valid_symbols, total_lines, loc, comment_data);
+    // Files not terminating with newline
+    if (buffer[buffer_size-1] != '\n'){
+        (*total_lines)++;
+        (*loc) += (valid_symbols >= minimum_characters);
+    }
+}
+
+#ifdef _WIN32
+
+vm_map_status
+_count_file_vm_map(const char *filename, struct CommentData *comment_data,
+    Py_ssize_t minimum_characters, unsigned long long *total_lines, unsigned long long *loc){
+
+    const HANDLE file_handle = CreateFile(filename, GENERIC_READ, FILE_SHARE_READ, NULL,
+        OPEN_EXISTING, FILE_ATTRIBUTE_READONLY, NULL);
+
+    if (file_handle == INVALID_HANDLE_VALUE){
+        return GetLastError();
+    }
+
+    LARGE_INTEGER filesize;
+    GetFileSizeEx(file_handle, &filesize);
+
+    if (filesize.QuadPart == 0){
+        CloseHandle(file_handle);
+        return 0;
+    } 
+    
+    const HANDLE mapping_handle = CreateFileMapping(file_handle, NULL, PAGE_READONLY, 0, 0, NULL);
+    if (!mapping_handle){
+        DWORD error = GetLastError();
+        CloseHandle(file_handle);
+        return error;
+    }
+
+    void *mapped_region = MapViewOfFile(mapping_handle, FILE_MAP_READ, 0, 0, 0);
+    if (!mapped_region){
+        DWORD error = GetLastError();
+        CloseHandle(file_handle);
+        CloseHandle(mapping_handle);
+        return error;
+    }
+
+    const unsigned char *view = (unsigned char *) mapped_region;
+    if (!sniff_buffer(view, filesize.QuadPart)){
+        Py_ssize_t valid_symbols = 0;
+        _parse_buffer(view, filesize.QuadPart, minimum_characters, &valid_symbols, total_lines, loc, comment_data);
+
+        // Files not terminating with newline
+        if (view[filesize.QuadPart-1] != '\n'){
+            (*total_lines)++;
+            (*loc) += (valid_symbols >= minimum_characters);
+        }
+    }
+
+    UnmapViewOfFile(mapped_region);
+    CloseHandle(mapping_handle);
+    CloseHandle(file_handle);
+    return 0;
+}
+
+void
+_set_vm_map_error(vm_map_status error, const char *filename){
+    PyErr_SetFromWindowsErrWithFilename(error, filename);
+}
+
+int
+_count_file_auto(const char *filename, struct CommentData *comment_data,
+    Py_ssize_t minimum_characters, unsigned long long *total_lines, unsigned long long *loc){
+
+    struct _stat64 st;
+    if (_stat64(filename, &st) == -1){
+        return errno;
+    }
+    if (st.st_size >= auto_buffered_threshold){
+        return _count_file(filename, comment_data, minimum_characters, total_lines, loc);
+    }
+    return _count_file_no_chunk(filename, comment_data, minimum_characters, total_lines, loc);
+}
+
+#else
+
+#include <sys/mman.h>
+
+/* Count files large enough to be split in parallel ranges, setting *counted if so */
+static int
+_count_if_split(FILE *file, struct CommentData *comment_data,
+    Py_ssize_t minimum_characters, unsigned long long *total_lines, unsigned long long *loc, bool *counted){
+
+    *counted = false;
+    if (!splitting_enabled()){
+        return 0;
+    }
+    struct stat st;
+    if (fstat(fileno(file), &st) == -1){
+        return errno;
+    }
+    if (!should_split(st.st_size)){
+        return 0;
+    }
+    *counted = true;
+    return _count_stream_split(file, st.st_size, comment_data, minimum_characters, total_lines, loc);
+}
+
+// Stream readers proper, shared by the counting routines once a file has passed sniffing
+static int
+_read_stream(FILE *file, struct CommentData *comment_data,
+    Py_ssize_t minimum_characters, unsigned long long *total_lines, unsigned long long *loc);
+
+static int
+_read_stream_no_chunk(FILE *file, struct CommentData *comment_data,
+    Py_ssize_t minimum_characters, unsigned long long *total_lines, unsigned long long *loc);
+
+static int
+_read_stream_vm_map(FILE *file, struct CommentData *comment_data,
+    Py_ssize_t minimum_characters, unsigned long long *total_lines, unsigned long long *loc){
+
+    struct stat st;
+    if (fstat(fileno(file), &st) == -1){
+        return errno;
+    }
+
+    if (st.st_size == 0){
+        return 0;
+    }
+    void *mapped_region = mmap(NULL, st.st_size, PROT_READ, MAP_PRIVATE, fileno(file), 0);
+    if (mapped_region == MAP_FAILED){
+        return errno;
+    }
+
+    const unsigned char *view = (unsigned char *) mapped_region;
+    Py_ssize_t valid_symbols = 0;
+
+    _parse_buffer(view, st.st_size, minimum_characters, &valid_symbols, total_lines, loc, comment_data);
+
+    // Files not terminating with newline
+    if (view[st.st_size-1] != '\n'){
+        (*total_lines)++;
+        (*loc) += (valid_symbols >= minimum_characters);
+    }
+
+    munmap(mapped_region, st.st_size);
+    return 0;
+}
+
+int
+_count_stream_vm_map(FILE *file, struct CommentData *comment_data,
+    Py_ssize_t minimum_characters, unsigned long long *total_lines, unsigned long long *loc){
+    if (sniff_stream(file)){
+        return 0;
+    }
+    bool counted;
+    const int error = _count_if_split(file, comment_data, minimum_characters, total_lines, loc, &counted);
+    if (error || counted){
+        return error;
+    }
+    return _read_stream_vm_map(file, comment_data, minimum_characters, total_lines, loc);
+}
+
+vm_map_status
+_count_file_vm_map(const char *filename, struct CommentData *comment_data,
+    Py_ssize_t minimum_characters, unsigned long long *total_lines, unsigned long long *loc){
+
+    FILE *file = fopen(filename, "rb");
+    if (!file){
+        return errno;
+    }
+    int error = _count_stream_vm_map(file, comment_data, minimum_characters, total_lines, loc);
+    fclose(file);
+    return error;
+}
+
+int
+_count_stream_auto(FILE *file, struct CommentData *comment_data,
+    Py_ssize_t minimum_characters, unsigned long long *total_lines, unsigned long long *loc){
+
+    struct stat st;
+    if (fstat(fileno(file), &st) == -1){
+        return errno;
+    }
+    if (sniff_stream(file)){
+        return 0;
+    }
+    if (should_split(st.st_size)){
+        return _count_stream_split(file, st.st_size, comment_data, minimum_characters, total_lines, loc);
+    }
+    if (st.st_size >= auto_buffered_threshold){
+        return _read_stream(file, comment_data, minimum_characters, total_lines, loc);
+    }
+    if (st.st_size >= auto_mmap_threshold){
+        return _read_stream_vm_map(file, comment_data, minimum_characters, total_lines, loc);
+    }
+    return _read_stream_no_chunk(file, comment_data, minimum_characters, total_lines, loc);
+}
+
+int
+_count_file_auto(const char *filename, struct CommentData *comment_data,
+    Py_ssize_t minimum_characters, unsigned long long *total_lines, unsigned long long *loc){
+
+    FILE *file = fopen(filename, "rb");
+    if (!file){
+        return errno;
+    }
+    int error = _count_stream_auto(file, comment_data, minimum_characters, total_lines, loc);
+    fclose(file);
+    return error;
+}
+
+void
+_set_vm_map_error(vm_map_status error, const char *filename){
+    errno = error;
+    PyErr_SetFromErrnoWithFilename(PyExc_OSError, filename);
+}
+
+#endif
+
+static int
+_read_stream(FILE *file, struct CommentData *comment_data,
+    Py_ssize_t minimum_characters, unsigned long long *total_lines, unsigned long long *loc){
+
+    const size_t buffer_size = 4 * 1024 * 1024;
+    unsigned char *buffer = malloc(buffer_size);
+    if (!buffer){
+        return ENOMEM;
+    }
+
+    Py_ssize_t valid_symbols = 0;
+    // Empty files have no last line to account for
+    unsigned char last_byte = '\n';
+    size_t chunk_size;
+
+    while ((chunk_size = fread(buffer, 1, buffer_size, file)) > 0){
+        last_byte = buffer[chunk_size-1];
+        _parse_buffer(buffer, chunk_size, minimum_characters, &valid_symbols, total_lines, loc, comment_data);
+    }
+    // Files not terminating with newline
+    if (last_byte != '\n'){
+        (*total_lines)++;
+        (*loc) += (valid_symbols >= minimum_characters);
+    }
+    
+    free(buffer);
+    return 0;
+}
+
+int
+_count_stream(FILE *file, struct CommentData *comment_data,
+    Py_ssize_t minimum_characters, unsigned long long *total_lines, unsigned long long *loc){
+    if (sniff_stream(file)){
+        return 0;
+    }
+#ifndef _WIN32
+    bool counted;
+    const int error = _count_if_split(file, comment_data, minimum_characters, total_lines, loc, &counted);
+    if (error || counted){
+        return error;
+    }
+#endif
+    return _read_stream(file, comment_data, minimum_characters, total_lines, loc);
+}
+
+int
+_count_file(const char *filename, struct CommentData *comment_data,
+    Py_ssize_t minimum_characters, unsigned long long *total_lines, unsigned long long *loc){
+
+    FILE *file = fopen(filename, "rb");
+    if (!file){
+        return errno;
+    }
+    int error = _count_stream(file, comment_data, minimum_characters, total_lines, loc);
+    fclose(file);
+    return error;
+}
+
+static int
+_read_stream_no_chunk(FILE *file, struct CommentData *comment_data,
+    Py_ssize_t minimum_characters, unsigned long long *total_lines, unsigned long long *loc){
+
+    struct stat st;
+    if (fstat(fileno(file), &st) == -1){
+        return errno;
+    }
+
+    if (st.st_size == 0){
+        return 0;
+    }
+
+    unsigned char *buffer = malloc(st.st_size);
+    if (!buffer){
+        return ENOMEM;
+    }
+    fread(buffer, 1, st.st_size, file);
+    
+    Py_ssize_t valid_symbols = 0;
+    _parse_buffer(buffer, st.st_size, minimum_characters, &valid_symbols, total_lines, loc, comment_data);
+    // Files not terminating with newline
+    if (buffer[st.st_size-1] != '\n'){
+        (*total_lines)++;
+        (*loc) += (valid_symbols >= minimum_characters);
+    }
+
+    free(buffer);
+    return 0;
+}
+
+int
+_count_stream_no_chunk(FILE *file, struct CommentData *comment_data,
+    Py_ssize_t minimum_characters, unsigned long long *total_lines, unsigned long long *loc){
+    if (sniff_stream(file)){
+        return 0;
+    }
+#ifndef _WIN32
+    bool counted;
+    const int error = _count_if_split(file, comment_data, minimum_characters, total_lines, loc, &counted);
+    if (error || counted){
+        return error;
+    }
+#endif
+    return _read_stream_no_chunk(file, comment_data, minimum_characters, total_lines, loc);
+}
+
+int
+_count_file_no_chunk(const char *filename, struct CommentData *comment_data,
+    Py_ssize_t minimum_characters, unsigned long long *total_lines, unsigned long long *loc){
+
+    FILE *file = fopen(filename, "rb");
+    if (!file){
+        return errno;
+    }
+    int error = _count_stream_no_chunk(file, comment_data, minimum_characters, total_lines, loc);
+    fclose(file);
+    return error;
+}
+
+void
+_set_file_error(int error, const char *filename){
+    if (error == ENOMEM){
+        PyErr_Format(PyExc_MemoryError, "Failed to allocate buffer for file %s", filename);
+        return;
+    }
+    errno = error;
+    PyErr_SetFromErrnoWithFilename(PyExc_OSError, filename);
+}
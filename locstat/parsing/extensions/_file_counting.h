@@ -0,0 +1,81 @@
+#ifndef _FILE_COUNTING_H
+#define _FILE_COUNTING_H
+#include "_locstat.h"
+#include <stdbool.h>
+#include <stdio.h>
+
+#ifdef _WIN32
+#include <windows.h>
+typedef DWORD vm_map_status;
+#else
+typedef int vm_map_status;
+#endif
+
+struct CommentData;
+
+enum CountingMode {COUNT_BUFFERED, COUNT_COMPLETE, COUNT_VM_MAP, COUNT_AUTO};
+
+/* Map a ParseMode value to its counting mode, setting ValueError if unrecognised */
+extern bool
+_parse_counting_mode(const char *parse_mode, enum CountingMode *mode);
+
+/* Size thresholds of COUNT_AUTO. Files smaller than the mmap threshold are read whole,
+ * files of at least the buffered threshold are read in chunks, and files in between are mapped.
+ * Memory mapping is not used on Windows, where files below the buffered threshold are read whole */
+extern void
+set_auto_thresholds(Py_ssize_t mmap_threshold, Py_ssize_t buffered_threshold);
+
+/*
+ * File counting routines do not touch any Python objects, and are hence
+ * called with the GIL released. Each returns 0 on success, or an error code to
+ * be reported by the caller through the _set_*_error functions once the GIL is reacquired.
+ * Stream variants count an already opened file, and leave closing it to the caller.
+ * Files rejected by sniffing (see _file_sniffing.h) are left uncounted, with 0 returned.
+ */
+
+extern vm_map_status
+_count_file_vm_map(const char *filename, struct CommentData *comment_data,
+    Py_ssize_t minimum_characters, unsigned long long *total_lines, unsigned long long *loc);
+
+extern int
+_count_file(const char *filename, struct CommentData *comment_data,
+    Py_ssize_t minimum_characters, unsigned long long *total_lines, unsigned long long *loc);
+
+extern int
+_count_file_no_chunk(const char *filename, struct CommentData *comment_data,
+    Py_ssize_t minimum_characters, unsigned long long *total_lines, unsigned long long *loc);
+
+extern int
+_count_file_auto(const char *filename, struct CommentData *comment_data,
+    Py_ssize_t minimum_characters, unsigned long long *total_lines, unsigned long long *loc);
+
+#ifndef _WIN32
+extern int
+_count_stream_vm_map(FILE *file, struct CommentData *comment_data,
+    Py_ssize_t minimum_characters, unsigned long long *total_lines, unsigned long long *loc);
+
+extern int
+_count_stream_auto(FILE *file, struct CommentData *comment_data,
+    Py_ssize_t minimum_characters, unsigned long long *total_lines, unsigned long long *loc);
+#endif
+
+extern int
+_count_stream(FILE *file, struct CommentData *comment_data,
+    Py_ssize_t minimum_characters, unsigned long long *total_lines, unsigned long long *loc);
+
+extern int
+_count_stream_no_chunk(FILE *file, struct CommentData *comment_data,
+    Py_ssize_t minimum_characters, unsigned long long *total_lines, unsigned long long *loc);
+
+/* Count an in-memory buffer holding a file's entire contents */
+extern void
+_count_buffer(const unsigned char *buffer, size_t buffer_size, struct CommentData *comment_data,
+    Py_ssize_t minimum_characters, unsigned long long *total_lines, unsigned long long *loc);
+
+extern void
+_set_vm_map_error(vm_map_status error, const char *filename);
+
+extern void
+_set_file_error(int error, const char *filename);
+
+#endif
@@ -0,0 +1,148 @@
+#include <stdbool.h>
+#include <string.h>
+#include "_file_sniffing.h"
+
+#ifdef _WIN32
+#include <windows.h>
+#define _atomic_add(counter, value) InterlockedExchangeAdd64((volatile LONG64 *) (counter), (LONG64) (value))
+#define _atomic_load(counter) ((unsigned long long) InterlockedCompareExchange64((volatile LONG64 *) (counter), 0, 0))
+#define _atomic_exchange(counter) ((unsigned long long) InterlockedExchange64((volatile LONG64 *) (counter), 0))
+#else
+#include <unistd.h>
+#define _atomic_add(counter, value) __atomic_fetch_add((counter), (value), __ATOMIC_RELAXED)
+#define _atomic_load(counter) __atomic_load_n((counter), __ATOMIC_RELAXED)
+#define _atomic_exchange(counter) __atomic_exchange_n((counter), 0, __ATOMIC_RELAXED)
+#endif
+
+// Disabled unless requested, so that counts stay exact by default
+static size_t sniff_block_size = 0;
+static size_t sniff_max_line_length = 1000;
+
+// Files are parsed by several threads at once when scanning with --threads
+static unsigned long long skip_counts[SKIP_REASONS];
+
+/* Conventional markers of generated code, lowercase and matched regardless of case. Covers Go's
+ * "Code generated ... DO NOT EDIT.", protoc's "DO NOT EDIT!", Meta's "@generated" and .NET's "<auto-generated>" */
+static const char *const generated_markers[] = {
+    "@generated",
+    "do not edit",
+    "auto-generated",
+    "autogenerated",
+    "automatically generated",
+};
+#define GENERATED_MARKER_COUNT (sizeof(generated_markers) / sizeof(generated_markers[0]))
+
+void
+set_sniff_options(Py_ssize_t block_size, Py_ssize_t max_line_length){
+    sniff_block_size = block_size > SNIFF_MAX_BLOCK_SIZE ? SNIFF_MAX_BLOCK_SIZE : (size_t) block_size;
+    sniff_max_line_length = (size_t) max_line_length;
+}
+
+void
+sniff_options(Py_ssize_t *block_size, Py_ssize_t *max_line_length){
+    *block_size = (Py_ssize_t) sniff_block_size;
+    *max_line_length = (Py_ssize_t) sniff_max_line_length;
+}
+
+static inline unsigned char
+_lower(unsigned char byte){
+    return (byte >= 'A' && byte <= 'Z') ? byte | 0x20 : byte;
+}
+
+static bool
+_contains_marker(const unsigned char *buffer, size_t buffer_size, const char *marker){
+    const size_t marker_length = strlen(marker);
+    if (marker_length > buffer_size){
+        return false;
+    }
+    const unsigned char first = (unsigned char) marker[0];
+    for (size_t i = 0; i <= buffer_size - marker_length; i++){
+        if (_lower(buffer[i]) != first){
+            continue;
+        }
+        size_t j = 1;
+        while (j < marker_length && _lower(buffer[i+j]) == (unsigned char) marker[j]){
+            j++;
+        }
+        if (j == marker_length){
+            return true;
+        }
+    }
+    return false;
+}
+
+static bool
+_has_long_line(const unsigned char *buffer, size_t buffer_size){
+    const unsigned char *line = buffer, *end = buffer + buffer_size;
+    while (line < end){
+        const unsigned char *newline = memchr(line, '\n', end - line);
+        // A line running past the end of the block is at least as long as its part within it
+        const unsigned char *line_end = newline ? newline : end;
+        if ((size_t) (line_end - line) > sniff_max_line_length){
+            return true;
+        }
+        line = line_end + 1;
+    }
+    return false;
+}
+
+static bool
+_skip(enum SkipReason reason){
+    _atomic_add(&skip_counts[reason], 1);
+    return true;
+}
+
+bool
+sniff_buffer(const unsigned char *buffer, size_t buffer_size){
+    if (!sniff_block_size){
+        return false;
+    }
+    if (buffer_size > sniff_block_size){
+        buffer_size = sniff_block_size;
+    }
+    if (memchr(buffer, '\0', buffer_size)){
+        return _skip(SKIP_BINARY);
+    }
+    if (_has_long_line(buffer, buffer_size)){
+        return _skip(SKIP_LONG_LINE);
+    }
+    for (size_t i = 0; i < GENERATED_MARKER_COUNT; i++){
+        if (_contains_marker(buffer, buffer_size, generated_markers[i])){
+            return _skip(SKIP_GENERATED);
+        }
+    }
+    return false;
+}
+
+bool
+sniff_stream(FILE *file){
+    if (!sniff_block_size){
+        return false;
+    }
+    unsigned char block[SNIFF_MAX_BLOCK_SIZE];
+#ifdef _WIN32
+    const size_t block_size = fread(block, 1, sniff_block_size, file);
+    rewind(file);
+#else
+    // Positioned reads leave the stream untouched, sparing a seek and the refill of its buffer
+    const ssize_t block_size = pread(fileno(file), block, sniff_block_size, 0);
+    if (block_size <= 0){
+        return false;
+    }
+#endif
+    return sniff_buffer(block, (size_t) block_size);
+}
+
+void
+skipped_files(unsigned long long counts[SKIP_REASONS], bool reset){
+    for (int reason = 0; reason < SKIP_REASONS; reason++){
+        counts[reason] = reset ? _atomic_exchange(&skip_counts[reason]) : _atomic_load(&skip_counts[reason]);
+    }
+}
+
+void
+add_skipped_files(const unsigned long long counts[SKIP_REASONS]){
+    for (int reason = 0; reason < SKIP_REASONS; reason++){
+        _atomic_add(&skip_counts[reason], counts[reason]);
+    }
+}
@@ -0,0 +1,39 @@
+#ifndef _FILE_SNIFFING_H
+#define _FILE_SNIFFING_H
+#include "_locstat.h"
+#include <stdbool.h>
+#include <stdio.h>
+
+/* Reasons for which a file is skipped without being counted */
+enum SkipReason {SKIP_BINARY, SKIP_LONG_LINE, SKIP_GENERATED, SKIP_REASONS};
+
+/* Upper bound on the number of leading bytes inspected, keeping the sniffed block on the stack */
+#define SNIFF_MAX_BLOCK_SIZE (64 * 1024)
+
+/* Inspect the first block_size bytes of each file (0 disables sniffing, the default).
+ * Files whose first block holds a NUL byte, a line longer than max_line_length bytes
+ * or a generated code marker are skipped, counting as 0 lines */
+extern void
+set_sniff_options(Py_ssize_t block_size, Py_ssize_t max_line_length);
+
+extern void
+sniff_options(Py_ssize_t *block_size, Py_ssize_t *max_line_length);
+
+/* Whether a file, of which the given buffer holds at least the start, should be skipped.
+ * Skipped files are tallied under their reason */
+extern bool
+sniff_buffer(const unsigned char *buffer, size_t buffer_size);
+
+/* Counterpart of sniff_buffer reading the first block of an unread stream,
+ * leaving the stream at its start. Streams that cannot be read are left to the counting routines */
+extern bool
+sniff_stream(FILE *file);
+
+/* Files skipped per reason since the last reset, safe to call from any thread */
+extern void
+skipped_files(unsigned long long counts[SKIP_REASONS], bool reset);
+
+extern void
+add_skipped_files(const unsigned long long counts[SKIP_REASONS]);
+
+#endif
@@ -1,307 +1,390 @@
 #include <stdbool.h>
-#include "_parsing_prinitives.h"
+#include <errno.h>
+#include "_file_counting.h"
+#include "_file_sniffing.h"
+#include "_split_counting.h"
+#include "_directory_walker.h"
+#include "_stream_parser.h"
 #include "_comment_data.h"
+#include "_parsing_prinitives.h"
 
-#define uchar_sentinel '0'
+static bool
+_parse_arguments(PyObject *args, const char **filename,
+    struct CommentData *comment_data, Py_ssize_t *minimum_characters){
 
-#ifdef _WIN32
+    PyObject *singleline_symbols, *multiline_start_symbols, *multiline_end_symbols;
+    if (!PyArg_ParseTuple(args,
+        "sOOOn",
+        filename,
+        &singleline_symbols,
+        &multiline_start_symbols,
+        &multiline_end_symbols,
+        minimum_characters)){
+            return false;
+    }
+
+    PyObject *metadata = PyTuple_Pack(3, singleline_symbols, multiline_start_symbols, multiline_end_symbols);
+    if (!metadata){
+        return false;
+    }
+    const bool success = extract_comment_data(metadata, comment_data);
+    Py_DECREF(metadata);
+    return success;
+}
 
-#include <windows.h>
 static PyObject *
 _parse_file_vm_map(PyObject *self, PyObject *args){
-    const char *filename,
-    *singleline_character,
-    *multiline_start_character, *multiline_end_character;
-    
-    Py_ssize_t singleline_length,
-    multiline_start_length,
-    multiline_end_length,
-    minimum_characters;
-
-    if (!PyArg_ParseTuple(args,
-        "sz#z#z#n",
-        &filename,
-        &singleline_character, &singleline_length,
-        &multiline_start_character, &multiline_start_length,
-        &multiline_end_character, &multiline_end_length,
-        &minimum_characters)){
-            return NULL;
+    const char *filename;
+    Py_ssize_t minimum_characters;
+    struct CommentData comment_data;
+    if (!_parse_arguments(args, &filename, &comment_data, &minimum_characters)){
+        return NULL;
     }
 
-    const HANDLE file_handle = CreateFile(filename, GENERIC_READ, FILE_SHARE_READ, NULL,
-        OPEN_EXISTING, FILE_ATTRIBUTE_READONLY, NULL);
+    unsigned long long total_lines = 0, loc = 0;
+    vm_map_status error;
+    Py_BEGIN_ALLOW_THREADS
+    error = _count_file_vm_map(filename, &comment_data, minimum_characters, &total_lines, &loc);
+    Py_END_ALLOW_THREADS
 
-    if (file_handle == INVALID_HANDLE_VALUE){
-        PyErr_SetFromWindowsErrWithFilename(0, filename);
+    if (error){
+        _set_vm_map_error(error, filename);
         return NULL;
     }
+    return Py_BuildValue("KK", total_lines, loc);
+}
 
-    LARGE_INTEGER filesize;
-    GetFileSizeEx(file_handle, &filesize);
-
-    if (filesize.QuadPart == 0){
-        CloseHandle(file_handle);
-        return Py_BuildValue("ii", 0, 0);
-    } 
-    
-    const HANDLE mapping_handle = CreateFileMapping(file_handle, NULL, PAGE_READONLY, 0, 0, NULL);
-    if (!mapping_handle){
-        CloseHandle(file_handle);
-        PyErr_SetFromWindowsErrWithFilename(0, filename);
+static PyObject *
+_parse_file(PyObject *self, PyObject *args){
+    const char *filename;
+    Py_ssize_t minimum_characters;
+    struct CommentData comment_data;
+    if (!_parse_arguments(args, &filename, &comment_data, &minimum_characters)){
         return NULL;
     }
 
-    void *mapped_region = MapViewOfFile(mapping_handle, FILE_MAP_READ, 0, 0, 0);
-    if (!mapped_region){
-        CloseHandle(file_handle);
-        CloseHandle(mapping_handle);
-        PyErr_SetFromWindowsErrWithFilename(0, filename);
+    unsigned long long total_lines = 0, loc = 0;
+    int error;
+    Py_BEGIN_ALLOW_THREADS
+    error = _count_file(filename, &comment_data, minimum_characters, &total_lines, &loc);
+    Py_END_ALLOW_THREADS
+
+    if (error){
+        _set_file_error(error, filename);
         return NULL;
     }
+    return Py_BuildValue("KK", total_lines, loc);
+}
 
-    const unsigned char *view = (unsigned char *) mapped_region;
-    int total_lines = 0, loc = 0, valid_symbols = 0;
-    
+static PyObject *
+_parse_file_no_chunk(PyObject *self, PyObject *args){
+    const char *filename;
+    Py_ssize_t minimum_characters;
     struct CommentData comment_data;
-    initialize_comment_data(
-        &comment_data,
-        singleline_character,
-        multiline_start_character,
-        multiline_end_character,
-        singleline_length,
-        multiline_start_length,
-        multiline_end_length
-    );
-
-    _parse_buffer(view, filesize.QuadPart, minimum_characters, &valid_symbols, &total_lines, &loc, &comment_data);
-
-    // Files not terminating with newline
-    if (view[filesize.QuadPart-1] != '\n'){
-        total_lines++;
-        loc += (valid_symbols >= minimum_characters);
-    }
-
-    UnmapViewOfFile(mapped_region);
-    CloseHandle(mapping_handle);
-    CloseHandle(file_handle);
-    return Py_BuildValue("ii", total_lines, loc);
-}
+    if (!_parse_arguments(args, &filename, &comment_data, &minimum_characters)){
+        return NULL;
+    }
 
-#else
+    unsigned long long total_lines = 0, loc = 0;
+    int error;
+    Py_BEGIN_ALLOW_THREADS
+    error = _count_file_no_chunk(filename, &comment_data, minimum_characters, &total_lines, &loc);
+    Py_END_ALLOW_THREADS
 
-#include <sys/mman.h>
-static PyObject *
-_parse_file_vm_map(PyObject *self, PyObject *args){
-    const char *filename,
-    *singleline_character,
-    *multiline_start_character, *multiline_end_character;
-    
-    Py_ssize_t singleline_length,
-    multiline_start_length,
-    multiline_end_length,
-    minimum_characters;
+    if (error){
+        _set_file_error(error, filename);
+        return NULL;
+    }
+    return Py_BuildValue("KK", total_lines, loc);
+}
 
-    if (!PyArg_ParseTuple(args,
-        "sz#z#z#n",
-        &filename,
-        &singleline_character, &singleline_length,
-        &multiline_start_character, &multiline_start_length,
-        &multiline_end_character, &multiline_end_length,
-        &minimum_characters)){
-            return NULL;
+static PyObject *
+_parse_file_auto(PyObject *self, PyObject *args){
+    const char *filename;
+    Py_ssize_t minimum_characters;
+    struct CommentData comment_data;
+    if (!_parse_arguments(args, &filename, &comment_data, &minimum_characters)){
+        return NULL;
     }
 
-    FILE *file = fopen(filename, "rb");
-    if (!file){
-        PyErr_SetFromErrnoWithFilename(PyExc_OSError, filename);
+    unsigned long long total_lines = 0, loc = 0;
+    int error;
+    Py_BEGIN_ALLOW_THREADS
+    error = _count_file_auto(filename, &comment_data, minimum_characters, &total_lines, &loc);
+    Py_END_ALLOW_THREADS
+
+    if (error){
+        _set_file_error(error, filename);
         return NULL;
     }
+    return Py_BuildValue("KK", total_lines, loc);
+}
 
-    struct stat st;
-    if (fstat(fileno(file), &st) == -1){
-        fclose(file);
-        PyErr_SetFromErrnoWithFilename(PyExc_OSError, filename);
+static PyObject *
+_set_auto_thresholds(PyObject *self, PyObject *args){
+    Py_ssize_t mmap_threshold, buffered_threshold;
+    if (!PyArg_ParseTuple(args, "nn", &mmap_threshold, &buffered_threshold)){
+        return NULL;
+    }
+    if (mmap_threshold < 0 || buffered_threshold < 0){
+        PyErr_SetString(PyExc_ValueError, "Thresholds cannot be negative");
         return NULL;
     }
+    set_auto_thresholds(mmap_threshold, buffered_threshold);
+    Py_RETURN_NONE;
+}
 
-    if (st.st_size == 0){
-        fclose(file);
-        return Py_BuildValue("ii", 0, 0);
+static PyObject *
+_set_split_options(PyObject *self, PyObject *args){
+    Py_ssize_t threshold, threads;
+    if (!PyArg_ParseTuple(args, "nn", &threshold, &threads)){
+        return NULL;
     }
-    void *mapped_region = mmap(NULL, st.st_size, PROT_READ, MAP_PRIVATE, fileno(file), 0);
-    if (mapped_region == MAP_FAILED){
-        fclose(file);
-        PyErr_SetFromErrnoWithFilename(PyExc_OSError, filename);
+    if (threshold < 0 || threads < 1){
+        PyErr_SetString(PyExc_ValueError, "Split threshold cannot be negative, and at least 1 thread is needed");
         return NULL;
     }
+    set_split_options(threshold, threads);
+    Py_RETURN_NONE;
+}
 
-    const unsigned char *view = (unsigned char *) mapped_region;
-    int total_lines = 0, loc = 0, valid_symbols = 0;
-    
-    struct CommentData comment_data;
-    initialize_comment_data(
-        &comment_data,
-        singleline_character,
-        multiline_start_character,
-        multiline_end_character,
-        singleline_length,
-        multiline_start_length,
-        multiline_end_length
-    );
-
-    _parse_buffer(view, st.st_size, minimum_characters, &valid_symbols, &total_lines, &loc, &comment_data);
-
-    // Files not terminating with newline
-    if (view[st.st_size-1] != '\n'){
-        total_lines++;
-        loc += (valid_symbols >= minimum_characters);
-    }
-
-    fclose(file);
-    munmap(mapped_region, st.st_size);
-    return Py_BuildValue("ii", total_lines, loc);
+static PyObject *
+_get_split_options(PyObject *self, PyObject *Py_UNUSED(args)){
+    Py_ssize_t threshold, threads;
+    split_options(&threshold, &threads);
+    return Py_BuildValue("nn", threshold, threads);
+}
+
+static PyObject *
+_set_sniff_options(PyObject *self, PyObject *args){
+    Py_ssize_t block_size, max_line_length;
+    if (!PyArg_ParseTuple(args, "nn", &block_size, &max_line_length)){
+        return NULL;
+    }
+    if (block_size < 0 || max_line_length < 0){
+        PyErr_SetString(PyExc_ValueError, "Sniffing options cannot be negative");
+        return NULL;
+    }
+    set_sniff_options(block_size, max_line_length);
+    Py_RETURN_NONE;
 }
 
+static PyObject *
+_get_sniff_options(PyObject *self, PyObject *Py_UNUSED(args)){
+    Py_ssize_t block_size, max_line_length;
+    sniff_options(&block_size, &max_line_length);
+    return Py_BuildValue("nn", block_size, max_line_length);
+}
 
-#endif
+static PyObject *
+_skipped_files(PyObject *self, PyObject *args){
+    int reset = 0;
+    if (!PyArg_ParseTuple(args, "|p", &reset)){
+        return NULL;
+    }
+    unsigned long long counts[SKIP_REASONS];
+    skipped_files(counts, reset);
+    return Py_BuildValue("KKK", counts[SKIP_BINARY], counts[SKIP_LONG_LINE], counts[SKIP_GENERATED]);
+}
 
 static PyObject *
-_parse_file(PyObject *self, PyObject *args){
-    const char *filename,
-    *singleline_character,
-    *multiline_start_character, *multiline_end_character;
-    
-    Py_ssize_t singleline_length,
-    multiline_start_length,
-    multiline_end_length,
-    minimum_characters;
+_add_skipped_files(PyObject *self, PyObject *args){
+    unsigned long long counts[SKIP_REASONS];
+    if (!PyArg_ParseTuple(args, "KKK", &counts[SKIP_BINARY], &counts[SKIP_LONG_LINE], &counts[SKIP_GENERATED])){
+        return NULL;
+    }
+    add_skipped_files(counts);
+    Py_RETURN_NONE;
+}
 
+static PyObject *
+_parse_bytes(PyObject *self, PyObject *args){
+    Py_buffer buffer;
+    PyObject *singleline_symbols, *multiline_start_symbols, *multiline_end_symbols;
+    Py_ssize_t minimum_characters;
     if (!PyArg_ParseTuple(args,
-        "sz#z#z#n",
-        &filename,
-        &singleline_character, &singleline_length,
-        &multiline_start_character, &multiline_start_length,
-        &multiline_end_character, &multiline_end_length,
+        "y*OOOn",
+        &buffer,
+        &singleline_symbols,
+        &multiline_start_symbols,
+        &multiline_end_symbols,
         &minimum_characters)){
             return NULL;
     }
 
-    FILE *file = fopen(filename, "rb");
-    if (!file){
-        PyErr_SetFromErrnoWithFilename(PyExc_OSError, filename);
+    struct CommentData comment_data;
+    PyObject *metadata = PyTuple_Pack(3, singleline_symbols, multiline_start_symbols, multiline_end_symbols);
+    if (!metadata || !extract_comment_data(metadata, &comment_data)){
+        Py_XDECREF(metadata);
+        PyBuffer_Release(&buffer);
         return NULL;
     }
+    Py_DECREF(metadata);
 
-    int total_lines = 0, loc = 0, valid_symbols = 0;
-    const size_t buffer_size = 4 * 1024 * 1024;
-    unsigned char *buffer = malloc(buffer_size);
-    unsigned char last_byte = uchar_sentinel;
-    size_t chunk_size;
+    // The exported buffer cannot be resized or freed while held, so the GIL can be released
+    unsigned long long total_lines = 0, loc = 0;
+    Py_BEGIN_ALLOW_THREADS
+    _count_buffer(buffer.buf, buffer.len, &comment_data, minimum_characters, &total_lines, &loc);
+    Py_END_ALLOW_THREADS
+
+    PyBuffer_Release(&buffer);
+    return Py_BuildValue("KK", total_lines, loc);
+}
 
+struct BatchTask {
+    const char *filename;
     struct CommentData comment_data;
-    initialize_comment_data(
-        &comment_data,
-        singleline_character,
-        multiline_start_character,
-        multiline_end_character,
-        singleline_length,
-        multiline_start_length,
-        multiline_end_length
-    );
-
-    while ((chunk_size = fread(buffer, 1, buffer_size, file)) > 0){
-        last_byte = buffer[chunk_size-1];
-        _parse_buffer(buffer, chunk_size, minimum_characters, &valid_symbols, &total_lines, &loc, &comment_data);
-    }
-    // Files not terminating with newline
-    if (last_byte != '\n' 
-        && last_byte != uchar_sentinel){
-        total_lines++;
-        loc += (valid_symbols >= minimum_characters);
-    }
-    
-    free(buffer);
-    fclose(file);
-    return Py_BuildValue("ii", total_lines, loc);
+};
+
+static bool
+_extract_batch_task(PyObject *item, struct BatchTask *task, PyObject **last_metadata){
+    if (!PyTuple_Check(item) || PyTuple_Size(item) != 2){
+        PyErr_SetString(PyExc_TypeError, "Expected (filename, (singleline, multiline_start, multiline_end)) pairs");
+        return false;
+    }
+
+    PyObject *filename = PyTuple_GetItem(item, 0);
+    if (!PyUnicode_Check(filename)){
+        PyErr_SetString(PyExc_TypeError, "Filename must be a string");
+        return false;
+    }
+    task->filename = PyUnicode_AsUTF8AndSize(filename, NULL);
+    if (!task->filename){
+        return false;
+    }
+
+    // Files of the same language share their metadata tuple, reuse the previous task's symbols if so
+    PyObject *metadata = PyTuple_GetItem(item, 1);
+    if (metadata == *last_metadata){
+        task->comment_data = (task-1)->comment_data;
+        return true;
+    }
+    if (!extract_comment_data(metadata, &task->comment_data)){
+        return false;
+    }
+    *last_metadata = metadata;
+    return true;
 }
 
 static PyObject *
-_parse_file_no_chunk(PyObject *self, PyObject *args){
-    const char *filename,
-    *singleline_character,
-    *multiline_start_character, *multiline_end_character;
-    
-    Py_ssize_t singleline_length,
-    multiline_start_length,
-    multiline_end_length,
-    minimum_characters;
+_parse_files(PyObject *self, PyObject *args){
+    PyObject *files;
+    Py_ssize_t minimum_characters;
+    const char *parse_mode = "BUF";
 
-    if (!PyArg_ParseTuple(args,
-        "sz#z#z#n",
-        &filename,
-        &singleline_character, &singleline_length,
-        &multiline_start_character, &multiline_start_length,
-        &multiline_end_character, &multiline_end_length,
-        &minimum_characters)){
-            return NULL;
+    if (!PyArg_ParseTuple(args, "On|s", &files, &minimum_characters, &parse_mode)){
+        return NULL;
     }
 
-    FILE *file = fopen(filename, "rb");
-    if (!file){
-        PyErr_SetFromErrnoWithFilename(PyExc_OSError, filename);
+    enum CountingMode mode;
+    if (!_parse_counting_mode(parse_mode, &mode)){
         return NULL;
     }
 
-    struct stat st;
-    if (fstat(fileno(file), &st) == -1){
-        fclose(file);
-        PyErr_SetFromErrnoWithFilename(PyExc_OSError, filename);
+    // Hold a tuple of the batch, keeping filename buffers alive while the GIL is released
+    PyObject *batch = PySequence_Tuple(files);
+    if (!batch){
         return NULL;
     }
 
-    if (st.st_size == 0){
-        fclose(file);
-        return Py_BuildValue("ii", 0, 0);
+    const Py_ssize_t batch_size = PyTuple_Size(batch);
+    struct BatchTask *tasks = PyMem_Malloc(sizeof(struct BatchTask) * (batch_size ? batch_size : 1));
+    unsigned long long *counts = PyMem_Malloc(sizeof(unsigned long long) * 2 * (batch_size ? batch_size : 1));
+    if (!(tasks && counts)){
+        PyMem_Free(tasks);
+        PyMem_Free(counts);
+        Py_DECREF(batch);
+        return PyErr_NoMemory();
     }
 
-    unsigned char *buffer = malloc(st.st_size);
-    if (!buffer){
-        fclose(file);
-        PyErr_Format(PyExc_MemoryError,
-            "Failed to load file %s of size %d bytes",
-            filename, st.st_size);
-        return NULL;
+    PyObject *last_metadata = NULL;
+    for (Py_ssize_t i = 0; i < batch_size; i++){
+        if (!_extract_batch_task(PyTuple_GetItem(batch, i), &tasks[i], &last_metadata)){
+            PyMem_Free(tasks);
+            PyMem_Free(counts);
+            Py_DECREF(batch);
+            return NULL;
+        }
     }
-    fread(buffer, 1, st.st_size, file);
-    
-    int total_lines = 0, loc = 0, valid_symbols = 0;
-    struct CommentData comment_data;
-    initialize_comment_data(
-        &comment_data,
-        singleline_character,
-        multiline_start_character,
-        multiline_end_character,
-        singleline_length,
-        multiline_start_length,
-        multiline_end_length
-    );
-
-    _parse_buffer(buffer, st.st_size, minimum_characters, &valid_symbols, &total_lines, &loc, &comment_data);
-    // Files not terminating with newline
-    if (buffer[st.st_size-1] != '\n'){
-        total_lines++;
-        loc += (valid_symbols >= minimum_characters);
-    }
-
-    free(buffer);
-    fclose(file);
-    return Py_BuildValue("ii", total_lines, loc);
+
+    Py_ssize_t failed_index = -1;
+    vm_map_status error = 0;
+    Py_BEGIN_ALLOW_THREADS
+    for (Py_ssize_t i = 0; i < batch_size; i++){
+        unsigned long long total_lines = 0, loc = 0;
+        switch (mode){
+            case COUNT_BUFFERED:
+                error = _count_file(tasks[i].filename, &tasks[i].comment_data, minimum_characters, &total_lines, &loc);
+                break;
+            case COUNT_COMPLETE:
+                error = _count_file_no_chunk(tasks[i].filename, &tasks[i].comment_data, minimum_characters, &total_lines, &loc);
+                break;
+            case COUNT_VM_MAP:
+                error = _count_file_vm_map(tasks[i].filename, &tasks[i].comment_data, minimum_characters, &total_lines, &loc);
+                break;
+            case COUNT_AUTO:
+                error = _count_file_auto(tasks[i].filename, &tasks[i].comment_data, minimum_characters, &total_lines, &loc);
+                break;
+        }
+        if (error){
+            failed_index = i;
+            break;
+        }
+        counts[2*i] = total_lines;
+        counts[2*i + 1] = loc;
+    }
+    Py_END_ALLOW_THREADS
+
+    PyObject *result = NULL;
+    if (failed_index != -1){
+        if (mode == COUNT_VM_MAP){
+            _set_vm_map_error(error, tasks[failed_index].filename);
+        } else {
+            _set_file_error(error, tasks[failed_index].filename);
+        }
+    } else {
+        PyObject *array_module = PyImport_ImportModule("array");
+        if (array_module){
+            result = PyObject_CallMethod(array_module, "array", "sy#",
+                "Q", (const char *) counts, (Py_ssize_t) (sizeof(unsigned long long) * 2 * batch_size));
+            Py_DECREF(array_module);
+        }
+    }
+
+    PyMem_Free(tasks);
+    PyMem_Free(counts);
+    Py_DECREF(batch);
+    return result;
 }
 
 PyDoc_STRVAR(_parse_file_vm_map_doc, "Parse a UTF-8 byte stream to count total lines and lines of code (LOC)");
 PyDoc_STRVAR(_parse_file_doc, "Parse a UTF-8 encoded file to count total lines and lines of code (LOC)");
 PyDoc_STRVAR(_parse_file_no_chunk_doc,
     "Parse a UTF-8 encoded file to count total lines and lines of code (LOC), reading the entire file at once");
+PyDoc_STRVAR(_parse_file_auto_doc,
+    "Parse a UTF-8 encoded file to count total lines and lines of code (LOC), choosing how to read it by its size");
+PyDoc_STRVAR(_set_auto_thresholds_doc,
+    "Set the file sizes from which AUTO parsing maps files into memory, and reads them in chunks");
+PyDoc_STRVAR(_set_split_options_doc,
+    "Set the file size from which files are split into ranges counted in parallel (0 disables splitting), "
+    "and the number of threads they are counted on");
+PyDoc_STRVAR(_get_split_options_doc, "Return the split threshold and number of threads currently in effect");
+PyDoc_STRVAR(_set_sniff_options_doc,
+    "Set the number of leading bytes sniffed to skip binary, minified and generated files (0 disables sniffing), "
+    "and the line length from which files are taken as minified");
+PyDoc_STRVAR(_get_sniff_options_doc, "Return the sniffed block size and maximum line length currently in effect");
+PyDoc_STRVAR(_skipped_files_doc,
+    "Return the numbers of binary, minified and generated files skipped so far, optionally resetting them");
+PyDoc_STRVAR(_add_skipped_files_doc,
+    "Add the numbers of binary, minified and generated files skipped elsewhere, such as by worker processes");
+PyDoc_STRVAR(_parse_bytes_doc,
+    "Parse a bytes-like object holding a file's UTF-8 encoded contents to count total lines and lines of code (LOC)");
+PyDoc_STRVAR(_parse_files_doc,
+    "Parse a batch of (filename, comment symbols) pairs, returning an array of interleaved total lines and LOC");
+#ifndef _WIN32
+PyDoc_STRVAR(_walk_directory_doc,
+    "Walk a directory tree natively, returning total lines, LOC and per-extension counts");
+#endif
 
 static PyMethodDef methods[] = {
     {
@@ -322,6 +405,74 @@ static PyMethodDef methods[] = {
         .ml_flags = METH_VARARGS,
         .ml_meth = _parse_file_no_chunk,
     },
+    {
+        .ml_name = "_parse_file_auto",
+        .ml_doc = _parse_file_auto_doc,
+        .ml_flags = METH_VARARGS,
+        .ml_meth = _parse_file_auto,
+    },
+    {
+        .ml_name = "_set_auto_thresholds",
+        .ml_doc = _set_auto_thresholds_doc,
+        .ml_flags = METH_VARARGS,
+        .ml_meth = _set_auto_thresholds,
+    },
+    {
+        .ml_name = "_set_split_options",
+        .ml_doc = _set_split_options_doc,
+        .ml_flags = METH_VARARGS,
+        .ml_meth = _set_split_options,
+    },
+    {
+        .ml_name = "_get_split_options",
+        .ml_doc = _get_split_options_doc,
+        .ml_flags = METH_NOARGS,
+        .ml_meth = _get_split_options,
+    },
+    {
+        .ml_name = "_set_sniff_options",
+        .ml_doc = _set_sniff_options_doc,
+        .ml_flags = METH_VARARGS,
+        .ml_meth = _set_sniff_options,
+    },
+    {
+        .ml_name = "_get_sniff_options",
+        .ml_doc = _get_sniff_options_doc,
+        .ml_flags = METH_NOARGS,
+        .ml_meth = _get_sniff_options,
+    },
+    {
+        .ml_name = "_skipped_files",
+        .ml_doc = _skipped_files_doc,
+        .ml_flags = METH_VARARGS,
+        .ml_meth = _skipped_files,
+    },
+    {
+        .ml_name = "_add_skipped_files",
+        .ml_doc = _add_skipped_files_doc,
+        .ml_flags = METH_VARARGS,
+        .ml_meth = _add_skipped_files,
+    },
+    {
+        .ml_name = "_parse_bytes",
+        .ml_doc = _parse_bytes_doc,
+        .ml_flags = METH_VARARGS,
+        .ml_meth = _parse_bytes,
+    },
+    {
+        .ml_name = "_parse_files",
+        .ml_doc = _parse_files_doc,
+        .ml_flags = METH_VARARGS,
+        .ml_meth = _parse_files,
+    },
+#ifndef _WIN32
+    {
+        .ml_name = "_walk_directory",
+        .ml_doc = _walk_directory_doc,
+        .ml_flags = METH_VARARGS,
+        .ml_meth = _walk_directory,
+    },
+#endif
     {NULL, NULL, 0, NULL}
 };
 
@@ -336,5 +487,17 @@ static PyModuleDef module = {
 
 PyMODINIT_FUNC
 PyInit__parsing(void){
-    return PyModule_Create(&module);
-}
\ No newline at end of file
+    initialize_parsing_primitives();
+    PyObject *parsing_module = PyModule_Create(&module);
+    if (!parsing_module){
+        return NULL;
+    }
+
+    PyObject *parser_type = create_parser_type(parsing_module);
+    if (!parser_type || PyModule_AddObject(parsing_module, "Parser", parser_type) == -1){
+        Py_XDECREF(parser_type);
+        Py_DECREF(parsing_module);
+        return NULL;
+    }
+    return parsing_module;
+}
@@ -1,26 +1,108 @@
-from typing import Optional
+from array import array
+from typing import Iterable, Optional, Sequence, TypeAlias, Union
 
-__all__ = ("_parse_file_vm_map",
+__all__ = ("Parser",
+           "_parse_file_vm_map",
            "_parse_file",
-           "_parse_file_no_chunk")
+           "_parse_file_no_chunk",
+           "_parse_file_auto",
+           "_set_auto_thresholds",
+           "_set_split_options",
+           "_get_split_options",
+           "_set_sniff_options",
+           "_get_sniff_options",
+           "_skipped_files",
+           "_add_skipped_files",
+           "_parse_bytes",
+           "_parse_files",
+           "_walk_directory")
+
+# A single comment symbol, or several alternatives of the same kind
+_Symbols: TypeAlias = Optional[Union[bytes, tuple[bytes, ...]]]
+
+class Parser:
+    '''Count total lines and LOC of a file fed in chunks, carrying comment state over between chunks'''
+    def __init__(self,
+                 singleline_symbol: _Symbols = None,
+                 multiline_start_symbol: _Symbols = None,
+                 multiline_end_symbol: _Symbols = None,
+                 minimum_characters: int = 0) -> None: ...
+
+    def feed(self, buffer: Union[bytes, bytearray, memoryview], /) -> None: ...
+
+    # Resets the parser, allowing it to be reused for another file
+    def finish(self) -> tuple[int, int]: ...
 
 def _parse_file_vm_map(filename: str,
-                     singleline_symbol: Optional[bytes] = None,
-                     multiline_start_symbol: Optional[bytes] = None,
-                     multiline_end_symbol: Optional[bytes] = None,
+                     singleline_symbol: _Symbols = None,
+                     multiline_start_symbol: _Symbols = None,
+                     multiline_end_symbol: _Symbols = None,
                      minimum_characters: int = 0,
                      /) -> tuple[int, int]: ...
 
 def _parse_file(filename: str,
-                singleline_symbol: Optional[bytes] = None,
-                multiline_start_symbol: Optional[bytes] = None,
-                multiline_end_symbol: Optional[bytes] = None,
+                singleline_symbol: _Symbols = None,
+                multiline_start_symbol: _Symbols = None,
+                multiline_end_symbol: _Symbols = None,
                 minimum_characters: int = 0,
                 /) -> tuple[int, int]: ...
 
 def _parse_file_no_chunk(filename: str,
-                         singleline_symbol: Optional[bytes] = None,
-                         multiline_start_symbol: Optional[bytes] = None,
-                         multiline_end_symbol: Optional[bytes] = None,
+                         singleline_symbol: _Symbols = None,
+                         multiline_start_symbol: _Symbols = None,
+                         multiline_end_symbol: _Symbols = None,
                          minimum_characters: int = 0,
                          /) -> tuple[int, int]: ...
+
+def _parse_file_auto(filename: str,
+                     singleline_symbol: _Symbols = None,
+                     multiline_start_symbol: _Symbols = None,
+                     multiline_end_symbol: _Symbols = None,
+                     minimum_characters: int = 0,
+                     /) -> tuple[int, int]: ...
+
+# Files below mmap_threshold are read whole, files of at least buffered_threshold are read in chunks
+def _set_auto_thresholds(mmap_threshold: int, buffered_threshold: int, /) -> None: ...
+
+# Files of at least threshold bytes are split at line boundaries into ranges counted on up to the given number of
+# threads. A threshold of 0, the default, disables splitting, as does Windows
+def _set_split_options(threshold: int, threads: int, /) -> None: ...
+
+def _get_split_options() -> tuple[int, int]: ...
+
+# Files whose first block_size bytes hold a NUL byte, a line longer than max_line_length bytes or a generated code
+# marker are skipped, counting as 0 lines. A block size of 0, the default, disables sniffing
+def _set_sniff_options(block_size: int, max_line_length: int, /) -> None: ...
+
+def _get_sniff_options() -> tuple[int, int]: ...
+
+# Files skipped as binary, minified (long lines) and generated, in that order
+def _skipped_files(reset: bool = False, /) -> tuple[int, int, int]: ...
+
+def _add_skipped_files(binary: int, long_lines: int, generated: int, /) -> None: ...
+
+def _parse_bytes(buffer: Union[bytes, bytearray, memoryview],
+                 singleline_symbol: _Symbols = None,
+                 multiline_start_symbol: _Symbols = None,
+                 multiline_end_symbol: _Symbols = None,
+                 minimum_characters: int = 0,
+                 /) -> tuple[int, int]: ...
+
+def _parse_files(files: Sequence[tuple[str, tuple[_Symbols, _Symbols, _Symbols]]],
+                 minimum_characters: int = 0,
+                 parse_mode: str = "BUF",
+                 /) -> array: ...
+
+# Not available on Windows
+def _walk_directory(root: bytes,
+                    languages: dict[bytes, tuple[_Symbols, _Symbols, _Symbols]],
+                    depth: int,
+                    minimum_characters: int,
+                    parse_mode: str,
+                    files: Iterable[bytes],
+                    file_mode: int,
+                    extensions: Iterable[bytes],
+                    extension_mode: int,
+                    directories: Iterable[bytes],
+                    directory_mode: int,
+                    /) -> tuple[int, int, list[tuple[bytes, int, int, int]]]: ...
\ No newline at end of file
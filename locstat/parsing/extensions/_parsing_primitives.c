@@ -1,85 +1,246 @@
 #include "_parsing_prinitives.h"
 #include "_comment_data.h"
 #include <stdbool.h>
+#include <stdint.h>
+#include <string.h>
+
+#if defined(__SSE2__) || defined(_M_X64) || (defined(_M_IX86_FP) && _M_IX86_FP >= 2)
+#define LOCSTAT_SSE2
+#include <emmintrin.h>
+#endif
+
+#if (defined(__GNUC__) || defined(__clang__)) && (defined(__x86_64__) || defined(__i386__))
+#define LOCSTAT_AVX2
+#include <immintrin.h>
+#endif
 
 static bool _is_ignorable(unsigned char c) {
     return ((c == 0x20) || (c == 0x09) || (c == 0x0B) || (c == 0x0C) || (c == 0x0D));
 }
 
-void
-_parse_buffer(unsigned char *buffer, size_t buffer_size,
-    Py_ssize_t minimum_characters, int *valid_characters,
-    int *total, int *loc,
-    struct CommentData *comment_data){
+static bool _is_continuation(unsigned char c) {
+    return (c & 0b11000000) == 0b10000000;
+}
 
-    for (size_t i = 0; i < buffer_size; i++){
-        if (comment_data->in_multiline) {
-            if (buffer[i] == '\n') {
-                (*total)++;
-                (*loc) += ((*valid_characters) > minimum_characters);
-                *valid_characters = 0;
-            }
-            else if (buffer[i] == comment_data->multiline_end_symbol[comment_data->multiline_end_pointer]) {
-                (comment_data->multiline_end_pointer)++;
-                if (comment_data->multiline_end_pointer == comment_data->multiline_end_length) {
-                    comment_data->in_multiline = false;
-                    comment_data->multiline_end_pointer = 0;
-                }
-            } else {
-                comment_data->multiline_end_pointer = 0;
-            }
-            continue; 
-        }
+/*
+ * Scanning routines return the offset of the first byte equal to any of the 4 targets,
+ * or buffer_size if there is none. If valid_characters is not NULL, it is incremented
+ * by the number of skipped bytes that are neither ignorable nor UTF-8 continuation bytes,
+ * which is exactly what the scalar state machine would have counted for them.
+ */
+typedef size_t (*scan_function)(const unsigned char *buffer, size_t buffer_size,
+    const unsigned char *targets, Py_ssize_t *valid_characters);
 
-        if (comment_data->in_singleline) {
-            if (buffer[i] == '\n') {
-                comment_data->in_singleline = false;
-            } else {
-                continue;
-            }
+static size_t
+_scan_scalar(const unsigned char *buffer, size_t buffer_size,
+    const unsigned char *targets, Py_ssize_t *valid_characters){
+
+    Py_ssize_t valid = 0;
+    size_t i = 0;
+    for (; i < buffer_size; i++){
+        const unsigned char c = buffer[i];
+        if (c == targets[0] || c == targets[1] || c == targets[2] || c == targets[3]){
+            break;
         }
+        valid += !(_is_ignorable(c) || _is_continuation(c));
+    }
+    if (valid_characters){
+        *valid_characters += valid;
+    }
+    return i;
+}
+
+#if defined(LOCSTAT_SSE2) || defined(LOCSTAT_AVX2)
+static unsigned
+_popcount(unsigned mask){
+#if defined(__GNUC__) || defined(__clang__)
+    return (unsigned) __builtin_popcount(mask);
+#else
+    unsigned count = 0;
+    for (; mask; mask &= mask - 1){
+        count++;
+    }
+    return count;
+#endif
+}
+
+static unsigned
+_trailing_zeros(unsigned mask){
+#if defined(__GNUC__) || defined(__clang__)
+    return (unsigned) __builtin_ctz(mask);
+#else
+    unsigned count = 0;
+    for (; !(mask & 1); mask >>= 1){
+        count++;
+    }
+    return count;
+#endif
+}
+#endif
 
-        if ((buffer[i] & 0b11000000) == 0b10000000) continue;
+#ifdef LOCSTAT_SSE2
+static size_t
+_scan_sse2(const unsigned char *buffer, size_t buffer_size,
+    const unsigned char *targets, Py_ssize_t *valid_characters){
 
-        if (_is_ignorable(buffer[i])){
-            comment_data->singleline_pointer = 0;
-            comment_data->multiline_start_pointer = 0;
-            comment_data->multiline_end_pointer = 0;
-            continue;   
+    const __m128i target_0 = _mm_set1_epi8((char) targets[0]);
+    const __m128i target_1 = _mm_set1_epi8((char) targets[1]);
+    const __m128i target_2 = _mm_set1_epi8((char) targets[2]);
+    const __m128i target_3 = _mm_set1_epi8((char) targets[3]);
+    const __m128i space = _mm_set1_epi8(0x20), tab = _mm_set1_epi8(0x09),
+        vertical_tab = _mm_set1_epi8(0x0B), form_feed = _mm_set1_epi8(0x0C),
+        carriage_return = _mm_set1_epi8(0x0D);
+    const __m128i continuation_mask = _mm_set1_epi8((char) 0xC0), continuation = _mm_set1_epi8((char) 0x80);
+
+    Py_ssize_t valid = 0;
+    size_t i = 0;
+    for (; i + 16 <= buffer_size; i += 16){
+        const __m128i block = _mm_loadu_si128((const __m128i *) (buffer + i));
+        const unsigned stops = (unsigned) _mm_movemask_epi8(
+            _mm_or_si128(_mm_or_si128(_mm_cmpeq_epi8(block, target_0), _mm_cmpeq_epi8(block, target_1)),
+                         _mm_or_si128(_mm_cmpeq_epi8(block, target_2), _mm_cmpeq_epi8(block, target_3))));
+
+        unsigned skipped = 0;
+        if (valid_characters){
+            const __m128i ignorable = _mm_or_si128(
+                _mm_or_si128(_mm_or_si128(_mm_cmpeq_epi8(block, space), _mm_cmpeq_epi8(block, tab)),
+                             _mm_or_si128(_mm_cmpeq_epi8(block, vertical_tab), _mm_cmpeq_epi8(block, form_feed))),
+                _mm_or_si128(_mm_cmpeq_epi8(block, carriage_return),
+                             _mm_cmpeq_epi8(_mm_and_si128(block, continuation_mask), continuation)));
+            skipped = (unsigned) _mm_movemask_epi8(ignorable);
         }
 
-        if (comment_data->singleline_symbol
-            && buffer[i] == comment_data->singleline_symbol[comment_data->singleline_pointer]) {
-            comment_data->singleline_pointer++;
-            if (comment_data->singleline_pointer == comment_data->singleline_length) {
-                comment_data->in_singleline = true;
-                comment_data->singleline_pointer = 0;
-                (*valid_characters) -= (comment_data->singleline_length - 1);
-                continue;
+        if (stops){
+            const unsigned offset = _trailing_zeros(stops);
+            valid += offset - _popcount(skipped & ((1u << offset) - 1));
+            if (valid_characters){
+                *valid_characters += valid;
             }
-        } else {
-            comment_data->singleline_pointer = 0;
+            return i + offset;
+        }
+        valid += 16 - _popcount(skipped);
+    }
+
+    if (valid_characters){
+        *valid_characters += valid;
+    }
+    return i + _scan_scalar(buffer + i, buffer_size - i, targets, valid_characters);
+}
+#endif
+
+#ifdef LOCSTAT_AVX2
+__attribute__((target("avx2")))
+static size_t
+_scan_avx2(const unsigned char *buffer, size_t buffer_size,
+    const unsigned char *targets, Py_ssize_t *valid_characters){
+
+    const __m256i target_0 = _mm256_set1_epi8((char) targets[0]);
+    const __m256i target_1 = _mm256_set1_epi8((char) targets[1]);
+    const __m256i target_2 = _mm256_set1_epi8((char) targets[2]);
+    const __m256i target_3 = _mm256_set1_epi8((char) targets[3]);
+    const __m256i space = _mm256_set1_epi8(0x20), tab = _mm256_set1_epi8(0x09),
+        vertical_tab = _mm256_set1_epi8(0x0B), form_feed = _mm256_set1_epi8(0x0C),
+        carriage_return = _mm256_set1_epi8(0x0D);
+    const __m256i continuation_mask = _mm256_set1_epi8((char) 0xC0), continuation = _mm256_set1_epi8((char) 0x80);
+
+    Py_ssize_t valid = 0;
+    size_t i = 0;
+    for (; i + 32 <= buffer_size; i += 32){
+        const __m256i block = _mm256_loadu_si256((const __m256i *) (buffer + i));
+        const unsigned stops = (unsigned) _mm256_movemask_epi8(
+            _mm256_or_si256(_mm256_or_si256(_mm256_cmpeq_epi8(block, target_0), _mm256_cmpeq_epi8(block, target_1)),
+                            _mm256_or_si256(_mm256_cmpeq_epi8(block, target_2), _mm256_cmpeq_epi8(block, target_3))));
+
+        unsigned skipped = 0;
+        if (valid_characters){
+            const __m256i ignorable = _mm256_or_si256(
+                _mm256_or_si256(_mm256_or_si256(_mm256_cmpeq_epi8(block, space), _mm256_cmpeq_epi8(block, tab)),
+                                _mm256_or_si256(_mm256_cmpeq_epi8(block, vertical_tab), _mm256_cmpeq_epi8(block, form_feed))),
+                _mm256_or_si256(_mm256_cmpeq_epi8(block, carriage_return),
+                                _mm256_cmpeq_epi8(_mm256_and_si256(block, continuation_mask), continuation)));
+            skipped = (unsigned) _mm256_movemask_epi8(ignorable);
         }
 
-        if (comment_data->multiline_start_symbol
-            && buffer[i] == comment_data->multiline_start_symbol[comment_data->multiline_start_pointer]) {
-                comment_data->multiline_start_pointer++;
-                if (comment_data->multiline_start_pointer == comment_data->multiline_start_length) {
-                    comment_data->in_multiline = true;
-                    comment_data->multiline_start_pointer = 0;
-                    (*valid_characters) -= (comment_data->multiline_start_length - 1);
-                    continue;
+        if (stops){
+            const unsigned offset = _trailing_zeros(stops);
+            valid += offset - _popcount(skipped & ((1u << offset) - 1));
+            if (valid_characters){
+                *valid_characters += valid;
             }
-        } else {
-            comment_data->multiline_start_pointer = 0;
+            return i + offset;
         }
+        valid += 32 - _popcount(skipped);
+    }
+
+    if (valid_characters){
+        *valid_characters += valid;
+    }
+    return i + _scan_scalar(buffer + i, buffer_size - i, targets, valid_characters);
+}
+#endif
 
-        if (buffer[i] == '\n') {
+static scan_function _scan = _scan_scalar;
+
+void
+initialize_parsing_primitives(void){
+#ifdef LOCSTAT_SSE2
+    _scan = _scan_sse2;
+#endif
+#ifdef LOCSTAT_AVX2
+    __builtin_cpu_init();
+    if (__builtin_cpu_supports("avx2")){
+        _scan = _scan_avx2;
+    }
+#endif
+}
+
+void
+_parse_buffer(unsigned char *buffer, size_t buffer_size,
+    Py_ssize_t minimum_characters, Py_ssize_t *valid_characters,
+    unsigned long long *total, unsigned long long *loc,
+    struct CommentData *comment_data){
+
+    const struct CommentAutomaton *automaton = comment_data->automaton;
+    uint16_t state = comment_data->state;
+
+    for (size_t i = 0; i < buffer_size; i++){
+        const unsigned char kind = automaton->kinds[state];
+        if (kind == STATE_LINE_COMMENT){
+            const unsigned char *newline = memchr(buffer + i, '\n', buffer_size - i);
+            if (!newline) break;
+            i = newline - buffer;
+            state = AUTOMATON_ROOT;
             (*total)++;
             (*loc) += ((*valid_characters) >= minimum_characters);
             *valid_characters = 0;
-        } else {
-            (*valid_characters)++;
+            continue;
+        }
+
+        // Bytes looping on the current state are skipped in bulk, only counting valid characters in code
+        if (automaton->stop_counts[state]){
+            i += _scan(buffer + i, buffer_size - i, automaton->stops[state],
+                       (kind == STATE_CODE) ? valid_characters : NULL);
+            if (i == buffer_size) break;
         }
+
+        const unsigned char byte = buffer[i];
+        const uint16_t next = automaton->transitions[state][byte];
+        if (byte == '\n'){
+            (*total)++;
+            if (kind == STATE_CODE){
+                (*loc) += ((*valid_characters) >= minimum_characters);
+            } else {
+                (*loc) += ((*valid_characters) > minimum_characters);
+            }
+            *valid_characters = 0;
+        } else if (kind == STATE_CODE){
+            if (automaton->kinds[next] != STATE_CODE){
+                (*valid_characters) -= automaton->adjustments[next];
+            } else {
+                (*valid_characters) += !(_is_ignorable(byte) || _is_continuation(byte));
+            }
+        }
+        state = next;
     }
-}
\ No newline at end of file
+    comment_data->state = state;
+}
@@ -1,4 +1,3 @@
-
 #ifndef _PARSING_PRIMITIVES_H
 #define _PARSING_PRIMITIVES_H
 #include "_locstat.h"
@@ -7,8 +6,13 @@
 struct CommentData;
 extern void
 _parse_buffer(unsigned char *buffer, size_t buffer_size,
-    Py_ssize_t minimum_characters, int *valid_characters,
-    int *total, int *loc,
+    Py_ssize_t minimum_characters, Py_ssize_t *valid_characters,
+    unsigned long long *total, unsigned long long *loc,
     struct CommentData *comment_data);
 
-#endif
\ No newline at end of file
+/* Select the fastest scanning routine supported by the running CPU.
+ * Must be called once before any parsing, and is idempotent */
+extern void
+initialize_parsing_primitives(void);
+
+#endif
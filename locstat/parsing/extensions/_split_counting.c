@@ -0,0 +1,318 @@
+#include <stdbool.h>
+#include <stdint.h>
+#include <errno.h>
+#include <string.h>
+#include "_split_counting.h"
+#include "_comment_data.h"
+#include "_parsing_prinitives.h"
+
+// Disabled until set from the configuration
+static Py_ssize_t split_threshold = 0;
+static Py_ssize_t split_threads = 1;
+
+// Ranges smaller than this are not worth a thread of their own
+#define SPLIT_MIN_RANGE ((long long) 4 * 1024 * 1024)
+
+void
+set_split_options(Py_ssize_t threshold, Py_ssize_t threads){
+    split_threshold = threshold;
+    split_threads = threads > 0 ? threads : 1;
+}
+
+void
+split_options(Py_ssize_t *threshold, Py_ssize_t *threads){
+    *threshold = split_threshold;
+    *threads = split_threads;
+}
+
+bool
+splitting_enabled(void){
+#ifdef _WIN32
+    return false;
+#else
+    return split_threshold && split_threads > 1;
+#endif
+}
+
+bool
+should_split(long long file_size){
+    return splitting_enabled() && file_size >= split_threshold && file_size >= 2 * SPLIT_MIN_RANGE;
+}
+
+#ifndef _WIN32
+
+#include <pthread.h>
+#include <unistd.h>
+
+// Ranges are read in chunks of this size, speculative runs are compared against the primary run after each
+#define SPLIT_CHUNK_SIZE (1024 * 1024)
+// Languages with more distinct states after a newline are not split
+#define SPLIT_MAX_STARTS 8
+#define SPLIT_MAX_RANGES 256
+
+struct RangeRun {
+    uint16_t state;
+    Py_ssize_t valid_characters;
+    unsigned long long total_lines, loc;
+    // Converged runs follow the primary run, differing from it only by the lines counted before converging
+    bool converged;
+    long long total_offset, loc_offset;
+};
+
+struct RangeTask {
+    int fd;
+    long long start, end;
+    const struct CommentAutomaton *automaton;
+    Py_ssize_t minimum_characters;
+    // Runs from each possible starting state, the first one being the primary run
+    uint16_t start_states[SPLIT_MAX_STARTS];
+    struct RangeRun runs[SPLIT_MAX_STARTS];
+    size_t run_count;
+    int error;
+};
+
+/* States the automaton can be in right after a newline. Returns 0 if there are too many of them */
+static size_t
+_line_start_states(const struct CommentAutomaton *automaton, uint16_t states[SPLIT_MAX_STARTS]){
+    size_t count = 0;
+    // Newlines end line comments without a transition, see _parse_buffer
+    states[count++] = AUTOMATON_ROOT;
+    for (Py_ssize_t state = 0; state < automaton->state_count; state++){
+        if (automaton->kinds[state] == STATE_LINE_COMMENT){
+            continue;
+        }
+        const uint16_t next = automaton->transitions[state]['\n'];
+        bool seen = false;
+        for (size_t i = 0; i < count && !seen; i++){
+            seen = states[i] == next;
+        }
+        if (seen){
+            continue;
+        }
+        if (count == SPLIT_MAX_STARTS){
+            return 0;
+        }
+        states[count++] = next;
+    }
+    return count;
+}
+
+/* Offset of the line following the one holding the given offset, or the file's size if it is the last */
+static int
+_next_line_start(int fd, long long offset, long long file_size, long long *line_start){
+    unsigned char buffer[16 * 1024];
+    while (offset < file_size){
+        const size_t remaining = (size_t) (file_size - offset);
+        const ssize_t read_size = pread(fd, buffer, remaining < sizeof(buffer) ? remaining : sizeof(buffer), offset);
+        if (read_size == -1){
+            if (errno == EINTR){
+                continue;
+            }
+            return errno;
+        }
+        if (read_size == 0){
+            break;
+        }
+        const unsigned char *newline = memchr(buffer, '\n', read_size);
+        if (newline){
+            *line_start = offset + (newline - buffer) + 1;
+            return 0;
+        }
+        offset += read_size;
+    }
+    *line_start = file_size;
+    return 0;
+}
+
+static void *
+_count_range(void *argument){
+    struct RangeTask *task = argument;
+    for (size_t i = 0; i < task->run_count; i++){
+        task->runs[i] = (struct RangeRun) {.state = task->start_states[i]};
+    }
+    if (task->start >= task->end){
+        return NULL;
+    }
+
+    unsigned char *buffer = malloc(SPLIT_CHUNK_SIZE);
+    if (!buffer){
+        task->error = ENOMEM;
+        return NULL;
+    }
+
+    struct RangeRun *primary = &task->runs[0];
+    long long offset = task->start;
+    while (offset < task->end){
+        const size_t remaining = (size_t) (task->end - offset);
+        const ssize_t read_size = pread(task->fd, buffer,
+            remaining < SPLIT_CHUNK_SIZE ? remaining : SPLIT_CHUNK_SIZE, offset);
+        if (read_size == -1){
+            if (errno == EINTR){
+                continue;
+            }
+            task->error = errno;
+            break;
+        }
+        // Truncated while being counted
+        if (read_size == 0){
+            break;
+        }
+
+        for (size_t i = 0; i < task->run_count; i++){
+            struct RangeRun *run = &task->runs[i];
+            if (run->converged){
+                continue;
+            }
+            struct CommentData comment_data;
+            initialize_comment_data(&comment_data, task->automaton);
+            comment_data.state = run->state;
+            _parse_buffer(buffer, read_size, task->minimum_characters, &run->valid_characters,
+                &run->total_lines, &run->loc, &comment_data);
+            run->state = comment_data.state;
+        }
+        // Runs in the same state with the same characters on the current line count everything after alike
+        for (size_t i = 1; i < task->run_count; i++){
+            struct RangeRun *run = &task->runs[i];
+            if (!run->converged
+                && run->state == primary->state
+                && run->valid_characters == primary->valid_characters){
+                run->converged = true;
+                run->total_offset = (long long) (run->total_lines - primary->total_lines);
+                run->loc_offset = (long long) (run->loc - primary->loc);
+            }
+        }
+        offset += read_size;
+    }
+    free(buffer);
+
+    for (size_t i = 1; i < task->run_count; i++){
+        struct RangeRun *run = &task->runs[i];
+        if (run->converged){
+            run->state = primary->state;
+            run->valid_characters = primary->valid_characters;
+            run->total_lines = primary->total_lines + run->total_offset;
+            run->loc = primary->loc + run->loc_offset;
+        }
+    }
+    return NULL;
+}
+
+int
+_count_stream_split(FILE *file, long long file_size, struct CommentData *comment_data,
+    Py_ssize_t minimum_characters, unsigned long long *total_lines, unsigned long long *loc){
+
+    const int fd = fileno(file);
+    long long range_count = file_size / SPLIT_MIN_RANGE;
+    if (range_count > split_threads){
+        range_count = split_threads;
+    }
+    if (range_count > SPLIT_MAX_RANGES){
+        range_count = SPLIT_MAX_RANGES;
+    }
+
+    uint16_t line_start_states[SPLIT_MAX_STARTS];
+    const size_t line_start_count = _line_start_states(comment_data->automaton, line_start_states);
+    if (!line_start_count || range_count < 1){
+        range_count = 1;
+    }
+
+    struct RangeTask *tasks = calloc(range_count, sizeof(struct RangeTask));
+    if (!tasks){
+        return ENOMEM;
+    }
+    int error = 0;
+    long long start = 0;
+    for (long long i = 0; i < range_count; i++){
+        struct RangeTask *task = &tasks[i];
+        task->fd = fd;
+        task->automaton = comment_data->automaton;
+        task->minimum_characters = minimum_characters;
+        task->start = start;
+        if (i == range_count - 1){
+            task->end = file_size;
+        } else if ((error = _next_line_start(fd, file_size / range_count * (i + 1), file_size, &task->end))){
+            free(tasks);
+            return error;
+        }
+        if (task->end < start){
+            task->end = start;
+        }
+        start = task->end;
+
+        // The first range starts in the state the file is counted from
+        if (i == 0){
+            task->start_states[0] = comment_data->state;
+            task->run_count = 1;
+        } else {
+            memcpy(task->start_states, line_start_states, sizeof(line_start_states));
+            task->run_count = line_start_count;
+        }
+    }
+
+    // The first range is counted on the calling thread
+    pthread_t *threads = calloc(range_count, sizeof(pthread_t));
+    bool *started = calloc(range_count, sizeof(bool));
+    if (!(threads && started)){
+        free(threads);
+        free(started);
+        free(tasks);
+        return ENOMEM;
+    }
+    for (long long i = 1; i < range_count; i++){
+        started[i] = pthread_create(&threads[i], NULL, _count_range, &tasks[i]) == 0;
+    }
+    _count_range(&tasks[0]);
+    for (long long i = 1; i < range_count; i++){
+        if (started[i]){
+            pthread_join(threads[i], NULL);
+        } else {
+            _count_range(&tasks[i]);
+        }
+    }
+    free(threads);
+    free(started);
+
+    uint16_t state = comment_data->state;
+    Py_ssize_t valid_characters = 0;
+    for (long long i = 0; i < range_count && !error; i++){
+        struct RangeTask *task = &tasks[i];
+        if ((error = task->error)){
+            break;
+        }
+        struct RangeRun *run = NULL;
+        for (size_t j = 0; j < task->run_count && !run; j++){
+            if (task->start_states[j] == state){
+                run = &task->runs[j];
+            }
+        }
+        if (!run){
+            // Not a state a newline leads to, which the automaton cannot reach. Count the range again from it
+            task->start_states[0] = state;
+            task->run_count = 1;
+            _count_range(task);
+            if ((error = task->error)){
+                break;
+            }
+            run = &task->runs[0];
+        }
+        *total_lines += run->total_lines;
+        *loc += run->loc;
+        state = run->state;
+        valid_characters = run->valid_characters;
+    }
+    free(tasks);
+    if (error){
+        return error;
+    }
+    comment_data->state = state;
+
+    // Files not terminating with newline
+    unsigned char last_byte = '\n';
+    if (file_size && pread(fd, &last_byte, 1, file_size - 1) == 1 && last_byte != '\n'){
+        (*total_lines)++;
+        (*loc) += (valid_characters >= minimum_characters);
+    }
+    return 0;
+}
+
+#endif
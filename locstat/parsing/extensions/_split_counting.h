@@ -0,0 +1,40 @@
+#ifndef _SPLIT_COUNTING_H
+#define _SPLIT_COUNTING_H
+#include "_locstat.h"
+#include <stdbool.h>
+#include <stdio.h>
+
+struct CommentData;
+
+/* Files of at least threshold bytes are divided at line boundaries into up to the given number of ranges,
+ * counted on as many threads. A threshold of 0, or a single thread, disables splitting.
+ * Splitting is not supported on Windows, where files are always counted on the calling thread */
+extern void
+set_split_options(Py_ssize_t threshold, Py_ssize_t threads);
+
+extern void
+split_options(Py_ssize_t *threshold, Py_ssize_t *threads);
+
+/* Whether any file is counted in parallel ranges, sparing a stat of each file otherwise */
+extern bool
+splitting_enabled(void);
+
+/* Whether a file of the given size is counted in parallel ranges */
+extern bool
+should_split(long long file_size);
+
+#ifndef _WIN32
+/*
+ * Count a file in parallel ranges, each starting right after a newline. Whether a range starts inside a
+ * block comment depends on the ranges before it, so each range is counted speculatively from every state
+ * the automaton can be in after a newline. Speculative runs are dropped as soon as they reach the same state
+ * as the run starting in code, past which both count alike, and the runs matching the actual states are
+ * stitched together afterwards. The stream's position is left untouched.
+ * Called with the GIL released, returning 0 on success or an errno value
+ */
+extern int
+_count_stream_split(FILE *file, long long file_size, struct CommentData *comment_data,
+    Py_ssize_t minimum_characters, unsigned long long *total_lines, unsigned long long *loc);
+#endif
+
+#endif
@@ -0,0 +1,156 @@
+#include <stdbool.h>
+#include "_stream_parser.h"
+#include "_comment_data.h"
+#include "_parsing_prinitives.h"
+
+struct Parser {
+    PyObject_HEAD
+    struct CommentData comment_data;
+    Py_ssize_t minimum_characters;
+    // Non-whitespace characters of the current line, carried over between chunks
+    Py_ssize_t valid_characters;
+    unsigned long long total_lines;
+    unsigned long long loc;
+    unsigned char last_byte;
+    bool empty;
+    // Set while a chunk is parsed with the GIL released, guarding against concurrent feeds
+    bool busy;
+};
+
+static void
+_reset_parser(struct Parser *parser){
+    parser->comment_data.state = AUTOMATON_ROOT;
+    parser->valid_characters = parser->total_lines = parser->loc = 0;
+    parser->last_byte = 0;
+    parser->empty = true;
+}
+
+static int
+_parser_init(PyObject *self, PyObject *args, PyObject *kwargs){
+    static char *keywords[] = {"singleline_symbol", "multiline_start_symbol", "multiline_end_symbol",
+        "minimum_characters", NULL};
+    struct Parser *parser = (struct Parser *) self;
+    PyObject *singleline_symbols = Py_None, *multiline_start_symbols = Py_None, *multiline_end_symbols = Py_None;
+    Py_ssize_t minimum_characters = 0;
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs,
+        "|OOOn",
+        keywords,
+        &singleline_symbols,
+        &multiline_start_symbols,
+        &multiline_end_symbols,
+        &minimum_characters)){
+            return -1;
+    }
+    if (parser->busy){
+        PyErr_SetString(PyExc_RuntimeError, "Parser is in use by another thread");
+        return -1;
+    }
+
+    PyObject *metadata = PyTuple_Pack(3, singleline_symbols, multiline_start_symbols, multiline_end_symbols);
+    if (!metadata){
+        return -1;
+    }
+    const bool success = extract_comment_data(metadata, &parser->comment_data);
+    Py_DECREF(metadata);
+    if (!success){
+        return -1;
+    }
+    parser->minimum_characters = minimum_characters;
+    _reset_parser(parser);
+    return 0;
+}
+
+static PyObject *
+_parser_feed(PyObject *self, PyObject *data){
+    struct Parser *parser = (struct Parser *) self;
+    if (!parser->comment_data.automaton){
+        PyErr_SetString(PyExc_RuntimeError, "Parser was not initialized");
+        return NULL;
+    }
+    if (parser->busy){
+        PyErr_SetString(PyExc_RuntimeError, "Parser is in use by another thread");
+        return NULL;
+    }
+
+    Py_buffer buffer;
+    if (PyObject_GetBuffer(data, &buffer, PyBUF_SIMPLE) == -1){
+        return NULL;
+    }
+    if (buffer.len){
+        parser->busy = true;
+        Py_BEGIN_ALLOW_THREADS
+        _parse_buffer(buffer.buf, buffer.len, parser->minimum_characters, &parser->valid_characters,
+            &parser->total_lines, &parser->loc, &parser->comment_data);
+        Py_END_ALLOW_THREADS
+        parser->busy = false;
+        parser->last_byte = ((unsigned char *) buffer.buf)[buffer.len-1];
+        parser->empty = false;
+    }
+    PyBuffer_Release(&buffer);
+    Py_RETURN_NONE;
+}
+
+static PyObject *
+_parser_finish(PyObject *self, PyObject *Py_UNUSED(args)){
+    struct Parser *parser = (struct Parser *) self;
+    if (parser->busy){
+        PyErr_SetString(PyExc_RuntimeError, "Parser is in use by another thread");
+        return NULL;
+    }
+
+    // Files not terminating with newline
+    if (!parser->empty && parser->last_byte != '\n'){
+        parser->total_lines++;
+        parser->loc += (parser->valid_characters >= parser->minimum_characters);
+    }
+    PyObject *result = Py_BuildValue("KK", parser->total_lines, parser->loc);
+    _reset_parser(parser);
+    return result;
+}
+
+static void
+_parser_dealloc(PyObject *self){
+    PyTypeObject *type = Py_TYPE(self);
+    freefunc free_function = PyType_GetSlot(type, Py_tp_free);
+    free_function(self);
+    Py_DECREF(type);
+}
+
+PyDoc_STRVAR(_parser_feed_doc,
+    "feed(buffer, /)\n--\n\n"
+    "Parse the next chunk of a file from any bytes-like object, without copying it");
+PyDoc_STRVAR(_parser_finish_doc,
+    "finish()\n--\n\n"
+    "Return (total lines, LOC) of the file fed so far, and reset the parser for the next file");
+PyDoc_STRVAR(_parser_doc,
+    "Parser(singleline_symbol=None, multiline_start_symbol=None, multiline_end_symbol=None, minimum_characters=0)\n"
+    "--\n\n"
+    "Count total lines and lines of code (LOC) of a UTF-8 encoded file fed in chunks,\n"
+    "carrying comment state over between chunks");
+
+static PyMethodDef _parser_methods[] = {
+    {"feed", _parser_feed, METH_O, _parser_feed_doc},
+    {"finish", _parser_finish, METH_NOARGS, _parser_finish_doc},
+    {NULL, NULL, 0, NULL}
+};
+
+static PyType_Slot _parser_slots[] = {
+    {Py_tp_doc, (void *) _parser_doc},
+    {Py_tp_new, PyType_GenericNew},
+    {Py_tp_init, _parser_init},
+    {Py_tp_dealloc, _parser_dealloc},
+    {Py_tp_methods, _parser_methods},
+    {0, NULL}
+};
+
+static PyType_Spec _parser_spec = {
+    .name = "locstat.parsing.extensions._parsing.Parser",
+    .basicsize = sizeof(struct Parser),
+    .flags = Py_TPFLAGS_DEFAULT,
+    .slots = _parser_slots
+};
+
+PyObject *
+create_parser_type(PyObject *module){
+    return PyType_FromModuleAndSpec(module, &_parser_spec, NULL);
+}
@@ -0,0 +1,10 @@
+#ifndef _STREAM_PARSER_H
+#define _STREAM_PARSER_H
+#include "_locstat.h"
+
+/* Create the Parser type, counting a file fed to it in chunks.
+ * See _parsing.pyi for the Python interface */
+extern PyObject *
+create_parser_type(PyObject *module);
+
+#endif
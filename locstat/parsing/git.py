@@ -0,0 +1,176 @@
+import os
+import struct
+import subprocess
+from typing import Final, Optional
+
+__all__ = ("git_blob_ids",)
+
+_INDEX_SIGNATURE: Final[bytes] = b"DIRC"
+# ctime (s, ns), mtime (s, ns), dev, ino, mode, uid, gid, size
+_ENTRY_STAT: Final[struct.Struct] = struct.Struct(">10I")
+# Symlinks and submodules are stored as blobs of their target, which is not what a scan reads
+_REGULAR_FILE_MODE: Final[int] = 0o100000
+
+def _run_git(directory: str, *args: str) -> Optional[bytes]:
+    '''Output of a git command run in a directory, or None if git is unavailable or the command failed'''
+    try:
+        process = subprocess.run(("git", *args), cwd=directory,
+                                 stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    except OSError:
+        return None
+    return process.stdout if process.returncode == 0 else None
+
+def _join(directory: str, relative_path: bytes) -> str:
+    return os.path.join(directory, *os.fsdecode(relative_path).split("/"))
+
+def _blob_ids_from_git(directory: str) -> Optional[dict[str, bytes]]:
+    listing: Optional[bytes] = _run_git(directory, "ls-files", "--stage", "-z")
+    # Files whose worktree contents may differ from the index, paths relative to the directory
+    modified: Optional[bytes] = _run_git(directory, "diff-files", "--name-only", "--relative", "-z")
+    if listing is None or modified is None:
+        return None
+
+    dirty: set[bytes] = set(modified.split(b"\0"))
+    blob_ids: dict[str, bytes] = {}
+    for line in listing.split(b"\0"):
+        if not line:
+            continue
+        metadata, relative_path = line.split(b"\t", 1)
+        mode, object_id, stage = metadata.split(b" ")
+        if stage != b"0" or int(mode, 8) & 0o170000 != _REGULAR_FILE_MODE or relative_path in dirty:
+            continue
+        blob_ids[_join(directory, relative_path)] = bytes.fromhex(object_id.decode())
+    return blob_ids
+
+def _find_git_directory(directory: str) -> Optional[tuple[str, str]]:
+    '''Locate the git directory and work tree root containing a directory'''
+    current: str = directory
+    while True:
+        candidate: str = os.path.join(current, ".git")
+        if os.path.isdir(candidate):
+            return candidate, current
+        if os.path.isfile(candidate):
+            # Linked worktrees and submodules point to their git directory
+            with open(candidate, "r", encoding="utf-8") as pointer:
+                contents: str = pointer.read().strip()
+            if contents.startswith("gitdir:"):
+                return os.path.join(current, contents[7:].strip()), current
+            return None
+        parent: str = os.path.dirname(current)
+        if parent == current:
+            return None
+        current = parent
+
+def _object_id_length(git_directory: str) -> int:
+    try:
+        with open(os.path.join(git_directory, "config"), "r", encoding="utf-8") as config_file:
+            config: str = config_file.read().lower().replace(" ", "").replace("\t", "")
+    except OSError:
+        return 20
+    return 32 if "objectformat=sha256" in config else 20
+
+def _is_clean(path: str, entry_stat: tuple[int, ...], index_mtime_ns: int) -> bool:
+    '''Compare a file against its cached stat data in the index, as git does before trusting an entry'''
+    try:
+        stat_result: os.stat_result = os.stat(path)
+    except OSError:
+        return False
+    _, _, mtime_s, mtime_ns, _, inode, _, _, _, size = entry_stat
+    # Racily clean entries, modified within the index's timestamp granularity, cannot be trusted
+    if stat_result.st_mtime_ns >= index_mtime_ns:
+        return False
+    return (mtime_s == (stat_result.st_mtime_ns // 1_000_000_000) & 0xFFFFFFFF
+            and mtime_ns == stat_result.st_mtime_ns % 1_000_000_000
+            and size == stat_result.st_size & 0xFFFFFFFF
+            and (not inode or inode == stat_result.st_ino & 0xFFFFFFFF))
+
+def _blob_ids_from_index(directory: str) -> Optional[dict[str, bytes]]:
+    '''Parse a version 2, 3 or 4 index directly, for when git itself is not installed'''
+    location: Optional[tuple[str, str]] = _find_git_directory(directory)
+    if location is None:
+        return None
+    git_directory, work_tree = location
+    index_path: str = os.path.join(git_directory, "index")
+    try:
+        with open(index_path, "rb") as index_file:
+            index: bytes = index_file.read()
+        index_mtime_ns: int = os.stat(index_path).st_mtime_ns
+    except OSError:
+        return None
+
+    if len(index) < 12 or index[:4] != _INDEX_SIGNATURE:
+        return None
+    version, entry_count = struct.unpack_from(">II", index, 4)
+    if version not in (2, 3, 4):
+        return None
+
+    object_id_length: int = _object_id_length(git_directory)
+    prefix: str = os.path.join(os.path.abspath(directory), "")
+    blob_ids: dict[str, bytes] = {}
+    offset: int = 12
+    previous_name: bytes = b""
+    for _ in range(entry_count):
+        entry_start: int = offset
+        entry_stat: tuple[int, ...] = _ENTRY_STAT.unpack_from(index, offset)
+        offset += _ENTRY_STAT.size
+        object_id: bytes = index[offset:offset+object_id_length]
+        offset += object_id_length
+        flags: int = struct.unpack_from(">H", index, offset)[0]
+        offset += 2
+        # Unmerged entries have a non-zero stage
+        usable: bool = not (flags >> 12) & 3
+        if version >= 3 and flags & 0x4000:
+            extended_flags: int = struct.unpack_from(">H", index, offset)[0]
+            offset += 2
+            # Skip-worktree and intent-to-add entries carry no usable blob
+            usable = usable and not extended_flags & 0x6000
+
+        if version == 4:
+            # Names are prefix compressed against the previous entry, without padding
+            byte: int = index[offset]
+            offset += 1
+            strip: int = byte & 0x7F
+            while byte & 0x80:
+                byte = index[offset]
+                offset += 1
+                strip = ((strip + 1) << 7) | (byte & 0x7F)
+            terminator: int = index.index(b"\0", offset)
+            name: bytes = previous_name[:len(previous_name)-strip] + index[offset:terminator]
+            offset = terminator + 1
+        else:
+            terminator = index.index(b"\0", offset)
+            name = index[offset:terminator]
+            # Entries are padded with NULs to a multiple of 8 bytes
+            offset = entry_start + ((terminator - entry_start + 8) & ~7)
+        previous_name = name
+
+        if not usable or entry_stat[6] & 0o170000 != _REGULAR_FILE_MODE:
+            continue
+        path: str = _join(work_tree, name)
+        if path.startswith(prefix) and _is_clean(path, entry_stat, index_mtime_ns):
+            blob_ids[path] = object_id
+
+    # Split indices keep most entries in a shared index, which is not read here
+    while offset + 8 <= len(index) - object_id_length:
+        signature: bytes = index[offset:offset+4]
+        if signature == b"link":
+            return None
+        offset += 8 + struct.unpack_from(">I", index, offset + 4)[0]
+    return blob_ids
+
+def git_blob_ids(directory: str) -> dict[str, bytes]:
+    '''
+    Object IDs of the blobs of tracked files under a directory, for files whose contents match the index.
+    Modified, unmerged, symlink and submodule entries are left out.
+    Uses git if available, reading the index directly otherwise
+
+    :param directory: Absolute path of a directory within a git work tree
+    :type directory: str
+
+    :return: Mapping of absolute file paths to raw object IDs, empty if the directory is not within a work tree
+    :rtype: dict[str, bytes]
+    '''
+    blob_ids: Optional[dict[str, bytes]] = _blob_ids_from_git(directory)
+    if blob_ids is None:
+        blob_ids = _blob_ids_from_index(directory)
+    return blob_ids or {}
@@ -0,0 +1,316 @@
+import os
+from array import array
+from concurrent.futures import (FIRST_COMPLETED, Executor, Future,
+                                ProcessPoolExecutor, wait)
+from typing import Any, Callable, Mapping, NamedTuple, Optional, Sequence, Union
+
+from locstat.data_structures.config import ClocConfig
+from locstat.data_structures.typing import FileParsingFunction, LanguageMetadata
+from locstat.parsing.cache import ResultCache
+from locstat.parsing.directory import parse_file_batch
+from locstat.parsing.extensions._parsing import (_add_skipped_files,
+                                                 _get_sniff_options,
+                                                 _get_split_options,
+                                                 _set_auto_thresholds,
+                                                 _set_sniff_options,
+                                                 _set_split_options,
+                                                 _skipped_files)
+from locstat.utilities.core import available_cpus
+
+__all__ = ("available_cpus",
+           "parse_directory_parallel",
+           "parse_directory_record_parallel",
+           "parse_directory_verbose_parallel")
+
+class _WorkerState(NamedTuple):
+    symbol_mapping: Mapping[str, LanguageMetadata]
+    file_parsing_function: FileParsingFunction
+    file_filter_function: Callable[[str, str], bool]
+    directory_filter_function: Callable[[str], bool]
+    minimum_characters: int
+    cache: Optional[ResultCache]
+    # Size thresholds of AUTO parsing, which workers started with spawn do not inherit
+    auto_thresholds: tuple[int, int]
+    # Sniffing options of --skip-generated, likewise
+    sniff_options: tuple[int, int]
+    # Size from which files are counted in parallel ranges, and the number of threads counting them
+    split_options: tuple[int, int]
+
+class _DirectoryResult(NamedTuple):
+    '''Counts for the files directly within a single directory'''
+    total: int
+    loc: int
+    # Extension -> [total, loc, files]
+    languages: dict[str, list[int]]
+    # Extensions (on first occurrence) and (name, path) pairs of subdirectories,
+    # in the order they were encountered. Used to reproduce serial traversal order
+    order: list[Union[str, tuple[str, str]]]
+    files: Optional[dict[str, dict[str, int]]]
+    # Files skipped by sniffing, per reason
+    skipped: tuple[int, int, int]
+    # Keys of cached results hit, for the owner of the cache to refresh on eviction
+    cache_hits: Optional[tuple[list[tuple[str, int]], list[tuple[bytes, int]]]]
+
+_worker_state: Optional[_WorkerState] = None
+
+def _initialize_worker(state: _WorkerState) -> None:
+    global _worker_state
+    _worker_state = state
+    _set_auto_thresholds(*state.auto_thresholds)
+    _set_sniff_options(*state.sniff_options)
+    _set_split_options(*state.split_options)
+    # Forked workers inherit the counts of their parent, which reports its own
+    _skipped_files(True)
+
+def _scan_directory(path: str, depth: int, detailed: bool) -> _DirectoryResult:
+    '''
+    Parse files directly under a directory, and collect subdirectories to be scanned next.
+    Mirrors the traversal rules of the serial parsing functions for a single level
+    '''
+    assert _worker_state is not None
+    (symbol_mapping, file_parsing_function,
+     file_filter_function, directory_filter_function,
+     minimum_characters, cache, *_) = _worker_state
+
+    total = loc = 0
+    languages: dict[str, list[int]] = {}
+    order: list[Union[str, tuple[str, str]]] = []
+    files: Optional[dict[str, dict[str, int]]] = {} if detailed else None
+    batch: list[tuple[str, LanguageMetadata]] = []
+    extensions: list[str] = []
+
+    with os.scandir(path) as directory_iterator:
+        for dir_entry in directory_iterator:
+            if dir_entry.is_symlink(): continue
+            if dir_entry.is_file(follow_symlinks=False):
+                extension = dir_entry.name.rsplit(".", 1)[-1]
+                if not file_filter_function(dir_entry.path, extension):
+                    continue
+
+                comment_data: LanguageMetadata = symbol_mapping.get(extension, (None, None, None))
+                if not (comment_data[0] or comment_data[1]):
+                    continue
+
+                if extension not in languages:
+                    languages[extension] = [0, 0, 0]
+                    order.append(extension)
+                batch.append((dir_entry.path, comment_data))
+                extensions.append(extension)
+                continue
+
+            if detailed:
+                if (depth
+                    and dir_entry.is_dir()
+                    and directory_filter_function(dir_entry.path)):
+                    order.append((dir_entry.name, dir_entry.path))
+                continue
+
+            if not depth:
+                break
+            if not directory_filter_function(dir_entry.path):
+                continue
+            order.append((dir_entry.name, dir_entry.path))
+
+    counts: Sequence[int] = parse_file_batch(batch, file_parsing_function, minimum_characters, cache)
+    cache_hits: Optional[tuple[list[tuple[str, int]], list[tuple[bytes, int]]]] = None
+    if cache is not None:
+        # Workers are never closed explicitly, write results back as each directory completes
+        cache.flush()
+        cache_hits = cache.take_hits()
+    for (filepath, _), extension, file_total, file_loc in zip(batch, extensions, counts[0::2], counts[1::2]):
+        total += file_total
+        loc += file_loc
+
+        language: list[int] = languages[extension]
+        language[0] += file_total
+        language[1] += file_loc
+        language[2] += 1
+
+        if files is not None:
+            files[filepath] = {"loc" : file_loc, "total_lines" : file_total}
+
+    return _DirectoryResult(total, loc, languages, order, files, _skipped_files(True), cache_hits)
+
+def _scan_tree(directory: str,
+               config: ClocConfig,
+               depth: int,
+               file_parsing_function: FileParsingFunction,
+               file_filter_function: Callable[[str, str], bool],
+               directory_filter_function: Callable[[str], bool],
+               minimum_characters: int,
+               detailed: bool,
+               jobs: Optional[int],
+               cache: Optional[ResultCache]) -> dict[str, _DirectoryResult]:
+    '''Scan every directory of the tree as a separate task, returning results keyed by directory path'''
+    state: _WorkerState = _WorkerState(dict(config.symbol_mapping),
+                                       file_parsing_function,
+                                       file_filter_function,
+                                       directory_filter_function,
+                                       minimum_characters,
+                                       cache,
+                                       (config.auto_mmap_threshold, config.auto_buffered_threshold),
+                                       _get_sniff_options(),
+                                       _get_split_options())
+
+    results: dict[str, _DirectoryResult] = {}
+    executor: Executor = ProcessPoolExecutor(max_workers=jobs or available_cpus(),
+                                             initializer=_initialize_worker,
+                                             initargs=(state,))
+    try:
+        pending: dict[Future[_DirectoryResult], tuple[str, int]] = {
+            executor.submit(_scan_directory, directory, depth, detailed) : (directory, depth)
+        }
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                path, path_depth = pending.pop(future)
+                result: _DirectoryResult = future.result()
+                results[path] = result
+                if any(result.skipped):
+                    _add_skipped_files(*result.skipped)
+                if cache is not None and result.cache_hits is not None:
+                    cache.add_hits(*result.cache_hits)
+                for item in result.order:
+                    if isinstance(item, tuple):
+                        pending[executor.submit(_scan_directory, item[1], path_depth-1, detailed)] = (item[1], path_depth-1)
+    except BaseException:
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    executor.shutdown()
+    return results
+
+def _merge_results(results: dict[str, _DirectoryResult],
+                   path: str,
+                   line_data: array,
+                   language_record: Optional[dict[str, dict[str, int]]]) -> None:
+    result: _DirectoryResult = results[path]
+    line_data[0] += result.total
+    line_data[1] += result.loc
+    for item in result.order:
+        if isinstance(item, tuple):
+            _merge_results(results, item[1], line_data, language_record)
+            continue
+        if language_record is None:
+            continue
+        record: dict[str, int] = language_record.setdefault(item, {"total" : 0, "loc" : 0, "files" : 0})
+        total, loc, files = result.languages[item]
+        record["total"] += total
+        record["loc"] += loc
+        record["files"] += files
+
+def _assemble_tree(results: dict[str, _DirectoryResult], path: str) -> dict[str, Any]:
+    result: _DirectoryResult = results[path]
+    subdirectories: dict[str, Any] = {}
+    directory_total, directory_loc = result.total, result.loc
+    for item in result.order:
+        if isinstance(item, tuple):
+            child: dict[str, Any] = _assemble_tree(results, item[1])
+            subdirectories[item[0]] = child
+            directory_total += child["total"]
+            directory_loc += child["loc"]
+
+    return {"files" : result.files,
+            "subdirectories" : subdirectories,
+            "total" : directory_total,
+            "loc" : directory_loc}
+
+def parse_directory_parallel(
+        directory: str,
+        config: ClocConfig,
+        line_data: array,
+        depth: int,
+        file_parsing_function: FileParsingFunction,
+        file_filter_function: Callable[[str, str], bool],
+        directory_filter_function: Callable[[str], bool],
+        minimum_characters: int = 0,
+        jobs: Optional[int] = None,
+        cache: Optional[ResultCache] = None) -> None:
+    '''
+    Parallel counterpart of parse_directory, distributing directories across a process pool.
+    Filter functions must be picklable
+
+    :param directory: Path of the top directory
+    :type directory: str
+
+    :param jobs: Number of worker processes, defaults to the CPUs available to this process
+    :type jobs: Optional[int]
+
+    :param cache: Result cache to consult, only files missing from it or changed since are parsed
+    :type cache: Optional[ResultCache]
+
+    :return: Passed line_data array is updated
+    :rtype: NoneType
+    '''
+    results: dict[str, _DirectoryResult] = _scan_tree(directory, config, depth,
+                                                      file_parsing_function,
+                                                      file_filter_function, directory_filter_function,
+                                                      minimum_characters, False, jobs, cache)
+    _merge_results(results, directory, line_data, None)
+
+def parse_directory_record_parallel(
+        directory: str,
+        config: ClocConfig,
+        line_data: array,
+        language_record: dict[str, dict[str, int]],
+        depth: int,
+        file_parsing_function: FileParsingFunction,
+        file_filter_function: Callable[[str, str], bool],
+        directory_filter_function: Callable[[str], bool],
+        minimum_characters: int = 0,
+        jobs: Optional[int] = None,
+        cache: Optional[ResultCache] = None) -> None:
+    '''
+    Parallel counterpart of parse_directory_record, distributing directories across a process pool.
+    Filter functions must be picklable
+
+    :param directory: Path of the top directory
+    :type directory: str
+
+    :param jobs: Number of worker processes, defaults to the CPUs available to this process
+    :type jobs: Optional[int]
+
+    :param cache: Result cache to consult, only files missing from it or changed since are parsed
+    :type cache: Optional[ResultCache]
+
+    :return: Passed line_data array and language_record mapping are updated
+    :rtype: NoneType
+    '''
+    results: dict[str, _DirectoryResult] = _scan_tree(directory, config, depth,
+                                                      file_parsing_function,
+                                                      file_filter_function, directory_filter_function,
+                                                      minimum_characters, False, jobs, cache)
+    _merge_results(results, directory, line_data, language_record)
+
+def parse_directory_verbose_parallel(
+        directory: str,
+        config: ClocConfig,
+        language_record: dict[str, dict[str, int]],
+        depth: int,
+        file_parsing_function: FileParsingFunction,
+        file_filter_function: Callable[[str, str], bool],
+        directory_filter_function: Callable[[str], bool],
+        minimum_characters: int = 0,
+        jobs: Optional[int] = None,
+        cache: Optional[ResultCache] = None) -> dict[str, Any]:
+    '''
+    Parallel counterpart of parse_directory_verbose, distributing directories across a process pool.
+    Filter functions must be picklable
+
+    :param directory: Path of the top directory
+    :type directory: str
+
+    :param jobs: Number of worker processes, defaults to the CPUs available to this process
+    :type jobs: Optional[int]
+
+    :param cache: Result cache to consult, only files missing from it or changed since are parsed
+    :type cache: Optional[ResultCache]
+
+    :return: Mapping of LOC and line information
+    :rtype: dict[str, Any]
+    '''
+    results: dict[str, _DirectoryResult] = _scan_tree(directory, config, depth,
+                                                      file_parsing_function,
+                                                      file_filter_function, directory_filter_function,
+                                                      minimum_characters, True, jobs, cache)
+    _merge_results(results, directory, array("Q", (0, 0)), language_record)
+    return _assemble_tree(results, directory)
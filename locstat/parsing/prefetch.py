@@ -0,0 +1,136 @@
+import os
+import time
+from collections import deque
+from typing import Callable, Final, Generator, Iterable, Iterator, Optional, TypeVar
+
+__all__ = ("DEFAULT_READ_AHEAD_DEPTH",
+           "READ_AHEAD_AVAILABLE",
+           "ReadAhead")
+
+# posix_fadvise is missing on macOS and Windows, where read-ahead is left to the kernel's own heuristics
+READ_AHEAD_AVAILABLE: Final[bool] = hasattr(os, "posix_fadvise")
+
+# Files advised ahead of the one being parsed when a scan starts
+DEFAULT_READ_AHEAD_DEPTH: Final[int] = 32
+# Smallest depth other than 0, at which no advice is given at all
+_MINIMUM_DEPTH: Final[int] = 4
+_MAXIMUM_DEPTH: Final[int] = 1024
+# Files consumed between adjustments of the depth
+_ADJUSTMENT_WINDOW: Final[int] = 256
+# Fraction by which throughput must drop for the direction to reverse, so that noise alone does not reverse it
+_TOLERANCE: Final[float] = 0.05
+
+_Item = TypeVar("_Item")
+
+class ReadAhead:
+    '''
+    Advises the kernel to read files into the page cache shortly before they are parsed, so that on cold caches
+    and network file systems their reads are already in flight while earlier files are being parsed.
+
+    The number of files advised ahead adapts to the throughput measured downstream: every _ADJUSTMENT_WINDOW files,
+    the depth is doubled or halved, keeping the direction while files consumed per second improve and reversing
+    it once they stop. Halving past _MINIMUM_DEPTH stops advising altogether, sparing system calls where advice
+    does not pay off, such as over warm caches. Advice is only a hint, so results are the same whatever the depth
+    '''
+
+    __slots__ = ("depth", "maximum_depth", "advised",
+                 "_growing", "_throughput", "_window_files", "_window_start")
+
+    def __init__(self, depth: int = DEFAULT_READ_AHEAD_DEPTH, maximum_depth: int = _MAXIMUM_DEPTH) -> None:
+        if not 0 <= depth <= maximum_depth:
+            raise ValueError(f"Expected 0 <= depth <= maximum_depth, got {depth} and {maximum_depth}")
+        self.depth: int = depth
+        self.maximum_depth: int = maximum_depth
+        # Files advised over the lifetime of this instance
+        self.advised: int = 0
+        self._growing: bool = True
+        self._throughput: float = 0.0
+        self._window_files: int = 0
+        self._window_start: float = time.perf_counter()
+
+    def advise(self, filepath: str) -> bool:
+        '''
+        Start reading a file into the page cache without waiting for it
+
+        :param filepath: Path of the file
+        :type filepath: str
+
+        :return: Whether the kernel was advised, False if the file could not be opened or advice is unavailable
+        :rtype: bool
+        '''
+        if not READ_AHEAD_AVAILABLE:
+            return False
+        try:
+            descriptor: int = os.open(filepath, os.O_RDONLY)
+        except OSError:     # Left for the parser to report, or skip
+            return False
+        try:
+            os.posix_fadvise(descriptor, 0, 0, os.POSIX_FADV_WILLNEED)
+        except OSError:
+            return False
+        finally:
+            os.close(descriptor)
+        self.advised += 1
+        return True
+
+    def consumed(self) -> None:
+        '''Account for a file having been handed on for parsing, adjusting the depth once a window is complete'''
+        self._window_files += 1
+        if self._window_files < _ADJUSTMENT_WINDOW:
+            return
+        now: float = time.perf_counter()
+        elapsed: float = now - self._window_start
+        throughput: float = self._window_files / elapsed if elapsed > 0 else float("inf")
+        if throughput < self._throughput * (1 - _TOLERANCE):
+            self._growing = not self._growing
+        self._throughput = throughput
+        if self._growing:
+            self.depth = min(max(self.depth * 2, _MINIMUM_DEPTH), self.maximum_depth)
+        else:
+            self.depth = self.depth // 2 if self.depth > _MINIMUM_DEPTH else 0
+        self._window_files = 0
+        self._window_start = now
+
+    def pipeline(self, items: Iterable[_Item], filepath: Callable[[_Item], Optional[str]]) -> Iterator[_Item]:
+        '''
+        Yield items in the same order, advising the files of up to depth items beyond the one last yielded
+
+        :param items: Items to pass through, such as walk events
+        :type items: Iterable[_Item]
+
+        :param filepath: Path of the file an item stands for, None for items that are not read
+        :type filepath: Callable[[_Item], Optional[str]]
+
+        :return: The items, in order
+        :rtype: Iterator[_Item]
+        '''
+        if not READ_AHEAD_AVAILABLE:
+            yield from items
+            return
+
+        # Items pulled but not yet yielded, along with whether they stand for a file
+        pending: deque[tuple[_Item, bool]] = deque()
+        pending_files: int = 0
+        for item in items:
+            path: Optional[str] = filepath(item)
+            if path is not None:
+                if self.depth:
+                    self.advise(path)
+                pending_files += 1
+            pending.append((item, path is not None))
+            while pending_files > self.depth:
+                pending_files -= yield from self._release(pending)
+
+        while pending:
+            yield from self._release(pending)
+
+    def _release(self, pending: deque[tuple[_Item, bool]]) -> Generator[_Item, None, int]:
+        '''Yield pending items up to and including the first file, returning the number of files yielded'''
+        while pending:
+            item, is_file = pending.popleft()
+            if is_file:
+                self.consumed()
+            yield item
+            if is_file:
+                return 1
+        return 0
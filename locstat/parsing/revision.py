@@ -0,0 +1,281 @@
+import os
+import subprocess
+import threading
+from array import array
+from typing import IO, Any, Callable, Final, Iterator, Optional, Sequence
+
+from locstat.data_structures.config import ClocConfig
+from locstat.data_structures.typing import LanguageMetadata
+from locstat.parsing.extensions._parsing import _parse_bytes
+from locstat.parsing.git import _run_git
+
+__all__ = ("parse_revision",
+           "parse_revision_record",
+           "parse_revision_verbose")
+
+_FILE, _ENTER, _EXIT = range(3)
+# Executable and non-executable files, symlinks and submodules are skipped as in directory scans
+_BLOB_MODES: Final[frozenset[bytes]] = frozenset((b"100644", b"100755"))
+_INITIAL_BUFFER_SIZE: Final[int] = 1 << 20
+
+def _list_tree(directory: str, revision: str) -> list[tuple[str, bytes]]:
+    '''Paths relative to the directory and object IDs of all blobs under it in a revision'''
+    listing: Optional[bytes] = _run_git(directory, "ls-tree", "-r", "-z", revision)
+    if listing is None:
+        raise ValueError(f"Revision {revision} could not be read from {directory}")
+
+    entries: list[tuple[str, bytes]] = []
+    for line in listing.split(b"\0"):
+        if not line:
+            continue
+        metadata, relative_path = line.split(b"\t", 1)
+        mode, object_type, object_id = metadata.split(b" ")
+        if object_type == b"blob" and mode in _BLOB_MODES:
+            entries.append((os.fsdecode(relative_path), object_id))
+    return entries
+
+def _walk_tree(
+        entries: Sequence[tuple[str, bytes]],
+        directory: str,
+        config: ClocConfig,
+        depth: int,
+        file_filter_function: Callable[[str, str], bool],
+        directory_filter_function: Callable[[str], bool],
+        detailed: bool) -> Iterator[tuple[int, str, Optional[str], Any]]:
+    '''
+    Yield files to parse along with their object IDs, and entries into/exits out of subdirectories,
+    under the same traversal rules as the directory scans. Relies on git listing trees depth first.
+
+    Scans other than DETAILED stop reading a directory at the depth limit once they reach a subdirectory,
+    so which of its files are counted depends on the order its entries are listed in. That order is taken
+    from the revision alone, so that the same revision is always counted alike, whatever the work tree holds
+    '''
+    # Components of the subdirectory currently being walked, and the prefix of a rejected one
+    stack: list[str] = []
+    rejected: Optional[str] = None
+    # Directories at the depth limit in which the revision has listed a subdirectory so far
+    limited: set[str] = set()
+    for relative_path, object_id in entries:
+        if rejected is not None and relative_path.startswith(rejected):
+            continue
+        *components, name = relative_path.split("/")
+
+        shared: int = 0
+        while shared < min(len(stack), len(components)) and stack[shared] == components[shared]:
+            shared += 1
+        while len(stack) > shared:
+            yield (_EXIT, stack.pop(), None, None)
+
+        for component in components[shared:]:
+            if not depth - len(stack):
+                limited.add("/".join(stack))
+                rejected = "/".join((*stack, component, ""))
+                break
+            if not directory_filter_function(os.path.join(directory, *stack, component)):
+                rejected = "/".join((*stack, component, ""))
+                break
+            stack.append(component)
+            yield (_ENTER, component, None, None)
+        else:
+            filepath: str = os.path.join(directory, *components, name)
+            if not detailed and len(components) == depth and "/".join(components) in limited:
+                continue
+            extension: str = name.rsplit(".", 1)[-1]
+            if not file_filter_function(filepath, extension):
+                continue
+            comment_data: LanguageMetadata = config.symbol_mapping.get(extension, (None, None, None))
+            if not (comment_data[0] or comment_data[1]):
+                continue
+            yield (_FILE, filepath, extension, (comment_data, object_id))
+
+    while stack:
+        yield (_EXIT, stack.pop(), None, None)
+
+def _feed_object_ids(stream: IO[bytes], object_ids: Sequence[bytes]) -> None:
+    try:
+        with stream:
+            for object_id in object_ids:
+                stream.write(object_id + b"\n")
+    except OSError:     # git exited early, the reading side reports why
+        pass
+
+def _read_blobs(directory: str, object_ids: Sequence[bytes]) -> Iterator[memoryview]:
+    '''
+    Stream the contents of blobs in order through a single git cat-file process.
+    Each view is only valid until the next one is requested
+    '''
+    process = subprocess.Popen(("git", "cat-file", "--batch"), cwd=directory,
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    assert process.stdin is not None and process.stdout is not None
+    # Writing object IDs from another thread keeps both pipes from filling up at once
+    feeder = threading.Thread(target=_feed_object_ids, args=(process.stdin, object_ids), daemon=True)
+    feeder.start()
+
+    buffer: bytearray = bytearray(_INITIAL_BUFFER_SIZE)
+    try:
+        for object_id in object_ids:
+            header: list[bytes] = process.stdout.readline().split()
+            if len(header) != 3 or header[1] != b"blob":
+                raise ValueError(f"Object {object_id.decode()} could not be read")
+            size: int = int(header[2])
+            if size > len(buffer):
+                buffer = bytearray(max(size, 2 * len(buffer)))
+            with memoryview(buffer) as view, view[:size] as contents:
+                if process.stdout.readinto(contents) != size or process.stdout.read(1) != b"\n":
+                    raise ValueError(f"Object {object_id.decode()} was truncated")
+                yield contents
+    finally:
+        process.stdout.close()
+        process.kill()
+        process.wait()
+        feeder.join()
+
+def _parse_tree(
+        directory: str,
+        revision: str,
+        config: ClocConfig,
+        depth: int,
+        file_filter_function: Callable[[str, str], bool],
+        directory_filter_function: Callable[[str], bool],
+        minimum_characters: int,
+        detailed: bool) -> Iterator[tuple[int, str, Optional[str], tuple[int, int]]]:
+    '''Walk events of a revision, along with file counts in walk order'''
+    events: list[tuple[int, str, Optional[str], Any]] = list(_walk_tree(_list_tree(directory, revision),
+                                                                        directory, config, depth,
+                                                                        file_filter_function,
+                                                                        directory_filter_function,
+                                                                        detailed))
+    blobs: Iterator[memoryview] = _read_blobs(directory, [file_data[1] for kind, _, _, file_data in events
+                                                          if kind == _FILE])
+    try:
+        for kind, name, extension, file_data in events:
+            if kind != _FILE:
+                yield (kind, name, extension, (0, 0))
+                continue
+            comment_data, _ = file_data
+            yield (kind, name, extension, _parse_bytes(next(blobs), *comment_data, minimum_characters))
+    finally:
+        blobs.close()
+
+def parse_revision(
+        directory: str,
+        revision: str,
+        config: ClocConfig,
+        line_data: array,
+        depth: int,
+        file_filter_function: Callable[[str, str], bool],
+        directory_filter_function: Callable[[str], bool],
+        minimum_characters: int = 0) -> None:
+    '''
+    Counterpart of parse_directory for a git revision, reading files from the repository
+    rather than the work tree, without checking them out
+
+    :param directory: Path of the top directory, within a git work tree
+    :type directory: str
+
+    :param revision: Commit, tag, branch or tree to scan, as understood by git
+    :type revision: str
+
+    :raises ValueError: If the revision or its contents could not be read
+
+    :return: Passed line_data array is updated
+    :rtype: NoneType
+    '''
+    for _, _, _, (file_total, file_loc) in _parse_tree(directory, revision, config, depth,
+                                                       file_filter_function, directory_filter_function,
+                                                       minimum_characters, False):
+        line_data[0] += file_total
+        line_data[1] += file_loc
+
+def parse_revision_record(
+        directory: str,
+        revision: str,
+        config: ClocConfig,
+        line_data: array,
+        language_record: dict[str, dict[str, int]],
+        depth: int,
+        file_filter_function: Callable[[str, str], bool],
+        directory_filter_function: Callable[[str], bool],
+        minimum_characters: int = 0) -> None:
+    '''
+    Counterpart of parse_directory_record for a git revision, reading files from the repository
+    rather than the work tree, without checking them out
+
+    :param directory: Path of the top directory, within a git work tree
+    :type directory: str
+
+    :param revision: Commit, tag, branch or tree to scan, as understood by git
+    :type revision: str
+
+    :raises ValueError: If the revision or its contents could not be read
+
+    :return: Passed line_data array and language_record mapping are updated
+    :rtype: NoneType
+    '''
+    for kind, _, extension, (file_total, file_loc) in _parse_tree(directory, revision, config, depth,
+                                                                  file_filter_function,
+                                                                  directory_filter_function,
+                                                                  minimum_characters, False):
+        if kind != _FILE:
+            continue
+        assert extension is not None
+        line_data[0] += file_total
+        line_data[1] += file_loc
+        record: dict[str, int] = language_record.setdefault(extension, {"total" : 0, "loc" : 0, "files" : 0})
+        record["total"] += file_total
+        record["loc"] += file_loc
+        record["files"] += 1
+
+def parse_revision_verbose(
+        directory: str,
+        revision: str,
+        config: ClocConfig,
+        language_record: dict[str, dict[str, int]],
+        depth: int,
+        file_filter_function: Callable[[str, str], bool],
+        directory_filter_function: Callable[[str], bool],
+        minimum_characters: int = 0) -> dict[str, Any]:
+    '''
+    Counterpart of parse_directory_verbose for a git revision, reading files from the repository
+    rather than the work tree, without checking them out. File paths are reported as if checked out
+
+    :param directory: Path of the top directory, within a git work tree
+    :type directory: str
+
+    :param revision: Commit, tag, branch or tree to scan, as understood by git
+    :type revision: str
+
+    :raises ValueError: If the revision or its contents could not be read
+
+    :return: Mapping of LOC and line information
+    :rtype: dict[str, Any]
+    '''
+    # Stack of (name, mapping) pairs for directories currently being populated
+    stack: list[tuple[str, dict[str, Any]]] = [("", {"files" : {}, "subdirectories" : {}, "total" : 0, "loc" : 0})]
+    for kind, name, extension, (file_total, file_loc) in _parse_tree(directory, revision, config, depth,
+                                                                     file_filter_function,
+                                                                     directory_filter_function,
+                                                                     minimum_characters, True):
+        if kind == _ENTER:
+            stack.append((name, {"files" : {}, "subdirectories" : {}, "total" : 0, "loc" : 0}))
+            continue
+        if kind == _EXIT:
+            child_name, child = stack.pop()
+            parent: dict[str, Any] = stack[-1][1]
+            parent["subdirectories"][child_name] = child
+            parent["total"] += child["total"]
+            parent["loc"] += child["loc"]
+            continue
+
+        assert extension is not None
+        record: dict[str, int] = language_record.setdefault(extension, {"total" : 0, "loc" : 0, "files" : 0})
+        record["total"] += file_total
+        record["loc"] += file_loc
+        record["files"] += 1
+
+        current: dict[str, Any] = stack[-1][1]
+        current["files"][name] = {"loc" : file_loc, "total_lines" : file_total}
+        current["total"] += file_total
+        current["loc"] += file_loc
+
+    return stack[0][1]
@@ -0,0 +1,40 @@
+import io
+from typing import Final
+
+from locstat.data_structures.typing import LanguageMetadata
+from locstat.parsing.extensions._parsing import Parser
+
+__all__ = ("DEFAULT_CHUNK_SIZE",
+           "parse_stream")
+
+DEFAULT_CHUNK_SIZE: Final[int] = 1 << 20
+
+def parse_stream(stream: io.BufferedIOBase,
+                 comment_data: LanguageMetadata,
+                 minimum_characters: int = 0,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE) -> tuple[int, int]:
+    '''
+    Count a binary stream read in fixed size chunks, such as a pipe or a decompressed file.
+    Memory use is bounded by the chunk size, regardless of the stream's length
+
+    :param stream: Binary stream positioned at the start of the file's contents, read until EOF
+    :type stream: io.BufferedIOBase
+
+    :param comment_data: Comment symbols of the file's language
+    :type comment_data: LanguageMetadata
+
+    :param minimum_characters: Minimum characters per line for it to be counted as a line of code
+    :type minimum_characters: int
+
+    :param chunk_size: Number of bytes read at a time
+    :type chunk_size: int
+
+    :return: Total lines and LOC
+    :rtype: tuple[int, int]
+    '''
+    parser: Parser = Parser(*comment_data, minimum_characters)
+    buffer: bytearray = bytearray(chunk_size)
+    with memoryview(buffer) as view:
+        while size := stream.readinto(view):
+            parser.feed(view[:size])
+    return parser.finish()
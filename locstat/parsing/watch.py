@@ -0,0 +1,397 @@
+import errno
+import os
+import stat
+import sys
+import time
+from typing import Any, Callable, Final, Iterable, Iterator, Optional
+
+from locstat.data_structures.config import ClocConfig
+from locstat.data_structures.typing import FileParsingFunction, LanguageMetadata
+from locstat.parsing.directory import parse_directory_stream
+
+__all__ = ("DirectoryWatch",
+           "inotify_available",
+           "watch_directory")
+
+class DirectoryWatch:
+    '''
+    Results of every file under a directory, along with totals per language and per directory,
+    kept up to date by counting changed files again and applying the difference to every aggregate.
+
+    Files and directories are counted under the same rules as parse_directory_stream, which performs
+    the initial scan, so that the aggregates always match those of a fresh scan
+    '''
+
+    __slots__ = ("directory", "config", "depth", "file_parsing_function", "file_filter_function",
+                 "directory_filter_function", "minimum_characters", "files", "directories", "language_record")
+
+    def __init__(self,
+                 directory: str,
+                 config: ClocConfig,
+                 depth: int,
+                 file_parsing_function: FileParsingFunction,
+                 file_filter_function: Callable[[str, str], bool] = lambda filename, extension : True,
+                 directory_filter_function: Callable[[str], bool] = lambda _: False,
+                 minimum_characters: int = 0,
+                 threads: bool = False,
+                 jobs: Optional[int] = None) -> None:
+        self.directory: str = os.path.abspath(directory)
+        self.config: ClocConfig = config
+        self.depth: int = depth
+        self.file_parsing_function: FileParsingFunction = file_parsing_function
+        self.file_filter_function: Callable[[str, str], bool] = file_filter_function
+        self.directory_filter_function: Callable[[str], bool] = directory_filter_function
+        self.minimum_characters: int = minimum_characters
+        # Path -> (extension, total, loc)
+        self.files: dict[str, tuple[str, int, int]] = {}
+        # Path -> [files directly within, total, loc], totals including subdirectories
+        self.directories: dict[str, list[int]] = {}
+        self.language_record: dict[str, dict[str, int]] = {}
+        self._scan(self.directory, depth, threads, jobs)
+
+    def _scan(self, directory: str, depth: int, threads: bool = False, jobs: Optional[int] = None) -> None:
+        '''Count a directory not yet known, along with its subdirectories up to the given depth'''
+        records: list[dict[str, Any]] = list(parse_directory_stream(directory, self.config, {}, depth,
+                                                                    self.file_parsing_function,
+                                                                    self.file_filter_function,
+                                                                    self.directory_filter_function,
+                                                                    self.minimum_characters,
+                                                                    threads, jobs))
+        # Directories are recorded after their contents, and must be in place before any file is added
+        for record in records:
+            if record["type"] == "directory":
+                self.directories[record["path"]] = [0, 0, 0]
+        for record in records:
+            if record["type"] == "file":
+                self._add(record["path"], record["extension"], record["total"], record["loc"])
+
+    def _apply(self, path: str, extension: str, total: int, loc: int, sign: int) -> None:
+        language: dict[str, int] = self.language_record.setdefault(extension, {"total" : 0, "loc" : 0, "files" : 0})
+        language["total"] += sign * total
+        language["loc"] += sign * loc
+        language["files"] += sign
+        if not language["files"]:
+            del self.language_record[extension]
+
+        directory: str = os.path.dirname(path)
+        self.directories[directory][0] += sign
+        while True:
+            record: list[int] = self.directories[directory]
+            record[1] += sign * total
+            record[2] += sign * loc
+            if directory == self.directory:
+                break
+            directory = os.path.dirname(directory)
+
+    def _add(self, path: str, extension: str, total: int, loc: int) -> None:
+        self.files[path] = (extension, total, loc)
+        self._apply(path, extension, total, loc, 1)
+
+    def _remove(self, path: str) -> bool:
+        result: Optional[tuple[str, int, int]] = self.files.pop(path, None)
+        if result is None:
+            return False
+        self._apply(path, *result, -1)
+        return True
+
+    def _level(self, directory: str) -> int:
+        return 0 if directory == self.directory else os.path.relpath(directory, self.directory).count(os.sep) + 1
+
+    def _refresh_directory(self, directory: str) -> int:
+        prefix: str = os.path.join(directory, "")
+        changed: int = 0
+        for path in [path for path in self.files if path.startswith(prefix)]:
+            changed += self._remove(path)
+        for path in [path for path in self.directories if path.startswith(prefix)]:
+            del self.directories[path]
+        if directory != self.directory:
+            self.directories.pop(directory, None)
+
+        # Walked into under the same rules as parse_directory_stream
+        level: int = self._level(directory)
+        if directory != self.directory and not (os.path.dirname(directory) in self.directories
+                                                and (self.depth < 0 or level <= self.depth)
+                                                and os.path.isdir(directory)
+                                                and not os.path.islink(directory)
+                                                and self.directory_filter_function(directory)):
+            return changed
+        try:
+            self._scan(directory, self.depth - level if self.depth >= 0 else self.depth)
+        except OSError:     # Removed again since
+            return changed
+        return changed + sum(path.startswith(prefix) for path in self.files)
+
+    def _refresh_file(self, path: str) -> int:
+        previous: Optional[tuple[str, int, int]] = self.files.get(path)
+        self._remove(path)
+        if os.path.dirname(path) not in self.directories:
+            return previous is not None
+        try:
+            if not stat.S_ISREG(os.lstat(path).st_mode):
+                return previous is not None
+        except OSError:
+            return previous is not None
+        extension: str = os.path.basename(path).rsplit(".", 1)[-1]
+        comment_data: LanguageMetadata = self.config.symbol_mapping.get(extension, (None, None, None))
+        if not (self.file_filter_function(path, extension) and (comment_data[0] or comment_data[1])):
+            return previous is not None
+        try:
+            total, loc = self.file_parsing_function(path, *comment_data, self.minimum_characters)
+        except OSError:
+            return previous is not None
+        self._add(path, extension, total, loc)
+        return previous != (extension, total, loc)
+
+    def update(self, paths: Iterable[str]) -> int:
+        '''
+        Count the given files and directories again, along with everything within the directories
+
+        :param paths: Paths that were created, modified or removed, including ones that are not counted
+        :type paths: Iterable[str]
+
+        :return: Number of files whose counts changed, appeared or disappeared
+        :rtype: int
+        '''
+        changed: int = 0
+        files: list[str] = []
+        # Outermost directories first, as refreshing one refreshes everything within it
+        for path in sorted(paths, key=lambda path: path.count(os.sep)):
+            if path == self.directory or path in self.directories or os.path.isdir(path):
+                if not os.path.join(path, "").startswith(os.path.join(self.directory, "")):
+                    continue
+                changed += self._refresh_directory(path)
+            else:
+                files.append(path)
+        for path in files:
+            changed += self._refresh_file(path)
+        return changed
+
+    def summary(self, detailed: bool = False) -> dict[str, Any]:
+        '''
+        Current totals, per language, and per directory if detailed
+
+        :return: Record of the form {"type" : "summary", "total", "loc", "languages"},
+        along with "directories" mapping paths to {"files", "total", "loc"} if detailed
+        :rtype: dict[str, Any]
+        '''
+        files, total, loc = self.directories[self.directory]
+        summary: dict[str, Any] = {"type" : "summary", "total" : total, "loc" : loc,
+                                   "languages" : {extension : dict(record)
+                                                  for extension, record in sorted(self.language_record.items())}}
+        if detailed:
+            summary["directories"] = {path : {"files" : record[0], "total" : record[1], "loc" : record[2]}
+                                      for path, record in sorted(self.directories.items())}
+        return summary
+
+class _PollingSource:
+    '''Detects changes by comparing the size, modification time and inode of every file between polls'''
+
+    __slots__ = ("watch", "signatures")
+
+    def __init__(self, watch: DirectoryWatch) -> None:
+        self.watch: DirectoryWatch = watch
+        self.signatures: dict[str, tuple[int, int, int]] = {}
+        self.changes(0)
+
+    def changes(self, timeout: float) -> set[str]:
+        time.sleep(timeout)
+        changed: set[str] = set()
+        signatures: dict[str, tuple[int, int, int]] = {}
+        for directory in list(self.watch.directories):
+            try:
+                with os.scandir(directory) as directory_iterator:
+                    for dir_entry in directory_iterator:
+                        if dir_entry.is_symlink():
+                            continue
+                        if dir_entry.is_dir(follow_symlinks=False):
+                            if dir_entry.path not in self.watch.directories:
+                                changed.add(dir_entry.path)
+                            continue
+                        try:
+                            stat_result: os.stat_result = dir_entry.stat(follow_symlinks=False)
+                        except OSError:
+                            continue
+                        signature: tuple[int, int, int] = (stat_result.st_size, stat_result.st_mtime_ns,
+                                                           stat_result.st_ino)
+                        signatures[dir_entry.path] = signature
+                        if self.signatures.get(dir_entry.path) != signature:
+                            changed.add(dir_entry.path)
+            except OSError:
+                changed.add(directory)
+        changed.update(path for path in self.signatures if path not in signatures)
+        self.signatures = signatures
+        return changed
+
+    def synchronize(self) -> None:
+        '''Directories are listed anew on every poll'''
+
+    def close(self) -> None:
+        '''Nothing to release'''
+
+# From <sys/inotify.h>
+_IN_MODIFY: Final[int] = 0x00000002
+_IN_CLOSE_WRITE: Final[int] = 0x00000008
+_IN_MOVED_FROM: Final[int] = 0x00000040
+_IN_MOVED_TO: Final[int] = 0x00000080
+_IN_CREATE: Final[int] = 0x00000100
+_IN_DELETE: Final[int] = 0x00000200
+_IN_DELETE_SELF: Final[int] = 0x00000400
+_IN_Q_OVERFLOW: Final[int] = 0x00004000
+_IN_IGNORED: Final[int] = 0x00008000
+_IN_ONLYDIR: Final[int] = 0x01000000
+_IN_DONT_FOLLOW: Final[int] = 0x02000000
+_IN_NONBLOCK: Final[int] = 0o4000
+_IN_CLOEXEC: Final[int] = 0o2000000
+_WATCH_MASK: Final[int] = (_IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+                           | _IN_DELETE_SELF | _IN_ONLYDIR | _IN_DONT_FOLLOW)
+
+def _libc() -> Any:
+    import ctypes
+    libc: Any = ctypes.CDLL(None, use_errno=True)
+    for function in (libc.inotify_init1, libc.inotify_add_watch, libc.inotify_rm_watch):
+        function.restype = ctypes.c_int
+    libc.inotify_add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+    return libc
+
+def inotify_available() -> bool:
+    '''Whether changes can be subscribed to with inotify, only available on Linux'''
+    if not sys.platform.startswith("linux"):
+        return False
+    try:
+        _libc().inotify_init1
+    except (OSError, AttributeError):
+        return False
+    return True
+
+class _InotifySource:
+    '''
+    Subscribes to changes within every directory counted, through inotify.
+    If the kernel drops events, the whole directory is counted again
+    '''
+
+    __slots__ = ("watch", "_libc", "_descriptor", "_watches", "_paths")
+
+    def __init__(self, watch: DirectoryWatch) -> None:
+        import ctypes
+        self.watch: DirectoryWatch = watch
+        self._libc: Any = _libc()
+        self._descriptor: int = self._libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self._descriptor < 0:
+            error: int = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        # Watch descriptors -> directories, and the reverse
+        self._watches: dict[int, str] = {}
+        self._paths: dict[str, int] = {}
+        try:
+            self.synchronize()
+        except OSError:
+            self.close()
+            raise
+
+    def synchronize(self) -> None:
+        '''Subscribe to directories counted since, and unsubscribe from those no longer counted'''
+        import ctypes
+        for path in [path for path in self._paths if path not in self.watch.directories]:
+            self._libc.inotify_rm_watch(self._descriptor, self._paths.pop(path))
+        for path in self.watch.directories:
+            if path in self._paths:
+                continue
+            watch_descriptor: int = self._libc.inotify_add_watch(self._descriptor, os.fsencode(path), _WATCH_MASK)
+            if watch_descriptor < 0:
+                error: int = ctypes.get_errno()
+                if error in (errno.ENOENT, errno.ENOTDIR):    # Removed since, its parent reports it
+                    continue
+                # Such as ENOSPC, once max_user_watches is reached
+                raise OSError(error, f"Could not watch {path}: {os.strerror(error)}")
+            self._watches[watch_descriptor] = path
+            self._paths[path] = watch_descriptor
+
+    def changes(self, timeout: float) -> set[str]:
+        import select
+        import struct
+        changed: set[str] = set()
+        readable, _, _ = select.select((self._descriptor,), (), (), timeout)
+        if not readable:
+            return changed
+        while True:
+            try:
+                data: bytes = os.read(self._descriptor, 64 * 1024)
+            except BlockingIOError:
+                return changed
+            offset: int = 0
+            while offset < len(data):
+                watch_descriptor, mask, _, length = struct.unpack_from("iIII", data, offset)
+                name: bytes = data[offset+16:offset+16+length].rstrip(b"\0")
+                offset += 16 + length
+                if mask & _IN_Q_OVERFLOW:
+                    changed.add(self.watch.directory)
+                    continue
+                directory: Optional[str] = self._watches.get(watch_descriptor)
+                if mask & _IN_IGNORED:
+                    if directory is not None and self._paths.get(directory) == watch_descriptor:
+                        del self._paths[directory]
+                    self._watches.pop(watch_descriptor, None)
+                    continue
+                if directory is None:
+                    continue
+                changed.add(os.path.join(directory, os.fsdecode(name)) if name else directory)
+
+    def close(self) -> None:
+        os.close(self._descriptor)
+
+def watch_directory(watch: DirectoryWatch,
+                    interval: float,
+                    polling: bool = False,
+                    detailed: bool = False) -> Iterator[dict[str, Any]]:
+    '''
+    Follow changes to a directory, yielding a summary once counted, then at most one per interval,
+    for intervals in which counts changed. Runs until the consumer stops
+
+    :param watch: Directory to follow, once counted
+    :type watch: DirectoryWatch
+
+    :param interval: Seconds between summaries, changes within an interval are counted together
+    :type interval: float
+
+    :param polling: Compare the files of every directory on each interval, instead of subscribing
+    to changes through inotify. Used regardless where inotify is not available, and needed on
+    network file systems, where changes made by other machines are not reported
+    :type polling: bool
+
+    :param detailed: Include totals per directory in summaries
+    :type detailed: bool
+
+    :return: Summaries, see DirectoryWatch.summary, along with the number of files "changed" since the last one
+    :rtype: Iterator[dict[str, Any]]
+    '''
+    source: Any = None
+    if not polling and inotify_available():
+        try:
+            source = _InotifySource(watch)
+        except OSError:
+            source = None
+    if source is None:
+        source = _PollingSource(watch)
+
+    try:
+        yield {**watch.summary(detailed), "changed" : len(watch.files)}
+        pending: set[str] = set()
+        deadline: float = time.monotonic() + interval
+        while True:
+            pending |= source.changes(max(0.0, deadline - time.monotonic()))
+            if time.monotonic() < deadline:
+                continue
+            deadline = time.monotonic() + interval
+            if not pending:
+                continue
+            changed: int = watch.update(pending)
+            pending.clear()
+            try:
+                source.synchronize()
+            except OSError:     # Out of watches, such as after a large directory was added
+                source.close()
+                source = _PollingSource(watch)
+            if changed:
+                yield {**watch.summary(detailed), "changed" : changed}
+    finally:
+        source.close()
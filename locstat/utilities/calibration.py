@@ -0,0 +1,132 @@
+import os
+import tempfile
+import time
+from typing import Final, Mapping, Optional, Sequence
+
+from locstat.data_structures.parse_modes import ParseMode
+from locstat.data_structures.typing import LanguageMetadata
+from locstat.parsing.extensions._parsing import _parse_files
+
+__all__ = ("CALIBRATION_SIZES",
+           "measure_parse_modes",
+           "choose_thresholds",
+           "calibrate")
+
+# File sizes measured, in bytes. Files larger than the largest of these are always read in chunks
+CALIBRATION_SIZES: Final[tuple[int, ...]] = tuple(1 << shift for shift in range(8, 25, 2))
+# Bytes written per size, spread over as many files as it takes
+_BYTES_PER_SIZE: Final[int] = 1 << 23
+_MAX_FILES_PER_SIZE: Final[int] = 256
+
+_COMMENT_DATA: Final[LanguageMetadata] = (b"//", b"/*", b"*/")
+_SAMPLE: Final[bytes] = b"".join((b"/* Synthetic source used to time parsing modes\n",
+                                  b" * spanning a few lines */\n",
+                                  b"static int counter = 0;\n",
+                                  b"\n",
+                                  b"int increment(int step) {\n",
+                                  b"    // Comments share lines with code too\n",
+                                  b"    counter += step; /* inline */\n",
+                                  b"    return counter;\n",
+                                  b"}\n"))
+
+def _calibration_modes() -> tuple[ParseMode, ...]:
+    # Memory mapping is not supported for parsing on Windows
+    if os.name == "nt":
+        return (ParseMode.COMPLETE, ParseMode.BUFFERED)
+    return (ParseMode.COMPLETE, ParseMode.MMAP, ParseMode.BUFFERED)
+
+def _write_corpus(directory: str, size: int) -> list[tuple[str, LanguageMetadata]]:
+    contents: bytes = (_SAMPLE * (size // len(_SAMPLE) + 1))[:size]
+    files: list[tuple[str, LanguageMetadata]] = []
+    for index in range(max(1, min(_MAX_FILES_PER_SIZE, _BYTES_PER_SIZE // size))):
+        filepath: str = os.path.join(directory, f"{size}_{index}.c")
+        with open(filepath, "wb") as file:
+            file.write(contents)
+        files.append((filepath, _COMMENT_DATA))
+    return files
+
+def measure_parse_modes(directory: str,
+                        sizes: Sequence[int] = CALIBRATION_SIZES,
+                        repeat: int = 3) -> dict[ParseMode, list[float]]:
+    '''
+    Time every parsing mode over synthetic files of each size, written to the given directory
+
+    :param directory: Directory to write files into, ideally on the file system that is usually scanned
+    :type directory: str
+
+    :param sizes: File sizes to measure, in ascending order
+    :type sizes: Sequence[int]
+
+    :param repeat: Times each measurement is repeated, keeping the fastest to filter out noise
+    :type repeat: int
+
+    :return: Seconds per byte of each mode, for each size in the order given
+    :rtype: dict[ParseMode, list[float]]
+    '''
+    timings: dict[ParseMode, list[float]] = {parse_mode : [] for parse_mode in _calibration_modes()}
+    for size in sizes:
+        files: list[tuple[str, LanguageMetadata]] = _write_corpus(directory, size)
+        for parse_mode, mode_timings in timings.items():
+            best: float = float("inf")
+            for _ in range(repeat):
+                epoch: float = time.perf_counter()
+                _parse_files(files, 0, parse_mode)
+                best = min(best, time.perf_counter() - epoch)
+            mode_timings.append(best / (size * len(files)))
+        for filepath, _ in files:
+            os.remove(filepath)
+    return timings
+
+def choose_thresholds(sizes: Sequence[int],
+                      timings: Mapping[ParseMode, Sequence[float]]) -> tuple[int, int]:
+    '''
+    Choose AUTO thresholds such that the smallest files are read whole, the medium sized ones are mapped into
+    memory and the largest are read in chunks, minimising the total time measured across all sizes
+
+    :param sizes: File sizes measured, in ascending order
+    :type sizes: Sequence[int]
+
+    :param timings: Seconds per byte of each mode, for each size. MMAP may be absent
+    :type timings: Mapping[ParseMode, Sequence[float]]
+
+    :return: File sizes from which MMAP, and then BUF parsing are used
+    :rtype: tuple[int, int]
+    '''
+    count: int = len(sizes)
+    # Sizes beyond those measured are read in chunks, keeping memory use bounded
+    boundaries: list[int] = [*sizes, sizes[-1] * 2]
+    complete: Sequence[float] = timings[ParseMode.COMPLETE]
+    buffered: Sequence[float] = timings[ParseMode.BUFFERED]
+    mapped: Optional[Sequence[float]] = timings.get(ParseMode.MMAP)
+
+    best_cost: float = float("inf")
+    best_split: tuple[int, int] = (0, 0)
+    for mmap_index in range(count + 1):
+        for buffered_index in range(mmap_index, count + 1):
+            # Without MMAP timings, files go straight from being read whole to being read in chunks
+            if mapped is None and buffered_index != mmap_index:
+                break
+            cost: float = (sum(complete[:mmap_index])
+                           + sum((mapped or ())[mmap_index:buffered_index])
+                           + sum(buffered[buffered_index:]))
+            if cost < best_cost:
+                best_cost, best_split = cost, (mmap_index, buffered_index)
+
+    return boundaries[best_split[0]], boundaries[best_split[1]]
+
+def calibrate(directory: Optional[str] = None, repeat: int = 3) -> tuple[int, int]:
+    '''
+    Measure parsing modes on this machine and choose thresholds for AUTO parsing
+
+    :param directory: Directory to create temporary files under, the system's temporary directory if None
+    :type directory: Optional[str]
+
+    :param repeat: Times each measurement is repeated
+    :type repeat: int
+
+    :return: File sizes from which MMAP, and then BUF parsing are used
+    :rtype: tuple[int, int]
+    '''
+    with tempfile.TemporaryDirectory(prefix="locstat_calibration_", dir=directory) as corpus:
+        timings: dict[ParseMode, list[float]] = measure_parse_modes(corpus, CALIBRATION_SIZES, repeat)
+    return choose_thresholds(CALIBRATION_SIZES, timings)
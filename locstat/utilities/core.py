@@ -1,15 +1,54 @@
-from typing import Callable, Literal, Optional
+import os
+from functools import partial
+from typing import Callable, Final, Literal, Optional
 
 from locstat.data_structures.parse_modes import ParseMode
 from locstat.data_structures.typing import SupportsMembershipChecks, FileParsingFunction
 from locstat.parsing.extensions._parsing import (_parse_file_vm_map,
                                               _parse_file,
-                                              _parse_file_no_chunk)
+                                              _parse_file_no_chunk,
+                                              _parse_file_auto)
 
-__all__ = ("construct_file_filter",
+__all__ = ("SKIP_REASONS",
+           "available_cpus",
+           "construct_file_filter",
            "construct_directory_filter",
+           "restrict_file_filter",
+           "restrict_directory_filter",
            "derive_file_parser")
 
+# Reasons for which --skip-generated skips files, in the order their counts are returned by _skipped_files
+SKIP_REASONS: Final[tuple[str, ...]] = ("binary", "long_lines", "generated")
+
+def available_cpus() -> int:
+    '''Number of CPUs usable by the current process'''
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # Not available on Windows and macOS
+        return os.cpu_count() or 1
+
+def _file_filter(extension_set: SupportsMembershipChecks[str],
+                 file_set: SupportsMembershipChecks[str],
+                 include_file: bool,
+                 exclude_file: bool,
+                 include_type: bool,
+                 exclude_type: bool,
+                 file: str,
+                 extension: str) -> bool:
+    file_match = (
+        True if not (include_file or exclude_file)
+        else file in file_set if include_file
+        else file not in file_set
+    )
+
+    type_match = (
+        True if not (include_type or exclude_type)
+        else extension in extension_set if include_type
+        else extension not in extension_set
+    )
+
+    return file_match and type_match
+
 def construct_file_filter(extension_set: Optional[SupportsMembershipChecks[str]] = None,
                           file_set: Optional[SupportsMembershipChecks[str]] = None,
                           include_file: bool = False,
@@ -20,37 +59,57 @@ def construct_file_filter(extension_set: Optional[SupportsMembershipChecks[str]]
         extension_set = {}
     if file_set is None:
         file_set = {}
-    
-    def file_filter(file: str, extension: str) -> bool:
-        file_match = (
-            True if not (include_file or exclude_file)
-            else file in file_set if include_file
-            else file not in file_set
-        )
-
-        type_match = (
-            True if not (include_type or exclude_type)
-            else extension in extension_set if include_type
-            else extension not in extension_set
-        )
-
-        return file_match and type_match
-    
-    return file_filter
+
+    # Partials over module-level functions (rather than closures) keep filters picklable,
+    # allowing them to be shipped to worker processes
+    return partial(_file_filter, extension_set, file_set,
+                   include_file, exclude_file, include_type, exclude_type)
+
+def _directory_excluded(directories: SupportsMembershipChecks[str], directory: str) -> bool:
+    return directory not in directories
+
+def _directory_included(directories: SupportsMembershipChecks[str], directory: str) -> bool:
+    return directory in directories
+
+def _allow_all(directory: str) -> bool:
+    return True
 
 def construct_directory_filter(directories: SupportsMembershipChecks[str],
                                exclude: bool = False,
                                include: bool = False) -> Callable[[str], bool]:
     if exclude:
-        return lambda directory : directory not in directories
+        return partial(_directory_excluded, directories)
     elif include:
-        return lambda directory : directory in directories
-    return lambda directory : True
+        return partial(_directory_included, directories)
+    return _allow_all
+
+def _restricted_file(file_filter_function: Callable[[str, str], bool],
+                     allowed: Callable[[str], bool],
+                     filepath: str,
+                     extension: str) -> bool:
+    return file_filter_function(filepath, extension) and allowed(filepath)
+
+def _restricted_directory(directory_filter_function: Callable[[str], bool],
+                          allowed: Callable[[str], bool],
+                          directory: str) -> bool:
+    return directory_filter_function(directory) and allowed(directory)
+
+def restrict_file_filter(file_filter_function: Callable[[str, str], bool],
+                         allowed: Callable[[str], bool]) -> Callable[[str, str], bool]:
+    '''Wrap a file filter to also reject files by their path, e.g. by a bound method of picklable rules'''
+    return partial(_restricted_file, file_filter_function, allowed)
+
+def restrict_directory_filter(directory_filter_function: Callable[[str], bool],
+                              allowed: Callable[[str], bool]) -> Callable[[str], bool]:
+    '''Wrap a directory filter to also reject directories by their path'''
+    return partial(_restricted_directory, directory_filter_function, allowed)
 
 def derive_file_parser(option: ParseMode) -> FileParsingFunction:
     if option == ParseMode.MMAP:
         return _parse_file_vm_map
     elif option == ParseMode.COMPLETE:
         return _parse_file_no_chunk
+    elif option == ParseMode.AUTO:
+        return _parse_file_auto
     return _parse_file
     
\ No newline at end of file
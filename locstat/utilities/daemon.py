@@ -0,0 +1,392 @@
+import os
+import stat
+import sys
+from pathlib import Path
+from typing import Any, Callable, Final, Mapping, Optional, Sequence, Union
+
+from locstat import __tool_name__, __version__
+
+__all__ = ("default_socket_path",
+           "forward",
+           "request",
+           "serve")
+
+# json and socket are imported within functions, as every run of the CLI looks for a daemon,
+# most of them finding none
+
+# Standard input, output and error, handed to the daemon along with each scan request
+_CLIENT_DESCRIPTORS: Final[tuple[int, int, int]] = (0, 1, 2)
+_RECEIVE_SIZE: Final[int] = 64 * 1024
+# Seconds a connection may take to send its request, so that a stalled client cannot hold on to a thread
+_RECEIVE_TIMEOUT: Final[float] = 5.0
+# Seconds a scan request waits for the one in progress, after which its client is told to scan by itself
+_BUSY_TIMEOUT: Final[float] = 2.0
+
+def default_socket_path() -> Path:
+    '''
+    Per user location of the daemon's socket, overridden by the LOCSTAT_SOCKET environment variable.
+    Without a runtime directory, the socket is kept in a directory of the user's own under the temporary one
+    '''
+    override: Optional[str] = os.environ.get("LOCSTAT_SOCKET")
+    if override:
+        return Path(override)
+    runtime_directory: Optional[str] = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_directory:
+        return Path(runtime_directory) / f"{__tool_name__}.sock"
+    return Path(os.environ.get("TMPDIR") or "/tmp") / f"{__tool_name__}-{os.getuid()}" / f"{__tool_name__}.sock"
+
+def _owned_socket(socket_path: Union[str, os.PathLike[str]]) -> Optional[os.stat_result]:
+    '''Status of a path if it is a socket of the current user's, None if missing or anything else'''
+    try:
+        stat_result: os.stat_result = os.lstat(socket_path)
+    except OSError:
+        return None
+    if not stat.S_ISSOCK(stat_result.st_mode) or stat_result.st_uid != os.getuid():
+        return None
+    return stat_result
+
+def _peer_uid(connection: Any) -> Optional[int]:
+    '''User at the other end of a Unix socket, None where the platform does not tell'''
+    import socket
+    import struct
+    if not hasattr(socket, "SO_PEERCRED"):
+        return None
+    credentials: bytes = connection.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+    return struct.unpack("3i", credentials)[1]
+
+def _connect(socket_path: Union[str, os.PathLike[str]]) -> Any:
+    '''
+    Connect to a daemon of the current user's. Other users could otherwise stand in for it, receiving the
+    client's standard streams, by placing a socket where it is looked for
+
+    :raises OSError: If no socket of the current user's is listening on the path, or another user answers
+    '''
+    if _owned_socket(socket_path) is None:
+        raise PermissionError(f"{os.fspath(socket_path)} is not a socket of the current user's")
+    import socket
+    connection: socket.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(os.fspath(socket_path))
+        if _peer_uid(connection) not in (None, os.getuid()):
+            raise PermissionError(f"{os.fspath(socket_path)} is served by another user")
+    except OSError:
+        connection.close()
+        raise
+    return connection
+
+def _send(connection: Any, message: Mapping[str, Any], descriptors: Sequence[int] = ()) -> None:
+    import json
+    import socket
+    payload: bytes = json.dumps(message).encode() + b"\n"
+    sent: int = socket.send_fds(connection, [payload], descriptors) if descriptors else 0
+    if sent < len(payload):
+        connection.sendall(payload[sent:])
+
+def _receive(connection: Any) -> tuple[Any, list[int]]:
+    '''Read a single message terminated by a newline, along with any descriptors sent with its first bytes'''
+    import json
+    import socket
+    data, descriptors, *_ = socket.recv_fds(connection, _RECEIVE_SIZE, len(_CLIENT_DESCRIPTORS))
+    chunks: list[bytes] = [data]
+    while data and not data.endswith(b"\n"):
+        data = connection.recv(_RECEIVE_SIZE)
+        chunks.append(data)
+    try:
+        return json.loads(b"".join(chunks)), descriptors
+    except ValueError:
+        for descriptor in descriptors:
+            os.close(descriptor)
+        raise
+
+def request(message: Mapping[str, Any], socket_path: Union[str, os.PathLike[str]]) -> dict[str, Any]:
+    '''
+    Send a single message to the daemon and return its response
+
+    :param message: Request, such as {"command" : "status"}
+    :type message: Mapping[str, Any]
+
+    :param socket_path: Socket the daemon listens on
+    :type socket_path: Union[str, os.PathLike[str]]
+
+    :raises OSError: If no daemon of the current user's is listening on the socket
+
+    :return: The daemon's response
+    :rtype: dict[str, Any]
+    '''
+    with _connect(socket_path) as connection:
+        _send(connection, message)
+        response, _ = _receive(connection)
+    return response
+
+def forward(line: Sequence[str], socket_path: Optional[Union[str, os.PathLike[str]]] = None) -> Optional[int]:
+    '''
+    Run a command line on the daemon if one is listening, in the caller's working directory and with its
+    standard streams, so that its output is exactly that of running it locally
+
+    :param line: Arguments to the CLI
+    :type line: Sequence[str]
+
+    :param socket_path: Socket the daemon listens on, defaults to default_socket_path()
+    :type socket_path: Optional[Union[str, os.PathLike[str]]]
+
+    :return: Exit status of the command, None if it was not run because no daemon could take it
+    :rtype: Optional[int]
+    '''
+    if os.name == "nt":
+        return None
+    # A scan waiting on a terminal would hold up the daemon until typed into, and gains nothing from it
+    if _reads_standard_input(line) and os.isatty(_CLIENT_DESCRIPTORS[0]):
+        return None
+    socket_path = socket_path or default_socket_path()
+    try:
+        connection: Any = _connect(socket_path)
+    except OSError:     # Missing, left behind by a daemon that did not shut down cleanly, or not the user's own
+        return None
+
+    with connection:
+        try:
+            _send(connection, {"command" : "scan", "version" : __version__,
+                               "argv" : list(line), "cwd" : os.getcwd()}, _CLIENT_DESCRIPTORS)
+        except OSError:
+            return None
+        try:
+            response, _ = _receive(connection)
+        except (OSError, ValueError) as error:
+            sys.stderr.write(f"Lost connection to the {__tool_name__} daemon at {socket_path}: {error}\n")
+            return 1
+    # Rejected without running, such as by a daemon of another version
+    if not isinstance(response, dict) or "status" not in response:
+        return None
+    return response["status"]
+
+def _reads_standard_input(line: Sequence[str]) -> bool:
+    for index, argument in enumerate(line):
+        if argument in ("-f-", "--file=-") or (argument in ("-f", "--file") and line[index+1:index+2] == ["-"]):
+            return True
+    return False
+
+def _run_scan(handler: Callable[[list[str]], int],
+              message: Mapping[str, Any],
+              descriptors: list[int]) -> dict[str, Any]:
+    '''
+    Run a scan request with the client's standard streams in place of the daemon's own.
+    Clients that send none, such as those without descriptor passing, get their output in the response
+    '''
+    import tempfile
+    import traceback
+    line: Any = message.get("argv")
+    cwd: Any = message.get("cwd")
+    if not (isinstance(line, list) and all(isinstance(argument, str) for argument in line)
+            and isinstance(cwd, str) and os.path.isabs(cwd)):
+        for descriptor in descriptors:
+            os.close(descriptor)
+        return {"error" : "Scan requests need argv, a list of arguments, and cwd, an absolute path"}
+
+    outputs: list[Any] = []
+    if len(descriptors) != len(_CLIENT_DESCRIPTORS):
+        for descriptor in descriptors:
+            os.close(descriptor)
+        outputs = [tempfile.TemporaryFile(), tempfile.TemporaryFile()]
+        descriptors = [os.open(os.devnull, os.O_RDONLY), *(os.dup(output.fileno()) for output in outputs)]
+
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved_descriptors: list[int] = [os.dup(descriptor) for descriptor in _CLIENT_DESCRIPTORS]
+    working_directory: str = os.getcwd()
+    status: int = 1
+    try:
+        for target, descriptor in zip(_CLIENT_DESCRIPTORS, descriptors):
+            os.dup2(descriptor, target)
+        try:
+            os.chdir(cwd)
+            status = handler(line)
+        except SystemExit as exit:
+            if exit.code is None or isinstance(exit.code, int):
+                status = exit.code or 0
+            else:
+                sys.stderr.write(f"{exit.code}\n")
+        except Exception:
+            traceback.print_exc()
+    finally:
+        for stream in (sys.stdout, sys.stderr):
+            # Output written with the descriptor closed by the handler is lost, as it would be locally
+            try:
+                stream.flush()
+            except OSError:
+                pass
+        os.chdir(working_directory)
+        for target, descriptor in zip(_CLIENT_DESCRIPTORS, saved_descriptors):
+            os.dup2(descriptor, target)
+            os.close(descriptor)
+        for descriptor in descriptors:
+            os.close(descriptor)
+
+    response: dict[str, Any] = {"status" : status}
+    for name, output in zip(("stdout", "stderr"), outputs):
+        with output:
+            output.seek(0)
+            response[name] = output.read().decode(errors="replace")
+    return response
+
+def _listening(socket_path: Path) -> bool:
+    import socket
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        try:
+            connection.connect(os.fspath(socket_path))
+        except OSError:
+            return False
+    return True
+
+def _terminate(*_) -> None:
+    sys.exit(0)
+
+class _Server:
+    '''
+    Connections answered on threads of their own, so that a client slow to send its request holds up no other.
+    Scans swap the process' standard streams and working directory for the client's, and so run one at a time
+    '''
+
+    __slots__ = ("handler", "socket_path", "status", "epoch", "served", "stopping", "scan_lock")
+
+    def __init__(self, handler: Callable[[list[str]], int],
+                 socket_path: Path,
+                 status: Optional[Callable[[], Mapping[str, Any]]]) -> None:
+        import threading
+        import time
+        self.handler: Callable[[list[str]], int] = handler
+        self.socket_path: Path = socket_path
+        self.status: Optional[Callable[[], Mapping[str, Any]]] = status
+        self.epoch: float = time.time()
+        self.served: int = 0
+        self.stopping: threading.Event = threading.Event()
+        self.scan_lock: threading.Lock = threading.Lock()
+
+    def answer(self, connection: Any) -> None:
+        with connection:
+            if _peer_uid(connection) not in (None, os.getuid()):
+                return
+            connection.settimeout(_RECEIVE_TIMEOUT)
+            try:
+                message, descriptors = _receive(connection)
+            except (OSError, ValueError):
+                return
+            try:
+                _send(connection, self._respond(message, descriptors))
+            except OSError:     # The client went away
+                pass
+        if self.stopping.is_set():
+            # Wakes the accepting thread up to notice
+            _listening(self.socket_path)
+
+    def _respond(self, message: Any, descriptors: list[int]) -> dict[str, Any]:
+        import time
+        command: Any = message.get("command") if isinstance(message, dict) else None
+        if command != "scan":
+            for descriptor in descriptors:
+                os.close(descriptor)
+        if command == "stop":
+            self.stopping.set()
+            return {"status" : 0}
+        if command == "status":
+            return {"pid" : os.getpid(), "version" : __version__,
+                    "uptime" : f"{time.time()-self.epoch:.0f}s", "requests" : self.served,
+                    **(self.status() if self.status is not None else {})}
+        if command != "scan":
+            return {"error" : f"Unknown command {command!r}, expected scan, status or stop"}
+        if message.get("version", __version__) != __version__:
+            for descriptor in descriptors:
+                os.close(descriptor)
+            return {"error" : f"Daemon runs {__tool_name__} {__version__}, not {message['version']}"}
+        line: Any = message.get("argv")
+        if (isinstance(line, list) and _reads_standard_input(line)
+            and len(descriptors) == len(_CLIENT_DESCRIPTORS) and os.isatty(descriptors[0])):
+            for descriptor in descriptors:
+                os.close(descriptor)
+            return {"error" : "Scans of standard input from a terminal are not run by the daemon"}
+        if not self.scan_lock.acquire(timeout=_BUSY_TIMEOUT):
+            for descriptor in descriptors:
+                os.close(descriptor)
+            return {"error" : "Busy with another scan"}
+        try:
+            response: dict[str, Any] = _run_scan(self.handler, message, descriptors)
+            self.served += "status" in response
+        finally:
+            self.scan_lock.release()
+        return response
+
+def serve(handler: Callable[[list[str]], int],
+          socket_path: Union[str, os.PathLike[str]],
+          status: Optional[Callable[[], Mapping[str, Any]]] = None) -> int:
+    '''
+    Answer requests on a Unix socket until stopped, each connection on a thread of its own and one scan at a time.
+    Scan requests that wait on another scan for more than _BUSY_TIMEOUT seconds are turned down,
+    leaving their clients to scan by themselves.
+
+    Each request is a JSON object on a single line, answered with another:
+    - {"command" : "scan", "argv" : [...], "cwd" : "/absolute/path", "version" : "..."} runs the CLI with the
+      given arguments, sent with the client's standard input, output and error descriptors. The response is
+      {"status" : exit_status}, along with "stdout" and "stderr" as text if no descriptors were sent.
+      Requests from clients of another version are answered with {"error" : "..."} and not run
+    - {"command" : "status"} returns the daemon's process ID, version, uptime and requests served
+    - {"command" : "stop"} shuts the daemon down
+
+    :param handler: Runs a command line in this process, returning its exit status
+    :type handler: Callable[[list[str]], int]
+
+    :param socket_path: Socket to listen on, only accessible to the current user
+    :type socket_path: Union[str, os.PathLike[str]]
+
+    :param status: Additional fields for status responses
+    :type status: Optional[Callable[[], Mapping[str, Any]]]
+
+    :return: Exit status, 1 if another daemon already listens on the socket or the path is not the user's to use
+    :rtype: int
+    '''
+    import signal
+    import socket
+    import threading
+    socket_path = Path(socket_path)
+    if _listening(socket_path):
+        sys.stderr.write(f"A {__tool_name__} daemon is already listening on {socket_path}\n")
+        return 1
+    if os.path.lexists(socket_path):
+        if _owned_socket(socket_path) is None:
+            sys.stderr.write(f"{socket_path} exists and is not a socket of the current user's, leaving it in place\n")
+            return 1
+        socket_path.unlink()
+    # Created for the user alone, while a directory of anyone else's could have the socket swapped out from it
+    socket_path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+    directory: os.stat_result = os.stat(socket_path.parent)
+    if (directory.st_uid not in (0, os.getuid())
+        or (directory.st_mode & (stat.S_IWGRP | stat.S_IWOTH) and not directory.st_mode & stat.S_ISVTX)):
+        sys.stderr.write(f"{socket_path.parent} is writable by other users, refusing to listen in it\n")
+        return 1
+
+    listener: socket.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    # Scans run with the daemon's permissions, so no other user may connect
+    umask: int = os.umask(0o177)
+    try:
+        listener.bind(os.fspath(socket_path))
+    finally:
+        os.umask(umask)
+    bound: os.stat_result = os.lstat(socket_path)
+    listener.listen()
+    signal.signal(signal.SIGTERM, _terminate)
+    sys.stderr.write(f"{__tool_name__} {__version__} listening on {socket_path}\n")
+    sys.stderr.flush()
+
+    server: _Server = _Server(handler, socket_path, status)
+    try:
+        while not server.stopping.is_set():
+            connection, _ = listener.accept()
+            if server.stopping.is_set():
+                connection.close()
+                break
+            threading.Thread(target=server.answer, args=(connection,), daemon=True).start()
+    finally:
+        listener.close()
+        # Left alone if replaced since, such as by another daemon
+        current: Optional[os.stat_result] = _owned_socket(socket_path)
+        if current is not None and (current.st_dev, current.st_ino) == (bound.st_dev, bound.st_ino):
+            socket_path.unlink()
+    return 0
@@ -0,0 +1,179 @@
+import os
+from typing import Any, Final, Iterator, Optional, Union
+
+from locstat.data_structures.result_store import ResultStore
+
+__all__ = ("SQLITE_EXTENSIONS",
+           "dump_sqlite_output")
+
+SQLITE_EXTENSIONS: Final[tuple[str, ...]] = ("sqlite", "sqlite3", "db")
+# Rows handed to each executemany call
+_BATCH_SIZE: Final[int] = 10_000
+
+_SCHEMA: Final[str] = '''
+CREATE TABLE scans (
+    id INTEGER PRIMARY KEY,
+    total INTEGER NOT NULL,
+    loc INTEGER NOT NULL,
+    time TEXT,
+    scanned_at TEXT,
+    platform TEXT
+);
+CREATE TABLE languages (
+    id INTEGER PRIMARY KEY,
+    extension TEXT NOT NULL UNIQUE,
+    files INTEGER NOT NULL,
+    total INTEGER NOT NULL,
+    loc INTEGER NOT NULL
+);
+CREATE TABLE directories (
+    id INTEGER PRIMARY KEY,
+    parent_id INTEGER REFERENCES directories(id),
+    name TEXT NOT NULL,
+    path TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    loc INTEGER NOT NULL
+);
+CREATE TABLE files (
+    id INTEGER PRIMARY KEY,
+    directory_id INTEGER NOT NULL REFERENCES directories(id),
+    language_id INTEGER NOT NULL REFERENCES languages(id),
+    name TEXT NOT NULL,
+    path TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    loc INTEGER NOT NULL
+);
+'''
+
+# Created once rows are loaded, which is cheaper than maintaining them row by row.
+# Path indexes serve prefix queries such as path >= :prefix AND path < :prefix || x'ff'
+_INDEXES: Final[tuple[str, ...]] = ("CREATE INDEX files_path ON files(path)",
+                                    "CREATE INDEX files_language ON files(language_id)",
+                                    "CREATE INDEX files_directory ON files(directory_id)",
+                                    "CREATE INDEX directories_path ON directories(path)",
+                                    "CREATE INDEX directories_parent ON directories(parent_id)")
+
+_DirectoryRow = tuple[int, Optional[int], str, str, int, int]
+_FileRow = tuple[int, int, str, str, str, int, int]
+
+def _store_rows(store: ResultStore) -> Iterator[tuple[int, Union[_DirectoryRow, _FileRow]]]:
+    '''Directory and file rows of a ResultStore in walk order, tagged 0 and 1 respectively'''
+    # Paths of directories only, files' paths are built from their directory's
+    directory_paths: dict[int, str] = {0 : store.root}
+    yield 0, (0, None, os.path.basename(store.root), store.root, store.totals[0], store.locs[0])
+    for index in range(1, len(store)):
+        parent: int = store.parents[index]
+        name: str = store.name(index)
+        path: str = os.path.join(directory_paths[parent], name)
+        if store.is_directory(index):
+            directory_paths[index] = path
+            yield 0, (index, parent, name, path, store.totals[index], store.locs[index])
+        else:
+            yield 1, (index, parent, store.extension(index), name, path, store.totals[index], store.locs[index])
+
+def _mapping_rows(tree: dict[str, Any], root: str) -> Iterator[tuple[int, Union[_DirectoryRow, _FileRow]]]:
+    '''Directory and file rows of a nested mapping, as returned by the parse_*_verbose functions'''
+    next_id: int = 1
+    # Stack of (id, parent ID, path, name, node), directories being yielded before their contents
+    stack: list[tuple[int, Optional[int], str, str, dict[str, Any]]] = [(0, None, root, os.path.basename(root), tree)]
+    while stack:
+        directory_id, parent_id, path, name, node = stack.pop()
+        yield 0, (directory_id, parent_id, name, path, node["total"], node["loc"])
+        for filepath, counts in node["files"].items():
+            filename: str = os.path.basename(filepath)
+            yield 1, (next_id, directory_id, filename.rsplit(".", 1)[-1], filename, filepath,
+                      counts["total_lines"], counts["loc"])
+            next_id += 1
+        for subdirectory_name, subdirectory in reversed(node["subdirectories"].items()):
+            stack.append((next_id, directory_id, os.path.join(path, subdirectory_name), subdirectory_name,
+                          subdirectory))
+            next_id += 1
+
+def _infer_root(tree: dict[str, Any], depth: int = 0) -> str:
+    '''Scanned directory of a nested mapping, which only records it within the paths of its files'''
+    for filepath in tree["files"]:
+        for _ in range(depth + 1):
+            filepath = os.path.dirname(filepath)
+        return filepath
+    for subdirectory in tree["subdirectories"].values():
+        if root := _infer_root(subdirectory, depth + 1):
+            return root
+    return ""
+
+def dump_sqlite_output(output_mapping: dict[str, Any],
+                       filepath: Union[str, os.PathLike[str], int]) -> None:
+    '''
+    Write results into a new SQLite database, with normalised scans, languages, directories and files tables.
+    Directory and file rows are only written for DETAILED scans, straight from their ResultStore where
+    available. Rows are loaded in batches within a single transaction, and indexed afterwards
+
+    :param output_mapping: resultant mapping
+    :type output_mapping: dict[str, Any]
+
+    :param filepath: Database file to create, replacing any existing file
+    :type filepath: Union[str, os.PathLike[str], int]
+    '''
+    if isinstance(filepath, int):
+        raise ValueError("SQLite output must be written to a file")
+    if os.path.exists(filepath):
+        os.remove(filepath)
+
+    general: dict[str, Any] = output_mapping["general"]
+    languages: dict[str, dict[str, int]] = dict(output_mapping.get("languages") or {})
+    store: Optional[ResultStore] = output_mapping.get("store")
+    rows: Iterator[tuple[int, Union[_DirectoryRow, _FileRow]]] = iter(())
+    if store is not None:
+        rows = _store_rows(store)
+    elif "subdirectories" in output_mapping:
+        rows = _mapping_rows({"files" : output_mapping["files"],
+                              "subdirectories" : output_mapping["subdirectories"],
+                              "total" : general["total"], "loc" : general["loc"]},
+                             _infer_root(output_mapping))
+
+    # Deferred, as the output functions are imported on every run of the CLI
+    import sqlite3
+    connection: sqlite3.Connection = sqlite3.connect(filepath, isolation_level=None)
+    try:
+        # A freshly created output file has nothing to protect from crashes
+        connection.execute("PRAGMA journal_mode=OFF")
+        connection.execute("PRAGMA synchronous=OFF")
+        connection.executescript(_SCHEMA)
+        connection.execute("BEGIN")
+        connection.execute("INSERT INTO scans VALUES (1, ?, ?, ?, ?, ?)",
+                           (general["total"], general["loc"],
+                            general.get("time"), general.get("scanned_at"), general.get("platform")))
+
+        language_ids: dict[str, int] = {extension : language_id
+                                        for language_id, extension in enumerate(languages, 1)}
+        # Directories and files arrive interleaved in walk order, and are split into their own batches
+        directory_batch: list[_DirectoryRow] = []
+        file_batch: list[tuple[int, int, int, str, str, int, int]] = []
+        for table, row in rows:
+            if table == 0:
+                directory_batch.append(row)     # type: ignore[arg-type]
+                if len(directory_batch) >= _BATCH_SIZE:
+                    connection.executemany("INSERT INTO directories VALUES (?, ?, ?, ?, ?, ?)", directory_batch)
+                    directory_batch.clear()
+                continue
+            file_id, directory_id, extension, name, path, total, loc = row     # type: ignore[misc]
+            language_id: Optional[int] = language_ids.get(extension)
+            if language_id is None:
+                # Trees without a language record, such as those of archives, have their languages derived
+                language_id = language_ids[extension] = len(language_ids) + 1
+                languages[extension] = {"files" : 0, "total" : 0, "loc" : 0}
+            file_batch.append((file_id, directory_id, language_id, name, path, total, loc))
+            if len(file_batch) >= _BATCH_SIZE:
+                connection.executemany("INSERT INTO files VALUES (?, ?, ?, ?, ?, ?, ?)", file_batch)
+                file_batch.clear()
+        connection.executemany("INSERT INTO directories VALUES (?, ?, ?, ?, ?, ?)", directory_batch)
+        connection.executemany("INSERT INTO files VALUES (?, ?, ?, ?, ?, ?, ?)", file_batch)
+
+        connection.executemany("INSERT INTO languages VALUES (?, ?, ?, ?, ?)",
+                               ((language_ids[extension], extension, record["files"], record["total"], record["loc"])
+                                for extension, record in languages.items()))
+        # executescript() would commit first, so indexes are created statement by statement
+        for statement in _INDEXES:
+            connection.execute(statement)
+        connection.execute("COMMIT")
+    finally:
+        connection.close()
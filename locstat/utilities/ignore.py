@@ -0,0 +1,163 @@
+import os
+import re
+from typing import Callable, Final, NamedTuple, Optional
+
+from locstat.utilities.core import restrict_directory_filter, restrict_file_filter
+from locstat.utilities.patterns import glob_expression
+
+__all__ = ("IGNORE_FILES",
+           "IgnoreRules")
+
+# Per directory ignore files, later files taking precedence over earlier ones at the same level
+IGNORE_FILES: Final[tuple[str, ...]] = (".gitignore", ".ignore")
+# Ignore file of a repository as a whole, taking precedence under every other
+_EXCLUDE_FILE: Final[str] = os.path.join(".git", "info", "exclude")
+
+class _Level(NamedTuple):
+    '''Patterns of a single directory, compiled into one expression for directories and one for files'''
+    base: str
+    directories: Optional[re.Pattern[str]]
+    files: Optional[re.Pattern[str]]
+    # Whether each pattern is negated, indexed by the number in its group's name
+    negated: tuple[bool, ...]
+
+def _translate(line: str) -> Optional[tuple[str, bool, bool]]:
+    '''
+    Translate a line of an ignore file into a regular expression matching paths relative to the file's directory
+
+    :return: Expression, whether the pattern is negated, and whether it only matches directories.
+             None for blank lines and comments
+    :rtype: Optional[tuple[str, bool, bool]]
+    '''
+    line = line.rstrip("\r\n")
+    # Trailing spaces are dropped, unless escaped
+    stripped: str = line.rstrip(" ")
+    if stripped.endswith("\\") and len(stripped) < len(line):
+        stripped += " "
+    line = stripped
+    if not line or line.startswith("#"):
+        return None
+
+    negated: bool = line.startswith("!")
+    if negated or line.startswith(("\\!", "\\#")):
+        line = line[1:]
+    directory_only: bool = line.endswith("/")
+    line = line.rstrip("/")
+    if not line:
+        return None
+
+    return glob_expression(line), negated, directory_only
+
+def _compile_level(base: str, lines: list[str]) -> Optional[_Level]:
+    patterns: list[tuple[str, bool, bool]] = [pattern for pattern in map(_translate, lines) if pattern is not None]
+    if not patterns:
+        return None
+
+    # Alternatives are tried in order, so listing patterns last to first makes the last matching pattern win
+    def combine(include_directory_only: bool) -> Optional[re.Pattern[str]]:
+        alternatives: list[str] = [f"(?P<p{index}>{expression})"
+                                   for index, (expression, _, directory_only) in reversed(tuple(enumerate(patterns)))
+                                   if include_directory_only or not directory_only]
+        return re.compile("|".join(alternatives), re.DOTALL) if alternatives else None
+
+    return _Level(base, combine(True), combine(False), tuple(negated for _, negated, _ in patterns))
+
+def _read_lines(path: str) -> list[str]:
+    try:
+        with open(path, "r", encoding="utf-8", errors="surrogateescape") as ignore_file:
+            return ignore_file.readlines()
+    except OSError:
+        return []
+
+class IgnoreRules:
+    '''
+    Rules of the .gitignore and .ignore files of a tree, along with .git/info/exclude,
+    following git's precedence: deeper files override shallower ones, and the last matching pattern within a file wins.
+    Patterns are compiled once per directory, when the first entry of that directory is checked, which happens
+    before the directory is scanned. Ignored directories, as well as .git directories, are never scanned at all.
+
+    Ignore files above the scanned directory, up to the root of its repository, apply as well
+    '''
+    __slots__ = ("root", "_chains")
+
+    def __init__(self, root: str) -> None:
+        self.root: str = os.path.abspath(root)
+        # Directory -> levels applying to its entries, shallowest first. Directories without ignore files of their
+        # own share their parent's tuple
+        self._chains: dict[str, tuple[_Level, ...]] = {}
+        self._chains[self.root] = self._root_chain()
+
+    def __getstate__(self) -> str:
+        return self.root
+
+    def __setstate__(self, root: str) -> None:
+        self.root = root
+        self._chains = {root : self._root_chain()}
+
+    def _root_chain(self) -> tuple[_Level, ...]:
+        # Directories from the root of the enclosing repository, if any, down to the scanned directory
+        directories: list[str] = [self.root]
+        while not os.path.exists(os.path.join(directories[-1], ".git")):
+            parent: str = os.path.dirname(directories[-1])
+            if parent == directories[-1]:
+                # Not within a repository, only ignore files within the scanned directory apply
+                directories = [self.root]
+                break
+            directories.append(parent)
+        directories.reverse()
+
+        chain: list[_Level] = []
+        for index, directory in enumerate(directories):
+            lines: list[str] = _read_lines(os.path.join(directory, _EXCLUDE_FILE)) if index == 0 else []
+            for ignore_file in IGNORE_FILES:
+                lines.extend(_read_lines(os.path.join(directory, ignore_file)))
+            level: Optional[_Level] = _compile_level(directory, lines)
+            if level is not None:
+                chain.append(level)
+        return tuple(chain)
+
+    def _chain(self, directory: str) -> tuple[_Level, ...]:
+        chain: Optional[tuple[_Level, ...]] = self._chains.get(directory)
+        if chain is not None:
+            return chain
+        parent: str = os.path.dirname(directory)
+        chain = self._chain(parent) if parent != directory else ()
+        lines: list[str] = []
+        for ignore_file in IGNORE_FILES:
+            lines.extend(_read_lines(os.path.join(directory, ignore_file)))
+        level: Optional[_Level] = _compile_level(directory, lines)
+        if level is not None:
+            chain = (*chain, level)
+        self._chains[directory] = chain
+        return chain
+
+    def ignored(self, path: str, is_directory: bool) -> bool:
+        '''Whether a file or directory within the scanned directory is ignored'''
+        if is_directory and os.path.basename(path) == ".git":
+            return True
+        for level in reversed(self._chain(os.path.dirname(path))):
+            expression: Optional[re.Pattern[str]] = level.directories if is_directory else level.files
+            if expression is None:
+                continue
+            relative: str = path[len(level.base.rstrip(os.sep)) + 1:]
+            if os.sep != "/":
+                relative = relative.replace(os.sep, "/")
+            match: Optional[re.Match[str]] = expression.fullmatch(relative)
+            if match is not None:
+                return not level.negated[int(match.lastgroup[1:])]   # type: ignore[index]
+        return False
+
+    def file_allowed(self, filepath: str) -> bool:
+        return not self.ignored(filepath, False)
+
+    def directory_allowed(self, directory: str) -> bool:
+        return not self.ignored(directory, True)
+
+    def file_filter(self, file_filter_function: Callable[[str, str], bool]) -> Callable[[str, str], bool]:
+        '''Wrap a file filter to also reject ignored files'''
+        return restrict_file_filter(file_filter_function, self.file_allowed)
+
+    def directory_filter(self, directory_filter_function: Callable[[str], bool]) -> Callable[[str], bool]:
+        '''Wrap a directory filter to also reject ignored directories'''
+        return restrict_directory_filter(directory_filter_function, self.directory_allowed)
+
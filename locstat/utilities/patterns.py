@@ -0,0 +1,167 @@
+import os
+import re
+from typing import Callable, Final, Iterable, NamedTuple, Optional
+
+from locstat.utilities.core import restrict_directory_filter, restrict_file_filter
+
+__all__ = ("translate_glob",
+           "glob_expression",
+           "PathPatterns")
+
+def translate_glob(pattern: str) -> str:
+    '''
+    Translate a glob into a regular expression matched against "/" separated paths, with gitignore's semantics:
+    * and ? never match a separator, **/ matches any number of directories and a trailing /** everything within
+    '''
+    parts: list[str] = []
+    index, length = 0, len(pattern)
+    while index < length:
+        character: str = pattern[index]
+        if character == "*":
+            if pattern.startswith("**", index):
+                leading: bool = index == 0 or pattern[index - 1] == "/"
+                if leading and pattern[index + 2:index + 3] == "/":
+                    # **/ matches any number of directories, including none
+                    parts.append("(?:.*/)?")
+                    index += 3
+                    continue
+                if leading and index + 2 == length:
+                    # Trailing /** matches everything within
+                    parts.append(".*")
+                    index += 2
+                    continue
+                # Any other ** is an ordinary *
+                while index < length and pattern[index] == "*":
+                    index += 1
+                parts.append("[^/]*")
+                continue
+            parts.append("[^/]*")
+        elif character == "?":
+            parts.append("[^/]")
+        elif character == "[":
+            end: int = index + 1
+            if end < length and pattern[end] in "!^":
+                end += 1
+            if end < length and pattern[end] == "]":
+                end += 1
+            while end < length and pattern[end] != "]":
+                end += 1
+            if end >= length:
+                parts.append(re.escape(character))
+            else:
+                members: str = pattern[index + 1:end]
+                negated: bool = members[:1] in ("!", "^")
+                if negated:
+                    members = members[1:]
+                members = members.replace("\\", "\\\\").replace("[", "\\[").replace("]", "\\]")
+                # Classes never match the separator, negated or not
+                parts.append(f"[^/{members}]" if negated else f"(?!/)[{members}]")
+                index = end
+        elif character == "\\" and index + 1 < length:
+            index += 1
+            parts.append(re.escape(pattern[index]))
+        else:
+            parts.append(re.escape(character))
+        index += 1
+    return "".join(parts)
+
+def glob_expression(pattern: str) -> str:
+    '''
+    Regular expression for a glob matched against paths relative to a root. Globs with a separator
+    anywhere but their end are anchored to the root, others match names at any depth below it
+    '''
+    pattern = pattern.rstrip("/")
+    expression: str = translate_glob(pattern.lstrip("/"))
+    return expression if "/" in pattern else f"(?:.*/)?{expression}"
+
+# Global inline flags, such as (?i), which Python only accepts at the very start of an expression
+_GLOBAL_FLAGS: Final[re.Pattern[str]] = re.compile(r"(?:\(\?[aiLmsux]+\))+")
+
+def _group(regex: str) -> str:
+    '''Group a regex to combine it with others, scoping global inline flags at its start to the group'''
+    flags: Optional[re.Match[str]] = _GLOBAL_FLAGS.match(regex)
+    if flags is None:
+        return f"(?:{regex})"
+    letters: str = "".join(dict.fromkeys(letter for letter in flags.group() if letter.isalpha()))
+    # Under verbose mode, a comment running to the end of the regex would otherwise swallow the group's end
+    end: str = "\n)" if "x" in letters else ")"
+    return f"(?{letters}:{regex[flags.end():]}{end}"
+
+class _Matcher(NamedTuple):
+    '''
+    Patterns compiled into an expression matched at the start of a path, for globs, and one searched for anywhere
+    within it, for regexes. Python's engine tries every alternative at every position when searching,
+    so globs, which always match whole paths, are kept out of the searched expression
+    '''
+    anchored: Optional[re.Pattern[str]]
+    unanchored: Optional[re.Pattern[str]]
+
+    def __call__(self, path: str) -> bool:
+        return ((self.anchored is not None and self.anchored.match(path) is not None)
+                or (self.unanchored is not None and self.unanchored.search(path) is not None))
+
+def _compile_matcher(globs: tuple[str, ...], regexes: tuple[str, ...], glob_suffix: str) -> Optional[_Matcher]:
+    '''
+    :raises re.error: If the regexes cannot be combined, such as those defining the same group name
+    '''
+    if not (globs or regexes):
+        return None
+    anchored: str = "|".join(f"(?:{glob_expression(glob)}){glob_suffix}\\Z" for glob in globs)
+    unanchored: str = "|".join(map(_group, regexes))
+    return _Matcher(re.compile(anchored, re.DOTALL) if anchored else None,
+                    re.compile(unanchored, re.DOTALL) if unanchored else None)
+
+class PathPatterns:
+    '''
+    Glob and regex filters over paths relative to a scanned directory, compiled into combined expressions
+    for files and for directories, so that each entry costs a match or two however many patterns there are.
+
+    Globs must match a whole path, regexes may match anywhere within it. Directories are matched with a trailing
+    separator, so that an excluded directory, or a glob ending in /** excluding everything within it, prunes the
+    whole subtree before it is scanned. Include patterns only apply to files, as a directory's name says
+    nothing about whether files within it match
+    '''
+    __slots__ = ("root", "include", "exclude", "exclude_directories", "_offset")
+
+    def __init__(self,
+                 root: str,
+                 include_globs: Iterable[str] = (),
+                 exclude_globs: Iterable[str] = (),
+                 include_regexes: Iterable[str] = (),
+                 exclude_regexes: Iterable[str] = ()) -> None:
+        '''
+        :raises re.error: If the regexes cannot be combined into a single expression
+        '''
+        self.root: str = os.path.abspath(root)
+        # Length of the root's path along with the separator following it
+        self._offset: int = len(self.root.rstrip(os.sep)) + 1
+        include_globs, exclude_globs = tuple(include_globs), tuple(exclude_globs)
+        include_regexes, exclude_regexes = tuple(include_regexes), tuple(exclude_regexes)
+        self.include: Optional[_Matcher] = _compile_matcher(include_globs, include_regexes, "")
+        self.exclude: Optional[_Matcher] = _compile_matcher(exclude_globs, exclude_regexes, "")
+        # Directories are matched as "path/", which globs may also match without their trailing separator
+        self.exclude_directories: Optional[_Matcher] = _compile_matcher(exclude_globs, exclude_regexes, "/?")
+
+    def _relative(self, path: str) -> str:
+        relative: str = path[self._offset:]
+        return relative.replace(os.sep, "/") if os.sep != "/" else relative
+
+    def file_allowed(self, filepath: str) -> bool:
+        relative: str = self._relative(filepath)
+        if self.exclude is not None and self.exclude(relative):
+            return False
+        return self.include is None or self.include(relative)
+
+    def directory_allowed(self, directory: str) -> bool:
+        return self.exclude_directories is None or not self.exclude_directories(self._relative(directory) + "/")
+
+    def file_filter(self, file_filter_function: Callable[[str, str], bool]) -> Callable[[str, str], bool]:
+        '''Wrap a file filter to also reject files excluded, or not included, by patterns'''
+        return restrict_file_filter(file_filter_function, self.file_allowed)
+
+    def directory_filter(self, directory_filter_function: Callable[[str], bool]) -> Callable[[str], bool]:
+        '''Wrap a directory filter to also reject directories excluded by patterns'''
+        if self.exclude_directories is None:
+            return directory_filter_function
+        return restrict_directory_filter(directory_filter_function, self.directory_allowed)
+
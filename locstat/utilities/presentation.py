@@ -1,17 +1,24 @@
-import json
 import os
 from io import TextIOWrapper
 from types import MappingProxyType
-from typing import (Any, Final, Literal,
+from typing import (Any, Final, Iterable, Iterator, Literal,
                     Optional, Sequence,
                     Union)
 
+from locstat.data_structures.result_store import ResultStore
 from locstat.data_structures.typing import OutputFunction
+from locstat.utilities.database import SQLITE_EXTENSIONS, dump_sqlite_output
 
 __all__ = ("dump_std_output",
            "dump_json_output",
+           "dump_ndjson_stream",
+           "dump_sqlite_output",
+           "NDJSON_EXTENSIONS",
            "OUTPUT_MAPPING")
 
+# Output files with these extensions are written as a stream of records, rather than from a finished mapping
+NDJSON_EXTENSIONS: Final[frozenset[str]] = frozenset(("ndjson", "jsonl"))
+
 def _format_row(row: Sequence[Union[str, int]], widths: Sequence[int]) -> str:
     return (
         f"{row[0]:<{widths[0]}}  "
@@ -60,6 +67,80 @@ def _dump_directory_tree(
             is_last=idx == len(sub_items) - 1,
         )
 
+def _dump_store_tree(
+    file: TextIOWrapper,
+    store: ResultStore,
+    index: int,
+    prefix: str = "",
+    is_last: bool = True,
+) -> None:
+    '''Counterpart of _dump_directory_tree rendering a directory of a ResultStore'''
+    connector: str = "└── " if is_last else "├── "
+    next_prefix: str = prefix + ("    " if is_last else "│   ")
+    total, loc = store.totals[index], store.locs[index]
+    file.write(f"{prefix}{connector}{store.name(index)}/ (total={total or 'N/A'}, loc={loc or 'N/A'})\n")
+
+    # Only the children of a single directory are materialised at a time
+    files: list[tuple[str, int]] = []
+    subdirectories: list[tuple[str, int]] = []
+    for child in store.children(index):
+        (subdirectories if store.is_directory(child) else files).append((store.name(child), child))
+    files.sort()
+    subdirectories.sort()
+
+    for idx, (fname, child) in enumerate(files):
+        file_connector: str = "└── " if idx == len(files) - 1 and not subdirectories else "├── "
+        file.write(
+            f"{next_prefix}{file_connector}"
+            f"{fname} (total={store.totals[child]}, loc={store.locs[child]})\n"
+        )
+
+    for idx, (_, child) in enumerate(subdirectories):
+        _dump_store_tree(file, store, child, prefix=next_prefix, is_last=idx == len(subdirectories) - 1)
+
+def _iterencode_store(store: ResultStore,
+                      index: int,
+                      level: int,
+                      members: Optional[dict[str, Any]] = None) -> Iterator[str]:
+    '''
+    Encode a directory of a ResultStore exactly as json.dumps(store.to_mapping(index), indent=2) would,
+    nested at the given level, without building the mapping. If given, members take the place of the
+    directory's total and LOC
+    '''
+    import json
+    inner: str = "  " * (level + 1)
+    innermost: str = "  " * (level + 2)
+    files: list[int] = []
+    subdirectories: list[int] = []
+    for child in store.children(index):
+        (subdirectories if store.is_directory(child) else files).append(child)
+
+    yield f"{{\n{inner}\"files\": "
+    if not files:
+        yield "{}"
+    else:
+        yield "{"
+        for position, child in enumerate(files):
+            yield (f"{',' if position else ''}\n{innermost}{json.dumps(store.path(child))}: "
+                   f"{{\n{innermost}  \"loc\": {store.locs[child]},"
+                   f"\n{innermost}  \"total_lines\": {store.totals[child]}\n{innermost}}}")
+        yield f"\n{inner}}}"
+    yield f",\n{inner}\"subdirectories\": "
+    if not subdirectories:
+        yield "{}"
+    else:
+        yield "{"
+        for position, child in enumerate(subdirectories):
+            yield f"{',' if position else ''}\n{innermost}{json.dumps(store.name(child))}: "
+            yield from _iterencode_store(store, child, level + 2)
+        yield f"\n{inner}}}"
+    if members is None:
+        members = {"total" : store.totals[index], "loc" : store.locs[index]}
+    for key, value in members.items():
+        encoded: str = json.dumps(value, indent=2).replace("\n", "\n" + inner)
+        yield f",\n{inner}{json.dumps(key)}: {encoded}"
+    yield f"\n{'  ' * level}}}"
+
 def dump_std_output(output_mapping: dict[str, Any],
                     filepath: Union[str, os.PathLike[str], int]) -> None:
     '''
@@ -81,6 +162,12 @@ def dump_std_output(output_mapping: dict[str, Any],
         
         file.write("\n\n")
 
+        skipped: Optional[dict[str, int]] = output_mapping.get("skipped")
+        if skipped is not None:
+            file.write("SKIPPED FILES:\n")
+            file.write("\n".join(f"{reason} : {count}" for reason, count in skipped.items()))
+            file.write("\n\n")
+
         languages: Optional[dict[str, dict[str, int]]] = output_mapping.pop("languages", None)
         if languages:
             headers: list[str] = ["Extension", "Files", "Total", "LOC"]
@@ -103,6 +190,14 @@ def dump_std_output(output_mapping: dict[str, Any],
             for row in rows:
                 file.write(_format_row(row, widths))
 
+        store: Optional[ResultStore] = output_mapping.get("store")
+        if store is not None and any(store.is_directory(child) for child in store.children(0)):
+            file.write("\nFILES & DIRECTORIES\n")
+            subdirectories: list[tuple[str, int]] = sorted((store.name(child), child) for child in store.children(0)
+                                                          if store.is_directory(child))
+            for idx, (_, child) in enumerate(subdirectories):
+                _dump_store_tree(file, store, child, prefix="", is_last=idx == len(subdirectories) - 1)
+
         tree = output_mapping.get("subdirectories")
         if tree:
             file.write("\nFILES & DIRECTORIES\n")
@@ -118,13 +213,45 @@ def dump_std_output(output_mapping: dict[str, Any],
 def dump_json_output(output_mapping: dict[str, Any],
                      filepath: Union[str, os.PathLike[str], int]) -> None:
     '''Dump output to JSON file, with proper formatting'''
+    # json is imported by the functions using it, as it would otherwise load on every run of the CLI
+    import json
     is_file_descriptor: bool = isinstance(filepath, int)
     if not (is_file_descriptor or os.path.abspath(filepath)):
         filepath = os.path.join(os.getcwd(), filepath)
 
+    store: Optional[ResultStore] = output_mapping.get("store")
     with open(filepath, mode="w") as output_file:
-        output_file.write(json.dumps(output_mapping, indent=2))
+        if store is None:
+            output_file.write(json.dumps(output_mapping, indent=2))
+            return
+        # Written in the layout of parse_directory_verbose's mapping, one directory at a time
+        for chunk in _iterencode_store(store, 0, 0, {key : value for key, value in output_mapping.items()
+                                                     if key != "store"}):
+            output_file.write(chunk)
+
+def dump_ndjson_stream(records: Iterable[dict[str, Any]],
+                       filepath: Union[str, os.PathLike[str], int]) -> None:
+    '''
+    Write records as newline delimited JSON while they are still being produced,
+    holding no more than a single record in memory at a time
+
+    :param records: Records to write, each on its own line
+    :type records: Iterable[dict[str, Any]]
+
+    :param filepath: Output file to write records to, can be stdout
+    :type filepath: Union[str, os.PathLike[str], int]
+    '''
+    import json
+    encoder: json.JSONEncoder = json.JSONEncoder(separators=(",", ":"))
+    with open(filepath, mode="w", closefd=not isinstance(filepath, int)) as output_file:
+        for record in records:
+            output_file.write(encoder.encode(record))
+            output_file.write("\n")
+            # Make each directory available to readers as soon as it is complete
+            if record["type"] != "file":
+                output_file.flush()
 
 OUTPUT_MAPPING: Final[MappingProxyType[str, OutputFunction]] = MappingProxyType({
     "json" : dump_json_output,
+    **dict.fromkeys(SQLITE_EXTENSIONS, dump_sqlite_output),
 })
\ No newline at end of file
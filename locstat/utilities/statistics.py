@@ -0,0 +1,148 @@
+import heapq
+import os
+import time
+from contextlib import contextmanager
+from typing import Callable, Final, Iterator, Mapping
+
+from locstat.data_structures.typing import FileParsingFunction, LanguageMetadata
+
+__all__ = ("DEFAULT_SLOWEST_FILES",
+           "ScanStatistics")
+
+DEFAULT_SLOWEST_FILES: Final[int] = 10
+_MEGABYTE: Final[int] = 1 << 20
+
+class ScanStatistics:
+    '''
+    Profile of a single scan, collected by wrapping the filters and parsing function handed to the
+    serial parse_directory* functions. Nothing is wrapped, and so nothing is paid for, unless requested
+    '''
+    __slots__ = ("symbol_mapping", "slowest_count", "phases",
+                 "files_visited", "files_filtered", "files_unsupported", "files_parsed",
+                 "directories_visited", "directories_filtered",
+                 "filtering_time", "parsing_time", "bytes_read",
+                 "extensions", "slowest")
+
+    def __init__(self, symbol_mapping: Mapping[str, LanguageMetadata], slowest_count: int = DEFAULT_SLOWEST_FILES):
+        self.symbol_mapping: Mapping[str, LanguageMetadata] = symbol_mapping
+        self.slowest_count: int = slowest_count
+        # Phase name -> seconds, in the order phases were first entered
+        self.phases: dict[str, float] = {}
+
+        self.files_visited = self.files_filtered = self.files_unsupported = self.files_parsed = 0
+        # The top directory is visited without passing through the directory filter
+        self.directories_visited, self.directories_filtered = 1, 0
+        self.filtering_time = self.parsing_time = 0.0
+        self.bytes_read: int = 0
+        # Extension -> [files, bytes, seconds]
+        self.extensions: dict[str, list[float]] = {}
+        # Min-heap of (seconds, path) holding the slowest files seen so far
+        self.slowest: list[tuple[float, str]] = []
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        '''Add the time spent within the block to the given phase'''
+        epoch: float = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - epoch
+
+    def file_filter(self, file_filter_function: Callable[[str, str], bool]) -> Callable[[str, str], bool]:
+        '''Wrap a file filter to count files visited and skipped, including those of unsupported languages'''
+        def _counting_file_filter(filepath: str, extension: str) -> bool:
+            epoch: float = time.perf_counter()
+            self.files_visited += 1
+            accepted: bool = file_filter_function(filepath, extension)
+            if not accepted:
+                self.files_filtered += 1
+            else:
+                comment_data: LanguageMetadata = self.symbol_mapping.get(extension, (None, None, None))
+                if not (comment_data[0] or comment_data[1]):
+                    self.files_unsupported += 1
+            self.filtering_time += time.perf_counter() - epoch
+            return accepted
+        return _counting_file_filter
+
+    def directory_filter(self, directory_filter_function: Callable[[str], bool]) -> Callable[[str], bool]:
+        '''Wrap a directory filter to count directories visited and skipped'''
+        def _counting_directory_filter(directory: str) -> bool:
+            epoch: float = time.perf_counter()
+            accepted: bool = directory_filter_function(directory)
+            if accepted:
+                self.directories_visited += 1
+            else:
+                self.directories_filtered += 1
+            self.filtering_time += time.perf_counter() - epoch
+            return accepted
+        return _counting_directory_filter
+
+    def file_parser(self, file_parsing_function: FileParsingFunction) -> FileParsingFunction:
+        '''
+        Wrap a parsing function to time each file. Files are then parsed one call at a time
+        rather than in batches, which is part of the reason profiling is opt-in
+        '''
+        def _timed_file_parser(filepath: str, *args) -> tuple[int, int]:
+            size: int = os.stat(filepath).st_size
+            epoch: float = time.perf_counter()
+            result: tuple[int, int] = file_parsing_function(filepath, *args)
+            elapsed: float = time.perf_counter() - epoch
+
+            self.files_parsed += 1
+            self.parsing_time += elapsed
+            self.bytes_read += size
+            record: list[float] = self.extensions.setdefault(filepath.rsplit(".", 1)[-1], [0, 0, 0.0])
+            record[0] += 1
+            record[1] += size
+            record[2] += elapsed
+            if len(self.slowest) < self.slowest_count:
+                heapq.heappush(self.slowest, (elapsed, filepath))
+            elif self.slowest_count and elapsed > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, (elapsed, filepath))
+            return result
+        return _timed_file_parser  # type: ignore[return-value]
+
+    def report(self) -> str:
+        '''Human readable breakdown of the scan'''
+        phases: dict[str, float] = dict(self.phases)
+        # Filtering and parsing happen within the scan, the rest of it is spent enumerating directories
+        scan_time: float = phases.pop("scan", 0.0)
+        breakdown: dict[str, float] = {"configuration" : phases.pop("configuration", 0.0),
+                                       "enumeration" : max(0.0, scan_time
+                                                                - self.filtering_time - self.parsing_time),
+                                       "filtering" : self.filtering_time,
+                                       "parsing (I/O and counting)" : self.parsing_time,
+                                       **phases}
+        total_time: float = sum(breakdown.values()) or 1.0
+
+        lines: list[str] = ["STATISTICS:", "Phases:"]
+        width: int = max(map(len, breakdown))
+        lines.extend(f"  {name:<{width}}  {seconds:>9.4f}s  {100 * seconds / total_time:>5.1f}%"
+                     for name, seconds in breakdown.items())
+
+        files_cached: int = (self.files_visited - self.files_filtered
+                             - self.files_unsupported - self.files_parsed)
+        lines.extend(("Traversal:",
+                      f"  directories visited : {self.directories_visited}",
+                      f"  directories skipped by filter : {self.directories_filtered}",
+                      f"  files visited : {self.files_visited}",
+                      f"  files skipped by filter : {self.files_filtered}",
+                      f"  files skipped as unsupported : {self.files_unsupported}",
+                      f"  files parsed : {self.files_parsed}"))
+        if files_cached:
+            lines.append(f"  files served from cache : {files_cached}")
+        lines.append(f"  bytes read : {self.bytes_read}")
+
+        if self.extensions:
+            lines.append("Throughput:")
+            for extension, (files, size, seconds) in sorted(self.extensions.items(),
+                                                            key=lambda item: item[1][2], reverse=True):
+                seconds = seconds or float("inf")
+                lines.append(f"  {extension:<10} {int(files):>8} files  {size / _MEGABYTE:>9.2f}MB  "
+                             f"{files / seconds:>10.0f} files/s  {size / _MEGABYTE / seconds:>8.1f}MB/s")
+
+        if self.slowest:
+            lines.append("Slowest files:")
+            lines.extend(f"  {seconds * 1000:>9.3f}ms  {filepath}"
+                         for seconds, filepath in sorted(self.slowest, reverse=True))
+        return "\n".join(lines) + "\n"
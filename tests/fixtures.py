@@ -1,9 +1,14 @@
+import subprocess
+import textwrap
 from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
 
 import pytest
 
 from locstat.data_structures.verbosity import Verbosity
 from locstat.data_structures.parse_modes import ParseMode
+from locstat.utilities.core import construct_directory_filter, construct_file_filter, derive_file_parser
 
 @dataclass
 class MockConfig:
@@ -11,11 +16,20 @@ class MockConfig:
     minimum_characters: int = field(default=1)
     max_depth: int = field(default=-1)
     parsing_mode: ParseMode = field(default=ParseMode.BUFFERED)
+    auto_mmap_threshold: int = field(default=64 * 1024)
+    auto_buffered_threshold: int = field(default=1 << 30)
+    split_threshold: int = field(default=64 * 1024 * 1024)
+    split_threads: int = field(default=0)
+    sniff_block_size: int = field(default=4096)
+    sniff_max_line_length: int = field(default=1000)
 
     @property
     def configurable(self) -> frozenset[str]:
         return frozenset(["verbosity", "minimum_characters",
-                          "max_depth", "parsing_mode"])
+                          "max_depth", "parsing_mode",
+                          "auto_mmap_threshold", "auto_buffered_threshold",
+                          "split_threshold", "split_threads",
+                          "sniff_block_size", "sniff_max_line_length"])
 
 @pytest.fixture
 def mock_config() -> MockConfig:
@@ -24,4 +38,137 @@ def mock_config() -> MockConfig:
 @pytest.fixture
 def mock_dir(tmp_path_factory):
     path = tmp_path_factory.mktemp("_temp_dir")
-    return path
\ No newline at end of file
+    return path
+
+def run_git(directory: Path, *args: str) -> None:
+    '''Run a git command in a directory, with an identity to commit under'''
+    subprocess.run(("git", "-c", "user.name=locstat", "-c", "user.email=locstat@localhost", *args),
+                   cwd=directory, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def scan_kwargs(config: MockConfig, **overrides: Any) -> dict[str, Any]:
+    '''Arguments shared by directory scans, counting every file and directory buffered'''
+    return {"config" : config,
+            "depth" : -1,
+            "file_parsing_function" : derive_file_parser(ParseMode.BUFFERED),
+            "file_filter_function" : construct_file_filter(),
+            "directory_filter_function" : construct_directory_filter(frozenset()),
+            "minimum_characters" : 1,
+            **overrides}
+
+def populate_directory(directory: Path) -> None:
+    directory.mkdir(parents=True, exist_ok=True)
+
+    src = directory / "src"
+    tests = directory / "tests"
+    data = directory / "data"
+    utils = src / "utils"
+
+    for d in (src, utils, tests, data):
+        d.mkdir(parents=True, exist_ok=True)
+
+    (src / "main.py").write_text(
+        textwrap.dedent(
+            """
+            \"\"\"
+            Entry point for the application.
+            \"\"\"
+
+            from utils.math_utils import add
+
+
+            def main():
+                # Simple execution flow
+                result = add(2, 3)
+
+                print("Result:", result)
+
+
+            if __name__ == "__main__":
+                main()
+            """
+        ).strip()
+        + "\n"
+    )
+
+    (utils / "math_utils.py").write_text(
+        textwrap.dedent(
+            """
+            \"\"\"
+            Utility functions for math operations.
+            \"\"\"
+
+
+            def add(a: int, b: int) -> int:
+                \"\"\"
+                Add two integers.
+
+                Args:
+                    a: First integer
+                    b: Second integer
+
+                Returns:
+                    The sum of a and b
+                \"\"\"
+                return a + b
+            """
+        ).strip()
+        + "\n"
+    )
+
+    (tests / "test_math_utils.py").write_text(
+        textwrap.dedent(
+            """
+            import pytest
+
+            from src.utils.math_utils import add
+
+
+            def test_add_basic():
+                # Basic sanity check
+                assert add(1, 2) == 3
+
+
+            def test_add_negative_numbers():
+                assert add(-1, -2) == -3
+            """
+        ).strip()
+        + "\n"
+    )
+
+    (directory / "README.md").write_text(
+        textwrap.dedent(
+            """
+            # Mock Project
+
+            This is a fake project structure used for testing filesystem behavior.
+
+            It intentionally includes:
+            - Python code
+            - Nested directories
+            - Symlinks
+            """
+        ).strip()
+        + "\n"
+    )
+
+    (data / "sample.txt").write_text(
+        "This is a sample data file.\n\nIt has multiple lines.\n"
+    )
+    try:
+        symlink_target = src / "main.py"
+        symlink_path = directory / "main_link.py"
+
+        if not symlink_path.exists():
+            symlink_path.symlink_to(symlink_target)
+    except (OSError, NotImplementedError):
+        pass
+
+def populate_nested(directory: Path, levels: int) -> None:
+    '''Populate a directory, adding C and Python files, some of them empty, under each of levels nested directories'''
+    populate_directory(directory)
+    for i in range(levels):
+        nested = directory / "nested" / f"level_{i}" / "inner"
+        nested.mkdir(parents=True, exist_ok=True)
+        (nested / f"module_{i}.c").write_text("// Comment\nint x = 1;\n/* Block\n*/\nint y;\n" * (i + 1))
+        (nested.parent / f"script_{i}.py").write_text("# Comment\nx = 1\n" * (i + 2))
+        (nested.parent / f"empty_{i}.py").touch()
@@ -0,0 +1,94 @@
+import array
+import gzip
+import lzma
+import os
+import tarfile
+import zipfile
+from typing import Any, Iterator
+
+import pytest
+
+from tests.fixtures import mock_dir, mock_config, populate_directory
+
+from locstat.parsing.archive import (open_compressed,
+                                     parse_archive,
+                                     parse_archive_record,
+                                     parse_archive_verbose)
+from locstat.parsing.directory import parse_directory_verbose
+from locstat.parsing.stream import parse_stream
+from locstat.utilities.core import (construct_directory_filter,
+                                    construct_file_filter,
+                                    derive_file_parser)
+from locstat.data_structures.parse_modes import ParseMode
+
+def _flatten(tree: dict[str, Any], directory: str = "") -> Iterator[tuple[str, int, int]]:
+    '''Files of a DETAILED tree by their position in it, along with their counts'''
+    for filepath, counts in tree["files"].items():
+        yield (f"{directory}/{os.path.basename(filepath)}", counts["total_lines"], counts["loc"])
+    for name, subdirectory in tree["subdirectories"].items():
+        yield from _flatten(subdirectory, f"{directory}/{name}")
+
+def _create_archive(project, archive) -> None:
+    if archive.suffix == ".zip":
+        with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zip_archive:
+            for path in sorted(project.rglob("*")):
+                if not path.is_symlink():
+                    zip_archive.write(path, path.relative_to(project.parent))
+        return
+    mode: str = {".tar" : "w", ".gz" : "w:gz", ".xz" : "w:xz"}[archive.suffix]
+    with tarfile.open(archive, mode) as tar_archive:
+        tar_archive.add(project, arcname=project.name)
+
+@pytest.mark.parametrize("archive_name", ("project.tar", "project.tar.gz", "project.tar.xz", "project.zip"))
+@pytest.mark.parametrize("depth", (-1, 1, 2))
+def test_archive_consistency(mock_dir, mock_config, archive_name, depth):
+    project = mock_dir / "project"
+    populate_directory(project)
+    (project / "src" / "no_newline.py").write_bytes(b"x = 1\n# comment\ny = 2")
+    (project / "src" / "multiline.c").write_text("int x;\n/* a\nb */\nint y;\n")
+    archive = mock_dir / archive_name
+    _create_archive(project, archive)
+
+    object.__setattr__(mock_config, "symbol_mapping", {"py" : (b"#", None, None),
+                                                       "c" : (b"//", b"/*", b"*/")})
+    kwargs = {"config" : mock_config,
+              "file_filter_function" : construct_file_filter(),
+              "directory_filter_function" : construct_directory_filter(frozenset()),
+              "minimum_characters" : 1}
+
+    # The archive holds the project directory itself, one level below its root
+    expected_record = {}
+    with os.scandir(project) as directory_iterator:
+        expected_tree = parse_directory_verbose(directory_iterator, language_record=expected_record,
+                                                file_parsing_function=derive_file_parser(ParseMode.BUFFERED),
+                                                depth=depth - 1 if depth > 0 else depth, **kwargs)
+
+    observed_record = {}
+    observed_tree = parse_archive_verbose(str(archive), language_record=observed_record, depth=depth, **kwargs)
+    assert (observed_tree["total"], observed_tree["loc"]) == (expected_tree["total"], expected_tree["loc"])
+    assert observed_record == expected_record
+    # Directories only appear in archive trees once a counted file is found within them
+    observed_project = observed_tree["subdirectories"].get("project", {"files" : {}, "subdirectories" : {}})
+    assert sorted(_flatten(observed_project)) == sorted(_flatten(expected_tree))
+
+    line_data, language_record = array.array("L", (0, 0)), {}
+    parse_archive_record(str(archive), line_data=line_data, language_record=language_record, depth=depth, **kwargs)
+    assert (tuple(line_data), language_record) == ((expected_tree["total"], expected_tree["loc"]), expected_record)
+
+    line_data = array.array("L", (0, 0))
+    parse_archive(str(archive), line_data=line_data, depth=depth, **kwargs)
+    assert tuple(line_data) == (expected_tree["total"], expected_tree["loc"])
+
+@pytest.mark.parametrize("compress", ((".gz", gzip.compress), (".xz", lzma.compress)))
+def test_compressed_file(mock_dir, compress):
+    suffix, compression_function = compress
+    contents: bytes = b"int x;\n/* a\nb */\n// c\nint y;" * 1000
+    source = mock_dir / "source.c"
+    source.write_bytes(contents)
+    compressed = mock_dir / f"source.c{suffix}"
+    compressed.write_bytes(compression_function(contents))
+
+    comment_data = (b"//", b"/*", b"*/")
+    with open_compressed(str(compressed)) as stream:
+        observed = parse_stream(stream, comment_data, 1, chunk_size=4096)
+    assert observed == derive_file_parser(ParseMode.BUFFERED)(str(source), *comment_data, 1)
@@ -0,0 +1,168 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+from tests.fixtures import mock_dir, populate_directory
+
+from locstat import __version__
+from locstat.utilities.daemon import default_socket_path, forward, request
+
+pytestmark = pytest.mark.skipif(os.name == "nt", reason="The daemon relies on Unix sockets")
+
+PACKAGE_ROOT = Path(__file__).parent.parent.parent
+
+def _environment(socket_path) -> dict[str, str]:
+    return {**os.environ, "PYTHONPATH" : str(PACKAGE_ROOT), "LOCSTAT_SOCKET" : str(socket_path)}
+
+def _run(arguments, socket_path, cwd) -> subprocess.CompletedProcess[str]:
+    return subprocess.run((sys.executable, "-m", "locstat", *arguments), cwd=cwd, env=_environment(socket_path),
+                          capture_output=True, text=True, timeout=60)
+
+def _without_timings(output: str) -> list:
+    if output.startswith("{"):
+        records = [json.loads(line) for line in output.splitlines()]
+        for record in records:
+            record.pop("time", None), record.pop("scanned_at", None)
+        return records
+    return [line for line in output.splitlines() if not line.startswith(("time", "scanned_at"))]
+
+@pytest.fixture
+def daemon(tmp_path):
+    # Kept short, as Unix socket paths are limited to about a hundred characters
+    socket_path = tmp_path / "d.sock"
+    process = subprocess.Popen((sys.executable, "-m", "locstat", "serve", "--socket", str(socket_path)),
+                               env=_environment(socket_path), stderr=subprocess.PIPE, text=True)
+    deadline = time.monotonic() + 30
+    while not socket_path.exists():
+        assert process.poll() is None, process.stderr.read()
+        assert time.monotonic() < deadline, "Daemon did not start listening"
+        time.sleep(0.05)
+    yield socket_path
+    if process.poll() is None:
+        request({"command" : "stop"}, socket_path)
+    assert process.wait(timeout=30) == 0
+    process.stderr.close()
+    assert not socket_path.exists()
+
+def test_daemon_consistency(mock_dir, daemon):
+    project = mock_dir / "project"
+    populate_directory(project)
+    for arguments in (("-d", "project"),
+                      ("-d", "project", "-vb", "REPORT"),
+                      ("-d", "project", "-vb", "DETAILED", "-mc", "5"),
+                      ("-d", "project", "--ndjson"),
+                      ("-d", "project", "--skip-generated"),
+                      ("-f", "project/src/main.py"),
+                      ("-d", "missing")):
+        for run in ("cold", "warm"):
+            served = _run(arguments, daemon, mock_dir)
+            local = _run((*arguments, "--no-daemon"), daemon, mock_dir)
+            assert served.returncode == local.returncode, f"{arguments} ({run})"
+            assert _without_timings(served.stdout) == _without_timings(local.stdout), f"{arguments} ({run})"
+            assert served.stderr == local.stderr, f"{arguments} ({run})"
+    assert request({"command" : "status"}, daemon)["requests"] == 14
+
+    # Output files are written relative to the client's working directory
+    served = _run(("-d", "project", "-vb", "REPORT", "-o", "served.json"), daemon, mock_dir)
+    assert served.returncode == 0
+    local = _run(("-d", "project", "-vb", "REPORT", "-o", "local.json", "--no-daemon"), daemon, mock_dir)
+    observed, expected = (json.loads((mock_dir / name).read_text()) for name in ("served.json", "local.json"))
+    for output in (observed, expected):
+        del output["general"]["time"], output["general"]["scanned_at"]
+    assert observed == expected
+
+    # Standard input is read from the client
+    served = subprocess.run((sys.executable, "-m", "locstat", "-f", "-", "--language", "py"), cwd=mock_dir,
+                            env=_environment(daemon), input="x = 1\n# comment\n", capture_output=True, text=True)
+    assert _without_timings(served.stdout)[:3] == ["GENERAL:", "loc : 1", "total : 2"]
+
+def test_daemon_recounts_changes(mock_dir, daemon):
+    project = mock_dir / "project"
+    populate_directory(project)
+    arguments = ("-d", str(project), "-vb", "REPORT")
+    _run(arguments, daemon, mock_dir)
+    main_file = project / "src" / "main.py"
+    main_file.write_text(main_file.read_text() + "\nprint('Appended')\n")
+    os.utime(main_file, ns=(1, 1))
+    served = _run(arguments, daemon, mock_dir)
+    local = _run((*arguments, "--no-daemon"), daemon, mock_dir)
+    assert _without_timings(served.stdout) == _without_timings(local.stdout)
+    assert request({"command" : "status"}, daemon)["cached_files"] > 0
+
+def test_daemon_protocol(mock_dir, daemon):
+    (mock_dir / "main.py").write_text("x = 1\n")
+    # Clients that send no descriptors get their output in the response
+    response = request({"command" : "scan", "argv" : ["-f", "main.py"], "cwd" : str(mock_dir)}, daemon)
+    assert response["status"] == 0 and response["stdout"].startswith("GENERAL:")
+    response = request({"command" : "scan", "argv" : ["-d", "missing"], "cwd" : str(mock_dir)}, daemon)
+    assert response == {"status" : 1, "stdout" : "", "stderr" : "Directory missing could not be found\n"}
+
+    assert "error" in request({"command" : "scan", "argv" : ["-f", "main.py"], "cwd" : "relative"}, daemon)
+    assert "error" in request({"command" : "restart"}, daemon)
+    # Clients of other versions run their scans themselves
+    assert "error" in request({"command" : "scan", "argv" : ["-f", "main.py"], "cwd" : str(mock_dir),
+                               "version" : f"{__version__}.dev"}, daemon)
+
+    status = request({"command" : "status"}, daemon)
+    assert status["version"] == __version__ and status["requests"] == 2
+
+def test_daemon_stalled_clients(mock_dir, daemon):
+    project = mock_dir / "project"
+    populate_directory(project)
+    arguments = ("-d", "project", "-vb", "REPORT")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as silent:
+        # Neither a client that never sends its request, nor a scan waiting on standard input, holds up others
+        silent.connect(str(daemon))
+        waiting = subprocess.Popen((sys.executable, "-m", "locstat", "-f", "-", "--language", "py"), cwd=mock_dir,
+                                   env=_environment(daemon), stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        try:
+            time.sleep(0.5)
+            served = _run(arguments, daemon, mock_dir)
+            local = _run((*arguments, "--no-daemon"), daemon, mock_dir)
+            assert served.returncode == 0
+            assert _without_timings(served.stdout) == _without_timings(local.stdout)
+            output, _ = waiting.communicate("x = 1\n# comment\n", timeout=60)
+        finally:
+            waiting.kill()
+    assert _without_timings(output)[:3] == ["GENERAL:", "loc : 1", "total : 2"]
+
+def test_forward_without_daemon(tmp_path):
+    assert forward(("-f", "main.py"), tmp_path / "d.sock") is None
+    # Left behind by a daemon that was killed
+    stale_socket = tmp_path / "stale.sock"
+    stale_socket.touch()
+    assert forward(("-f", "main.py"), stale_socket) is None
+
+def test_socket_ownership(tmp_path, monkeypatch):
+    monkeypatch.delenv("LOCSTAT_SOCKET", raising=False)
+    monkeypatch.delenv("XDG_RUNTIME_DIR", raising=False)
+    monkeypatch.setenv("TMPDIR", str(tmp_path))
+    # Other users cannot create the socket in a directory of the user's own
+    assert default_socket_path().parent == tmp_path / f"locstat-{os.getuid()}"
+
+    # Paths that are not sockets of the user's own are neither connected to nor removed
+    regular_file = tmp_path / "file.sock"
+    regular_file.write_text("Not a socket\n")
+    served = subprocess.run((sys.executable, "-m", "locstat", "serve", "--socket", str(regular_file)),
+                            env=_environment(regular_file), capture_output=True, text=True, timeout=60)
+    assert served.returncode == 1 and regular_file.read_text() == "Not a socket\n"
+
+    if os.getuid() != 0:
+        return
+    foreign_socket = tmp_path / "foreign.sock"
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as listener:
+        listener.bind(str(foreign_socket))
+        listener.listen()
+        os.chown(foreign_socket, 65534, 65534)
+        assert forward(("-f", "main.py"), foreign_socket) is None
+        with pytest.raises(OSError):
+            request({"command" : "status"}, foreign_socket)
+        listener.settimeout(0)
+        with pytest.raises(BlockingIOError):
+            listener.accept()
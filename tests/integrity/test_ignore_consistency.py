@@ -0,0 +1,68 @@
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from locstat.utilities.ignore import IgnoreRules
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed")
+
+GITIGNORE = '''
+# Build outputs
+build/
+/dist
+*.o
+*.min.js
+!vendor/keep.min.js
+docs/**/*.html
+**/generated
+logs/*
+!logs/important.log
+[Tt]emp*/
+'''
+
+NESTED_GITIGNORE = '''
+*.py
+!main.py
+fixtures/
+'''
+
+def _populate(root):
+    files = ("main.c", "main.o", "app.min.js", "vendor/keep.min.js", "vendor/drop.min.js",
+             "build/out.c", "src/build/out.c", "dist/bundle.js", "src/dist/kept.js",
+             "docs/index.html", "docs/api/v1/index.html", "docs/readme.md",
+             "src/generated/table.c", "generated/table.c", "logs/debug.log", "logs/important.log",
+             "Temporary/a.c", "temp_files/b.c", "tempfile.c",
+             "tests/main.py", "tests/helper.py", "tests/fixtures/data.c", "tests/unit/fixtures.py",
+             "src/app/fixtures.c")
+    for file in files:
+        path = root / file
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("x = 1\n")
+    (root / ".gitignore").write_text(GITIGNORE)
+    (root / "tests" / ".gitignore").write_text(NESTED_GITIGNORE)
+
+def _walk(rules, root):
+    '''Files left after pruning ignored directories, relative to root'''
+    files = set()
+    for directory, directories, filenames in os.walk(root):
+        directories[:] = [name for name in directories
+                          if not rules.ignored(os.path.join(directory, name), True)]
+        files.update(os.path.relpath(os.path.join(directory, name), root).replace(os.sep, "/")
+                     for name in filenames if not rules.ignored(os.path.join(directory, name), False))
+    return files
+
+def test_matches_git(tmp_path):
+    _populate(tmp_path)
+    environment = {**os.environ, "GIT_CONFIG_GLOBAL" : os.devnull, "GIT_CONFIG_NOSYSTEM" : "1"}
+    subprocess.run(("git", "init", "-q", str(tmp_path)), check=True, env=environment)
+    (tmp_path / ".git" / "info" / "exclude").write_text("tempfile.c\n")
+    expected = set(subprocess.run(("git", "ls-files", "--others", "--exclude-standard"),
+                                  cwd=tmp_path, env=environment, capture_output=True, text=True,
+                                  check=True).stdout.splitlines())
+
+    assert _walk(IgnoreRules(str(tmp_path)), tmp_path) == expected
+    # Rules of the repository's root apply to scans of its subdirectories
+    assert _walk(IgnoreRules(str(tmp_path / "tests")), tmp_path / "tests") \
+        == {file.removeprefix("tests/") for file in expected if file.startswith("tests/")}
@@ -0,0 +1,114 @@
+import array
+import os
+
+import pytest
+
+from tests.fixtures import mock_dir, mock_config, populate_nested, scan_kwargs
+
+from locstat.parsing.directory import (NATIVE_WALK_AVAILABLE,
+                                       parse_directory_native,
+                                       parse_directory,
+                                       parse_directory_record,
+                                       parse_directory_verbose,
+                                       parse_directory_threaded,
+                                       parse_directory_record_threaded,
+                                       parse_directory_verbose_threaded)
+from locstat.parsing.parallel import (parse_directory_parallel,
+                                      parse_directory_record_parallel,
+                                      parse_directory_verbose_parallel)
+from locstat.utilities.core import (construct_directory_filter,
+                                    construct_file_filter,
+                                    derive_file_parser)
+from locstat.data_structures.parse_modes import ParseMode
+
+def test_parallel_consistency(mock_dir, mock_config):
+    populate_nested(mock_dir, 4)
+    object.__setattr__(mock_config, "symbol_mapping", {"py" : (b"#", None, None),
+                                                       "c" : (b"//", b"/*", b"*/")})
+
+    for depth in (-1, 0, 1, 2):
+        kwargs = scan_kwargs(mock_config, depth=depth)
+        serial_data, parallel_data = array.array("L", (0, 0)), array.array("L", (0, 0))
+        parse_directory(os.scandir(mock_dir), line_data=serial_data, **kwargs)
+        parse_directory_parallel(str(mock_dir), line_data=parallel_data, jobs=2, **kwargs)
+        assert serial_data == parallel_data, \
+        f"BARE: Serial {tuple(serial_data)} != Parallel {tuple(parallel_data)} at depth {depth}"
+
+        serial_record, parallel_record = {}, {}
+        serial_data, parallel_data = array.array("L", (0, 0)), array.array("L", (0, 0))
+        parse_directory_record(os.scandir(mock_dir), line_data=serial_data,
+                               language_record=serial_record, **kwargs)
+        parse_directory_record_parallel(str(mock_dir), line_data=parallel_data,
+                                        language_record=parallel_record, jobs=2, **kwargs)
+        assert serial_data == parallel_data and list(serial_record.items()) == list(parallel_record.items()), \
+        f"REPORT: Serial {serial_record} != Parallel {parallel_record} at depth {depth}"
+
+        serial_record, parallel_record = {}, {}
+        with os.scandir(mock_dir) as directory_iterator:
+            serial_tree = parse_directory_verbose(directory_iterator, language_record=serial_record,
+                                                  **kwargs)
+        parallel_tree = parse_directory_verbose_parallel(str(mock_dir), language_record=parallel_record,
+                                                         jobs=2, **kwargs)
+        assert serial_tree == parallel_tree and list(serial_record.items()) == list(parallel_record.items()), \
+        f"DETAILED: Serial and parallel trees differ at depth {depth}"
+
+def test_threaded_consistency(mock_dir, mock_config):
+    populate_nested(mock_dir, 4)
+    object.__setattr__(mock_config, "symbol_mapping", {"py" : (b"#", None, None),
+                                                       "c" : (b"//", b"/*", b"*/")})
+
+    for depth in (-1, 0, 1, 2):
+        kwargs = scan_kwargs(mock_config, depth=depth)
+        serial_data, threaded_data = array.array("L", (0, 0)), array.array("L", (0, 0))
+        parse_directory(os.scandir(mock_dir), line_data=serial_data, **kwargs)
+        parse_directory_threaded(os.scandir(mock_dir), line_data=threaded_data, jobs=2, **kwargs)
+        assert serial_data == threaded_data, \
+        f"BARE: Serial {tuple(serial_data)} != Threaded {tuple(threaded_data)} at depth {depth}"
+
+        serial_record, threaded_record = {}, {}
+        serial_data, threaded_data = array.array("L", (0, 0)), array.array("L", (0, 0))
+        parse_directory_record(os.scandir(mock_dir), line_data=serial_data,
+                               language_record=serial_record, **kwargs)
+        parse_directory_record_threaded(os.scandir(mock_dir), line_data=threaded_data,
+                                        language_record=threaded_record, jobs=2, **kwargs)
+        assert serial_data == threaded_data and list(serial_record.items()) == list(threaded_record.items()), \
+        f"REPORT: Serial {serial_record} != Threaded {threaded_record} at depth {depth}"
+
+        serial_record, threaded_record = {}, {}
+        with os.scandir(mock_dir) as directory_iterator:
+            serial_tree = parse_directory_verbose(directory_iterator, language_record=serial_record,
+                                                  **kwargs)
+        with os.scandir(mock_dir) as directory_iterator:
+            threaded_tree = parse_directory_verbose_threaded(directory_iterator, language_record=threaded_record,
+                                                             jobs=2, **kwargs)
+        assert serial_tree == threaded_tree and list(serial_record.items()) == list(threaded_record.items()), \
+        f"DETAILED: Serial and threaded trees differ at depth {depth}"
+
+@pytest.mark.skipif(not NATIVE_WALK_AVAILABLE, reason="Native traversal unavailable on this platform")
+def test_native_consistency(mock_dir, mock_config):
+    populate_nested(mock_dir, 4)
+    object.__setattr__(mock_config, "symbol_mapping", {"py" : (b"#", None, None),
+                                                       "c" : (b"//", b"/*", b"*/")})
+    filters: tuple[dict, ...] = ({},
+                                 {"extension_set" : {"c"}, "exclude_type" : True},
+                                 {"directory_set" : {str(mock_dir / "nested" / "level_1")}, "exclude_dir" : True},
+                                 {"file_set" : {str(mock_dir / "src" / "main.py")}, "exclude_file" : True})
+
+    for filter_kwargs in filters:
+        file_filter = construct_file_filter(filter_kwargs.get("extension_set"), filter_kwargs.get("file_set"),
+                                            include_file=False,
+                                            exclude_file=filter_kwargs.get("exclude_file", False),
+                                            include_type=False,
+                                            exclude_type=filter_kwargs.get("exclude_type", False))
+        directory_filter = construct_directory_filter(filter_kwargs.get("directory_set", frozenset()),
+                                                      exclude=filter_kwargs.get("exclude_dir", False))
+        for parse_mode in ParseMode:
+            for depth in (-1, 0, 1, 2):
+                serial_data, native_data = array.array("L", (0, 0)), array.array("L", (0, 0))
+                serial_record, native_record = {}, {}
+                parse_directory_record(os.scandir(mock_dir), mock_config, serial_data, serial_record, depth,
+                                       derive_file_parser(parse_mode), file_filter, directory_filter, 1)
+                parse_directory_native(str(mock_dir), mock_config, native_data, depth, parse_mode, 1,
+                                       native_record, **filter_kwargs)
+                assert serial_data == native_data and list(serial_record.items()) == list(native_record.items()), \
+                f"Native traversal differs with filters {filter_kwargs}, mode {parse_mode}, depth {depth}"
@@ -0,0 +1,95 @@
+import array
+import os
+
+import pytest
+
+from tests.fixtures import mock_dir, mock_config, populate_nested, scan_kwargs
+
+from locstat.parsing import prefetch
+from locstat.parsing.directory import (parse_directory,
+                                       parse_directory_record,
+                                       parse_directory_threaded,
+                                       parse_directory_record_threaded,
+                                       parse_directory_verbose_threaded,
+                                       parse_directory_stream,
+                                       parse_directory_columnar)
+from locstat.parsing.prefetch import READ_AHEAD_AVAILABLE, ReadAhead
+
+def _scans(directory, kwargs, read_ahead):
+    '''Results of every scan read-ahead applies to'''
+    bare_data, record_data, threaded_data = (array.array("Q", (0, 0)) for _ in range(3))
+    parse_directory(os.scandir(directory), line_data=bare_data, read_ahead=read_ahead, **kwargs)
+    record = {}
+    parse_directory_record(os.scandir(directory), line_data=record_data, language_record=record,
+                           read_ahead=read_ahead, **kwargs)
+    parse_directory_threaded(os.scandir(directory), line_data=threaded_data, jobs=2, read_ahead=read_ahead, **kwargs)
+    threaded_record = {}
+    parse_directory_record_threaded(os.scandir(directory), line_data=array.array("Q", (0, 0)),
+                                    language_record=threaded_record, jobs=2, read_ahead=read_ahead, **kwargs)
+    tree = parse_directory_verbose_threaded(os.scandir(directory), language_record={}, jobs=2,
+                                            read_ahead=read_ahead, **kwargs)
+    stream = list(parse_directory_stream(str(directory), language_record={}, read_ahead=read_ahead, **kwargs))
+    store = parse_directory_columnar(os.scandir(directory), language_record={}, root=str(directory),
+                                     read_ahead=read_ahead, **kwargs)
+    return (tuple(bare_data), tuple(record_data), list(record.items()), tuple(threaded_data),
+            list(threaded_record.items()), tree, stream, store.to_mapping())
+
+@pytest.mark.parametrize("depth", (-1, 0, 1, 2))
+def test_prefetch_consistency(mock_dir, mock_config, monkeypatch, depth):
+    populate_nested(mock_dir, 6)
+    object.__setattr__(mock_config, "symbol_mapping", {"py" : (b"#", None, None),
+                                                       "c" : (b"//", b"/*", b"*/")})
+    kwargs = scan_kwargs(mock_config, depth=depth)
+
+    expected = _scans(mock_dir, kwargs, None)
+    # Windows small enough for the depth to change several times within a scan
+    monkeypatch.setattr(prefetch, "_ADJUSTMENT_WINDOW", 2)
+    for read_ahead in (ReadAhead(), ReadAhead(0), ReadAhead(1, maximum_depth=1), ReadAhead(64)):
+        assert _scans(mock_dir, kwargs, read_ahead) == expected, f"Initial depth {read_ahead.depth}"
+
+def test_pipeline_order(tmp_path):
+    paths = []
+    for i in range(10):
+        path = tmp_path / f"{i}.py"
+        path.write_text("x = 1\n" * i)
+        paths.append(str(path))
+    items = [(path, True) for path in paths] + [("missing", True), ("directory", False)]
+    items.insert(3, ("directory", False))
+
+    read_ahead = ReadAhead(4)
+    pulled = []
+    def pull():
+        # Items are only pulled from upstream once earlier ones are handed on
+        for item in items:
+            pulled.append(item)
+            yield item
+    passed = []
+    for item in read_ahead.pipeline(pull(), lambda item: item[0] if item[1] else None):
+        if READ_AHEAD_AVAILABLE and len(passed) < 6:
+            files_ahead = sum(is_file for _, is_file in pulled[len(passed):])
+            assert files_ahead <= read_ahead.depth + 1
+        passed.append(item)
+    assert passed == items
+    if READ_AHEAD_AVAILABLE:
+        # Empty files are advised as well, missing ones are left to the parser
+        assert read_ahead.advised == 10
+
+def test_depth_adjustment(monkeypatch):
+    monkeypatch.setattr(prefetch, "_ADJUSTMENT_WINDOW", 1)
+    clock = [0.0]
+    monkeypatch.setattr(prefetch.time, "perf_counter", lambda: clock[0])
+    read_ahead = ReadAhead(8, maximum_depth=32)
+
+    def window(seconds):
+        clock[0] += seconds
+        read_ahead.consumed()
+        return read_ahead.depth
+
+    # Grows while throughput improves, up to the maximum
+    assert [window(1.0), window(0.5), window(0.4), window(0.4)] == [16, 32, 32, 32]
+    # Reverses once throughput drops beyond the tolerance, down to no advice at all
+    assert [window(0.5), window(0.5), window(0.5), window(0.5)] == [16, 8, 4, 0]
+    assert [window(0.5), window(1.0), window(0.5)] == [0, 4, 8]
+
+    with pytest.raises(ValueError):
+        ReadAhead(64, maximum_depth=32)
@@ -0,0 +1,215 @@
+import array
+import os
+import shutil
+import sqlite3
+
+import pytest
+
+from tests.fixtures import mock_dir, mock_config, populate_directory, run_git
+
+from locstat.parsing.cache import MemoryCache, ResultCache
+from locstat.parsing.git import _blob_ids_from_git, _blob_ids_from_index, git_blob_ids
+from locstat.parsing.directory import (parse_directory_record,
+                                       parse_directory_record_threaded,
+                                       parse_directory_verbose)
+from locstat.parsing.parallel import parse_directory_record_parallel
+from locstat.utilities.core import (construct_directory_filter,
+                                    construct_file_filter,
+                                    derive_file_parser)
+from locstat.data_structures.parse_modes import ParseMode
+
+def _record(mock_dir, kwargs, cache=None, parser=parse_directory_record, **extra):
+    line_data, language_record = array.array("L", (0, 0)), {}
+    if parser is parse_directory_record_parallel:
+        parser(str(mock_dir), line_data=line_data, language_record=language_record, cache=cache, **kwargs, **extra)
+    else:
+        parser(os.scandir(mock_dir), line_data=line_data, language_record=language_record, cache=cache, **kwargs, **extra)
+    return tuple(line_data), language_record
+
+def _cached_paths(cache_file) -> set[str]:
+    with sqlite3.connect(cache_file) as connection:
+        return {path for (path,) in connection.execute("SELECT path FROM results")}
+
+def test_cache_consistency(mock_dir, mock_config):
+    project = mock_dir / "project"
+    populate_directory(project)
+    cache_file = mock_dir / "cache" / "results.sqlite"
+    object.__setattr__(mock_config, "symbol_mapping", {"py" : (b"#", None, None),
+                                                       "c" : (b"//", b"/*", b"*/")})
+    kwargs = {"config" : mock_config,
+              "file_parsing_function" : derive_file_parser(ParseMode.BUFFERED),
+              "file_filter_function" : construct_file_filter(),
+              "directory_filter_function" : construct_directory_filter(frozenset()),
+              "minimum_characters" : 1,
+              "depth" : -1}
+    expected = _record(project, kwargs)
+
+    for parser, extra in ((parse_directory_record, {}),
+                          (parse_directory_record_threaded, {"jobs" : 2}),
+                          (parse_directory_record_parallel, {"jobs" : 2})):
+        cache_file.unlink(missing_ok=True)
+        for run in ("cold", "warm"):
+            with ResultCache(cache_file) as cache:
+                observed = _record(project, kwargs, cache, parser, **extra)
+            assert observed == expected, \
+            f"{parser.__qualname__} ({run} cache): {observed} != {expected}"
+
+    def _unreachable(filepath, *_):
+        raise AssertionError(f"Cached file {filepath} was parsed again")
+    with ResultCache(cache_file) as cache:
+        observed = _record(project, kwargs | {"file_parsing_function" : _unreachable}, cache)
+    assert observed == expected
+
+    # Changed files must be re-parsed, not served from the cache
+    main_file = project / "src" / "main.py"
+    main_file.write_text(main_file.read_text() + "\nprint('Appended')\n")
+    os.utime(main_file, ns=(1, 1))
+    expected = _record(project, kwargs)
+    with ResultCache(cache_file) as cache:
+        observed = _record(project, kwargs, cache)
+    assert observed == expected, f"Modified file served stale counts: {observed} != {expected}"
+
+    # Counts under different parameters are kept apart
+    expected = _record(project, kwargs | {"minimum_characters" : 5})
+    with ResultCache(cache_file) as cache:
+        observed = _record(project, kwargs | {"minimum_characters" : 5}, cache)
+    assert observed == expected, f"Cache ignored minimum characters: {observed} != {expected}"
+
+    with ResultCache(cache_file) as cache:
+        with os.scandir(project) as directory_iterator:
+            observed_tree = parse_directory_verbose(directory_iterator, language_record={}, cache=cache, **kwargs)
+    with os.scandir(project) as directory_iterator:
+        expected_tree = parse_directory_verbose(directory_iterator, language_record={}, **kwargs)
+    assert observed_tree == expected_tree, "DETAILED output differs when cached"
+
+@pytest.mark.parametrize("parser, extra", ((parse_directory_record, {}),
+                                           (parse_directory_record_parallel, {"jobs" : 2})))
+def test_cache_eviction(mock_dir, mock_config, parser, extra):
+    project = mock_dir / "project"
+    populate_directory(project)
+    cache_file = mock_dir / "results.sqlite"
+    object.__setattr__(mock_config, "symbol_mapping", {"py" : (b"#", None, None)})
+    kwargs = {"config" : mock_config,
+              "file_parsing_function" : derive_file_parser(ParseMode.BUFFERED),
+              "file_filter_function" : construct_file_filter(),
+              "directory_filter_function" : construct_directory_filter(frozenset()),
+              "minimum_characters" : 1,
+              "depth" : -1}
+
+    # Files scanned every time are only written on the first scan, and must be kept as recent through their hits,
+    # including those of worker processes
+    with ResultCache(cache_file, max_entries=40) as cache:
+        _record(project, kwargs, cache, parser, **extra)
+    stale = project / "stale"
+    stale.mkdir()
+    for i in range(20):
+        (stale / f"stale_{i}.py").write_text("x = 1\n")
+    with ResultCache(cache_file, max_entries=40) as cache:
+        _record(project, kwargs, cache, parser, **extra)
+    assert any("stale_" in path for path in _cached_paths(cache_file))
+
+    for file in stale.iterdir():
+        file.unlink()
+    stale.rmdir()
+    for i in range(30):
+        (project / f"fresh_{i}.py").write_text("y = 2\n")
+    with ResultCache(cache_file, max_entries=40) as cache:
+        _record(project, kwargs, cache, parser, **extra)
+
+    paths = _cached_paths(cache_file)
+    scanned = {str(path) for path in project.rglob("*.py") if not path.is_symlink()}
+    assert len(paths) <= 40, f"Cache holds {len(paths)} entries beyond its bound of 40"
+    assert scanned <= paths, f"Entries from the latest scan were evicted: {scanned - paths}"
+    assert all("stale_" in path for path in paths - scanned), "Entries other than stale ones were kept"
+
+def test_memory_cache(mock_dir, mock_config):
+    project = mock_dir / "project"
+    populate_directory(project)
+    object.__setattr__(mock_config, "symbol_mapping", {"py" : (b"#", None, None),
+                                                       "c" : (b"//", b"/*", b"*/")})
+    kwargs = {"config" : mock_config,
+              "file_parsing_function" : derive_file_parser(ParseMode.BUFFERED),
+              "file_filter_function" : construct_file_filter(),
+              "directory_filter_function" : construct_directory_filter(frozenset()),
+              "minimum_characters" : 1,
+              "depth" : -1}
+    expected = _record(project, kwargs)
+    cache = MemoryCache()
+    for parser, extra in ((parse_directory_record, {}), (parse_directory_record_threaded, {"jobs" : 2})):
+        for run in ("cold", "warm"):
+            observed = _record(project, kwargs, cache, parser, **extra)
+            assert observed == expected, f"{parser.__qualname__} ({run} cache): {observed} != {expected}"
+
+    def _unreachable(filepath, *_):
+        raise AssertionError(f"Cached file {filepath} was parsed again")
+    assert _record(project, kwargs | {"file_parsing_function" : _unreachable}, cache) == expected
+
+    main_file = project / "src" / "main.py"
+    main_file.write_text(main_file.read_text() + "\nprint('Appended')\n")
+    os.utime(main_file, ns=(1, 1))
+    expected = _record(project, kwargs)
+    assert _record(project, kwargs, cache) == expected, "Modified file served stale counts"
+    expected = _record(project, kwargs | {"minimum_characters" : 5})
+    assert _record(project, kwargs | {"minimum_characters" : 5}, cache) == expected
+
+    # Least recently used entries are evicted first
+    cache = MemoryCache(max_entries=2)
+    first, second, third = ((str(path), (b"#", None, None)) for path in sorted(project.rglob("*.py"))[:3])
+    for file in (first, second):
+        cache.store(cache.lookup((file,), 1)[1], (1, 1))
+    assert cache.lookup((first,), 1)[0] == [(1, 1)]
+    cache.store(cache.lookup((third,), 1)[1], (1, 1))
+    assert len(cache) == 2
+    assert cache.lookup((first, second, third), 1)[0] == [(1, 1), None, (1, 1)]
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed")
+def test_git_blob_cache(mock_dir, mock_config):
+    project = mock_dir / "project"
+    populate_directory(project)
+    run_git(project, "init", "-q")
+    run_git(project, "add", "-A")
+    run_git(project, "commit", "-q", "-m", "Initial commit")
+    clone = mock_dir / "clone"
+    run_git(mock_dir, "clone", "-q", str(project), str(clone))
+
+    cache_file = mock_dir / "results.sqlite"
+    object.__setattr__(mock_config, "symbol_mapping", {"py" : (b"#", None, None)})
+    file_parser = derive_file_parser(ParseMode.BUFFERED)
+    kwargs = {"config" : mock_config,
+              "file_parsing_function" : file_parser,
+              "file_filter_function" : construct_file_filter(),
+              "directory_filter_function" : construct_directory_filter(frozenset()),
+              "minimum_characters" : 1,
+              "depth" : -1}
+    expected = _record(project, kwargs)
+    with ResultCache(cache_file, blob_ids=git_blob_ids(str(project))) as cache:
+        assert _record(project, kwargs, cache) == expected
+
+    # Tracked files of a clone are served by blob ID, only symlinks are keyed on their path
+    parsed = set()
+    def _recording_parser(filepath, *args):
+        parsed.add(filepath)
+        return file_parser(filepath, *args)
+    blob_ids = git_blob_ids(str(clone))
+    with ResultCache(cache_file, blob_ids=blob_ids) as cache:
+        observed = _record(clone, kwargs | {"file_parsing_function" : _recording_parser}, cache)
+    assert observed[0] == expected[0]
+    assert all(os.path.islink(path) for path in parsed), f"Files with known blobs were parsed: {parsed}"
+
+    # Modified files are dropped from the mapping and fall back to stat based keys
+    main_file = clone / "src" / "main.py"
+    main_file.write_text(main_file.read_text() + "\nprint('Appended')\n")
+    assert str(main_file) not in git_blob_ids(str(clone))
+    assert str(main_file) in blob_ids
+    expected = _record(clone, kwargs)
+    with ResultCache(cache_file, blob_ids=git_blob_ids(str(clone))) as cache:
+        assert _record(clone, kwargs, cache) == expected
+
+    # Reading the index directly agrees with git once no entry is racily clean
+    run_git(clone, "checkout", "--", ".")
+    for path in clone.rglob("*"):
+        if ".git" not in path.parts and path.is_file() and not path.is_symlink():
+            os.utime(path, ns=(1_000_000_000 * 10**9, 1_000_000_000 * 10**9))
+    run_git(clone, "update-index", "--refresh")
+    for directory in (clone, clone / "src"):
+        assert _blob_ids_from_index(str(directory)) == _blob_ids_from_git(str(directory))
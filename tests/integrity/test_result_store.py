@@ -0,0 +1,68 @@
+import copy
+import os
+import tracemalloc
+
+import pytest
+
+from tests.fixtures import mock_dir, mock_config, populate_directory, scan_kwargs
+
+from locstat.data_structures.result_store import ResultStore
+from locstat.parsing.directory import parse_directory_columnar, parse_directory_verbose
+from locstat.utilities.presentation import dump_json_output, dump_std_output
+
+@pytest.mark.parametrize("depth", (-1, 0, 1))
+@pytest.mark.parametrize("threads", (False, True))
+def test_columnar_consistency(mock_dir, mock_config, depth, threads):
+    populate_directory(mock_dir)
+    (mock_dir / "src" / "utils" / "nested").mkdir()
+    (mock_dir / "src" / "utils" / "nested" / "main.py").write_text("x = 1\n# comment\n")
+    object.__setattr__(mock_config, "symbol_mapping", {"py" : (b"#", None, None)})
+
+    expected_record = {}
+    with os.scandir(mock_dir) as directory_data:
+        expected = parse_directory_verbose(directory_data, language_record=expected_record,
+                                           **scan_kwargs(mock_config, depth=depth))
+    observed_record = {}
+    with os.scandir(mock_dir) as directory_data:
+        store = parse_directory_columnar(directory_data, language_record=observed_record, root=str(mock_dir),
+                                         threads=threads, jobs=2, **scan_kwargs(mock_config, depth=depth))
+    assert store.to_mapping() == expected
+    assert observed_record == expected_record
+
+    columns = store.columns
+    assert columns["totals"].tolist() == store.totals.tolist() and columns["totals"].readonly
+    assert sum(columns["totals"][index] for index in range(len(store)) if not store.is_directory(index)) \
+        == expected["total"]
+
+    # Both output formats must render stores exactly as they render mappings
+    general = {"general" : {"total" : expected["total"], "loc" : expected["loc"]}, "languages" : expected_record}
+    mapping_output = {"files" : expected["files"], "subdirectories" : expected["subdirectories"],
+                      **copy.deepcopy(general)}
+    for dump, name in ((dump_json_output, "output.json"), (dump_std_output, "output.txt")):
+        dump(output_mapping=copy.deepcopy(mapping_output), filepath=str(mock_dir.parent / f"mapping_{name}"))
+        dump(output_mapping={"store" : store, **copy.deepcopy(general)},
+             filepath=str(mock_dir.parent / f"store_{name}"))
+        assert ((mock_dir.parent / f"mapping_{name}").read_text()
+                == (mock_dir.parent / f"store_{name}").read_text())
+
+def test_store_memory(mock_dir, mock_config):
+    '''Results of DETAILED scans should take a fraction of the memory of nested mappings'''
+    for directory_index in range(20):
+        directory = mock_dir / "project" / "src" / f"package_{directory_index}"
+        directory.mkdir(parents=True)
+        for file_index in range(100):
+            (directory / f"module_{file_index}.py").write_bytes(b"x = 1\n" * (file_index + 300))
+    object.__setattr__(mock_config, "symbol_mapping", {"py" : (b"#", None, None)})
+
+    def retained(function, **kwargs):
+        tracemalloc.start()
+        with os.scandir(mock_dir) as directory_data:
+            result = function(directory_data, language_record={}, **kwargs, **scan_kwargs(mock_config))
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del result
+        return size
+
+    mapping_size = retained(parse_directory_verbose)
+    store_size = retained(parse_directory_columnar, root=str(mock_dir))
+    assert mapping_size >= 5 * store_size, (mapping_size, store_size)
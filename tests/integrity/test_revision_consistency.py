@@ -0,0 +1,131 @@
+import array
+import os
+import shutil
+
+import pytest
+
+from tests.fixtures import mock_dir, mock_config, populate_directory, run_git
+
+from locstat.parsing.directory import parse_directory, parse_directory_record, parse_directory_verbose
+from locstat.parsing.revision import (parse_revision,
+                                      parse_revision_record,
+                                      parse_revision_verbose)
+from locstat.utilities.core import construct_file_filter, derive_file_parser
+from locstat.data_structures.parse_modes import ParseMode
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed")
+
+def _skip_git_directory(path: str) -> bool:
+    return os.path.basename(path) != ".git"
+
+@pytest.mark.parametrize("depth", (-1, 0, 1, 2))
+@pytest.mark.parametrize("file_filter", (construct_file_filter(),
+                                         construct_file_filter(frozenset({"py"}), include_type=True)))
+def test_revision_consistency(mock_dir, mock_config, depth, file_filter):
+    project = mock_dir / "project"
+    populate_directory(project)
+    (project / "src" / "no_newline.py").write_bytes(b"x = 1\n# comment\ny = 2")
+    (project / "src" / "multiline.c").write_text("int x;\n/* a\nb */\nint y;\n")
+    (project / "top.py").write_text("x = 1\n")
+    run_git(project, "init", "-q")
+    run_git(project, "add", "-A")
+    run_git(project, "commit", "-q", "-m", "Initial commit")
+
+    object.__setattr__(mock_config, "symbol_mapping", {"py" : (b"#", None, None),
+                                                       "c" : (b"//", b"/*", b"*/")})
+    kwargs = {"config" : mock_config,
+              "file_filter_function" : file_filter,
+              "directory_filter_function" : _skip_git_directory,
+              "minimum_characters" : 1,
+              "depth" : depth}
+    file_parser = derive_file_parser(ParseMode.BUFFERED)
+
+    # The scans of a clean checkout. At the depth limit, BARE and REPORT scans stop reading a directory
+    # at its first subdirectory, which they reach in file system order there and in git's order in revisions
+    expected_bare, expected_data, expected_record = array.array("L", (0, 0)), array.array("L", (0, 0)), {}
+    with os.scandir(project) as directory_iterator:
+        parse_directory(directory_iterator, line_data=expected_bare, file_parsing_function=file_parser, **kwargs)
+    with os.scandir(project) as directory_iterator:
+        parse_directory_record(directory_iterator, line_data=expected_data, language_record=expected_record,
+                               file_parsing_function=file_parser, **kwargs)
+    with os.scandir(project) as directory_iterator:
+        expected_tree = parse_directory_verbose(directory_iterator, language_record={},
+                                                file_parsing_function=file_parser, **kwargs)
+    committed_bare = array.array("L", (0, 0))
+    parse_revision(str(project), "HEAD", line_data=committed_bare, **kwargs)
+    if depth < 0:
+        assert committed_bare == expected_bare
+
+    # Changes to the work tree after the commit must not be visible in the revision
+    main_file = project / "src" / "main.py"
+    main_file.write_text(main_file.read_text() + "\nprint('Uncommitted')\n")
+    (project / "src" / "multiline.c").write_text("int z;\n")
+    (project / "untracked.py").write_text("untracked = True\n")
+    for directory in (project, project / "src", project / "src" / "utils", project / "tests"):
+        (directory / "untracked_directory").mkdir()
+
+    bare_data = array.array("L", (0, 0))
+    parse_revision(str(project), "HEAD", line_data=bare_data, **kwargs)
+    assert bare_data == committed_bare
+
+    observed_data, observed_record = array.array("L", (0, 0)), {}
+    parse_revision_record(str(project), "HEAD", line_data=observed_data, language_record=observed_record, **kwargs)
+    assert observed_data == bare_data
+    if depth < 0:
+        assert (observed_data, observed_record) == (expected_data, expected_record)
+
+    observed_tree = parse_revision_verbose(str(project), "HEAD", language_record={}, **kwargs)
+    assert observed_tree == expected_tree
+
+@pytest.mark.parametrize("work_tree", ("clean", "untracked_directory", "removed"))
+def test_revision_listing_order(mock_dir, mock_config, work_tree):
+    project = mock_dir / "project"
+    (project / "a").mkdir(parents=True)
+    (project / "a" / "a.py").write_text("x = 1\n")
+    (project / "a" / "b").mkdir()
+    (project / "a" / "b" / "nested.py").write_text("x = 1\n")
+    (project / "a" / "c.py").write_text("x = 1\ny = 2\n")
+    run_git(project, "init", "-q")
+    run_git(project, "add", "-A")
+    run_git(project, "commit", "-q", "-m", "Initial commit")
+    if work_tree == "untracked_directory":
+        (project / "a" / "0").mkdir()
+    elif work_tree == "removed":
+        shutil.rmtree(project / "a")
+
+    object.__setattr__(mock_config, "symbol_mapping", {"py" : (b"#", None, None)})
+    kwargs = {"config" : mock_config,
+              "file_filter_function" : construct_file_filter(),
+              "directory_filter_function" : _skip_git_directory,
+              "minimum_characters" : 1,
+              "depth" : 1}
+    # Directories are listed in git's order whatever the work tree holds, in which a/b comes between a/a.py and a/c.py
+    observed = array.array("L", (0, 0))
+    parse_revision(str(project), "HEAD", line_data=observed, **kwargs)
+    assert tuple(observed) == (1, 1)
+    tree = parse_revision_verbose(str(project), "HEAD", language_record={}, **kwargs)
+    assert (tree["total"], tree["loc"]) == (3, 3)
+
+def test_revision_subdirectory(mock_dir, mock_config):
+    project = mock_dir / "project"
+    populate_directory(project)
+    run_git(project, "init", "-q")
+    run_git(project, "add", "-A")
+    run_git(project, "commit", "-q", "-m", "Initial commit")
+
+    object.__setattr__(mock_config, "symbol_mapping", {"py" : (b"#", None, None)})
+    kwargs = {"config" : mock_config,
+              "file_filter_function" : construct_file_filter(),
+              "directory_filter_function" : _skip_git_directory,
+              "minimum_characters" : 1,
+              "depth" : -1}
+    expected = array.array("L", (0, 0))
+    with os.scandir(project / "src") as directory_iterator:
+        parse_directory_record(directory_iterator, line_data=expected, language_record={},
+                               file_parsing_function=derive_file_parser(ParseMode.BUFFERED), **kwargs)
+    observed = array.array("L", (0, 0))
+    parse_revision(str(project / "src"), "HEAD", line_data=observed, **kwargs)
+    assert observed == expected
+
+    with pytest.raises(ValueError):
+        parse_revision(str(project), "no-such-revision", line_data=observed, **kwargs)
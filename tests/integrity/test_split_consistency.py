@@ -0,0 +1,62 @@
+import os
+import random
+
+import pytest
+
+from tests.fixtures import mock_dir
+
+from locstat.parsing.extensions._parsing import (_get_split_options,
+                                                 _parse_file,
+                                                 _parse_file_auto,
+                                                 _parse_file_no_chunk,
+                                                 _parse_file_vm_map,
+                                                 _parse_files,
+                                                 _set_split_options)
+
+# Ranges are at least 4 MB long, files of at least twice that are split
+FILE_SIZE = 10 * 1024 * 1024
+
+LANGUAGES = {
+    "c" : ((b"//", b"/*", b"*/"),
+           ("int x = 1;\n", "/* opened\n", "still inside\n", "*/ int y;\n", "// line /* not a block\n",
+            "x /* inline */ y;\n", "/*\n*/\n", "é€ z;\n", "   \n", "\t/* only */ \n")),
+    "lua" : ((b"--", (b"--[[", b"--[=["), (b"]]", b"]=]")),
+             ("x = 1\n", "--[[ opened\n", "inside ]=]\n", "]] y = 2\n", "--[=[\n", "]=]\n", "-- line\n", "\n")),
+}
+
+@pytest.fixture
+def splitting():
+    threshold, threads = _get_split_options()
+    yield
+    _set_split_options(threshold, threads)
+
+@pytest.mark.skipif(os.name == "nt", reason="Files are not split on Windows")
+@pytest.mark.parametrize("language", LANGUAGES)
+@pytest.mark.parametrize("tail", ("", "\n", "x = 0"))
+def test_split_consistency(mock_dir, splitting, language, tail):
+    symbols, pieces = LANGUAGES[language]
+    rng = random.Random(f"{language}{tail}")
+    file = mock_dir / f"huge_{len(tail)}.{language}"
+    with open(file, "w", encoding="utf-8") as handle:
+        written = 0
+        while written < FILE_SIZE:
+            piece = rng.choice(pieces) * rng.randint(1, 40)
+            handle.write(piece)
+            written += len(piece)
+        handle.write(tail)
+
+    for minimum_characters in (0, 1, 4):
+        _set_split_options(0, 1)
+        expected = _parse_file(str(file), *symbols, minimum_characters)
+        for threads in (2, 3):
+            _set_split_options(1, threads)
+            for parser in (_parse_file, _parse_file_no_chunk, _parse_file_vm_map, _parse_file_auto):
+                assert parser(str(file), *symbols, minimum_characters) == expected, \
+                f"{parser.__qualname__} with {threads} threads, minimum characters {minimum_characters}"
+            assert tuple(_parse_files([(str(file), symbols)], minimum_characters, "BUF")) == expected
+
+def test_split_options(splitting):
+    _set_split_options(1 << 20, 4)
+    assert _get_split_options() == (1 << 20, 4)
+    with pytest.raises(ValueError):
+        _set_split_options(1 << 20, 0)
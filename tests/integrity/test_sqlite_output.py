@@ -0,0 +1,86 @@
+import copy
+import os
+import sqlite3
+
+import pytest
+
+from tests.fixtures import mock_dir, mock_config, populate_directory, scan_kwargs
+
+from locstat.parsing.directory import parse_directory_columnar, parse_directory_verbose
+from locstat.utilities.presentation import OUTPUT_MAPPING, dump_sqlite_output
+
+@pytest.mark.parametrize("columnar", (False, True))
+def test_sqlite_consistency(mock_dir, mock_config, columnar):
+    populate_directory(mock_dir)
+    (mock_dir / "src" / "utils" / "nested").mkdir()
+    (mock_dir / "src" / "utils" / "nested" / "main.py").write_text("x = 1\n# comment\n")
+    object.__setattr__(mock_config, "symbol_mapping", {"py" : (b"#", None, None)})
+
+    language_record = {}
+    with os.scandir(mock_dir) as directory_data:
+        expected = parse_directory_verbose(directory_data, language_record=language_record,
+                                           **scan_kwargs(mock_config))
+    general = {"total" : expected["total"], "loc" : expected["loc"], "platform" : "Linux"}
+    if columnar:
+        with os.scandir(mock_dir) as directory_data:
+            store = parse_directory_columnar(directory_data, language_record={}, root=str(mock_dir),
+                                             **scan_kwargs(mock_config))
+        output_mapping = {"store" : store, "general" : general, "languages" : copy.deepcopy(language_record)}
+    else:
+        output_mapping = {"files" : expected["files"], "subdirectories" : expected["subdirectories"],
+                          "general" : general, "languages" : copy.deepcopy(language_record)}
+
+    database = mock_dir.parent / "result.sqlite"
+    database.write_text("stale")
+    assert OUTPUT_MAPPING["sqlite"] is dump_sqlite_output
+    dump_sqlite_output(output_mapping, str(database))
+
+    connection = sqlite3.connect(database)
+    try:
+        assert connection.execute("SELECT total, loc, platform FROM scans").fetchall() \
+            == [(expected["total"], expected["loc"], "Linux")]
+        assert {extension : {"files" : files, "total" : total, "loc" : loc}
+                for extension, files, total, loc
+                in connection.execute("SELECT extension, files, total, loc FROM languages")} == language_record
+
+        # Files are attached to their directories and languages
+        assert {path : {"loc" : loc, "total_lines" : total} for path, total, loc
+                in connection.execute("SELECT f.path, f.total, f.loc FROM files f "
+                                      "JOIN directories d ON f.directory_id = d.id "
+                                      "JOIN languages l ON f.language_id = l.id "
+                                      "WHERE f.path = d.path || '/' || f.name "
+                                      "AND f.name LIKE '%.' || l.extension")} \
+            == _flatten_files(expected)
+
+        # Directory totals match the mapping's, and prefix queries find whole subtrees
+        utils = str(mock_dir / "src" / "utils")
+        assert connection.execute("SELECT total, loc FROM directories WHERE path = ?", (utils,)).fetchone() \
+            == (expected["subdirectories"]["src"]["subdirectories"]["utils"]["total"],
+                expected["subdirectories"]["src"]["subdirectories"]["utils"]["loc"])
+        assert connection.execute("SELECT sum(total) FROM files WHERE path >= ? AND path < ?",
+                                  (utils + "/", utils + "0")).fetchone()[0] \
+            == expected["subdirectories"]["src"]["subdirectories"]["utils"]["total"]
+        assert connection.execute("SELECT path FROM directories WHERE parent_id IS NULL").fetchall() \
+            == [(str(mock_dir),)]
+        assert {name for name, in connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'")} \
+            >= {"files_path", "directories_path", "files_language"}
+    finally:
+        connection.close()
+
+def test_sqlite_summary_only(mock_dir):
+    '''BARE and REPORT scans hold no per file results, leaving their tables empty'''
+    database = mock_dir / "result.db"
+    dump_sqlite_output({"general" : {"total" : 10, "loc" : 7}}, str(database))
+    connection = sqlite3.connect(database)
+    try:
+        assert connection.execute("SELECT total, loc FROM scans").fetchall() == [(10, 7)]
+        assert connection.execute("SELECT count(*) FROM files").fetchone() == (0,)
+        assert connection.execute("SELECT count(*) FROM languages").fetchone() == (0,)
+    finally:
+        connection.close()
+
+def _flatten_files(tree):
+    files = dict(tree["files"])
+    for subdirectory in tree["subdirectories"].values():
+        files.update(_flatten_files(subdirectory))
+    return files
@@ -0,0 +1,67 @@
+import json
+import os
+
+import pytest
+
+from tests.fixtures import mock_dir, mock_config, populate_directory
+
+from locstat.parsing.directory import parse_directory_stream, parse_directory_verbose
+from locstat.utilities.core import construct_directory_filter, construct_file_filter, derive_file_parser
+from locstat.utilities.presentation import dump_ndjson_stream
+from locstat.data_structures.parse_modes import ParseMode
+
+def _directory_totals(tree, path, totals):
+    '''Totals and direct file counts of every directory of a DETAILED tree, keyed by path'''
+    totals[path] = (len(tree["files"]), tree["total"], tree["loc"])
+    for name, subdirectory in tree["subdirectories"].items():
+        _directory_totals(subdirectory, os.path.join(path, name), totals)
+    return totals
+
+def _files(tree):
+    yield from ((filepath, counts["total_lines"], counts["loc"]) for filepath, counts in tree["files"].items())
+    for subdirectory in tree["subdirectories"].values():
+        yield from _files(subdirectory)
+
+@pytest.mark.parametrize("depth", (-1, 0, 1))
+@pytest.mark.parametrize("threads", (False, True))
+def test_stream_consistency(mock_dir, mock_config, depth, threads):
+    populate_directory(mock_dir)
+    (mock_dir / "src" / "multiline.c").write_text("int x;\n/* a\nb */\nint y;\n")
+    object.__setattr__(mock_config, "symbol_mapping", {"py" : (b"#", None, None),
+                                                       "c" : (b"//", b"/*", b"*/")})
+    kwargs = {"config" : mock_config,
+              "depth" : depth,
+              "file_parsing_function" : derive_file_parser(ParseMode.BUFFERED),
+              "file_filter_function" : construct_file_filter(),
+              "directory_filter_function" : construct_directory_filter(frozenset()),
+              "minimum_characters" : 1}
+
+    expected_record = {}
+    with os.scandir(mock_dir) as directory_data:
+        expected_tree = parse_directory_verbose(directory_data, language_record=expected_record, **kwargs)
+
+    observed_record = {}
+    records = list(parse_directory_stream(str(mock_dir), language_record=observed_record,
+                                          threads=threads, jobs=2, **kwargs))
+    assert observed_record == expected_record
+
+    # Every file comes before the record of the directory holding it, and the top directory comes last
+    seen_directories = set()
+    for record in records:
+        if record["type"] == "directory":
+            seen_directories.add(record["path"])
+        else:
+            assert os.path.dirname(record["path"]) not in seen_directories
+    assert records[-1]["path"] == str(mock_dir)
+
+    assert sorted((record["path"], record["total"], record["loc"]) for record in records
+                  if record["type"] == "file") == sorted(_files(expected_tree))
+    assert {record["path"] : (record["files"], record["total"], record["loc"]) for record in records
+            if record["type"] == "directory"} == _directory_totals(expected_tree, str(mock_dir), {})
+
+def test_ndjson_stream(mock_dir):
+    records = ({"type" : "file", "path" : f"file_{index}.py", "total" : index, "loc" : index} for index in range(3))
+    output = mock_dir / "output.ndjson"
+    dump_ndjson_stream(records, str(output))
+    lines = output.read_text().splitlines()
+    assert [json.loads(line)["total"] for line in lines] == [0, 1, 2]
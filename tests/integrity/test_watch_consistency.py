@@ -0,0 +1,97 @@
+import os
+import shutil
+import time
+
+import pytest
+
+from tests.fixtures import mock_dir, mock_config, populate_directory, scan_kwargs
+
+from locstat.parsing.watch import (DirectoryWatch,
+                                   _InotifySource,
+                                   _PollingSource,
+                                   inotify_available,
+                                   watch_directory)
+from locstat.utilities.core import construct_directory_filter
+
+SOURCES = (_PollingSource,
+           pytest.param(_InotifySource, marks=pytest.mark.skipif(not inotify_available(),
+                                                                 reason="inotify is only available on Linux")))
+
+def _changes(project):
+    '''Edits made to a populated directory, one step at a time'''
+    main_file = project / "src" / "main.py"
+    yield main_file.write_text(main_file.read_text() + "\nprint('Appended')\n")
+    yield (project / "src" / "utils" / "helper.c").write_text("/* helper\n*/\nint helper;\n")
+    yield (project / "tests" / "test_math_utils.py").unlink()
+    nested = project / "src" / "generated" / "deeper"
+    nested.mkdir(parents=True)
+    (nested / "model.py").write_text("x = 1\n# comment\ny = 2\n")
+    yield (project / "src" / "generated" / "model.c").write_text("int model;\n")
+    yield (project / "src" / "generated").rename(project / "generated")
+    yield (project / "README.py").write_text("# Renamed from markdown\nx = 1\n")
+    yield shutil.rmtree(project / "src" / "utils")
+    yield (project / "data" / "notes.txt").write_text("Not counted\n")
+
+@pytest.mark.parametrize("overrides", ({},
+                                       {"depth" : 1},
+                                       {"directory_filter_function" : construct_directory_filter(frozenset(("deeper",)),
+                                                                                                 exclude=True)},
+                                       {"minimum_characters" : 5}))
+def test_update_consistency(mock_dir, mock_config, overrides):
+    project = mock_dir / "project"
+    populate_directory(project)
+    object.__setattr__(mock_config, "symbol_mapping", {"py" : (b"#", None, None), "c" : (b"//", b"/*", b"*/")})
+    kwargs = scan_kwargs(mock_config, **overrides)
+    watch = DirectoryWatch(str(project), **kwargs)
+
+    for step, _ in enumerate(_changes(project)):
+        # Every path touched, as reported by inotify or found by polling
+        paths = {str(path) for path in project.rglob("*")} | set(watch.files) | set(watch.directories)
+        watch.update(paths)
+        expected = DirectoryWatch(str(project), **kwargs)
+        assert watch.summary(True) == expected.summary(True), f"Step {step}"
+        assert watch.files == expected.files, f"Step {step}"
+
+    # Dropped events lead to the whole directory being counted again
+    (project / "late.py").write_text("z = 3\n")
+    watch.update((str(project),))
+    assert watch.summary(True) == DirectoryWatch(str(project), **kwargs).summary(True)
+
+@pytest.mark.parametrize("source_type", SOURCES)
+def test_change_sources(mock_dir, mock_config, source_type):
+    project = mock_dir / "project"
+    populate_directory(project)
+    object.__setattr__(mock_config, "symbol_mapping", {"py" : (b"#", None, None), "c" : (b"//", b"/*", b"*/")})
+    kwargs = scan_kwargs(mock_config)
+    watch = DirectoryWatch(str(project), **kwargs)
+    source = source_type(watch)
+    try:
+        for step, _ in enumerate(_changes(project)):
+            changed = set()
+            # Events may take a moment to arrive
+            deadline = time.monotonic() + 5
+            while not changed and time.monotonic() < deadline:
+                changed = source.changes(0.1)
+            changed |= source.changes(0.1)
+            watch.update(changed)
+            source.synchronize()
+            expected = DirectoryWatch(str(project), **kwargs)
+            assert watch.summary(True) == expected.summary(True), f"Step {step}, changes reported: {changed}"
+    finally:
+        source.close()
+
+def test_watch_directory(mock_dir, mock_config):
+    project = mock_dir / "project"
+    populate_directory(project)
+    object.__setattr__(mock_config, "symbol_mapping", {"py" : (b"#", None, None), "c" : (b"//", b"/*", b"*/")})
+    kwargs = scan_kwargs(mock_config)
+    summaries = watch_directory(DirectoryWatch(str(project), **kwargs), interval=0.05, polling=True)
+    first = next(summaries)
+    assert first == {**DirectoryWatch(str(project), **kwargs).summary(), "changed" : 3}
+
+    (project / "src" / "added.py").write_text("x = 1\ny = 2\n")
+    second = next(summaries)
+    assert second["changed"] == 1
+    assert (second["total"], second["loc"]) == (first["total"] + 2, first["loc"] + 2)
+    assert second["languages"]["py"]["files"] == first["languages"]["py"]["files"] + 1
+    summaries.close()
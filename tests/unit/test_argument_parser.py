@@ -11,7 +11,14 @@ def test_exclusive_groups(mock_config, mock_dir) -> None:
     illegal_combinations: tuple[str, ...] = (
         "-it py -xt js",
         "-if foo.py -xf bar.py",
-        "-id foo -xd bar"
+        "-id foo -xd bar",
+        "--skip-generated --cache",
+        "--watch --cache",
+        "--watch 0",
+        "--poll",
+        "--prefetch -j 2",
+        "--prefetch --watch",
+        "-xr (?P<name>a) (?P<name>b)"
     )
 
     base_args: str = f"-d {mock_dir}"
@@ -35,7 +42,15 @@ def test_allowed_combinations(mock_config, mock_dir):
         "-if foo.py bar.py",
         "-xf foo.py bar.py",
         "-id foo bar",
-        "-xd foo bar"
+        "-xd foo bar",
+        "-xd foo bar --gitignore",
+        "--skip-generated -j 2",
+        "--no-daemon -vb REPORT",
+        "--watch 0.5 --poll -vb DETAILED",
+        "--watch -t -j 2",
+        "--prefetch -vb REPORT --stats",
+        "--prefetch -t -j 2 --ndjson",
+        "-xr (?i)BUILD ^zzz|build"
     )
 
     base_args: str = f"-d {mock_dir}"
@@ -0,0 +1,102 @@
+'''Unit tests for the benchmark corpus generator and report comparison'''
+
+import copy
+import os
+
+import pytest
+
+from benchmarks.corpus import CorpusSpec, generate_corpus
+from benchmarks.suite import compare_reports, evict_corpus
+
+SYMBOL_MAPPING = {"py" : (b"#", None, None),
+                  "c" : (b"//", b"/*", b"*/"),
+                  "hs" : (None, b"{-", b"-}")}
+
+def _read_tree(root):
+    tree = {}
+    for directory, _, filenames in os.walk(root):
+        for filename in filenames:
+            filepath = os.path.join(directory, filename)
+            with open(filepath, "rb") as file:
+                tree[os.path.relpath(filepath, root)] = file.read()
+    return tree
+
+def test_corpus_is_reproducible(tmp_path):
+    spec = CorpusSpec(seed=7, files=50, depth=2, fan_out=3, median_size=512,
+                      languages={"py" : 1, "c" : 1, "hs" : 1})
+    first = generate_corpus(spec, str(tmp_path / "first"), SYMBOL_MAPPING)
+    second = generate_corpus(spec, str(tmp_path / "second"), SYMBOL_MAPPING)
+
+    first_tree, second_tree = _read_tree(tmp_path / "first"), _read_tree(tmp_path / "second")
+    assert first == second and first_tree == second_tree
+    assert first.files == len(first_tree) and first.bytes == sum(map(len, first_tree.values()))
+    assert first.directories == 1 + 3 + 9
+    assert all(path.count(os.sep) <= 2 for path in first_tree)
+    assert {path.rsplit(".", 1)[-1] for path in first_tree} == {"py", "c", "hs"}
+
+    generate_corpus(CorpusSpec(seed=8, files=50, depth=2, fan_out=3, median_size=512,
+                               languages={"py" : 1, "c" : 1, "hs" : 1}),
+                    str(tmp_path / "different"), SYMBOL_MAPPING)
+    assert _read_tree(tmp_path / "different") != first_tree
+
+def test_unknown_language(tmp_path):
+    with pytest.raises(ValueError):
+        generate_corpus(CorpusSpec(files=1, languages={"txt" : 1}), str(tmp_path), SYMBOL_MAPPING)
+
+def test_compare_reports():
+    result = {"parse_mode" : "BUF", "verbosity" : "BARE", "files_per_second" : 1000.0,
+              "peak_rss" : 100 << 20, "total" : 10, "loc" : 8}
+    baseline = {"corpus" : {"seed" : 0}, "results" : [result]}
+    assert compare_reports(baseline, copy.deepcopy(baseline)) == []
+
+    current = copy.deepcopy(baseline)
+    current["results"][0]["files_per_second"] = 950.0
+    assert compare_reports(baseline, current, tolerance=0.1) == []
+    current["results"][0]["files_per_second"] = 800.0
+    current["results"][0]["peak_rss"] = 150 << 20
+    assert len(compare_reports(baseline, current, tolerance=0.1)) == 2
+
+    current["results"][0]["loc"] = 9
+    assert any("counts changed" in regression for regression in compare_reports(baseline, current))
+
+    current["corpus"] = {"seed" : 1}
+    with pytest.raises(ValueError):
+        compare_reports(baseline, current)
+
+def test_compare_startup():
+    baseline = {"corpus" : {"seed" : 0}, "results" : [],
+                "startup" : {"seconds" : 0.1, "import_seconds" : 0.05, "modules" : 100}}
+    current = copy.deepcopy(baseline)
+    current["startup"]["import_seconds"] = 0.052
+    assert compare_reports(baseline, current, tolerance=0.1) == []
+    current["startup"].update({"import_seconds" : 0.08, "modules" : 120})
+    assert len(compare_reports(baseline, current, tolerance=0.1)) == 2
+    # Baselines made before startup was measured still compare
+    del baseline["startup"]
+    assert compare_reports(baseline, current) == []
+
+def test_compare_cold_cases():
+    result = {"parse_mode" : "BUF", "verbosity" : "BARE", "files_per_second" : 1000.0,
+              "peak_rss" : 100 << 20, "total" : 10, "loc" : 8}
+    cold = [{**result, "read_ahead" : read_ahead, "files_per_second" : 500.0 * (1 + read_ahead)}
+            for read_ahead in (False, True)]
+    for case in cold:
+        del case["peak_rss"]
+    baseline = {"corpus" : {"seed" : 0}, "results" : [result], "cold" : cold}
+    current = copy.deepcopy(baseline)
+    assert compare_reports(baseline, current) == []
+
+    current["cold"][1]["files_per_second"] = 600.0
+    assert compare_reports(baseline, current) == ["BUF/BARE cold with read-ahead: 600 files/s, down from 1000"]
+    # Baselines made before cold cases were timed still compare
+    del baseline["cold"]
+    assert compare_reports(baseline, current) == []
+
+@pytest.mark.skipif(not hasattr(os, "posix_fadvise"), reason="Files are evicted through posix_fadvise")
+def test_evict_corpus(tmp_path):
+    generate_corpus(CorpusSpec(files=20, depth=1, fan_out=2, median_size=512, languages={"py" : 1}),
+                    str(tmp_path), SYMBOL_MAPPING)
+    tree = _read_tree(tmp_path)
+    evict_corpus(str(tmp_path))
+    # Eviction only drops clean pages, which are read back from storage unchanged
+    assert _read_tree(tmp_path) == tree
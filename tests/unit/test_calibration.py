@@ -0,0 +1,34 @@
+'''Unit tests for choosing AUTO parsing thresholds'''
+
+from locstat.data_structures.parse_modes import ParseMode
+from locstat.utilities.calibration import choose_thresholds, measure_parse_modes
+
+SIZES: list[int] = [256, 4096, 65536, 1 << 20]
+
+def test_thresholds_follow_fastest_modes():
+    timings = {ParseMode.COMPLETE : [1.0, 1.0, 3.0, 3.0],
+               ParseMode.MMAP : [2.0, 2.0, 1.0, 2.0],
+               ParseMode.BUFFERED : [3.0, 3.0, 3.0, 1.0]}
+    assert choose_thresholds(SIZES, timings) == (65536, 1 << 20)
+
+def test_thresholds_without_mmap():
+    timings = {ParseMode.COMPLETE : [1.0, 1.0, 1.0, 3.0],
+               ParseMode.BUFFERED : [2.0, 2.0, 2.0, 1.0]}
+    mmap_threshold, buffered_threshold = choose_thresholds(SIZES, timings)
+    assert mmap_threshold == buffered_threshold == 1 << 20
+
+def test_unused_modes_are_skipped():
+    # Reading whole files wins everywhere, so neither threshold is reached within the measured sizes
+    timings = {ParseMode.COMPLETE : [1.0] * 4,
+               ParseMode.MMAP : [2.0] * 4,
+               ParseMode.BUFFERED : [2.0] * 4}
+    assert choose_thresholds(SIZES, timings) == (1 << 21, 1 << 21)
+
+    timings[ParseMode.BUFFERED] = [0.5] * 4
+    assert choose_thresholds(SIZES, timings) == (256, 256)
+
+def test_measurements_cover_every_size(tmp_path):
+    timings = measure_parse_modes(str(tmp_path), SIZES[:2], repeat=1)
+    assert ParseMode.COMPLETE in timings and ParseMode.BUFFERED in timings
+    assert all(len(mode_timings) == 2 and min(mode_timings) > 0 for mode_timings in timings.values())
+    assert not any(tmp_path.iterdir())
@@ -1,10 +1,18 @@
+import io
+import random
 from pathlib import Path
-from typing import Iterable
+from typing import Iterable, Optional
 
-from locstat.parsing.extensions._parsing import (_parse_file_vm_map,
+import pytest
+
+from locstat.data_structures.parse_modes import ParseMode
+from locstat.parsing.extensions._parsing import (Parser,
+                                              _parse_file_vm_map,
                                               _parse_file_no_chunk,
-                                              _parse_file)
-from locstat.data_structures.typing import FileParsingFunction, LanguageMetadata
+                                              _parse_file,
+                                              _parse_files)
+from locstat.parsing.stream import parse_stream
+from locstat.data_structures.typing import CommentSymbols, FileParsingFunction, LanguageMetadata
 from tests.fixtures import mock_dir
 from tests.constants import UNIX_NEWLINE, WIN_NEWLINE
 
@@ -204,4 +212,168 @@ def test_missing_newline(mock_dir) -> None:
     _test_helper_run_all_parsers(mock_file, (b"#", None, None), expected_total, expected_loc)
     
     mock_file.write_text(WIN_NEWLINE.join(lines))
-    _test_helper_run_all_parsers(mock_file, (b"#", None, None), expected_total, expected_loc)
\ No newline at end of file
+    _test_helper_run_all_parsers(mock_file, (b"#", None, None), expected_total, expected_loc)
+
+    # Files ending in a '0' were once mistaken for empty ones
+    mock_file.write_text("x = 1\ny = 0")
+    _test_helper_run_all_parsers(mock_file, (b"#", None, None), 2, 2)
+
+def test_batch_parsing(mock_dir) -> None:
+    contents: dict[str, str] = {"_mock_file.py" : "# Comment\nx = 1\n\ny = 2",
+                                "_mock_file.c" : "/* Block\n*/ int x;\n// Comment\n",
+                                "_mock_empty.py" : "",
+                                "_mock_file.html" : "<!-- a -->\n<p></p>\n"}
+    symbols: dict[str, tuple] = {"py" : (b"#", None, None),
+                                 "c" : (b"//", b"/*", b"*/"),
+                                 "html" : (None, b"<!--", b"-->")}
+    batch: list[tuple[str, tuple]] = []
+    for filename, text in contents.items():
+        (mock_dir / filename).write_text(text)
+        batch.append((str(mock_dir / filename), symbols[filename.rsplit(".", 1)[-1]]))
+
+    expected: list[int] = []
+    for filepath, comment_data in batch:
+        expected.extend(_parse_file(filepath, *comment_data, 1))
+
+    for parse_mode in ParseMode:
+        counts = _parse_files(batch, 1, parse_mode)
+        assert counts.typecode == "Q" and list(counts) == expected, \
+        f"Batch parsing in mode {parse_mode} returned {list(counts)}, expected {expected}"
+
+    assert len(_parse_files([], 1)) == 0
+    with pytest.raises(FileNotFoundError):
+        _parse_files(batch + [(str(mock_dir / "_missing.py"), symbols["py"])], 1)
+
+def _as_symbols(symbols: CommentSymbols) -> tuple[bytes, ...]:
+    if symbols is None:
+        return ()
+    return (symbols,) if isinstance(symbols, bytes) else symbols
+
+def _reference_count(data: bytes, comment_data: LanguageMetadata, minimum_characters: int) -> tuple[int, int]:
+    '''Naive suffix matching of comment symbols, used as an oracle for the compiled automaton'''
+    singleline, multiline_start, multiline_end = map(_as_symbols, comment_data)
+    openers: list[tuple[bytes, Optional[bytes]]] = [(symbol, None) for symbol in singleline]
+    if len(multiline_start) == len(multiline_end):
+        openers.extend(zip(multiline_start, multiline_end))
+
+    total = loc = valid = 0
+    segment: bytes = b""
+    terminator: Optional[bytes] = None
+    in_singleline: bool = False
+    for byte in data:
+        if byte == 0x0A:
+            total += 1
+            loc += (valid > minimum_characters) if terminator else (valid >= minimum_characters)
+            valid, in_singleline = 0, False
+            segment = segment + b"\n" if terminator else b""
+            continue
+        if in_singleline:
+            continue
+        segment += bytes((byte,))
+        if terminator:
+            if segment.endswith(terminator):
+                terminator, segment = None, b""
+            continue
+
+        # Longest symbol ending here wins, earlier (singleline) symbols on ties
+        matches = [(len(symbol), -index, symbol, end) for index, (symbol, end) in enumerate(openers)
+                   if segment.endswith(symbol)]
+        if matches:
+            _, _, symbol, terminator = max(matches)
+            valid -= sum(1 for c in symbol[:-1] if c not in b" \t\v\f\r" and c & 0xC0 != 0x80)
+            in_singleline, segment = terminator is None, b""
+            continue
+        valid += byte not in b" \t\v\f\r" and byte & 0xC0 != 0x80
+
+    if data and data[-1] != 0x0A:
+        total += 1
+        loc += valid >= minimum_characters
+    return total, loc
+
+def test_overlapping_symbols(mock_dir) -> None:
+    lines: list[str] = ["<<!-- Opened despite the leading '<', which counts as code -->",
+                        "<p></p>",
+                        "<!---- Closed despite the extra dashes ---->",
+                        "<p></p>"]
+    expected_total, expected_loc = len(lines), 3
+    mock_file: Path = mock_dir / "_mock_file.html"
+    mock_file.write_text(UNIX_NEWLINE.join(lines))
+    _test_helper_run_all_parsers(mock_file, (None, b"<!--", b"-->"), expected_total, expected_loc)
+
+    lines = ["/** Doc comment **/", "int x;"]
+    mock_file.write_text(UNIX_NEWLINE.join(lines))
+    _test_helper_run_all_parsers(mock_file, (b"//", b"/*", b"*/"), len(lines), 1)
+
+def test_multiple_symbols(mock_dir) -> None:
+    lines: list[str] = ["# Comment",
+                        "// Comment",
+                        "x = 1 # Trailing comment",
+                        "/* Block",
+                        "*/",
+                        "(* Another block",
+                        "*)",
+                        "y = 2"]
+    expected_total, expected_loc = len(lines), 2
+    mock_file: Path = mock_dir / "_mock_file.txt"
+    mock_file.write_text(UNIX_NEWLINE.join(lines))
+    _test_helper_run_all_parsers(mock_file, ((b"#", b"//"), (b"/*", b"(*"), (b"*/", b"*)")),
+                                 expected_total, expected_loc)
+
+    with pytest.raises(ValueError):
+        _parse_file(str(mock_file), None, (b"/*", b"(*"), b"*/", 1)
+    with pytest.raises(ValueError):
+        _parse_file(str(mock_file), b"", None, None, 1)
+
+def test_randomized_against_reference(mock_dir) -> None:
+    # Exercises bulk skipping and overlapping symbols, which must agree with naive matching exactly
+    rng: random.Random = random.Random(0x10C)
+    fragments: list[bytes] = [b"int x = 1;", b"/*", b"*/", b"//", b"#", b"<!--", b"-->", b"--", b"{-", b"-}",
+                              b"<", b"(*", b"*)", b"\n", b"\r\n", b" ", b"\t", b"*", b"/", b"-",
+                              "\u00e9\u20ac".encode(), b"a" * 40, b" " * 20]
+    symbols: list[LanguageMetadata] = [(b"//", b"/*", b"*/"),
+                                       (b"#", None, None),
+                                       (None, b"<!--", b"-->"),
+                                       (b"--", b"{-", b"-}"),
+                                       (b"*", None, b";"),
+                                       ((b"#", b"//"), (b"/*", b"(*", b"<!--"), (b"*/", b"*)", b"-->")),
+                                       ((b"-", b"--"), (b"<!---", b"<!--"), (b"--->", b"-->"))]
+    mock_file: Path = mock_dir / "_mock_file.txt"
+    for _ in range(300):
+        data: bytes = b"".join(rng.choices(fragments, k=rng.randrange(0, 400))) + b"\n"
+        mock_file.write_bytes(data)
+        comment_data = rng.choice(symbols)
+        minimum_characters: int = rng.randrange(0, 4)
+        expected_total, expected_loc = _reference_count(data, comment_data, minimum_characters)
+        _test_helper_run_all_parsers(mock_file, comment_data, expected_total, expected_loc, minimum_characters)
+
+def test_streaming_parser() -> None:
+    # Chunk boundaries may fall anywhere, including within comment symbols and multi-byte characters
+    rng: random.Random = random.Random(0x5EED)
+    fragments: list[bytes] = [b"int x = 1;", b"/*", b"*/", b"//", b"#", b"<!--", b"-->",
+                              b"\n", b"\r\n", b" ", b"\t", b"*", b"/", "\u00e9\u20ac".encode(), b"a" * 40]
+    symbols: list[LanguageMetadata] = [(b"//", b"/*", b"*/"),
+                                       (b"#", None, None),
+                                       (None, b"<!--", b"-->"),
+                                       ((b"#", b"//"), (b"/*", b"<!--"), (b"*/", b"-->"))]
+    for _ in range(300):
+        data: bytes = b"".join(rng.choices(fragments, k=rng.randrange(0, 200)))
+        comment_data = rng.choice(symbols)
+        minimum_characters: int = rng.randrange(0, 4)
+        expected: tuple[int, int] = _reference_count(data, comment_data, minimum_characters)
+
+        parser: Parser = Parser(*comment_data, minimum_characters)
+        view: memoryview = memoryview(bytearray(data))
+        offset: int = 0
+        while offset < len(data):
+            size: int = rng.randrange(0, 8)
+            parser.feed(view[offset:offset+size])
+            offset += size
+        assert parser.finish() == expected, f"Chunked parse of {data!r} with {comment_data}"
+
+        # Finishing resets the parser for the next file
+        parser.feed(data)
+        assert parser.finish() == expected
+        assert parse_stream(io.BytesIO(data), comment_data, minimum_characters, chunk_size=7) == expected
+
+    with pytest.raises(TypeError):
+        Parser(b"#").feed("Not a bytes-like object")
@@ -0,0 +1,98 @@
+import array
+import os
+
+import pytest
+
+from tests.fixtures import mock_dir, mock_config
+
+from locstat.data_structures.parse_modes import ParseMode
+from locstat.parsing.directory import NATIVE_WALK_AVAILABLE, parse_directory, parse_directory_native
+from locstat.parsing.extensions._parsing import (_get_sniff_options,
+                                                 _parse_bytes,
+                                                 _parse_file,
+                                                 _parse_file_auto,
+                                                 _parse_file_no_chunk,
+                                                 _parse_file_vm_map,
+                                                 _set_sniff_options,
+                                                 _skipped_files)
+from locstat.parsing.parallel import parse_directory_parallel
+from locstat.utilities.core import SKIP_REASONS, construct_directory_filter, construct_file_filter, derive_file_parser
+
+SYMBOLS = (b"//", b"/*", b"*/")
+PARSERS = (_parse_file, _parse_file_no_chunk, _parse_file_vm_map, _parse_file_auto)
+
+@pytest.fixture
+def sniffing():
+    '''Enable sniffing with the default thresholds for the duration of a test'''
+    _set_sniff_options(4096, 1000)
+    _skipped_files(True)
+    yield
+    _set_sniff_options(0, 1000)
+    _skipped_files(True)
+
+@pytest.mark.parametrize("contents, reason", (
+    (b"int x;\n", None),
+    (b"int x;\0\n", "binary"),
+    # MPEG transport streams share the .ts extension
+    (b"\x47\x40\x00\x10" * 47, "binary"),
+    (b"var a=" + b"x" * 1200 + b";\n", "long_lines"),
+    (b"var a=" + b"x" * 990 + b";\nvar b;\n", None),
+    (b"// Code generated by stringer. DO NOT EDIT.\nint x;\n", "generated"),
+    (b"/* @generated */\nint x;\n", "generated"),
+    (b"// <auto-generated>\nint x;\n", "generated"),
+    # Only the first block is inspected
+    (b"int x;\n" * 1000 + b"// DO NOT EDIT\n", None),
+))
+def test_sniffing(mock_dir, sniffing, contents, reason):
+    file = mock_dir / "sniffed.c"
+    file.write_bytes(contents)
+    expected = tuple(int(name == reason) for name in SKIP_REASONS)
+    for parser in PARSERS:
+        total, loc = parser(str(file), *SYMBOLS, 1)
+        assert (total == 0) is (reason is not None), parser.__qualname__
+        assert _skipped_files(True) == expected, parser.__qualname__
+    _parse_bytes(contents, *SYMBOLS, 1)
+    assert _skipped_files(True) == expected
+
+def test_thresholds(mock_dir, sniffing):
+    file = mock_dir / "minified.js"
+    file.write_bytes(b"var a=" + b"x" * 1200 + b";\n")
+    _set_sniff_options(4096, 2000)
+    assert _parse_file(str(file), *SYMBOLS, 1) == (1, 1)
+    # Lines are only measured within the sniffed block
+    _set_sniff_options(512, 100)
+    assert _parse_file(str(file), *SYMBOLS, 1) == (0, 0)
+    assert _get_sniff_options() == (512, 100)
+    assert _skipped_files() == (0, 1, 0)
+
+    _set_sniff_options(0, 100)
+    assert _parse_file(str(file), *SYMBOLS, 1) == (1, 1)
+    with pytest.raises(ValueError):
+        _set_sniff_options(-1, 100)
+
+def test_scans_report_skipped_files(mock_dir, mock_config, sniffing):
+    for directory in ("src", "dist", "proto"):
+        (mock_dir / directory).mkdir()
+    (mock_dir / "src" / "main.c").write_text("int x;\n")
+    (mock_dir / "dist" / "bundle.js").write_text("var a=" + "x" * 1200 + ";\n")
+    (mock_dir / "dist" / "video.ts").write_bytes(b"\x47\x40\x00\x10" * 47)
+    (mock_dir / "proto" / "service.c").write_text("/* @generated */\nint x;\n")
+    object.__setattr__(mock_config, "symbol_mapping", {"c" : SYMBOLS, "js" : SYMBOLS, "ts" : SYMBOLS})
+    kwargs = {"config" : mock_config, "depth" : -1, "minimum_characters" : 1}
+    filters = {"file_parsing_function" : derive_file_parser(ParseMode.BUFFERED),
+               "file_filter_function" : construct_file_filter(),
+               "directory_filter_function" : construct_directory_filter(frozenset())}
+
+    line_data = array.array("L", (0, 0))
+    parse_directory(os.scandir(mock_dir), line_data=line_data, **kwargs, **filters)
+    assert tuple(line_data) == (1, 1) and _skipped_files(True) == (1, 1, 1)
+
+    # Counts of worker processes are added to those of the parent
+    line_data = array.array("L", (0, 0))
+    parse_directory_parallel(str(mock_dir), line_data=line_data, jobs=2, **kwargs, **filters)
+    assert tuple(line_data) == (1, 1) and _skipped_files(True) == (1, 1, 1)
+
+    if NATIVE_WALK_AVAILABLE:
+        line_data = array.array("L", (0, 0))
+        parse_directory_native(str(mock_dir), line_data=line_data, parse_mode=ParseMode.AUTO, **kwargs)
+        assert tuple(line_data) == (1, 1) and _skipped_files(True) == (1, 1, 1)
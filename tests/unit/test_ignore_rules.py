@@ -0,0 +1,96 @@
+import os
+import pickle
+from array import array
+
+import pytest
+
+from tests.fixtures import mock_dir, mock_config
+
+from locstat.data_structures.parse_modes import ParseMode
+from locstat.parsing.directory import parse_directory
+from locstat.utilities.core import construct_directory_filter, construct_file_filter, derive_file_parser
+from locstat.utilities.ignore import IgnoreRules
+
+@pytest.mark.parametrize("patterns, path, is_directory, expected", (
+    ("build/", "build", True, True),
+    ("build/", "build", False, False),
+    ("build/", "src/build", True, True),
+    ("/build", "src/build", True, False),
+    ("src/build", "src/build", True, True),
+    ("src/build", "lib/src/build", True, False),
+    ("*.min.js", "web/app.min.js", False, True),
+    ("*.min.js", "web/app.js", False, False),
+    ("*_pb2.py", "proto/service_pb2.py", False, True),
+    ("**/generated", "a/b/generated", True, True),
+    ("**/generated", "generated", True, True),
+    ("docs/**", "docs/a/b.md", False, True),
+    ("a/**/b.py", "a/b.py", False, True),
+    ("a/**/b.py", "a/x/y/b.py", False, True),
+    ("a/*.py", "a/x/b.py", False, False),
+    ("file?.c", "file1.c", False, True),
+    ("file?.c", "file10.c", False, False),
+    ("[abc].py", "b.py", False, True),
+    ("[!abc].py", "b.py", False, False),
+    ("[!abc].py", "d.py", False, True),
+    ("\\#hash", "#hash", False, True),
+    ("# comment", "# comment", False, False),
+    ("*.py\n!keep.py", "keep.py", False, False),
+    ("*.py\n!keep.py", "drop.py", False, True),
+    ("!keep.py\n*.py", "keep.py", False, True),
+    ("trailing   ", "trailing", False, True),
+))
+def test_patterns(tmp_path, patterns, path, is_directory, expected):
+    (tmp_path / ".gitignore").write_text(patterns + "\n")
+    rules = IgnoreRules(str(tmp_path))
+    assert rules.ignored(os.path.join(str(tmp_path), *path.split("/")), is_directory) is expected
+
+def test_precedence(tmp_path):
+    (tmp_path / "src" / "vendor").mkdir(parents=True)
+    (tmp_path / ".gitignore").write_text("*.c\n")
+    # .ignore files override .gitignore files of the same directory
+    (tmp_path / ".ignore").write_text("!main.c\n")
+    # Deeper files override shallower ones
+    (tmp_path / "src" / ".gitignore").write_text("!*.c\nvendor/\n")
+    rules = IgnoreRules(str(tmp_path))
+
+    assert rules.ignored(str(tmp_path / "util.c"), False)
+    assert not rules.ignored(str(tmp_path / "main.c"), False)
+    assert not rules.ignored(str(tmp_path / "src" / "util.c"), False)
+    assert rules.ignored(str(tmp_path / "src" / "vendor"), True)
+    assert rules.ignored(str(tmp_path / ".git"), True)
+
+    # Compiled rules are rebuilt from the root when shipped to worker processes
+    copied = pickle.loads(pickle.dumps(rules.file_filter(construct_file_filter())))
+    assert copied(str(tmp_path / "src" / "util.c"), "c")
+    assert not copied(str(tmp_path / "util.c"), "c")
+
+def test_repository_rules(tmp_path):
+    '''Ignore files above the scanned directory apply up to the root of its repository'''
+    (tmp_path / ".git" / "info").mkdir(parents=True)
+    (tmp_path / ".git" / "info" / "exclude").write_text("*.log\n")
+    (tmp_path / ".gitignore").write_text("project/out/\n")
+    (tmp_path / "project" / "out").mkdir(parents=True)
+    rules = IgnoreRules(str(tmp_path / "project"))
+    assert rules.ignored(str(tmp_path / "project" / "out"), True)
+    assert rules.ignored(str(tmp_path / "project" / "debug.log"), False)
+    assert not rules.ignored(str(tmp_path / "project" / "main.py"), False)
+
+def test_ignored_directories_are_not_scanned(mock_dir, mock_config, monkeypatch):
+    for directory in ("node_modules/package", "target/debug", "src/build", "src/app"):
+        (mock_dir / directory).mkdir(parents=True)
+        (mock_dir / directory / "main.py").write_text("x = 1\n")
+    (mock_dir / ".gitignore").write_text("node_modules/\n/target\nbuild/\n")
+    object.__setattr__(mock_config, "symbol_mapping", {"py" : (b"#", None, None)})
+
+    scanned = []
+    scandir = os.scandir
+    monkeypatch.setattr(os, "scandir", lambda path: scanned.append(str(path)) or scandir(path))
+    rules = IgnoreRules(str(mock_dir))
+    line_data = array("L", (0, 0))
+    with scandir(mock_dir) as directory_data:
+        parse_directory(directory_data, mock_config, line_data, -1, derive_file_parser(ParseMode.BUFFERED),
+                        rules.file_filter(construct_file_filter()),
+                        rules.directory_filter(construct_directory_filter(frozenset())), 1)
+
+    assert tuple(line_data) == (1, 1)
+    assert sorted(os.path.relpath(path, mock_dir) for path in scanned) == ["src", os.path.join("src", "app")]
@@ -0,0 +1,91 @@
+import os
+import pickle
+from array import array
+
+import pytest
+
+from tests.fixtures import mock_dir, mock_config
+
+from benchmarks.filters import benchmark_filters, generate_paths
+
+from locstat.data_structures.parse_modes import ParseMode
+from locstat.parsing.directory import parse_directory
+from locstat.utilities.core import construct_directory_filter, construct_file_filter, derive_file_parser
+from locstat.utilities.patterns import PathPatterns
+
+ROOT = os.path.join(os.sep, "project")
+
+def _path(relative):
+    return os.path.join(ROOT, *relative.split("/"))
+
+@pytest.mark.parametrize("kwargs, relative, expected", (
+    ({"exclude_globs" : ("*_pb2.py",)}, "proto/service_pb2.py", False),
+    ({"exclude_globs" : ("*_pb2.py",)}, "proto/service.py", True),
+    ({"exclude_globs" : ("**/generated/**",)}, "src/generated/table.c", False),
+    ({"exclude_globs" : ("**/generated/**",)}, "src/generated.c", True),
+    ({"exclude_globs" : ("src/*.c",)}, "src/main.c", False),
+    ({"exclude_globs" : ("src/*.c",)}, "lib/src/main.c", True),
+    ({"include_globs" : ("src/**/*.py",)}, "src/a/b/main.py", True),
+    ({"include_globs" : ("src/**/*.py",)}, "tests/main.py", False),
+    ({"exclude_regexes" : (r"/tests?/",)}, "src/test/main.py", False),
+    ({"exclude_regexes" : (r"^tests/",)}, "src/tests/main.py", True),
+    # Alternatives after an anchored one may match anywhere
+    ({"exclude_regexes" : (r"^zzz|build",)}, "src/build/b.py", False),
+    # Global inline flags apply to their own regex only
+    ({"exclude_regexes" : (r"(?i)BUILD", r"^docs/")}, "src/build/b.py", False),
+    ({"exclude_regexes" : (r"(?i)BUILD", r"^docs/")}, "DOCS/conf.py", True),
+    ({"exclude_regexes" : ("(?x) vendor  # third party", r"\.c$")}, "vendor/six.py", False),
+    ({"include_regexes" : (r"\.pyi?$",)}, "src/main.pyi", True),
+    # Exclusion takes precedence over inclusion
+    ({"include_globs" : ("*.py",), "exclude_regexes" : ("vendor",)}, "vendor/six.py", False),
+    ({"include_globs" : ("*.c",), "include_regexes" : ("^docs/",)}, "docs/conf.py", True),
+))
+def test_file_patterns(kwargs, relative, expected):
+    patterns = PathPatterns(ROOT, **kwargs)
+    assert patterns.file_allowed(_path(relative)) is expected
+    # Filters over patterns are shipped to worker processes
+    file_filter = pickle.loads(pickle.dumps(patterns.file_filter(construct_file_filter())))
+    assert file_filter(_path(relative), relative.rsplit(".", 1)[-1]) is expected
+
+@pytest.mark.parametrize("pattern, relative, pruned", (
+    ("**/generated/**", "src/generated", True),
+    ("**/generated/**", "src/generated_code", False),
+    ("build", "build", True),
+    ("build/", "src/build", True),
+    ("/build", "src/build", False),
+    ("*.py", "src", False),
+))
+def test_directory_pruning(pattern, relative, pruned):
+    assert PathPatterns(ROOT, exclude_globs=(pattern,)).directory_allowed(_path(relative)) is not pruned
+
+def test_include_patterns_do_not_prune():
+    patterns = PathPatterns(ROOT, include_globs=("src/**/*.py",))
+    directory_filter = construct_directory_filter(frozenset())
+    assert patterns.directory_filter(directory_filter) is directory_filter
+
+def test_excluded_subtrees_are_not_scanned(mock_dir, mock_config, monkeypatch):
+    for directory in ("src/generated", "src/app", "proto"):
+        (mock_dir / directory).mkdir(parents=True)
+        (mock_dir / directory / "main.py").write_text("x = 1\n")
+    (mock_dir / "proto" / "service_pb2.py").write_text("x = 1\n")
+    object.__setattr__(mock_config, "symbol_mapping", {"py" : (b"#", None, None)})
+
+    scanned = []
+    scandir = os.scandir
+    monkeypatch.setattr(os, "scandir", lambda path: scanned.append(str(path)) or scandir(path))
+    patterns = PathPatterns(str(mock_dir), exclude_globs=("**/generated/**", "*_pb2.py"))
+    line_data = array("L", (0, 0))
+    with scandir(mock_dir) as directory_data:
+        parse_directory(directory_data, mock_config, line_data, -1, derive_file_parser(ParseMode.BUFFERED),
+                        patterns.file_filter(construct_file_filter()),
+                        patterns.directory_filter(construct_directory_filter(frozenset())), 1)
+
+    assert tuple(line_data) == (2, 2)
+    assert os.path.join(str(mock_dir), "src", "generated") not in scanned
+
+def test_filter_benchmark():
+    paths = generate_paths(2000, seed=3)
+    assert paths == generate_paths(2000, seed=3)
+    results = benchmark_filters(paths, (1, 10), repeat=1)
+    assert results["paths"] == 2000 and set(results["glob"]) == set(results["regex"]) == {1, 10}
+    assert 0 < results["pruned_directories"] < results["directories"]
@@ -0,0 +1,48 @@
+'''Unit tests for scan profiling'''
+
+import array
+import os
+
+from tests.fixtures import mock_dir, mock_config, populate_directory
+
+from locstat.data_structures.parse_modes import ParseMode
+from locstat.parsing.directory import parse_directory_record
+from locstat.utilities.core import construct_directory_filter, construct_file_filter, derive_file_parser
+from locstat.utilities.statistics import ScanStatistics
+
+def test_statistics_do_not_change_results(mock_dir, mock_config):
+    populate_directory(mock_dir)
+    (mock_dir / "notes.txt").write_text("Not a supported language\n")
+    (mock_dir / "src" / "skipped.py").write_text("skipped = True\n")
+    object.__setattr__(mock_config, "symbol_mapping", {"py" : (b"#", None, None)})
+
+    file_filter = construct_file_filter(file_set={str(mock_dir / "src" / "skipped.py")}, exclude_file=True)
+    directory_filter = construct_directory_filter({str(mock_dir / "data")}, exclude=True)
+    kwargs = {"config" : mock_config, "depth" : -1, "minimum_characters" : 1}
+
+    expected_data, expected_record = array.array("L", (0, 0)), {}
+    with os.scandir(mock_dir) as directory_data:
+        parse_directory_record(directory_data, line_data=expected_data, language_record=expected_record,
+                               file_parsing_function=derive_file_parser(ParseMode.BUFFERED),
+                               file_filter_function=file_filter, directory_filter_function=directory_filter,
+                               **kwargs)
+
+    stats = ScanStatistics(mock_config.symbol_mapping, slowest_count=2)
+    observed_data, observed_record = array.array("L", (0, 0)), {}
+    with os.scandir(mock_dir) as directory_data, stats.phase("scan"):
+        parse_directory_record(directory_data, line_data=observed_data, language_record=observed_record,
+                               file_parsing_function=stats.file_parser(derive_file_parser(ParseMode.BUFFERED)),
+                               file_filter_function=stats.file_filter(file_filter),
+                               directory_filter_function=stats.directory_filter(directory_filter),
+                               **kwargs)
+    assert (observed_data, observed_record) == (expected_data, expected_record)
+
+    parsed_files = [path for path in mock_dir.rglob("*.py")
+                    if path.name != "skipped.py" and "data" not in path.parts and not path.is_symlink()]
+    assert stats.files_parsed == expected_record["py"]["files"] == len(parsed_files)
+    assert stats.files_filtered == 1 and stats.files_unsupported >= 1
+    assert stats.files_visited == stats.files_filtered + stats.files_unsupported + stats.files_parsed
+    assert stats.directories_filtered == 1
+    assert stats.bytes_read == sum(path.stat().st_size for path in parsed_files)
+    assert stats.extensions["py"][:2] == [len(parsed_files), stats.bytes_read]
+    assert len(stats.slowest) == 2 and "Slowest files:" in stats.report()
@@ -0,0 +1,57 @@
+import json
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+
+from benchmarks.suite import imported_modules, measure_startup
+
+from locstat.data_structures.config import ClocConfig
+
+PACKAGE_ROOT = Path(__file__).parent.parent.parent
+# Modules that a single file count must not pay for
+DEFERRED_MODULES = frozenset(("json", "socket", "sqlite3", "hashlib", "platform",
+                              "concurrent.futures", "multiprocessing", "subprocess", "tarfile", "zipfile", "gzip",
+                              "locstat.parsing.directory", "locstat.parsing.parallel",
+                              "locstat.parsing.revision", "locstat.parsing.watch", "locstat.utilities.calibration"))
+
+def test_single_file_imports(tmp_path):
+    source = tmp_path / "main.py"
+    source.write_text("x = 1\n# comment\n")
+    # The first run may have to compile the language table
+    imported_modules(("-f", str(source)), cwd=str(tmp_path))
+    modules = {name.strip() for name in imported_modules(("-f", str(source)), cwd=str(tmp_path))}
+    assert "locstat.argparser" in modules
+    assert not DEFERRED_MODULES & modules, sorted(DEFERRED_MODULES & modules)
+
+def test_measure_startup():
+    startup = measure_startup(repeat=1)
+    assert 0 < startup["import_seconds"] < startup["seconds"]
+    assert startup["modules"] > 0
+
+@pytest.fixture
+def languages_file(tmp_path) -> Path:
+    path = tmp_path / "languages.json"
+    shutil.copyfile(PACKAGE_ROOT / "locstat" / "languages.json", path)
+    return path
+
+def test_language_table_compilation(languages_file):
+    compiled_file = languages_file.parent / "__pycache__" / f"languages.{sys.implementation.cache_tag}.marshal"
+    ignored, symbol_mapping = ClocConfig._load_languages(languages_file)
+    assert compiled_file.is_file()
+    assert symbol_mapping["py"] == (b"#", None, None)
+
+    # Loaded from the compiled table, identical to the source
+    assert ClocConfig._load_languages(languages_file) == (ignored, symbol_mapping)
+
+    # Changes to languages.json are picked up
+    languages_data = json.loads(languages_file.read_text())
+    languages_data["comments"]["locstat"] = ["%%", None, None]
+    languages_file.write_text(json.dumps(languages_data))
+    assert ClocConfig._load_languages(languages_file)[1]["locstat"] == (b"%%", None, None)
+
+    # As are corrupt tables, which are recompiled
+    compiled_file.write_bytes(b"\x00corrupt")
+    assert ClocConfig._load_languages(languages_file)[1]["locstat"] == (b"%%", None, None)
+    assert ClocConfig._load_languages(languages_file)[0] == ignored